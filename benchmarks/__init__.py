@@ -0,0 +1 @@
+"""Performance benchmarks on synthetic archives (see ``benchmarks.suite``)."""
@@ -0,0 +1,348 @@
+"""Benchmark suite with a stored baseline and a regression threshold.
+
+Every case runs against synthetic archives (:mod:`src.synthetic`) at each
+requested scale. A case reports the best of several repeats, normalised per
+frame or per step where it loops, so results are comparable across scales.
+
+Usage::
+
+    python -m benchmarks                       # compare with baseline.json
+    python -m benchmarks --update-baseline     # store new baseline values
+    python -m benchmarks --scales small medium large --threshold 0.3
+
+The run fails (exit code 1) when any case is slower than its baseline by
+more than ``threshold`` (a fraction, default 0.25).
+"""
+
+from __future__ import annotations
+
+import gc
+import json
+import os
+import platform
+import time
+from collections.abc import Callable, Iterable
+from dataclasses import asdict
+
+import numpy as np
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from src import synthetic
+from src.cache import cache_dir, safe_name
+from src.data_loader import DISPLAY_COLUMNS, load_signals
+from src.trends import TrendStore, calculate_l1_norm
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+DEFAULT_THRESHOLD = 0.25
+DEFAULT_SCALES = ("small", "medium")
+
+SCALES = {
+    "tiny": synthetic.SyntheticScale(surgeries=1, channels=4, timestamps=10, samples=200),
+    "small": synthetic.SyntheticScale(surgeries=2, channels=8, timestamps=50, samples=1000),
+    "medium": synthetic.SyntheticScale(surgeries=5, channels=16, timestamps=200, samples=1000),
+    "large": synthetic.SyntheticScale(surgeries=10, channels=16, timestamps=500, samples=2000),
+}
+
+# Frames drawn / steps taken by the looping cases
+FRAMES = 20
+
+
+def archive_path(scale: synthetic.SyntheticScale) -> str:
+    """Return a pickle of ``scale``, generating it on first use."""
+    name = "-".join(f"{k}{v}" for k, v in asdict(scale).items())
+    path = os.path.join(cache_dir("bench"), f"{safe_name(name)}.pkl")
+    if not os.path.isfile(path):
+        synthetic.write_archive(path, scale)
+    return path
+
+
+class Context:
+    """Data shared by the cases of one scale, loaded lazily."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._frames = None
+        self._app = None
+
+    @property
+    def frames(self):
+        if self._frames is None:
+            self._frames = load_signals(self.path, columns=DISPLAY_COLUMNS, flatten_stimulus=True)
+        return self._frames
+
+    @property
+    def app(self):
+        if self._app is None:
+            from PyQt5.QtWidgets import QApplication
+
+            self._app = QApplication.instance() or QApplication([])
+        return self._app
+
+    def frame_keys(self, n: int = FRAMES):
+        """Return (surgery, [timestamps]) of the first surgery's MEP frames."""
+        mep = self.frames[0]
+        surgery = mep["surgery_id"].iloc[0]
+        timestamps = np.unique(mep.loc[mep["surgery_id"] == surgery, "timestamp"])
+        return surgery, list(timestamps[:n])
+
+
+# -----------------------------------------------------
+# Cases: each returns the number of operations it timed, or
+# {"ops": n, "elapsed": s} when its setup must not be measured
+# -----------------------------------------------------
+def case_load(ctx: Context) -> int:
+    load_signals(ctx.path, columns=DISPLAY_COLUMNS, flatten_stimulus=True)
+    return 1
+
+
+def case_frame_lookup(ctx: Context) -> int:
+    mep = ctx.frames[0]
+    surgery, timestamps = ctx.frame_keys()
+    channels = list(mep["channel"].unique())
+    for ts in timestamps:
+        mep[
+            (mep["surgery_id"] == surgery)
+            & (mep["timestamp"] == ts)
+            & (mep["channel"].isin(channels))
+        ]
+    return len(timestamps)
+
+
+def case_draw(ctx: Context) -> int:
+    from ui.mep_view import MepView
+
+    app = ctx.app
+    mep = ctx.frames[0]
+    surgery, timestamps = ctx.frame_keys()
+    channels = list(mep["channel"].unique())
+    view = MepView()
+    view.resize(1200, 800)
+    view.show()
+    for ts in timestamps:
+        view.update_view(mep, surgery, ts, channels)
+        # Paint synchronously into an offscreen pixmap
+        view.grab()
+    view.close()
+    app.processEvents()
+    return len(timestamps)
+
+
+def case_trend(ctx: Context) -> int:
+    store = TrendStore(persist=False)
+    for df, mode in zip(ctx.frames[:3], ("MEP", "SSEP_UPPER", "SSEP_LOWER")):
+        calculate_l1_norm(df)
+        store.update(df, mode)
+    return 1
+
+
+def case_features(ctx: Context) -> int:
+    # Per-trace time; 1 / result is the extraction throughput in traces/s
+    from src.features import extract_features
+
+    for df in ctx.frames[:3]:
+        extract_features(df)
+    return sum(len(df) for df in ctx.frames[:3])
+
+
+def case_playback(ctx: Context) -> int:
+    from ui.main_window import MainWindow
+
+    app = ctx.app
+    window = MainWindow()
+    window.resize(1400, 900)
+    window.load_data(*ctx.frames)
+    window.show()
+    steps = min(FRAMES, window.timestamp_slider.maximum())
+    start = time.perf_counter()
+    for i in range(1, steps + 1):
+        window.timestamp_slider.setValue(i)
+        app.processEvents()
+    elapsed = time.perf_counter() - start
+    window.close()
+    app.processEvents()
+    # Setting up the window is not part of the measurement
+    return {"ops": max(steps, 1), "elapsed": elapsed}
+
+
+def case_service(ctx: Context) -> dict:
+    from src.service import (
+        DataService,
+        ServiceServer,
+        load_test,
+        sample_paths,
+        start_in_thread,
+    )
+
+    service = DataService(ctx.frames, trend_store=TrendStore(persist=False))
+    server = ServiceServer(service, port=0)
+    start_in_thread(server)
+    paths = sample_paths(service, frames_per_surgery=FRAMES)
+    start = time.perf_counter()
+    # One cold pass over every path, then the same mix served from the cache
+    load_test(server.url, paths, len(paths), concurrency=8)
+    load_test(server.url, paths, 4 * len(paths), concurrency=8)
+    elapsed = time.perf_counter() - start
+    server.shutdown()
+    server.server_close()
+    return {"ops": 5 * len(paths), "elapsed": elapsed}
+
+
+def _open_window(frames, state=None):
+    from PyQt5.QtCore import QEvent
+    from PyQt5.QtWidgets import QApplication
+
+    from ui.main_window import MainWindow
+
+    window = MainWindow()
+    window.resize(1400, 900)
+    window.load_data(*frames, state=state)
+    window.show()
+    window.grab()
+    window.close()
+    # Closed windows are only hidden; delete them so later runs do not
+    # restyle and repaint leftover widgets
+    window.deleteLater()
+    QApplication.sendPostedEvents(None, QEvent.DeferredDelete)
+    del window
+    gc.collect()
+
+
+def case_cold_open(ctx: Context) -> int:
+    # Load the pickle and draw the first frame, as when picking a file
+    app = ctx.app
+    _open_window(load_signals(ctx.path, columns=DISPLAY_COLUMNS, flatten_stimulus=True))
+    app.processEvents()
+    return 1
+
+
+def case_restore(ctx: Context) -> dict:
+    # Reopen a saved session straight at its last frame
+    from src import session
+
+    app = ctx.app
+    surgery, timestamps = ctx.frame_keys()
+    state = {"tab": 0, "surgery": str(surgery), "timestamp": float(timestamps[-1])}
+    path = os.path.join(cache_dir("bench"), "session.json")
+    # Writing the snapshot and warm store happens when the viewer closes
+    session.save_session(ctx.path, ctx.frames, state, path=path)
+    start = time.perf_counter()
+    snapshot = session.load_session(path)
+    _open_window(session.open_session(snapshot), state=snapshot["state"])
+    app.processEvents()
+    return {"ops": 1, "elapsed": time.perf_counter() - start}
+
+
+CASES: dict[str, Callable[[Context], object]] = {
+    "load": case_load,
+    "frame_lookup": case_frame_lookup,
+    "draw": case_draw,
+    "trend": case_trend,
+    "features": case_features,
+    "playback": case_playback,
+    "service": case_service,
+    "cold_open": case_cold_open,
+    "restore": case_restore,
+}
+
+
+def _time_case(func, ctx: Context, repeats: int) -> float:
+    """Return the best time per operation (s) over ``repeats`` runs."""
+    best = np.inf
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = func(ctx)
+        elapsed = time.perf_counter() - start
+        if isinstance(result, dict):
+            ops, elapsed = result["ops"], result["elapsed"]
+        else:
+            ops = result
+        best = min(best, elapsed / max(ops, 1))
+    return float(best)
+
+
+def run(scales: Iterable[str] = DEFAULT_SCALES, cases: list[str] | None = None,
+        repeats: int = 3, log: Callable[[str], None] = print) -> dict[str, dict[str, float]]:
+    """Run the cases at every scale and return {scale: {case: seconds}}."""
+    results = {}
+    for scale_name in scales:
+        ctx = Context(archive_path(SCALES[scale_name]))
+        # Warm the shared frames outside of any measurement
+        _ = ctx.frames
+        results[scale_name] = {}
+        for case in cases or list(CASES):
+            seconds = _time_case(CASES[case], ctx, repeats)
+            results[scale_name][case] = seconds
+            log(f"{scale_name:>7} {case:<13} {seconds * 1000:10.2f} ms")
+    return results
+
+
+def compare(results: dict[str, dict[str, float]], baseline: dict[str, dict[str, float]],
+            threshold: float = DEFAULT_THRESHOLD) -> list[str]:
+    """Return a message for every case slower than baseline by > threshold."""
+    regressions = []
+    for scale, cases in results.items():
+        for case, seconds in cases.items():
+            reference = baseline.get(scale, {}).get(case)
+            if reference is None or reference <= 0:
+                continue
+            ratio = seconds / reference
+            if ratio > 1.0 + threshold:
+                regressions.append(
+                    f"{scale}/{case}: {seconds * 1000:.2f} ms vs "
+                    f"{reference * 1000:.2f} ms baseline ({ratio:.2f}x)"
+                )
+    return regressions
+
+
+def load_baseline(path: str = BASELINE_PATH) -> dict[str, dict[str, float]]:
+    if not os.path.isfile(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)["results"]
+
+
+def save_baseline(results: dict[str, dict[str, float]], path: str = BASELINE_PATH) -> None:
+    """Merge ``results`` into the baseline file at ``path``."""
+    merged = load_baseline(path)
+    for scale, cases in results.items():
+        merged.setdefault(scale, {}).update(cases)
+    data = {
+        "machine": {
+            "platform": platform.platform(),
+            "processor": platform.processor() or platform.machine(),
+            "python": platform.python_version(),
+        },
+        "results": merged,
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def main(argv: list[str] | None = None) -> int:
+    import argparse
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scales", nargs="+", choices=list(SCALES), default=list(DEFAULT_SCALES))
+    parser.add_argument("--cases", nargs="+", choices=list(CASES))
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--output", help="Also write this run's results to a JSON file")
+    args = parser.parse_args(argv)
+
+    results = run(args.scales, args.cases, args.repeats)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    if args.update_baseline:
+        save_baseline(results, args.baseline)
+        print(f"Baseline updated: {args.baseline}")
+        return 0
+
+    regressions = compare(results, load_baseline(args.baseline), args.threshold)
+    for line in regressions:
+        print(f"REGRESSION {line}")
+    return 1 if regressions else 0
@@ -1,7 +1,7 @@
 import sys
 from PyQt5.QtWidgets import QApplication, QDialog
 
-from ui.launch_dialog import LaunchDialog
+from ui.launch_dialog import CatalogScanThread, LaunchDialog
 from ui.main_window import MainWindow
 
 
@@ -9,23 +9,32 @@ def main() -> None:
     app = QApplication(sys.argv)
     dialog = LaunchDialog()
     if dialog.exec_() != QDialog.Accepted:
+        CatalogScanThread.wait_all()
         sys.exit(0)
 
     window = MainWindow()
     if getattr(dialog, "mep_df", None) is not None:
+        window.set_source(dialog.source_path, dialog.source_surgeries)
         window.load_data(
             dialog.mep_df,
             dialog.ssep_upper_df,
             dialog.ssep_lower_df,
             dialog.surgery_meta_df,
+            state=dialog.session["state"] if dialog.session is not None else None,
         )
         window.trend_tab.refresh({
             "mep_df": dialog.mep_df,
             "ssep_upper_df": dialog.ssep_upper_df,
             "ssep_lower_df": dialog.ssep_lower_df,
+            "surgery_meta_df": dialog.surgery_meta_df,
         })
+        summary = dialog.integrity_summary()
+        if summary:
+            window.statusBar().showMessage(summary)
     window.show()
-    sys.exit(app.exec_())
+    status = app.exec_()
+    CatalogScanThread.wait_all()
+    sys.exit(status)
 
 
 if __name__ == "__main__":
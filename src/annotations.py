@@ -0,0 +1,223 @@
+"""Per-surgery annotations (events and regions) on the timestamp axis.
+
+An annotation spans ``start``..``end`` in timestamp units; point events have
+``end == start``. The annotations of a surgery are kept as columns sorted by
+start, next to the running maximum of their ends, so a range query is two
+binary searches: annotations before the first whose running end reaches ``lo``
+all end before it, and those after the last start at or before ``hi`` start
+after it. Adding many annotations at once (machine-generated events) sorts
+the columns once.
+
+Stores are saved as JSON in the user data directory
+(:func:`src.cache.data_dir`, not the cache), one file per dataset and
+surgery, so datasets reusing a surgery ID keep their own annotations.
+
+Usage::
+
+    python -m src.annotations SURGERY [events.csv] [--dataset data.pkl]
+"""
+
+from __future__ import annotations
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from .cache import data_dir, dataset_key, safe_name
+
+COLUMNS = ["start", "end", "label", "category"]
+
+
+class AnnotationStore:
+    """Annotations of one surgery with logarithmic range queries.
+
+    ``directory=None`` uses the :func:`src.cache.data_dir` directory of
+    ``dataset`` (the source path, see :func:`src.cache.dataset_key`);
+    ``persist=False`` keeps the annotations in memory only.
+    """
+
+    def __init__(self, surgery_id, directory: str | None = None, persist: bool = True,
+                 dataset: str | None = None):
+        self.surgery_id = str(surgery_id)
+        self._persist = persist
+        self._directory = directory
+        self.dataset = dataset
+        self.start = np.zeros(0)
+        self.end = np.zeros(0)
+        self.label = np.zeros(0, dtype=object)
+        self.category = np.zeros(0, dtype=object)
+        # Running maximum of ``end`` in start order, for range queries
+        self._reach = np.zeros(0)
+        # Bumped on every change, so views can tell when to redraw
+        self.version = 0
+        if persist:
+            self._load()
+
+    @property
+    def path(self) -> str:
+        directory = self._directory or data_dir("annotations", dataset_key(self.dataset))
+        return os.path.join(directory, f"{safe_name(self.surgery_id)}.json")
+
+    def __len__(self) -> int:
+        return self.start.size
+
+    # -----------------------------------------------------
+    # Editing
+    # -----------------------------------------------------
+    def add(self, start: float, end: float | None = None, label: str = "",
+            category: str = "") -> None:
+        """Add one annotation; a point event if ``end`` is omitted."""
+        self.add_many([start], None if end is None else [end], [label], [category])
+
+    def add_many(self, starts, ends=None, labels=None, categories=None) -> int:
+        """Add annotations from parallel sequences and return how many.
+
+        ``ends`` default to the starts; missing labels and categories are
+        empty. Annotations whose start is not finite are skipped.
+        """
+        starts = np.asarray(starts, dtype=float).ravel()
+        ends = starts.copy() if ends is None else np.asarray(ends, dtype=float).ravel()
+        n = starts.size
+        labels = np.full(n, "", dtype=object) if labels is None else \
+            np.asarray(labels, dtype=object).ravel()
+        categories = np.full(n, "", dtype=object) if categories is None else \
+            np.asarray(categories, dtype=object).ravel()
+        if not (ends.size == labels.size == categories.size == n):
+            raise ValueError("annotation columns must have the same length")
+        ends = np.where(np.isfinite(ends), ends, starts)
+        keep = np.isfinite(starts)
+        starts, ends = starts[keep], ends[keep]
+        lo, hi = np.minimum(starts, ends), np.maximum(starts, ends)
+        self._set(
+            np.concatenate([self.start, lo]),
+            np.concatenate([self.end, hi]),
+            np.concatenate([self.label, labels[keep].astype(str).astype(object)]),
+            np.concatenate([self.category, categories[keep].astype(str).astype(object)]),
+        )
+        self.save()
+        return int(keep.sum())
+
+    def remove(self, indices) -> None:
+        """Remove the annotations at ``indices`` (positions in start order)."""
+        keep = np.ones(len(self), dtype=bool)
+        keep[np.asarray(indices, dtype=np.int64)] = False
+        self._set(self.start[keep], self.end[keep], self.label[keep], self.category[keep])
+        self.save()
+
+    def clear(self) -> None:
+        self.remove(np.arange(len(self)))
+
+    def _set(self, start, end, label, category) -> None:
+        order = np.argsort(start, kind="stable")
+        self.start, self.end = start[order], end[order]
+        self.label, self.category = label[order], category[order]
+        self._reach = np.maximum.accumulate(self.end)
+        self.version += 1
+
+    # -----------------------------------------------------
+    # Queries
+    # -----------------------------------------------------
+    def query(self, lo: float, hi: float) -> np.ndarray:
+        """Return the positions of annotations overlapping ``lo..hi``, by start."""
+        first = np.searchsorted(self._reach, lo, side="left")
+        last = np.searchsorted(self.start, hi, side="right")
+        candidates = np.arange(first, last)
+        return candidates[self.end[first:last] >= lo]
+
+    def frame(self, indices=None) -> pd.DataFrame:
+        """Return the annotations (default: all) as a frame of :data:`COLUMNS`."""
+        indices = slice(None) if indices is None else indices
+        return pd.DataFrame({
+            "start": self.start[indices],
+            "end": self.end[indices],
+            "label": self.label[indices],
+            "category": self.category[indices],
+        })
+
+    # -----------------------------------------------------
+    # Persistence
+    # -----------------------------------------------------
+    def save(self) -> None:
+        if not self._persist:
+            return
+        path = self.path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = {
+            "surgery_id": self.surgery_id,
+            "start": self.start.tolist(),
+            "end": self.end.tolist(),
+            "label": self.label.tolist(),
+            "category": self.category.tolist(),
+        }
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp, path)
+
+    def _load(self) -> None:
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        self._set(
+            np.asarray(data.get("start", []), dtype=float),
+            np.asarray(data.get("end", []), dtype=float),
+            np.asarray(data.get("label", []), dtype=object),
+            np.asarray(data.get("category", []), dtype=object),
+        )
+
+    def import_frame(self, df: pd.DataFrame) -> int:
+        """Add the rows of ``df`` and return how many were added.
+
+        ``start`` (or ``timestamp``) is required; ``end``, ``label`` and
+        ``category`` are optional.
+        """
+        start_col = "start" if "start" in df.columns else "timestamp"
+        if start_col not in df.columns:
+            raise KeyError("annotations need a 'start' or 'timestamp' column")
+        starts = pd.to_numeric(df[start_col], errors="coerce").to_numpy(dtype=float)
+        ends = None
+        if "end" in df.columns:
+            ends = pd.to_numeric(df["end"], errors="coerce").to_numpy(dtype=float)
+        labels, categories = (
+            df[name].fillna("").to_numpy(dtype=object) if name in df.columns else None
+            for name in ("label", "category")
+        )
+        return self.add_many(starts, ends, labels, categories)
+
+
+# Loaded stores keyed by (dataset directory, surgery ID)
+_STORES: dict[tuple, AnnotationStore] = {}
+
+
+def annotations(surgery_id, dataset: str | None = None) -> AnnotationStore:
+    """Return the persisted store of ``surgery_id`` in ``dataset``, loading it once per process."""
+    key = (data_dir("annotations", dataset_key(dataset)), str(surgery_id))
+    if key not in _STORES:
+        _STORES[key] = AnnotationStore(surgery_id, directory=key[0], dataset=dataset)
+    return _STORES[key]
+
+
+def import_csv(surgery_id, path: str, dataset: str | None = None) -> int:
+    """Add the annotations of a CSV file to a surgery; return how many."""
+    return annotations(surgery_id, dataset).import_frame(pd.read_csv(path))
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("surgery")
+    parser.add_argument("csv", nargs="?", help="Annotations to import")
+    parser.add_argument("--dataset", help="Data file or dataset the surgery belongs to")
+    args = parser.parse_args()
+
+    store = annotations(args.surgery, args.dataset)
+    if args.csv:
+        added = import_csv(args.surgery, args.csv, args.dataset)
+        print(f"{added} annotations added, {len(store)} in total")
+    else:
+        print(store.frame().to_string(index=False))
@@ -0,0 +1,206 @@
+"""Vectorized artifact rejection and robust per-channel display scales.
+
+A trace is flagged as an artifact if it is
+
+* clipped: a share of its samples sits at the trace's largest magnitude,
+  as happens when the amplifier saturates;
+* flat: its peak-to-peak amplitude is below :data:`FLAT_UV`, a
+  disconnected or dead lead;
+* an outlier: its peak-to-peak amplitude lies far above the other traces
+  of its surgery and channel (robust z-score against their median and
+  median absolute deviation). Only large outliers are flagged, because a
+  loss of amplitude is what monitoring is looking for.
+
+Every check is one pass over the packed samples of the whole frame
+(:mod:`src.packed`). :func:`flag_artifacts` stores the outcome as a boolean
+``artifact`` column; trends, population statistics and display scaling
+leave flagged rows out.
+
+Usage::
+
+    python -m src.artifacts data.pkl     # report flagged rows and throughput
+"""
+
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+from .memory import ACCOUNTANT, PRIORITY_DERIVED, array_buffers, iter_arrays
+from .packed import cached_columns, frame_cache, packed_column, register_packed
+
+ARTIFACT_COLUMN = "artifact"
+
+# A trace is clipped if at least this share of its samples, and at least
+# CLIP_MIN_SAMPLES of them, are within CLIP_TOLERANCE of its largest magnitude
+CLIP_FRACTION = 0.01
+CLIP_MIN_SAMPLES = 3
+CLIP_TOLERANCE = 1e-6
+
+# Peak-to-peak amplitude (µV) below which a trace is flat
+FLAT_UV = 0.1
+
+# Robust z-score above which a trace's amplitude is an outlier in its channel,
+# and the number of traces a channel needs before outliers are looked for
+OUTLIER_Z = 6.0
+OUTLIER_MIN_ROWS = 5
+
+# Share of a channel's clean traces that fit within its display scale
+SCALE_QUANTILE = 0.95
+
+CHECK_DESCRIPTIONS = {
+    "clipped": "clipped (saturated) samples",
+    "flat": "flat line",
+    "outlier": "amplitude outlier in its channel",
+}
+
+
+def _clipped(packed, magnitude: np.ndarray, peak: np.ndarray) -> np.ndarray:
+    lengths = packed.lengths
+    limit = np.repeat(peak * (1.0 - CLIP_TOLERANCE), lengths)
+    at_peak = packed.reduce(np.add, (magnitude >= limit).astype(np.float32), empty=0)
+    return (peak > 0) & (at_peak >= CLIP_MIN_SAMPLES) & (at_peak >= CLIP_FRACTION * lengths)
+
+
+def _outliers(df: pd.DataFrame, amplitude: np.ndarray) -> np.ndarray:
+    """Flag amplitudes whose robust z-score within their channel exceeds :data:`OUTLIER_Z`."""
+    groups = df.groupby([df["surgery_id"].astype(str), df["channel"].astype(str)],
+                        sort=False).ngroup().to_numpy()
+    amp = pd.Series(amplitude)
+    grouped = amp.groupby(groups)
+    median = grouped.transform("median").to_numpy()
+    mad = (amp - median).abs().groupby(groups).transform("median").to_numpy()
+    size = grouped.transform("count").to_numpy()
+    with np.errstate(invalid="ignore", divide="ignore"):
+        z = 0.6745 * (amplitude - median) / mad
+    return (size >= OUTLIER_MIN_ROWS) & (mad > 0) & (z > OUTLIER_Z)
+
+
+def classify(df: pd.DataFrame) -> dict[str, np.ndarray]:
+    """Return one boolean mask per check in :data:`CHECK_DESCRIPTIONS`.
+
+    Empty rows fail no check; they are left to :mod:`src.integrity`.
+    """
+    n = len(df)
+    if not n:
+        return {check: np.zeros(0, dtype=bool) for check in CHECK_DESCRIPTIONS}
+    packed = packed_column(df, "values")
+    magnitude = np.abs(packed.data)
+    peak = packed.reduce(np.maximum, magnitude, empty=np.nan)
+    amplitude = packed.reduce(np.maximum, empty=np.nan) - packed.reduce(np.minimum, empty=np.nan)
+    with np.errstate(invalid="ignore"):
+        return {
+            "clipped": _clipped(packed, magnitude, peak),
+            "flat": amplitude < FLAT_UV,
+            "outlier": _outliers(df, amplitude),
+        }
+
+
+def flag_artifacts(df: pd.DataFrame) -> pd.DataFrame:
+    """Return ``df`` with a boolean :data:`ARTIFACT_COLUMN` of rows failing any check.
+
+    The rows and their packed stores are kept.
+    """
+    flags = np.zeros(len(df), dtype=bool)
+    for mask in classify(df).values():
+        flags |= mask
+    flagged = df.assign(**{ARTIFACT_COLUMN: flags})
+    for column in cached_columns(df):
+        register_packed(flagged, column, packed_column(df, column))
+    return flagged
+
+
+def artifact_mask(df: pd.DataFrame) -> np.ndarray:
+    """Return the :data:`ARTIFACT_COLUMN` of ``df``, or no flags if it was not computed."""
+    if ARTIFACT_COLUMN not in df.columns:
+        return np.zeros(len(df), dtype=bool)
+    return df[ARTIFACT_COLUMN].fillna(False).to_numpy(dtype=bool)
+
+
+def clean_rows(df: pd.DataFrame) -> pd.DataFrame:
+    """Return the rows of ``df`` not flagged as artifacts."""
+    flags = artifact_mask(df)
+    return df[~flags] if flags.any() else df
+
+
+# Per frame (see frame_cache): the peak magnitude of every row and the
+# scales of each surgery once computed
+_SCALE_CACHE: dict[int, dict] = {}
+
+
+def _frame_cache(df: pd.DataFrame) -> dict:
+    return frame_cache(_SCALE_CACHE, df, lambda: {"peaks": None, "scales": {}})
+
+
+def _baseline_peaks(subset: pd.DataFrame) -> pd.Series:
+    """Return the largest baseline magnitude of each channel of ``subset``."""
+    if "baseline_values" not in subset.columns or subset.empty:
+        return pd.Series(dtype=float)
+    keys = ["channel", "baseline_timestamp"] if "baseline_timestamp" in subset.columns else None
+    distinct = subset.drop_duplicates(keys) if keys else subset
+    peaks = [
+        float(np.nanmax(np.abs(np.asarray(b, dtype=float)), initial=0)) if b is not None else 0.0
+        for b in distinct["baseline_values"]
+    ]
+    return pd.Series(peaks, index=distinct["channel"].astype(str).to_numpy()).groupby(level=0).max()
+
+
+def channel_scales(df: pd.DataFrame, surgery_id) -> pd.Series:
+    """Return the cached display scale of every channel of one surgery.
+
+    The scale of a channel is the :data:`SCALE_QUANTILE` quantile of the peak
+    magnitude of its traces not flagged as artifacts, or its largest baseline
+    magnitude if that is larger. The series is indexed by channel as str.
+    """
+    cache = _frame_cache(df)
+    key = str(surgery_id)
+    if key not in cache["scales"]:
+        if cache["peaks"] is None:
+            packed = packed_column(df, "values")
+            cache["peaks"] = packed.reduce(np.maximum, np.abs(packed.data), empty=0.0)
+        rows = (df["surgery_id"].astype(str) == key).to_numpy() & ~artifact_mask(df)
+        subset = df[rows]
+        traces = pd.Series(cache["peaks"][rows], index=subset["channel"].astype(str).to_numpy())
+        scales = traces.groupby(level=0).quantile(SCALE_QUANTILE)
+        scales = pd.concat([scales, _baseline_peaks(subset)]).groupby(level=0).max()
+        cache["scales"][key] = scales
+    return cache["scales"][key]
+
+
+def _scale_buffers() -> dict:
+    out = {}
+    for cache in list(_SCALE_CACHE.values()):
+        if cache["peaks"] is not None:
+            array_buffers(cache["peaks"], out=out)
+        array_buffers(*iter_arrays(list(cache["scales"].values())), out=out)
+    return out
+
+
+def release_scales() -> None:
+    """Empty the scale cache; scales are recomputed on the next lookup."""
+    for cache in list(_SCALE_CACHE.values()):
+        cache["peaks"] = None
+        cache["scales"].clear()
+
+
+ACCOUNTANT.register("Display scales", _scale_buffers, release_scales,
+                    priority=PRIORITY_DERIVED)
+
+
+if __name__ == "__main__":
+    import sys
+    import time
+
+    from .data_loader import load_signals
+
+    if len(sys.argv) != 2:
+        print("Usage: python -m src.artifacts <input.pkl|parquet_dir>")
+        sys.exit(1)
+    for name, df in zip(("MEP", "SSEP_UPPER", "SSEP_LOWER"), load_signals(sys.argv[1])[:3]):
+        packed_column(df, "values")
+        start = time.perf_counter()
+        masks = classify(df)
+        elapsed = time.perf_counter() - start
+        counts = ", ".join(f"{CHECK_DESCRIPTIONS[c]}: {int(m.sum())}" for c, m in masks.items())
+        print(f"{name:<11} {len(df):>8} traces  {len(df) / max(elapsed, 1e-9):>12,.0f} traces/s  "
+              f"({counts})")
@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+import hashlib
+import os
+
+CACHE_ENV = "CV_CACHE_DIR"
+DATA_ENV = "CV_DATA_DIR"
+
+
+def cache_dir(*parts: str) -> str:
+    """Return (and create) a directory for derived caches.
+
+    The root defaults to ``~/.cache/competitive_viewer`` and can be moved
+    with the ``CV_CACHE_DIR`` environment variable.
+    """
+    root = os.environ.get(CACHE_ENV) or os.path.join(
+        os.path.expanduser("~"), ".cache", "competitive_viewer"
+    )
+    path = os.path.join(root, *parts)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def data_dir(*parts: str) -> str:
+    """Return (and create) a directory for user-authored data.
+
+    Unlike :func:`cache_dir`, its contents cannot be recomputed, so it is
+    kept apart from the caches. The root defaults to
+    ``~/.local/share/competitive_viewer`` and can be moved with the
+    ``CV_DATA_DIR`` environment variable.
+    """
+    root = os.environ.get(DATA_ENV) or os.path.join(
+        os.path.expanduser("~"), ".local", "share", "competitive_viewer"
+    )
+    path = os.path.join(root, *parts)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def dataset_key(source: str | None) -> str:
+    """Return a directory name for caches and data of the dataset at ``source``.
+
+    The key depends on the dataset's path only, so entries survive a
+    corrected or reconverted file at the same location; ``None`` (data not
+    loaded from a file) is ``"default"``.
+    """
+    if not source:
+        return "default"
+    path = os.path.abspath(source).rstrip(os.sep)
+    digest = hashlib.sha1(path.encode("utf-8")).hexdigest()[:8]
+    return f"{safe_name(os.path.basename(path))}-{digest}"
+
+
+def safe_name(value) -> str:
+    """Return ``value`` as a string usable as a file name."""
+    text = str(value)
+    name = "".join(c if c.isalnum() or c in "-_." else "_" for c in text)
+    if name != text or not name:
+        # Keep names of different values distinct after substitution
+        name += "-" + hashlib.sha1(text.encode("utf-8")).hexdigest()[:8]
+    return name
@@ -0,0 +1,296 @@
+"""SQLite catalog of the surgeries contained in many data files.
+
+The catalog records, for every file and surgery, the surgery's date and
+protocol (from the surgery metadata), its channels, timestamp range and row
+counts per modality. Files are scanned in parallel worker processes and only
+files whose size or modification time changed since the last scan are read
+again, so re-running the scan over an unchanged archive is cheap.
+
+Usage::
+
+    python -m src.catalog archive_dir [--workers N]
+    python -m src.catalog --search "spine 2023-05"
+"""
+
+from __future__ import annotations
+
+import os
+import sqlite3
+import time
+from collections.abc import Callable, Iterator
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from . import chunk_store, data_loader, parquet_store, shared_store
+from .cache import cache_dir
+
+MODALITY_KEYS = {
+    "mep_data": "mep_rows",
+    "ssep_upper_data": "ssep_upper_rows",
+    "ssep_lower_data": "ssep_lower_rows",
+}
+SCAN_COLUMNS = ["surgery_id", "timestamp", "channel"]
+SEARCH_FIELDS = ("surgery_id", "date", "protocol", "channels", "path")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    mtime REAL NOT NULL,
+    size INTEGER NOT NULL,
+    scanned_at REAL NOT NULL,
+    error TEXT
+);
+CREATE TABLE IF NOT EXISTS surgeries (
+    path TEXT NOT NULL REFERENCES files(path) ON DELETE CASCADE,
+    surgery_id TEXT NOT NULL,
+    date TEXT,
+    protocol TEXT,
+    channels TEXT,
+    n_channels INTEGER,
+    ts_min REAL,
+    ts_max REAL,
+    mep_rows INTEGER,
+    ssep_upper_rows INTEGER,
+    ssep_lower_rows INTEGER,
+    PRIMARY KEY (path, surgery_id)
+);
+CREATE INDEX IF NOT EXISTS surgeries_id ON surgeries (surgery_id);
+CREATE INDEX IF NOT EXISTS surgeries_date ON surgeries (date);
+"""
+
+
+def default_path() -> str:
+    return os.path.join(cache_dir("catalog"), "catalog.sqlite")
+
+
+def file_stat(path: str) -> tuple[float, int]:
+    """Return (mtime, size) of a pickle, or of a dataset directory's files."""
+    if os.path.isdir(path):
+        stats = [os.stat(os.path.join(path, name)) for name in sorted(os.listdir(path))]
+        return max((s.st_mtime for s in stats), default=0.0), sum(s.st_size for s in stats)
+    stat = os.stat(path)
+    return stat.st_mtime, stat.st_size
+
+
+def iter_data_files(directory: str) -> Iterator[str]:
+    """Yield the pickles, Parquet datasets, shared stores and chunked archives below ``directory``."""
+    for root, dirs, files in os.walk(directory):
+        if (parquet_store.is_parquet_dataset(root) or shared_store.is_shared_store(root)
+                or chunk_store.is_chunk_store(root)):
+            dirs[:] = []
+            yield os.path.abspath(root)
+            continue
+        for name in sorted(files):
+            if name.endswith(".pkl"):
+                yield os.path.abspath(os.path.join(root, name))
+
+
+def meta_records(meta: pd.DataFrame | None) -> dict[str, dict]:
+    """Return the surgery metadata rows keyed by surgery ID (as str)."""
+    if meta is None or meta.empty:
+        return {}
+    ids = meta["surgery_id"] if "surgery_id" in meta.columns else meta.index
+    return {str(sid): row for sid, row in zip(ids, meta.to_dict("records"))}
+
+
+def scan_file(path: str) -> list[dict]:
+    """Summarise every surgery of one data file (runs in a worker)."""
+    frames = data_loader.load_signals(path, columns=SCAN_COLUMNS, check_integrity=False)
+    meta = meta_records(frames[3])
+    summaries: dict[str, dict] = {}
+    for key, df in zip(MODALITY_KEYS, frames[:3]):
+        if df.empty:
+            continue
+        ids = df["surgery_id"].astype(str)
+        ts = pd.to_numeric(df["timestamp"], errors="coerce")
+        grouped = pd.DataFrame({"sid": ids, "ts": ts}).groupby("sid", sort=False)["ts"]
+        stats = grouped.agg(["min", "max", "size"]).astype({"min": float, "max": float})
+        channels = df["channel"].astype(str).groupby(ids, sort=False).unique()
+        for sid, row in stats.iterrows():
+            entry = summaries.setdefault(sid, {
+                "surgery_id": sid, "channels": set(), "ts_min": row["min"], "ts_max": row["max"],
+            })
+            entry["channels"].update(channels[sid])
+            entry["ts_min"] = float(min(entry["ts_min"], row["min"]))
+            entry["ts_max"] = float(max(entry["ts_max"], row["max"]))
+            entry[MODALITY_KEYS[key]] = int(row["size"])
+    for sid in meta:
+        summaries.setdefault(sid, {"surgery_id": sid, "channels": set()})
+    result = []
+    for sid, entry in summaries.items():
+        info = meta.get(sid, {})
+        channels = sorted(entry.pop("channels"))
+        entry.update({
+            "date": None if pd.isna(info.get("date")) else str(info.get("date")),
+            "protocol": None if pd.isna(info.get("protocol")) else str(info.get("protocol")),
+            "channels": ",".join(channels),
+            "n_channels": len(channels),
+        })
+        result.append(entry)
+    return result
+
+
+def _scan_task(path: str):
+    try:
+        return path, scan_file(path), None
+    except Exception as exc:  # noqa: BLE001 - a broken file must not stop the whole scan
+        return path, [], f"{type(exc).__name__}: {exc}"
+
+
+class Catalog:
+    """Incrementally updated SQLite index of surgeries across data files."""
+
+    COLUMNS = (
+        "path", "surgery_id", "date", "protocol", "channels", "n_channels",
+        "ts_min", "ts_max", "mep_rows", "ssep_upper_rows", "ssep_lower_rows",
+    )
+
+    def __init__(self, path: str | None = None):
+        self.path = path or default_path()
+        # Callers that share a catalog between threads serialise access
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA foreign_keys = ON")
+        self._conn.executescript(SCHEMA)
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # -----------------------------------------------------
+    # Building
+    # -----------------------------------------------------
+    def stale_files(self, directory: str) -> tuple[list[str], list[str]]:
+        """Return (new or changed files, catalogued files that disappeared)."""
+        known = {
+            row["path"]: (row["mtime"], row["size"])
+            for row in self._conn.execute("SELECT path, mtime, size FROM files")
+        }
+        root = os.path.abspath(directory)
+        present = set()
+        changed = []
+        for path in iter_data_files(directory):
+            present.add(path)
+            if known.get(path) != file_stat(path):
+                changed.append(path)
+        removed = [
+            p for p in known
+            if p not in present and os.path.commonpath([root, p]) == root
+        ]
+        return changed, removed
+
+    def update(self, directory: str, workers: int | None = None,
+               cancelled: Callable[[], bool] | None = None) -> dict:
+        """Scan new and changed files below ``directory``.
+
+        ``workers=0`` scans in-process, otherwise a process pool of
+        ``workers`` (default: CPU count) is used. ``cancelled`` is polled
+        between files; once it returns True the remaining files are left
+        for the next scan. Returns the number of scanned, removed and
+        failed files.
+        """
+        changed, removed = self.stale_files(directory)
+        with self._conn:
+            self._conn.executemany("DELETE FROM files WHERE path = ?", [(p,) for p in removed])
+        scanned = failed = 0
+        if changed:
+            if workers == 0:
+                scanned, failed = self._store_results(map(_scan_task, changed), cancelled)
+            else:
+                with ProcessPoolExecutor(max_workers=workers) as pool:
+                    try:
+                        scanned, failed = self._store_results(pool.map(_scan_task, changed),
+                                                              cancelled)
+                    finally:
+                        # Do not start the files left over after a cancel
+                        pool.shutdown(cancel_futures=True)
+        return {"scanned": scanned, "removed": len(removed), "failed": failed}
+
+    def _store_results(self, results, cancelled=None) -> tuple[int, int]:
+        scanned = failed = 0
+        for path, surgeries, error in results:
+            if cancelled is not None and cancelled():
+                break
+            scanned += 1
+            mtime, size = file_stat(path)
+            failed += error is not None
+            with self._conn:
+                self._conn.execute("DELETE FROM files WHERE path = ?", (path,))
+                self._conn.execute(
+                    "INSERT INTO files (path, mtime, size, scanned_at, error) VALUES (?, ?, ?, ?, ?)",
+                    (path, mtime, size, time.time(), error),
+                )
+                self._conn.executemany(
+                    f"INSERT INTO surgeries ({', '.join(self.COLUMNS)}) "
+                    f"VALUES ({', '.join('?' * len(self.COLUMNS))})",
+                    [tuple([path] + [s.get(c) for c in self.COLUMNS[1:]]) for s in surgeries],
+                )
+        return scanned, failed
+
+    # -----------------------------------------------------
+    # Queries
+    # -----------------------------------------------------
+    def search(self, text: str = "", limit: int | None = 500) -> list[sqlite3.Row]:
+        """Return surgeries matching every whitespace-separated term of ``text``.
+
+        A term matches if it occurs (case-insensitively) in the surgery ID,
+        date, protocol, channel list or file path.
+        """
+        clauses, params = [], []
+        for term in text.split():
+            escaped = term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            pattern = f"%{escaped}%"
+            clauses.append(
+                "(" + " OR ".join(f"{f} LIKE ? ESCAPE '\\'" for f in SEARCH_FIELDS) + ")"
+            )
+            params.extend([pattern] * len(SEARCH_FIELDS))
+        sql = "SELECT * FROM surgeries"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY date DESC, surgery_id"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        return self._conn.execute(sql, params).fetchall()
+
+    def count(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM surgeries").fetchone()[0]
+
+    def errors(self) -> list[sqlite3.Row]:
+        return self._conn.execute(
+            "SELECT path, error FROM files WHERE error IS NOT NULL"
+        ).fetchall()
+
+
+def load_surgery(path: str, surgery_id: str, **kwargs):
+    """Load only ``surgery_id`` from a catalogued file (see ``load_signals``).
+
+    Parquet datasets read just that surgery's row groups; pickles are read
+    whole and then filtered.
+    """
+    kwargs.setdefault("columns", data_loader.DISPLAY_COLUMNS)
+    return data_loader.load_signals(path, surgeries=[surgery_id], **kwargs)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("directory", nargs="?", help="Directory to scan")
+    parser.add_argument("--catalog", default=None, help="SQLite file (default: cache directory)")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--search", default=None)
+    args = parser.parse_args()
+    with Catalog(args.catalog) as catalog:
+        if args.directory:
+            print(catalog.update(args.directory, args.workers))
+        if args.search is not None:
+            for row in catalog.search(args.search):
+                print(f"{row['surgery_id']}  {row['date']}  {row['protocol']}  {row['path']}")
+        print(f"{catalog.count()} surgeries catalogued")
@@ -0,0 +1,413 @@
+"""Chunked, compressed waveform archive.
+
+An archive is a directory holding the waveform columns (``values`` and
+``baseline_values``) as independently compressed chunks plus the small
+remaining columns as pickles::
+
+    archive/
+        chunked.json                      manifest, written last
+        mep_data.pkl                      non-waveform columns
+        mep_data.order.npy                original position of every stored row
+        mep_data.values.chunks            concatenated compressed chunks
+        mep_data.values.index.npy         one row per chunk (see INDEX_FIELDS)
+        mep_data.values.lengths.npy       samples per distinct waveform
+        mep_data.values.codes.npy         distinct waveform of every row
+        mep_data.values.nulls.npy         rows whose waveform is None
+        ...
+        surgerydata.pkl
+
+Identical waveforms (such as a baseline repeated on every row of a channel)
+are stored once. Rows are stored sorted by surgery and channel, and a chunk
+never spans two (surgery, channel) groups, so reading some surgeries or
+channels only decompresses their chunks. Reading restores the original row
+order and index, and ``None`` waveforms. Chunks are decoded in parallel by a
+thread pool (the codecs release the GIL).
+
+Each chunk is delta and zigzag coded and byte shuffled before compression. Waveforms
+quantized to a decimal step (e.g. whole or hundredth µV) are stored as the
+deltas of the scaled integers, which compress several times better than
+float bits; other chunks are stored as deltas of their float bit patterns.
+Both are lossless; ``decimals`` rounds the waveforms before writing for a
+smaller, lossy archive.
+
+Usage::
+
+    python -m src.chunk_store data.pkl archive_dir [--decimals 2]
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import zlib
+from collections.abc import Iterable
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from .packed import PackedWaveforms, register_packed
+from .parquet_store import FRAME_KEYS
+
+try:
+    import pyarrow as pa
+except ImportError:  # pragma: no cover - optional dependency
+    pa = None
+
+MANIFEST = "chunked.json"
+META_FILE = "surgerydata.pkl"
+PACKED_COLUMNS = ("values", "baseline_values")
+VERSION = 1
+
+# Samples per chunk; chunks hold whole rows, so a long row may exceed this.
+CHUNK_SAMPLES = 1 << 18
+
+# Decimal steps tried when looking for quantized waveforms (10 ** -k µV).
+DECIMAL_SCALES = (1, 10, 100, 1000)
+
+# Columns of a chunk index: byte offset and size in the chunk file, the
+# chunk's first and past-the-end row, and its integer scale (0: float bits).
+INDEX_FIELDS = ("byte_start", "nbytes", "row_start", "row_stop", "scale")
+
+
+def store_root(path: str) -> str:
+    """Return the archive directory for ``path`` (the directory or its manifest)."""
+    if os.path.basename(path) == MANIFEST:
+        return os.path.dirname(path) or "."
+    return path
+
+
+def is_chunk_store(path: str) -> bool:
+    return os.path.isfile(os.path.join(store_root(path), MANIFEST))
+
+
+def _default_codec() -> str:
+    if pa is not None and pa.Codec.is_available("zstd"):
+        return "zstd"
+    return "zlib"
+
+
+def _compress(buffer: bytes, codec: str) -> bytes:
+    if codec == "zlib":
+        return zlib.compress(buffer, 1)
+    if pa is None:
+        raise ImportError(f"pyarrow is required for the '{codec}' codec")
+    return pa.Codec(codec).compress(buffer, asbytes=True)
+
+
+def _decompress(buffer: bytes, size: int, codec: str) -> bytes:
+    if codec == "zlib":
+        return zlib.decompress(buffer)
+    if pa is None:
+        raise ImportError(f"pyarrow is required for the '{codec}' codec")
+    return pa.Codec(codec).decompress(buffer, size, asbytes=True)
+
+
+def _shuffle(words: np.ndarray) -> bytes:
+    """Return the bytes of int32 ``words`` grouped by byte position."""
+    bits = words.view(np.uint32)
+    return b"".join(((bits >> shift) & 0xFF).astype(np.uint8).tobytes() for shift in (0, 8, 16, 24))
+
+
+def _unshuffle(buffer) -> np.ndarray:
+    # Shifting whole byte planes is much faster than a strided transpose
+    planes = np.frombuffer(buffer, dtype=np.uint8).reshape(4, -1)
+    bits = planes[0].astype(np.uint32)
+    for i, shift in ((1, 8), (2, 16), (3, 24)):
+        bits |= planes[i].astype(np.uint32) << shift
+    return bits.view(np.int32)
+
+
+def _integer_scale(samples: np.ndarray) -> int:
+    """Return the smallest decimal scale that represents ``samples`` exactly, or 0."""
+    for scale in DECIMAL_SCALES:
+        scaled = np.rint(samples.astype(np.float64) * scale)
+        if np.abs(scaled).max(initial=0) >= 2 ** 30:
+            return 0
+        if np.array_equal((scaled / scale).astype(np.float32), samples):
+            return scale
+    return 0
+
+
+def encode_chunk(samples: np.ndarray, codec: str) -> tuple[bytes, int]:
+    """Return (compressed bytes, scale) of a float32 chunk."""
+    samples = np.ascontiguousarray(samples, dtype=np.float32)
+    scale = _integer_scale(samples)
+    if scale:
+        words = np.rint(samples.astype(np.float64) * scale).astype(np.int32)
+    else:
+        words = samples.view(np.int32)
+    # Deltas wrap around in int32 and the cumulative sum undoes them exactly;
+    # zigzag coding keeps the high bytes of small negative deltas zero
+    deltas = np.diff(words, prepend=np.int32(0)).astype(np.int32)
+    zigzag = (deltas << 1) ^ (deltas >> 31)
+    return _compress(_shuffle(zigzag), codec), scale
+
+
+def decode_chunk(buffer: bytes, n: int, scale: int, codec: str,
+                 out: np.ndarray | None = None) -> np.ndarray:
+    """Decode a chunk of ``n`` samples written by :func:`encode_chunk`."""
+    zigzag = _unshuffle(_decompress(buffer, 4 * n, codec)).view(np.uint32)
+    deltas = (zigzag >> 1).view(np.int32) ^ -(zigzag & 1).view(np.int32)
+    words = np.cumsum(deltas, dtype=np.int32)
+    if scale:
+        samples = (words.astype(np.float64) / scale).astype(np.float32)
+    else:
+        samples = words.view(np.float32)
+    if out is None:
+        return samples
+    out[:] = samples
+    return out
+
+
+def _path(root: str, name: str, column: str, part: str) -> str:
+    return os.path.join(root, f"{name}.{column}.{part}")
+
+
+def _chunk_bounds(lengths: np.ndarray, groups: np.ndarray) -> list[tuple[int, int]]:
+    """Split rows into runs of whole rows within one group of ~CHUNK_SAMPLES samples."""
+    bounds = []
+    start, total = 0, 0
+    for row, n in enumerate(lengths.tolist()):
+        if row > start and (groups[row] != groups[row - 1] or total + n > CHUNK_SAMPLES):
+            bounds.append((start, row))
+            start, total = row, 0
+        total += n
+    if len(lengths):
+        bounds.append((start, len(lengths)))
+    return bounds
+
+
+def _distinct_rows(packed: PackedWaveforms) -> tuple[np.ndarray, np.ndarray]:
+    """Return (row -> distinct waveform code, first row of every code).
+
+    Codes follow the order of first appearance. Baselines are typically
+    shared by every row of a surgery and channel and are stored once.
+    """
+    digests = [
+        hashlib.blake2b(packed.data[a:b].tobytes(), digest_size=16).digest()
+        for a, b in zip(packed.offsets[:-1].tolist(), packed.offsets[1:].tolist())
+    ]
+    codes, uniques = pd.factorize(pd.Series(digests, dtype=object))
+    first = np.full(len(uniques), -1, dtype=np.int64)
+    # Reversed assignment leaves the first occurrence of every code
+    first[codes[::-1]] = np.arange(len(codes))[::-1]
+    return codes.astype(np.int64), first
+
+
+def _write_column(values: pd.Series, groups: np.ndarray, root: str, name: str, column: str,
+                  codec: str, decimals: int | None) -> None:
+    objects = values.to_numpy(dtype=object)
+    np.save(_path(root, name, column, "nulls.npy"),
+            np.fromiter((v is None for v in objects), dtype=bool, count=objects.size))
+    packed = PackedWaveforms.from_sequences(objects)
+    if decimals is not None:
+        packed = PackedWaveforms(np.round(packed.data, decimals).astype(np.float32), packed.offsets)
+    codes, first = _distinct_rows(packed)
+    distinct = packed.take(first)
+    data, offsets, lengths = distinct.data, distinct.offsets, distinct.lengths
+    index = []
+    byte_start = 0
+    with open(_path(root, name, column, "chunks"), "wb") as f:
+        for start, stop in _chunk_bounds(lengths, groups[first]):
+            buffer, scale = encode_chunk(data[offsets[start]:offsets[stop]], codec)
+            f.write(buffer)
+            index.append((byte_start, len(buffer), start, stop, scale))
+            byte_start += len(buffer)
+    np.save(_path(root, name, column, "index.npy"),
+            np.asarray(index, dtype=np.int64).reshape(-1, len(INDEX_FIELDS)))
+    np.save(_path(root, name, column, "lengths.npy"), lengths)
+    np.save(_path(root, name, column, "codes.npy"), codes)
+
+
+def export_frames(frames: tuple[pd.DataFrame, ...], path: str, decimals: int | None = None,
+                  codec: str | None = None) -> str:
+    """Write ``(mep, ssep_upper, ssep_lower, meta)`` frames as a chunked archive.
+
+    ``decimals`` rounds the waveforms to that many decimals first (lossy).
+    The manifest is written last, so an archive is never read half written.
+    Returns the archive directory.
+    """
+    codec = codec or _default_codec()
+    os.makedirs(path, exist_ok=True)
+    manifest = {"version": VERSION, "codec": codec, "frames": {}}
+    for name, df in zip(FRAME_KEYS, frames[:3]):
+        ids = df["surgery_id"].astype(str).to_numpy()
+        channels = df["channel"].astype(str).to_numpy()
+        order = np.lexsort((channels, ids))
+        # The pickle keeps the original index; the order restores the rows
+        df, ids, channels = df.iloc[order], ids[order], channels[order]
+        np.save(os.path.join(path, f"{name}.order.npy"), order.astype(np.int64))
+        keys = pd.Series(ids) + "\0" + pd.Series(channels)
+        groups = pd.factorize(keys)[0] if len(df) else np.zeros(0, dtype=np.int64)
+        starts = np.flatnonzero(np.r_[True, ids[1:] != ids[:-1]]) if len(ids) else []
+        stops = np.r_[starts[1:], len(ids)] if len(ids) else []
+        packed_columns = [c for c in PACKED_COLUMNS if c in df.columns]
+        for column in packed_columns:
+            _write_column(df[column], groups, path, name, column, codec, decimals)
+        df.drop(columns=packed_columns).to_pickle(os.path.join(path, f"{name}.pkl"))
+        manifest["frames"][name] = {
+            "rows": len(df),
+            "columns": list(df.columns),
+            "packed": packed_columns,
+            "surgeries": {ids[s]: [int(s), int(e)] for s, e in zip(starts, stops)},
+        }
+    frames[3].to_pickle(os.path.join(path, META_FILE))
+    tmp = os.path.join(path, MANIFEST + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    os.replace(tmp, os.path.join(path, MANIFEST))
+    return path
+
+
+def _row_views(packed: PackedWaveforms) -> np.ndarray:
+    """Return an object array whose elements are views of ``packed.data``."""
+    data, offsets = packed.data, packed.offsets
+    return np.fromiter(
+        (data[a:b] for a, b in zip(offsets[:-1].tolist(), offsets[1:].tolist())),
+        dtype=object,
+        count=len(packed),
+    )
+
+
+def _load_optional(path: str, rows: np.ndarray | None) -> np.ndarray | None:
+    """Load a per-row array of ``rows``, or None for archives written without it."""
+    if not os.path.isfile(path):
+        return None
+    values = np.load(path)
+    return values if rows is None else values[rows]
+
+
+def _read_column(root: str, name: str, column: str, rows: np.ndarray | None, codec: str,
+                 pool: ThreadPoolExecutor, restore: np.ndarray | None = None
+                 ) -> tuple[np.ndarray, PackedWaveforms | None]:
+    """Decode the chunks needed by ``rows`` (default: all rows).
+
+    Returns the waveform of every row (None for rows stored as None) as a
+    view of the decoded data, and the packed store of the rows if no two of
+    them share a waveform. ``restore`` reorders the returned rows.
+    """
+    index = np.load(_path(root, name, column, "index.npy"))
+    lengths = np.load(_path(root, name, column, "lengths.npy"))
+    codes = np.load(_path(root, name, column, "codes.npy"))
+    nulls = _load_optional(_path(root, name, column, "nulls.npy"), rows)
+    if rows is not None:
+        codes = codes[rows]
+    needed = np.zeros(len(lengths) + 1, dtype=bool)
+    needed[codes] = True
+    # A chunk is needed if any of its distinct waveforms is
+    counts = np.r_[0, np.cumsum(needed[:-1])]
+    chunks = index[counts[index[:, 3]] > counts[index[:, 2]]]
+    distinct = (np.concatenate([np.arange(a, b) for a, b in chunks[:, 2:4]])
+                if len(chunks) else np.zeros(0, dtype=np.int64))
+    offsets = np.zeros(distinct.size + 1, dtype=np.int64)
+    np.cumsum(lengths[distinct], out=offsets[1:])
+    data = np.empty(int(offsets[-1]), dtype=np.float32)
+    chunk_starts = np.r_[0, np.cumsum(chunks[:, 3] - chunks[:, 2])].astype(np.int64)
+
+    if len(chunks):
+        mapped = np.memmap(_path(root, name, column, "chunks"), dtype=np.uint8, mode="r")
+
+        def decode(i: int) -> None:
+            byte_start, nbytes, _, _, scale = chunks[i].tolist()
+            start, stop = offsets[chunk_starts[i]], offsets[chunk_starts[i + 1]]
+            buffer = mapped[byte_start:byte_start + nbytes]
+            decode_chunk(buffer, int(stop - start), scale, codec, out=data[start:stop])
+
+        list(pool.map(decode, range(len(chunks))))
+        del mapped
+    position = np.full(len(lengths), -1, dtype=np.int64)
+    position[distinct] = np.arange(distinct.size)
+    codes = position[codes]
+    packed = PackedWaveforms(data, offsets)
+    if codes.size == distinct.size and np.array_equal(codes, np.arange(codes.size)):
+        if restore is not None:
+            packed = packed.take(restore)
+        views = _row_views(packed)
+    else:
+        views = _row_views(packed)[codes if restore is None else codes[restore]]
+        packed = None
+    if nulls is not None:
+        nulls = nulls if restore is None else nulls[restore]
+        # The packed store holds them as empty rows, as from_sequences does
+        views[nulls] = None
+    return views, packed
+
+
+def read_archive(path: str, columns: Iterable[str] | None = None,
+                 surgeries: Iterable | None = None, channels: Iterable | None = None,
+                 workers: int | None = None) -> tuple[pd.DataFrame, ...]:
+    """Read a chunked archive and return ``(mep, ssep_upper, ssep_lower, meta)``.
+
+    Only the chunks of the requested ``surgeries`` and ``channels`` are
+    decompressed, by a pool of ``workers`` threads (default: CPU count).
+    Rows come back in their original order with their original index.
+    Rows sharing a waveform share one array, as in a pickle. Packed stores of
+    columns without shared waveforms are registered with
+    :func:`src.packed.register_packed`.
+    """
+    root = store_root(path)
+    with open(os.path.join(root, MANIFEST), encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("version") != VERSION:
+        raise KeyError(f"Unsupported chunked archive version: {manifest.get('version')}")
+    codec = manifest["codec"]
+    columns = list(columns) if columns is not None else None
+    frames = []
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        for name in FRAME_KEYS:
+            info = manifest["frames"][name]
+            wanted = columns if columns is not None else info["columns"]
+            unknown = set(wanted) - set(info["columns"])
+            if unknown:
+                raise KeyError(f"DataFrame '{name}' has no columns: {', '.join(sorted(unknown))}")
+            df = pd.read_pickle(os.path.join(root, f"{name}.pkl"))
+            rows = None
+            if surgeries is not None or channels is not None:
+                mask = np.ones(len(df), dtype=bool)
+                if surgeries is not None:
+                    ranges = info["surgeries"]
+                    mask[:] = False
+                    for sid in {str(s) for s in surgeries}:
+                        if sid in ranges:
+                            mask[slice(*ranges[sid])] = True
+                if channels is not None:
+                    mask &= df["channel"].astype(str).isin({str(c) for c in channels}).to_numpy()
+                rows = np.flatnonzero(mask)
+                df = df.iloc[rows]
+            # Position of every row in the original frame; archives written
+            # before the order was stored keep the sorted order
+            positions = _load_optional(os.path.join(root, f"{name}.order.npy"), rows)
+            restore = None
+            if positions is not None and np.any(np.diff(positions) < 0):
+                restore = np.argsort(positions, kind="stable")
+                df = df.iloc[restore]
+            stores: dict[str, PackedWaveforms] = {}
+            for column in info["packed"]:
+                if column in wanted:
+                    df[column], packed = _read_column(root, name, column, rows, codec, pool,
+                                                      restore)
+                    if packed is not None:
+                        stores[column] = packed
+            df = df[wanted]
+            for column, packed in stores.items():
+                register_packed(df, column, packed)
+            frames.append(df)
+    meta = pd.read_pickle(os.path.join(root, META_FILE))
+    return tuple(frames) + (meta,)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from .data_loader import load_signals
+
+    parser = argparse.ArgumentParser(description="Write a chunked, compressed archive")
+    parser.add_argument("input", help="pickle, Parquet dataset or shared store")
+    parser.add_argument("output", help="archive directory")
+    parser.add_argument("--decimals", type=int, default=None,
+                        help="round waveforms to this many decimals (lossy)")
+    args = parser.parse_args()
+    frames = load_signals(args.input, check_integrity=False)
+    print(f"Chunked archive written to {export_frames(frames, args.output, args.decimals)}")
@@ -0,0 +1,234 @@
+"""Per-row waveform features computed on packed sample arrays.
+
+Rows are processed in batches of equal length and signal rate, so every
+feature is a handful of NumPy operations on a 2-D block instead of a Python
+loop over traces.
+
+Usage::
+
+    python -m src.features data.pkl     # report extraction throughput
+"""
+
+from __future__ import annotations
+
+from collections.abc import Iterator
+
+import numpy as np
+import pandas as pd
+
+from .memory import ACCOUNTANT, PRIORITY_DERIVED, array_buffers, iter_arrays
+from .packed import PackedWaveforms, frame_cache, packed_column
+from .profiler import profiled
+
+FEATURE_COLUMNS = ["amplitude", "latency"]
+
+# Columns of :func:`extract_features`; latencies and onset in ms, peaks in µV
+PEAK_COLUMNS = [
+    "onset", "pos_latency", "pos_peak", "neg_latency", "neg_peak", "latency", "amplitude",
+]
+
+# The first NOISE_MS of a trace estimate its noise; the onset is the first
+# later sample deviating from that noise by more than ONSET_SD deviations.
+NOISE_MS = 5.0
+ONSET_SD = 5.0
+
+# Upper bound on samples per batch to keep the temporary 2-D blocks small.
+BATCH_SAMPLES = 4_000_000
+
+
+def iter_batches(packed: PackedWaveforms, rates: np.ndarray, rows: np.ndarray | None = None
+                 ) -> Iterator[tuple[np.ndarray, float, np.ndarray]]:
+    """Yield (row indices, rate, 2-D samples) for rows of equal length and rate.
+
+    ``rows`` restricts the batches to a subset of the rows of ``packed``.
+    """
+    rows = np.arange(len(packed)) if rows is None else np.asarray(rows, dtype=np.int64)
+    keys = pd.DataFrame({"n": packed.lengths[rows], "rate": np.asarray(rates)[rows]})
+    for (n, rate), group in keys.groupby(["n", "rate"], sort=False).indices.items():
+        if n == 0 or not np.isfinite(rate) or rate <= 0:
+            continue
+        group = rows[group]
+        step = max(1, BATCH_SAMPLES // int(n))
+        for start in range(0, group.size, step):
+            chunk = group[start:start + step]
+            yield chunk, float(rate), packed.padded(chunk, int(n))
+
+
+def _block_peaks(block: np.ndarray):
+    """Return (positive index, negative index, positive peak, negative peak, main index).
+
+    The main peak is the larger deflection of the two, the positive one on a
+    tie; its index gives the ``latency`` of every feature function.
+    """
+    index = np.arange(block.shape[0])
+    pos_idx = block.argmax(axis=1)
+    neg_idx = block.argmin(axis=1)
+    pos, neg = block[index, pos_idx], block[index, neg_idx]
+    main = np.where(np.abs(pos) >= np.abs(neg), pos_idx, neg_idx)
+    return pos_idx, neg_idx, pos, neg, main
+
+
+def extract_basic_features(df: pd.DataFrame) -> pd.DataFrame:
+    """Return peak-to-peak amplitude (µV) and latency (ms) of every row.
+
+    These are the ``amplitude`` and ``latency`` of :func:`extract_features`
+    without the onset and peak details. Rows that are empty or have an
+    invalid rate get NaN.
+    """
+    n = len(df)
+    out = pd.DataFrame(
+        {col: np.full(n, np.nan) for col in FEATURE_COLUMNS}, index=df.index
+    )
+    if n == 0:
+        return out
+    packed = packed_column(df, "values")
+    rates = pd.to_numeric(df["signal_rate"], errors="coerce").to_numpy(dtype=float)
+    amplitude = out["amplitude"].to_numpy(copy=True)
+    latency = out["latency"].to_numpy(copy=True)
+    for rows, rate, block in iter_batches(packed, rates):
+        _, _, pos, neg, main = _block_peaks(block)
+        amplitude[rows] = pos - neg
+        latency[rows] = main * 1000.0 / rate
+    out["amplitude"] = amplitude
+    out["latency"] = latency
+    return out
+
+
+def _block_features(block: np.ndarray, rate: float) -> dict[str, np.ndarray]:
+    """Return the :data:`PEAK_COLUMNS` of every row of an equal-rate block."""
+    n = block.shape[1]
+    ms = 1000.0 / rate
+    pos_idx, neg_idx, pos, neg, main = _block_peaks(block)
+
+    n_noise = min(max(2, int(NOISE_MS / ms)), n)
+    noise = block[:, :n_noise]
+    threshold = np.maximum(ONSET_SD * noise.std(axis=1), 1e-3 * (pos - neg))
+    # The onset lies after the noise window and at or before the first peak
+    first = np.minimum(pos_idx, neg_idx)
+    window = block[:, :max(int(first.max()) + 1, n_noise)]
+    deviates = np.abs(window - noise.mean(axis=1, keepdims=True)) > threshold[:, None]
+    cols = np.arange(window.shape[1])
+    deviates &= (cols >= n_noise) & (cols <= first[:, None])
+    onset = np.where(deviates.any(axis=1), deviates.argmax(axis=1) * ms, np.nan)
+    return {
+        "onset": onset,
+        "pos_latency": pos_idx * ms,
+        "pos_peak": pos,
+        "neg_latency": neg_idx * ms,
+        "neg_peak": neg,
+        "latency": main * ms,
+        "amplitude": pos - neg,
+    }
+
+
+def compute_features(packed: PackedWaveforms, rates: np.ndarray,
+                     rows: np.ndarray | None = None) -> dict[str, np.ndarray]:
+    """Return :data:`PEAK_COLUMNS` arrays for ``rows`` (default: all rows).
+
+    Rows that are empty or have an invalid rate get NaN.
+    """
+    rows = np.arange(len(packed)) if rows is None else np.asarray(rows, dtype=np.int64)
+    position = np.full(len(packed), -1, dtype=np.int64)
+    position[rows] = np.arange(rows.size)
+    out = {col: np.full(rows.size, np.nan) for col in PEAK_COLUMNS}
+    for chunk, rate, block in iter_batches(packed, rates, rows):
+        target = position[chunk]
+        for col, values in _block_features(block, rate).items():
+            out[col][target] = values
+    return out
+
+
+@profiled()
+def extract_features(df: pd.DataFrame) -> pd.DataFrame:
+    """Return onset, main peaks, latency and amplitude of every row of ``df``.
+
+    ``pos_*``/``neg_*`` are the largest positive and negative deflections,
+    ``latency`` is the time of the larger of the two and ``amplitude`` the
+    peak-to-peak difference. All times are in ms from the trace start.
+    """
+    if df.empty:
+        return pd.DataFrame({col: np.zeros(0) for col in PEAK_COLUMNS}, index=df.index)
+    rates = pd.to_numeric(df["signal_rate"], errors="coerce").to_numpy(dtype=float)
+    return pd.DataFrame(compute_features(packed_column(df, "values"), rates), index=df.index)
+
+
+# Feature frames of every frame by surgery ID (as str), see frame_cache
+_FEATURE_CACHE: dict[int, dict[str, pd.DataFrame]] = {}
+
+
+def _surgery_cache(df: pd.DataFrame) -> dict[str, pd.DataFrame]:
+    return frame_cache(_FEATURE_CACHE, df, dict)
+
+
+def _fill_cache(df: pd.DataFrame, surgery_ids=None) -> dict[str, pd.DataFrame]:
+    """Compute the features of uncached surgeries of ``df`` in one batched pass."""
+    cache = _surgery_cache(df)
+    groups = df.groupby(df["surgery_id"].astype(str), sort=False).indices
+    wanted = groups if surgery_ids is None else [s for s in map(str, surgery_ids) if s in groups]
+    missing = [sid for sid in wanted if sid not in cache]
+    if missing:
+        rows = np.concatenate([groups[sid] for sid in missing])
+        rates = pd.to_numeric(df["signal_rate"], errors="coerce").to_numpy(dtype=float)
+        values = pd.DataFrame(
+            compute_features(packed_column(df, "values"), rates, rows), index=df.index[rows]
+        )
+        start = 0
+        for sid in missing:
+            stop = start + len(groups[sid])
+            cache[sid] = values.iloc[start:stop]
+            start = stop
+    return cache
+
+
+def _feature_buffers() -> dict:
+    out = {}
+    for cache in list(_FEATURE_CACHE.values()):
+        for frame in list(cache.values()):
+            array_buffers(*iter_arrays(frame), out=out)
+    return out
+
+
+def release_features() -> None:
+    """Empty the feature cache; features are recomputed on the next lookup."""
+    for cache in list(_FEATURE_CACHE.values()):
+        cache.clear()
+
+
+ACCOUNTANT.register("Peak features", _feature_buffers, release_features,
+                    priority=PRIORITY_DERIVED)
+
+
+def surgery_features(df: pd.DataFrame, surgery_id) -> pd.DataFrame:
+    """Return the cached :func:`extract_features` rows of one surgery.
+
+    The frame is indexed by the row labels of ``df``, so rows of a filtered
+    view of ``df`` can be looked up with ``.loc``.
+    """
+    cache = _fill_cache(df, [surgery_id])
+    empty = pd.DataFrame({col: np.zeros(0) for col in PEAK_COLUMNS})
+    return cache.get(str(surgery_id), empty)
+
+
+def frame_features(df: pd.DataFrame) -> pd.DataFrame:
+    """Return the cached features of every row of ``df``, aligned to its index."""
+    if df.empty:
+        return extract_features(df)
+    cache = _fill_cache(df)
+    return pd.concat(cache.values()).reindex(df.index)
+
+
+if __name__ == "__main__":
+    import sys
+    import time
+
+    from .data_loader import load_signals
+
+    if len(sys.argv) != 2:
+        print("Usage: python -m src.features <input.pkl|parquet_dir>")
+        sys.exit(1)
+    for name, df in zip(("MEP", "SSEP_UPPER", "SSEP_LOWER"), load_signals(sys.argv[1])[:3]):
+        packed_column(df, "values")
+        start = time.perf_counter()
+        extract_features(df)
+        elapsed = time.perf_counter() - start
+        print(f"{name:<11} {len(df):>8} traces  {len(df) / max(elapsed, 1e-9):>12,.0f} traces/s")
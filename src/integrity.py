@@ -0,0 +1,163 @@
+"""Vectorized data-integrity checks run when signals are loaded.
+
+Every check produces a boolean mask over the rows of a modality DataFrame.
+Rows failing a *quarantining* check are removed from the working frame and
+kept in the report; the remaining checks are reported as warnings only,
+because the data description allows e.g. several rows per timestamp and
+channel.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+from .packed import cached_columns, packed_column, register_packed
+
+KEY_COLUMNS = ["surgery_id", "timestamp", "channel"]
+
+# Checks whose failing rows are removed from the frame by default.
+QUARANTINE_CHECKS = ("empty_values", "bad_rate", "non_finite", "length_mismatch")
+
+CHECK_DESCRIPTIONS = {
+    "empty_values": "empty values",
+    "bad_rate": "missing or non-positive signal_rate",
+    "non_finite": "NaN/inf samples",
+    "length_mismatch": "sample count differs from its channel",
+    "empty_baseline": "empty baseline_values",
+    "bad_baseline_rate": "missing or non-positive baseline_signal_rate",
+    "non_monotonic": "timestamp decreases within its channel",
+    "duplicate_key": "duplicate (surgery, timestamp, channel)",
+}
+
+
+@dataclass
+class IntegrityReport:
+    """Outcome of :func:`scan_frame` for one modality DataFrame."""
+
+    name: str
+    n_rows: int
+    masks: dict[str, np.ndarray] = field(default_factory=dict)
+    quarantine_checks: tuple = QUARANTINE_CHECKS
+    quarantined: pd.DataFrame = None
+
+    @property
+    def counts(self) -> dict[str, int]:
+        return {check: int(mask.sum()) for check, mask in self.masks.items()}
+
+    @property
+    def bad_mask(self) -> np.ndarray:
+        """Rows failing at least one quarantining check."""
+        bad = np.zeros(self.n_rows, dtype=bool)
+        for check in self.quarantine_checks:
+            if check in self.masks:
+                bad |= self.masks[check]
+        return bad
+
+    @property
+    def ok(self) -> bool:
+        return not any(self.counts.values())
+
+    def summary(self) -> str:
+        lines = [f"{self.name}: {self.n_rows} rows, {int(self.bad_mask.sum())} quarantined"]
+        for check, count in self.counts.items():
+            if count:
+                kind = "quarantined" if check in self.quarantine_checks else "warning"
+                lines.append(f"  {CHECK_DESCRIPTIONS.get(check, check)}: {count} ({kind})")
+        return "\n".join(lines)
+
+
+def _bad_rate(rates: pd.Series) -> np.ndarray:
+    rates = pd.to_numeric(rates, errors="coerce").to_numpy(dtype=float)
+    return ~(np.isfinite(rates) & (rates > 0))
+
+
+def _non_finite(packed) -> np.ndarray:
+    """Flag rows containing NaN or inf samples."""
+    # NaN/inf propagate through a row sum, which is a single cheap pass; the
+    # few rows whose sum is not finite are then confirmed sample by sample.
+    flags = ~np.isfinite(packed.reduce(np.add, empty=0))
+    for i in np.flatnonzero(flags):
+        flags[i] = not np.isfinite(packed.row(i)).all()
+    return flags
+
+
+def _length_mismatch(df: pd.DataFrame, lengths: np.ndarray) -> np.ndarray:
+    """Flag rows whose sample count differs from the most common count of
+    rows sharing their surgery, channel and signal rate."""
+    groups = df.groupby(["surgery_id", "channel", "signal_rate"], sort=False, dropna=False).ngroup()
+    frame = pd.DataFrame({"g": groups.to_numpy(), "n": lengths})
+    counts = frame.groupby(["g", "n"], sort=False).size().reset_index(name="c")
+    counts = counts.sort_values(["g", "c"], ascending=[True, False], kind="stable")
+    modal = counts.drop_duplicates("g").set_index("g")["n"]
+    return lengths != modal.reindex(frame["g"]).to_numpy()
+
+
+def _non_monotonic(df: pd.DataFrame) -> np.ndarray:
+    """Flag rows whose timestamp is earlier than the previous row of the same
+    surgery and channel (in file order)."""
+    n = len(df)
+    groups = df.groupby(["surgery_id", "channel"], sort=False).ngroup().to_numpy()
+    order = np.argsort(groups, kind="stable")
+    ts = pd.to_numeric(df["timestamp"], errors="coerce").to_numpy(dtype=float)[order]
+    same = groups[order][1:] == groups[order][:-1]
+    flags = np.zeros(n, dtype=bool)
+    flags[order[1:]] = same & (np.diff(ts) < 0)
+    return flags
+
+
+def scan_frame(df: pd.DataFrame, name: str = "") -> IntegrityReport:
+    """Run all integrity checks on ``df``.
+
+    Only the columns that are present are checked, so projected frames can be
+    scanned as well. Waveform checks run on the packed sample store, which is
+    cached for later stages.
+    """
+    report = IntegrityReport(name=name, n_rows=len(df))
+    if df.empty:
+        return report
+    masks = report.masks
+    cols = df.columns
+
+    if "values" in cols:
+        packed = packed_column(df, "values")
+        lengths = packed.lengths
+        masks["empty_values"] = lengths == 0
+        masks["non_finite"] = _non_finite(packed)
+        if {"surgery_id", "channel", "signal_rate"} <= set(cols):
+            masks["length_mismatch"] = _length_mismatch(df, lengths) & (lengths > 0)
+    if "signal_rate" in cols:
+        masks["bad_rate"] = _bad_rate(df["signal_rate"])
+    if "baseline_values" in cols:
+        baseline_lengths = df["baseline_values"].str.len().fillna(0).to_numpy()
+        masks["empty_baseline"] = baseline_lengths == 0
+        if "baseline_signal_rate" in cols:
+            masks["bad_baseline_rate"] = (
+                _bad_rate(df["baseline_signal_rate"]) & ~masks["empty_baseline"]
+            )
+    if {"surgery_id", "channel", "timestamp"} <= set(cols):
+        masks["non_monotonic"] = _non_monotonic(df)
+        masks["duplicate_key"] = df.duplicated(KEY_COLUMNS, keep="first").to_numpy()
+    return report
+
+
+def quarantine(df: pd.DataFrame, report: IntegrityReport,
+               checks: Iterable[str] = QUARANTINE_CHECKS) -> pd.DataFrame:
+    """Remove rows failing ``checks`` and keep them in ``report.quarantined``.
+
+    If rows are removed the clean frame gets a fresh ``RangeIndex``; packed
+    stores built during the scan are carried over to it.
+    """
+    report.quarantine_checks = tuple(checks)
+    bad = report.bad_mask
+    report.quarantined = df[bad]
+    if not bad.any():
+        return df
+    keep = np.flatnonzero(~bad)
+    clean = df.iloc[keep].reset_index(drop=True)
+    for column in cached_columns(df):
+        register_packed(clean, column, packed_column(df, column).take(keep))
+    return clean
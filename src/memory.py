@@ -0,0 +1,340 @@
+"""Memory accounting for loaded data, derived caches and plot pools.
+
+Everything that holds a sizeable amount of memory registers an *entry* with
+the global :data:`ACCOUNTANT`: the loaded frames, the per-frame caches of
+:mod:`src.packed`, :mod:`src.features` and :mod:`src.resample`, the trend
+store and the pooled plot widgets. An entry's size function returns the
+buffers it references as ``{key: nbytes}``, keyed by the identity of the
+object owning the memory, so a buffer shared by several entries (a packed
+store whose rows are the frame's cells, the same baseline array in every
+row of a channel) is counted once, for the first entry reporting it.
+
+Entries with an eviction function can be released to stay under a global
+budget. :meth:`MemoryAccountant.enforce` drops them least valuable first
+(lowest priority, then largest) until the total fits. Priorities:
+
+* :data:`PRIORITY_TRANSIENT` -- cheap to rebuild on the next redraw
+* :data:`PRIORITY_POOL` -- hidden widgets kept for reuse
+* :data:`PRIORITY_DERIVED` -- caches recomputed from the frames on demand
+* :data:`PRIORITY_INDEX` -- caches every other computation is built on
+
+The budget is read from ``CV_MEMORY_BUDGET`` (bytes, or with a ``K``, ``M``
+or ``G`` suffix) and defaults to half of the physical memory.
+
+Buffers backed by a memory-mapped file are not counted: their pages belong
+to the operating system's page cache and are dropped under pressure.
+"""
+
+from __future__ import annotations
+
+import mmap
+import os
+import sys
+import weakref
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+MEMORY_ENV = "CV_MEMORY_BUDGET"
+
+PRIORITY_TRANSIENT = 0
+PRIORITY_POOL = 1
+PRIORITY_DERIVED = 2
+PRIORITY_INDEX = 3
+
+_UNITS = {"": 1, "B": 1, "K": 1 << 10, "M": 1 << 20, "G": 1 << 30, "T": 1 << 40}
+
+# Size of a Python float, the element type of list-valued waveform cells
+_FLOAT_SIZE = sys.getsizeof(0.0)
+
+
+def parse_size(text: str) -> int:
+    """Return the number of bytes in ``text`` such as ``"512M"`` or ``"4G"``."""
+    value = str(text).strip().upper().removesuffix("IB").removesuffix("B")
+    unit = value[-1:] if value[-1:] in _UNITS else ""
+    number = value[:-1] if unit else value
+    try:
+        return int(float(number) * _UNITS[unit])
+    except ValueError:
+        raise ValueError(f"invalid memory size: {text!r}") from None
+
+
+def format_bytes(nbytes: float) -> str:
+    """Return ``nbytes`` in the largest binary unit below it, e.g. ``"1.5 GiB"``."""
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if abs(nbytes) < 1024 or unit == "GiB":
+            return f"{nbytes:.0f} {unit}" if unit == "B" else f"{nbytes:.1f} {unit}"
+        nbytes /= 1024
+
+
+def physical_memory() -> int | None:
+    """Return the installed memory in bytes, or None if it is unknown."""
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def default_budget() -> int | None:
+    """Return the budget from ``CV_MEMORY_BUDGET`` or half the physical memory."""
+    text = os.environ.get(MEMORY_ENV, "")
+    if text:
+        return parse_size(text)
+    total = physical_memory()
+    return total // 2 if total else None
+
+
+# -----------------------------------------------------
+# Measuring
+# -----------------------------------------------------
+def _owner(array: np.ndarray):
+    """Return the object owning the memory of ``array`` (following views)."""
+    owner = array
+    while isinstance(owner, np.ndarray) and owner.base is not None:
+        owner = owner.base
+    return owner
+
+
+def array_buffers(*arrays, out: dict | None = None) -> dict:
+    """Add the buffers of ``arrays`` to ``out`` as ``{id(owner): nbytes}``.
+
+    Views count the whole buffer they look into, once. Memory-mapped
+    buffers count as zero.
+    """
+    out = {} if out is None else out
+    for array in arrays:
+        if array is None:
+            continue
+        owner = _owner(array)
+        key = id(owner)
+        if key in out:
+            continue
+        if isinstance(owner, (np.memmap, mmap.mmap)):
+            out[key] = 0
+        elif isinstance(owner, np.ndarray):
+            out[key] = owner.nbytes
+        elif isinstance(owner, (bytes, bytearray)):
+            out[key] = len(owner)
+        else:
+            out[key] = array.nbytes
+    return out
+
+
+def _cell_buffers(cells: np.ndarray, out: dict) -> None:
+    """Add the objects referenced by an object column to ``out``."""
+    # Rows often share a cell (baselines), so visit each object once
+    ids = np.fromiter(map(id, cells), dtype=np.int64, count=len(cells))
+    _, first = np.unique(ids, return_index=True)
+    for cell in cells[first]:
+        if isinstance(cell, np.ndarray):
+            array_buffers(cell, out=out)
+        elif isinstance(cell, list):
+            # Lists of floats: the pointer array plus one float object each
+            out.setdefault(id(cell), sys.getsizeof(cell) + _FLOAT_SIZE * len(cell))
+        else:
+            out.setdefault(id(cell), sys.getsizeof(cell))
+
+
+# Buffers of every measured frame (see src.packed.frame_cache)
+_FRAME_BUFFERS: dict[int, dict] = {}
+
+
+def frame_buffers(df: pd.DataFrame) -> dict:
+    """Return the buffers held by ``df``, measured once per frame.
+
+    Numeric columns count their array; object columns count the pointer
+    array and every distinct object they reference, so frames selected
+    from another frame share the cells with it.
+    """
+    if df is None:
+        return {}
+    # src.packed imports this module
+    from .packed import frame_cache
+
+    return frame_cache(_FRAME_BUFFERS, df, lambda: _measure_frame(df))
+
+
+def _measure_frame(df: pd.DataFrame) -> dict:
+    key = id(df)
+    out = {("index", key): int(df.index.memory_usage(deep=True))}
+    usage = df.memory_usage(index=False, deep=False)
+    for column, dtype in df.dtypes.items():
+        out[("column", key, column)] = int(usage[column])
+        if pd.api.types.is_object_dtype(dtype):
+            _cell_buffers(df[column].to_numpy(), out)
+    return out
+
+
+def total_bytes(*buffers: dict) -> int:
+    """Return the size of the union of several buffer dicts."""
+    merged = {}
+    for part in buffers:
+        merged.update(part)
+    return int(sum(merged.values()))
+
+
+# -----------------------------------------------------
+# Accounting
+# -----------------------------------------------------
+@dataclass
+class MemoryEntry:
+    """One line of a :meth:`MemoryAccountant.report`."""
+
+    name: str
+    category: str
+    nbytes: int
+    evictable: bool
+    priority: int
+
+
+def _weak(func: Callable | None):
+    """Return a callable returning ``func`` (None once its object is gone)."""
+    if func is None:
+        return lambda: None
+    if hasattr(func, "__self__") and hasattr(func, "__func__"):
+        return weakref.WeakMethod(func)
+    return lambda: func
+
+
+class MemoryAccountant:
+    """Registry of memory holders and the global budget they share.
+
+    Bound methods are held weakly, so a widget registering its caches does
+    not outlive its window; its entries disappear with it.
+    """
+
+    CATEGORIES = ("data", "cache", "plots")
+
+    def __init__(self, budget: int | None = None):
+        self.budget = budget
+        self._entries: dict[str, tuple] = {}
+
+    def register(self, name: str, sizer: Callable[[], dict], evict: Callable | None = None,
+                 priority: int = PRIORITY_DERIVED, category: str = "cache") -> None:
+        """Register (or replace) the entry ``name``.
+
+        ``sizer()`` returns the entry's buffers as ``{key: nbytes}``; see
+        :func:`array_buffers` and :func:`frame_buffers`. ``evict()``
+        releases them; entries without one are only reported.
+        """
+        if category not in self.CATEGORIES:
+            raise ValueError(f"unknown category: {category!r}")
+        self._entries[name] = (category, _weak(sizer), None if evict is None else _weak(evict),
+                               priority)
+
+    def track_frame(self, name: str, df: pd.DataFrame | None, category: str = "data") -> None:
+        """Report ``df`` as the entry ``name`` for as long as the frame is alive.
+
+        The frame is held weakly and measured once, see :func:`frame_buffers`.
+        ``None`` removes the entry.
+        """
+        if df is None:
+            self.unregister(name)
+            return
+        ref = weakref.ref(df)
+
+        def sizer():
+            frame = ref()
+            return None if frame is None else (lambda: frame_buffers(frame))
+
+        self._entries[name] = (category, sizer, None, PRIORITY_INDEX)
+
+    def unregister(self, name: str) -> None:
+        self._entries.pop(name, None)
+
+    def _live(self) -> list[tuple]:
+        """Return (name, category, sizer, evict, priority), dropping dead entries."""
+        live = []
+        for name, (category, sizer, evict, priority) in list(self._entries.items()):
+            size_func = sizer()
+            evict_func = evict() if evict is not None else None
+            if size_func is None or (evict is not None and evict_func is None):
+                del self._entries[name]
+                continue
+            live.append((name, category, size_func, evict_func, priority))
+        return live
+
+    def _measure(self) -> list[tuple]:
+        """Return the live entries with their bytes, shared buffers counted once.
+
+        Data is measured first and evictable caches last, most valuable
+        first, so a shared buffer is attributed to the entry that would
+        keep it alive and evicting an entry frees what it reports.
+        """
+        entries = sorted(
+            self._live(),
+            key=lambda e: (self.CATEGORIES.index(e[1]) if e[3] is None else len(self.CATEGORIES),
+                           -e[4]),
+        )
+        seen = set()
+        measured = []
+        for name, category, sizer, evict, priority in entries:
+            nbytes = 0
+            for key, size in sizer().items():
+                if key not in seen:
+                    seen.add(key)
+                    nbytes += size
+            measured.append((name, category, nbytes, evict, priority))
+        return measured
+
+    def report(self) -> list[MemoryEntry]:
+        """Return every entry with its size, grouped by category then largest first."""
+        entries = [
+            MemoryEntry(name, category, nbytes, evict is not None, priority)
+            for name, category, nbytes, evict, priority in self._measure()
+        ]
+        entries.sort(key=lambda e: (self.CATEGORIES.index(e.category), -e.nbytes, e.name))
+        return entries
+
+    def total(self) -> int:
+        return sum(nbytes for _, _, nbytes, _, _ in self._measure())
+
+    def enforce(self, budget: int | None = None) -> list[str]:
+        """Evict entries until the total fits ``budget`` (default: :attr:`budget`).
+
+        Entries go lowest priority first and, within a priority, largest
+        first. Returns the names of the evicted entries; the total can
+        remain over budget if the data alone exceeds it.
+        """
+        budget = self.budget if budget is None else budget
+        if budget is None:
+            return []
+        measured = self._measure()
+        total = sum(nbytes for _, _, nbytes, _, _ in measured)
+        candidates = sorted(
+            (e for e in measured if e[3] is not None and e[2] > 0),
+            key=lambda e: (e[4], -e[2]),
+        )
+        evicted = []
+        for name, _, nbytes, evict, _ in candidates:
+            if total <= budget:
+                break
+            evict()
+            total -= nbytes
+            evicted.append(name)
+        return evicted
+
+
+ACCOUNTANT = MemoryAccountant(budget=default_budget())
+
+
+def iter_arrays(value) -> Iterable[np.ndarray]:
+    """Yield the arrays in a (possibly nested) dict, list, tuple or Series."""
+    if isinstance(value, np.ndarray):
+        yield value
+    elif isinstance(value, dict):
+        for item in value.values():
+            yield from iter_arrays(item)
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            yield from iter_arrays(item)
+    elif isinstance(value, pd.Series):
+        if value.dtype == object:
+            yield from iter_arrays(list(value))
+        else:
+            yield value.to_numpy()
+    elif isinstance(value, pd.DataFrame):
+        for column in value.columns:
+            yield from iter_arrays(value[column])
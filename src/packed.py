@@ -0,0 +1,191 @@
+from __future__ import annotations
+
+import itertools
+import weakref
+from collections.abc import Callable, Iterable
+from typing import Any
+
+import numpy as np
+import pandas as pd
+
+from .memory import ACCOUNTANT, PRIORITY_INDEX, array_buffers
+
+
+class PackedWaveforms:
+    """Contiguous float32 storage for a column of variable-length waveforms.
+
+    The samples of every row are stored back to back in ``data`` and row ``i``
+    spans ``data[offsets[i]:offsets[i + 1]]``.  Building the store once lets
+    later stages work on whole columns with NumPy instead of per-row Python.
+    """
+
+    def __init__(self, data: np.ndarray, offsets: np.ndarray):
+        self.data = np.asarray(data, dtype=np.float32)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        if self.offsets.ndim != 1 or self.offsets.size == 0:
+            raise ValueError("offsets must be a non-empty 1-D array")
+        if self.offsets[-1] != self.data.size:
+            raise ValueError("last offset must equal the number of samples")
+
+    @classmethod
+    def from_sequences(cls, values: Iterable) -> PackedWaveforms:
+        """Pack an iterable of sample sequences (lists or arrays)."""
+        values = [() if v is None else v for v in values]
+        lengths = np.fromiter(map(len, values), dtype=np.int64, count=len(values))
+        offsets = np.zeros(len(values) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        if offsets[-1] == 0:
+            data = np.empty(0, dtype=np.float32)
+        elif isinstance(values[int(np.argmax(lengths > 0))], np.ndarray):
+            # Arrays concatenate at memcpy speed; lists are faster through a
+            # single flat iterator than converted one by one.
+            data = np.concatenate(values, dtype=np.float32, casting="same_kind")
+        else:
+            data = np.fromiter(
+                itertools.chain.from_iterable(values),
+                dtype=np.float32,
+                count=int(offsets[-1]),
+            )
+        return cls(data, offsets)
+
+    def __len__(self) -> int:
+        return self.offsets.size - 1
+
+    @property
+    def lengths(self) -> np.ndarray:
+        return np.diff(self.offsets)
+
+    def row(self, i: int) -> np.ndarray:
+        """Return row ``i`` as a view into ``data``."""
+        return self.data[self.offsets[i]:self.offsets[i + 1]]
+
+    def rows(self) -> list:
+        """Return every row as a view into ``data``."""
+        return np.split(self.data, self.offsets[1:-1])
+
+    def take(self, indices) -> PackedWaveforms:
+        """Return a new store containing only the given rows."""
+        indices = np.asarray(indices, dtype=np.int64)
+        starts = self.offsets[indices]
+        lengths = self.offsets[indices + 1] - starts
+        offsets = np.zeros(indices.size + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        if offsets[-1]:
+            # Index of every output sample into ``data``
+            gather = np.arange(offsets[-1]) - np.repeat(offsets[:-1] - starts, lengths)
+            data = self.data[gather]
+        else:
+            data = np.empty(0, dtype=np.float32)
+        return PackedWaveforms(data, offsets)
+
+    def reduce(self, ufunc: np.ufunc, values: np.ndarray | None = None,
+               empty: float = np.nan) -> np.ndarray:
+        """Apply ``ufunc.reduceat`` per row, returning ``empty`` for empty rows.
+
+        ``values`` may be a transformed copy of ``data`` (e.g. ``np.abs``) so
+        callers can reduce derived quantities without repacking.
+        """
+        values = self.data if values is None else values
+        out = np.full(len(self), empty, dtype=np.float64)
+        nonempty = self.lengths > 0
+        if values.size and nonempty.any():
+            out[nonempty] = ufunc.reduceat(values, self.offsets[:-1][nonempty])
+        return out
+
+    def padded(self, indices=None, length: int | None = None,
+               fill: float = np.nan) -> np.ndarray:
+        """Return the selected rows as a 2-D array padded with ``fill``."""
+        if indices is None:
+            indices = np.arange(len(self))
+        indices = np.asarray(indices, dtype=np.int64)
+        starts = self.offsets[indices]
+        lengths = self.offsets[indices + 1] - starts
+        if length is None:
+            length = int(lengths.max()) if lengths.size else 0
+        if length and indices.size and np.all(lengths == length):
+            # Rows that exactly fill the output: a slice if they are stored
+            # back to back, otherwise a single gather without masking
+            if np.all(np.diff(starts) == length):
+                start = int(starts[0])
+                return self.data[start:start + indices.size * length].reshape(-1, length).copy()
+            return self.data[starts[:, None] + np.arange(length)]
+        out = np.full((indices.size, length), fill, dtype=np.float32)
+        if length == 0:
+            return out
+        cols = np.arange(length)
+        mask = cols[None, :] < np.minimum(lengths, length)[:, None]
+        src = (starts[:, None] + cols[None, :])[mask]
+        out[mask] = self.data[src]
+        return out
+
+
+def frame_cache(registry: dict[int, Any], df: pd.DataFrame, factory: Callable[[], Any]) -> Any:
+    """Return the entry of ``df`` in a per-frame cache, creating it with ``factory()``.
+
+    ``registry`` is keyed by ``id(df)`` and the entry is dropped when the
+    frame is garbage collected, so a recycled id never finds a stale entry.
+    Frames are treated as immutable once cached.
+    """
+    key = id(df)
+    entry = registry.get(key)
+    if entry is None:
+        entry = registry[key] = factory()
+        weakref.finalize(df, registry.pop, key, None)
+    return entry
+
+
+# Packed stores of every frame (see frame_cache)
+_PACKED_CACHE: dict[int, dict[str, PackedWaveforms]] = {}
+# Columns whose store was registered rather than built, keyed like the cache:
+# the frame's cells are views into it, so releasing it would free nothing
+_REGISTERED: dict[int, set] = {}
+
+
+def _frame_cache(df: pd.DataFrame) -> dict[str, PackedWaveforms]:
+    return frame_cache(_PACKED_CACHE, df, dict)
+
+
+def packed_column(df: pd.DataFrame, column: str = "values") -> PackedWaveforms:
+    """Return the packed store for ``df[column]``, building it once per frame."""
+    cache = _frame_cache(df)
+    if column not in cache:
+        cache[column] = PackedWaveforms.from_sequences(df[column].to_numpy(dtype=object))
+    return cache[column]
+
+
+def register_packed(df: pd.DataFrame, column: str, packed: PackedWaveforms) -> None:
+    """Associate an already built store with ``df[column]``."""
+    if len(packed) != len(df):
+        raise ValueError("packed store and frame have different lengths")
+    _frame_cache(df)[column] = packed
+    frame_cache(_REGISTERED, df, set).add(column)
+
+
+def cached_columns(df: pd.DataFrame) -> list:
+    """Return the columns of ``df`` that already have a packed store."""
+    return list(_PACKED_CACHE.get(id(df), {}))
+
+
+def _built_stores():
+    for key, cache in list(_PACKED_CACHE.items()):
+        registered = _REGISTERED.get(key, ())
+        for column, packed in list(cache.items()):
+            if column not in registered:
+                yield cache, column, packed
+
+
+def _packed_buffers() -> dict:
+    out = {}
+    for _, _, packed in _built_stores():
+        array_buffers(packed.data, packed.offsets, out=out)
+    return out
+
+
+def release_packed() -> None:
+    """Drop the stores built by :func:`packed_column`; they are rebuilt on use."""
+    for cache, column, _ in list(_built_stores()):
+        cache.pop(column, None)
+
+
+ACCOUNTANT.register("Packed waveforms", _packed_buffers, release_packed,
+                    priority=PRIORITY_INDEX)
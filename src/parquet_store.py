@@ -0,0 +1,197 @@
+"""Arrow/Parquet layout for monitoring data.
+
+A dataset is a directory holding one Parquet file per modality plus a JSON
+file with the surgery metadata::
+
+    dataset/
+        mep_data.parquet
+        ssep_upper_data.parquet
+        ssep_lower_data.parquet
+        surgerydata.json
+
+Rows are sorted by ``surgery_id`` and written one row group per surgery so
+that reading a subset of surgeries only touches the matching row groups.
+Waveforms are stored as ``list<float32>`` columns; the stimulus dicts are
+stored as JSON strings and are only decoded when requested.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+from collections.abc import Iterable
+
+import numpy as np
+import pandas as pd
+
+from .packed import PackedWaveforms
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - optional dependency
+    pa = None
+    pq = None
+
+FRAME_KEYS = ("mep_data", "ssep_upper_data", "ssep_lower_data")
+META_FILE = "surgerydata.json"
+WAVEFORM_COLUMNS = ("values", "baseline_values")
+DICT_COLUMNS = ("stimulus", "baseline_stimulus")
+
+
+def _require_pyarrow() -> None:
+    if pa is None:
+        raise ImportError("pyarrow is required to read or write Parquet datasets")
+
+
+def is_parquet_dataset(path: str) -> bool:
+    """Return True if ``path`` points at a Parquet dataset or one of its files."""
+    root = dataset_root(path)
+    return os.path.isdir(root) and os.path.isfile(
+        os.path.join(root, f"{FRAME_KEYS[0]}.parquet")
+    )
+
+
+def dataset_root(path: str) -> str:
+    """Return the dataset directory for ``path``."""
+    if path.endswith(".parquet") and not os.path.isdir(path):
+        return os.path.dirname(path) or "."
+    return path
+
+
+def _waveform_array(values: pd.Series) -> pa.Array:
+    packed = PackedWaveforms.from_sequences(values)
+    return pa.ListArray.from_arrays(
+        pa.array(packed.offsets.astype(np.int32)), pa.array(packed.data)
+    )
+
+
+def _frame_to_table(df: pd.DataFrame) -> pa.Table:
+    arrays = {}
+    for col in df.columns:
+        series = df[col]
+        if col in WAVEFORM_COLUMNS:
+            arrays[col] = _waveform_array(series)
+        elif col in DICT_COLUMNS:
+            arrays[col] = pa.array(
+                [json.dumps(v, default=str) for v in series], type=pa.string()
+            )
+        elif col == "surgery_id":
+            arrays[col] = pa.array(series.astype(str).to_numpy(), type=pa.string())
+        else:
+            arrays[col] = pa.Array.from_pandas(series)
+    return pa.table(arrays)
+
+
+def write_frame(df: pd.DataFrame, path: str) -> None:
+    """Write one modality DataFrame, one row group per surgery.
+
+    Object columns are typed per surgery (an all-None column becomes the
+    null type), so the file schema unifies the types of all surgeries.
+    """
+    _require_pyarrow()
+    df = df.reset_index(drop=True)
+    df = df.iloc[np.argsort(df["surgery_id"].astype(str).to_numpy(), kind="stable")]
+    tables = [
+        _frame_to_table(group)
+        for _, group in df.groupby(df["surgery_id"].astype(str), sort=False)
+    ]
+    if not tables:
+        pq.write_table(_frame_to_table(df), path)
+        return
+    schema = pa.unify_schemas([t.schema for t in tables], promote_options="permissive")
+    with pq.ParquetWriter(path, schema) as writer:
+        for table in tables:
+            writer.write_table(table.cast(schema), row_group_size=table.num_rows)
+
+
+def convert_pickle(pkl_path: str, out_dir: str) -> str:
+    """Convert a pickle produced by the pipeline into a Parquet dataset.
+
+    Returns the path of the created dataset directory.
+    """
+    _require_pyarrow()
+    from .data_loader import load_signals
+
+    frames = load_signals(pkl_path, check_integrity=False)
+    os.makedirs(out_dir, exist_ok=True)
+    for key, df in zip(FRAME_KEYS, frames):
+        write_frame(df, os.path.join(out_dir, f"{key}.parquet"))
+
+    meta = frames[3]
+    with open(os.path.join(out_dir, META_FILE), "w", encoding="utf-8") as f:
+        json.dump(
+            {str(k): v for k, v in meta.to_dict(orient="index").items()},
+            f,
+            default=str,
+        )
+    return out_dir
+
+
+def read_schema_columns(path: str) -> set:
+    """Return the column names of a Parquet file without reading any data."""
+    _require_pyarrow()
+    return set(pq.read_schema(path).names)
+
+
+def read_frame(path: str, columns: Iterable[str] | None = None,
+               surgeries: Iterable | None = None) -> pd.DataFrame:
+    """Read a modality file, projecting ``columns`` and filtering ``surgeries``."""
+    _require_pyarrow()
+    filters = None
+    if surgeries is not None:
+        filters = [("surgery_id", "in", [str(s) for s in surgeries])]
+    table = pq.read_table(
+        path,
+        columns=list(columns) if columns is not None else None,
+        filters=filters,
+    )
+    df = table.to_pandas()
+    for col in DICT_COLUMNS:
+        if col in df.columns:
+            df[col] = _decode_dicts(df[col])
+    return df
+
+
+def _decode_dicts(series: pd.Series) -> np.ndarray:
+    # Parameter sets repeat heavily, so decode each distinct JSON string once
+    # and let the rows share the resulting dict objects.
+    codes, uniques = pd.factorize(series)
+    decoded = np.empty(len(uniques) + 1, dtype=object)
+    decoded[:-1] = [json.loads(u) for u in uniques]
+    decoded[-1] = {}
+    return decoded[codes]
+
+
+def read_dataset(path: str, columns: Iterable[str] | None = None,
+                 surgeries: Iterable | None = None,
+                 ) -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """Read a Parquet dataset; see :func:`src.data_loader.load_signals`."""
+    root = dataset_root(path)
+    frames = []
+    for key in FRAME_KEYS:
+        frames.append(read_frame(os.path.join(root, f"{key}.parquet"), columns, surgeries))
+
+    meta_path = os.path.join(root, META_FILE)
+    meta = {}
+    if os.path.isfile(meta_path):
+        with open(meta_path, encoding="utf-8") as f:
+            meta = json.load(f)
+    if surgeries is not None:
+        wanted = {str(s) for s in surgeries}
+        meta = {k: v for k, v in meta.items() if k in wanted}
+    frames.append(pd.DataFrame.from_dict(meta, orient="index"))
+    return tuple(frames)
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) != 3:
+        print("Usage: python -m src.parquet_store <path_to_pickle> <output_dir>")
+    else:
+        try:
+            print(convert_pickle(sys.argv[1], sys.argv[2]))
+        except (FileNotFoundError, KeyError, ImportError) as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(1)
@@ -0,0 +1,120 @@
+"""Wall-clock playback scheduling.
+
+:class:`PlaybackClock` maps elapsed wall-clock time to a position on the
+recording time axis at the chosen speed and returns the frame due at that
+position. A caller that renders slower than frames fall due simply gets a
+later frame on its next tick, so the frames in between are dropped and
+playback stays in sync with the clock instead of falling behind.
+
+In the default mode every frame lasts ``frame_interval`` seconds at x1
+regardless of the recorded spacing; in real-time mode frames are shown at
+their recorded timestamps (in seconds), scaled by the speed.
+"""
+
+from __future__ import annotations
+
+import time
+from collections import deque
+from collections.abc import Callable, Sequence
+
+import numpy as np
+
+# Frames shown within this many seconds count towards the frame rate.
+FPS_WINDOW = 2.0
+
+
+class PlaybackClock:
+    """Map wall-clock time to the index of the frame due for display.
+
+    Parameters
+    ----------
+    timestamps:
+        Sorted recording times of the frames, in seconds.
+    speed:
+        Recording seconds per wall-clock second.
+    realtime:
+        Follow the recorded spacing of ``timestamps`` instead of showing
+        every frame for ``frame_interval`` seconds.
+    frame_interval:
+        Duration of one frame at x1 when not playing in real time.
+    clock:
+        Source of wall-clock time in seconds (for tests).
+    """
+
+    def __init__(self, timestamps: Sequence[float], speed: float = 1.0, realtime: bool = False,
+                 frame_interval: float = 1.0, clock: Callable[[], float] = time.monotonic):
+        self.clock = clock
+        self.speed = speed if speed > 0 else 1.0
+        n = len(timestamps)
+        if realtime:
+            self._times = np.asarray(timestamps, dtype=float)
+        else:
+            self._times = np.arange(n) * float(frame_interval)
+        self.index = 0
+        self.frames = 0
+        self.dropped = 0
+        self._start_wall = 0.0
+        self._start_time = 0.0
+        self._shown = deque()
+
+    def __len__(self) -> int:
+        return len(self._times)
+
+    def start(self, index: int = 0, now: float | None = None) -> None:
+        """Start playing at frame ``index`` and reset the statistics."""
+        now = self.clock() if now is None else now
+        self.index = min(max(index, 0), max(len(self) - 1, 0))
+        self._start_wall = now
+        self._start_time = self._times[self.index] if len(self) else 0.0
+        self.frames = 0
+        self.dropped = 0
+        self._shown.clear()
+
+    def position(self, now: float | None = None) -> float:
+        """Return the recording time reached at wall-clock time ``now``."""
+        now = self.clock() if now is None else now
+        return self._start_time + (now - self._start_wall) * self.speed
+
+    def due_index(self, now: float | None = None) -> int:
+        """Return the last frame whose time has been reached."""
+        if not len(self):
+            return 0
+        index = int(np.searchsorted(self._times, self.position(now), side="right")) - 1
+        return min(max(index, self.index), len(self) - 1)
+
+    def advance(self, now: float | None = None) -> int | None:
+        """Return the frame to show now, or None if the current one is still due.
+
+        Frames skipped since the last shown one are counted as dropped.
+        """
+        now = self.clock() if now is None else now
+        index = self.due_index(now)
+        if index == self.index:
+            return None
+        self.dropped += index - self.index - 1
+        self.index = index
+        self.frames += 1
+        self._shown.append(now)
+        while self._shown and self._shown[0] < now - FPS_WINDOW:
+            self._shown.popleft()
+        return index
+
+    @property
+    def finished(self) -> bool:
+        return self.index >= len(self) - 1
+
+    def delay(self, now: float | None = None) -> float:
+        """Return the wall-clock seconds until the next frame falls due."""
+        if self.finished:
+            return 0.0
+        remaining = self._times[self.index + 1] - self.position(now)
+        return max(remaining / self.speed, 0.0)
+
+    def fps(self, now: float | None = None) -> float:
+        """Return the frames shown per second over the last :data:`FPS_WINDOW`."""
+        now = self.clock() if now is None else now
+        recent = [t for t in self._shown if t >= now - FPS_WINDOW]
+        if not recent:
+            return 0.0
+        span = min(FPS_WINDOW, now - self._start_wall)
+        return len(recent) / span if span > 0 else 0.0
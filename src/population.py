@@ -0,0 +1,317 @@
+"""Out-of-core population statistics across an archive of surgeries.
+
+The batch job streams the archive one surgery at a time and accumulates a
+mergeable quantile sketch per (modality, channel, protocol, metric). Workers
+build partial statistics in separate processes and the parent merges them,
+so memory use is bounded by the largest single task rather than the archive.
+
+Sketches are log-bucketed histograms (as in DDSketch): every value falls in
+a bucket whose bounds differ by a factor ``gamma``, so any quantile is known
+to within the relative accuracy ``alpha`` and two sketches merge exactly by
+adding bucket counts.
+
+Usage::
+
+    python -m src.population population.json archive_dir_or_files... [--workers N]
+"""
+
+from __future__ import annotations
+
+import json
+import math
+import os
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from . import data_loader, parquet_store
+from .artifacts import clean_rows
+from .cache import cache_dir
+from .features import extract_basic_features
+from .trends import calculate_l1_norm
+
+MODALITIES = {
+    "mep_data": "MEP",
+    "ssep_upper_data": "SSEP_UPPER",
+    "ssep_lower_data": "SSEP_LOWER",
+}
+METRICS = ("amplitude", "latency", "l1")
+COLUMNS = ["surgery_id", "timestamp", "channel", "values", "signal_rate"]
+DEFAULT_FILE = "population.json"
+
+
+class QuantileSketch:
+    """Mergeable quantile sketch with relative accuracy ``alpha``.
+
+    Only non-negative values are tracked; negative and non-finite values are
+    ignored.
+    """
+
+    def __init__(self, alpha: float = 0.01):
+        self.alpha = alpha
+        self._log_gamma = math.log((1 + alpha) / (1 - alpha))
+        self.zero_count = 0
+        self.offset = 0
+        self.counts = np.zeros(0, dtype=np.int64)
+
+    @property
+    def count(self) -> int:
+        return int(self.counts.sum()) + self.zero_count
+
+    def _grow(self, lo: int, hi: int) -> None:
+        if self.counts.size == 0:
+            self.offset = lo
+            self.counts = np.zeros(hi - lo + 1, dtype=np.int64)
+            return
+        new_lo = min(lo, self.offset)
+        new_hi = max(hi, self.offset + self.counts.size - 1)
+        if new_lo == self.offset and new_hi == self.offset + self.counts.size - 1:
+            return
+        counts = np.zeros(new_hi - new_lo + 1, dtype=np.int64)
+        start = self.offset - new_lo
+        counts[start:start + self.counts.size] = self.counts
+        self.offset, self.counts = new_lo, counts
+
+    def add(self, values) -> None:
+        values = np.asarray(values, dtype=float)
+        values = values[np.isfinite(values) & (values >= 0)]
+        zero = values <= np.finfo(float).tiny
+        self.zero_count += int(zero.sum())
+        values = values[~zero]
+        if values.size == 0:
+            return
+        keys = np.ceil(np.log(values) / self._log_gamma).astype(np.int64)
+        lo, hi = int(keys.min()), int(keys.max())
+        self._grow(lo, hi)
+        self.counts += np.bincount(keys - self.offset, minlength=self.counts.size)[
+            : self.counts.size
+        ]
+
+    def merge(self, other: QuantileSketch) -> None:
+        if other.alpha != self.alpha:
+            raise ValueError("cannot merge sketches with different accuracy")
+        self.zero_count += other.zero_count
+        if other.counts.size == 0:
+            return
+        self._grow(other.offset, other.offset + other.counts.size - 1)
+        start = other.offset - self.offset
+        self.counts[start:start + other.counts.size] += other.counts
+
+    def quantile(self, q: float) -> float:
+        total = self.count
+        if total == 0:
+            return float("nan")
+        rank = q * (total - 1)
+        if rank < self.zero_count:
+            return 0.0
+        cumulative = np.cumsum(self.counts) + self.zero_count
+        idx = int(np.searchsorted(cumulative, rank, side="right"))
+        idx = min(idx, self.counts.size - 1)
+        # Midpoint (in relative terms) of the bucket
+        return 2 * math.exp(self._log_gamma * (idx + self.offset)) / (
+            1 + math.exp(self._log_gamma)
+        )
+
+    def to_dict(self) -> dict:
+        nonzero = np.flatnonzero(self.counts)
+        return {
+            "alpha": self.alpha,
+            "zero_count": self.zero_count,
+            "keys": (nonzero + self.offset).tolist(),
+            "counts": self.counts[nonzero].tolist(),
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> QuantileSketch:
+        sketch = cls(data["alpha"])
+        sketch.zero_count = int(data["zero_count"])
+        keys = np.asarray(data["keys"], dtype=np.int64)
+        if keys.size:
+            sketch._grow(int(keys.min()), int(keys.max()))
+            sketch.counts[keys - sketch.offset] = np.asarray(data["counts"], dtype=np.int64)
+        return sketch
+
+
+class PopulationStats:
+    """Quantile sketches keyed by (modality, channel, protocol, metric)."""
+
+    def __init__(self, alpha: float = 0.01):
+        self.alpha = alpha
+        self.sketches: dict[tuple[str, str, str, str], QuantileSketch] = {}
+        self.surgeries: set = set()
+
+    def sketch(self, modality: str, channel, protocol, metric: str) -> QuantileSketch:
+        key = (modality, str(channel), str(protocol), metric)
+        if key not in self.sketches:
+            self.sketches[key] = QuantileSketch(self.alpha)
+        return self.sketches[key]
+
+    def get(self, modality: str, channel, protocol, metric: str) -> QuantileSketch | None:
+        return self.sketches.get((modality, str(channel), str(protocol), metric))
+
+    def band(self, modality: str, channel, protocol, metric: str) -> dict | None:
+        """Return the median, IQR and 5–95th percentile of one sketch."""
+        sketch = self.get(modality, channel, protocol, metric)
+        if sketch is None or sketch.count == 0:
+            return None
+        return {
+            name: sketch.quantile(q)
+            for name, q in (("p5", 0.05), ("p25", 0.25), ("median", 0.5),
+                            ("p75", 0.75), ("p95", 0.95))
+        }
+
+    def add_frame(self, df: pd.DataFrame, modality: str, protocol) -> None:
+        """Add every row of one surgery's modality frame not flagged as an artifact."""
+        df = clean_rows(df)
+        if df.empty:
+            return
+        features = extract_basic_features(df)
+        features["l1"] = calculate_l1_norm(df)["l1"].to_numpy()
+        features["channel"] = df["channel"].astype(str).to_numpy()
+        for channel, rows in features.groupby("channel", sort=False):
+            for metric in METRICS:
+                self.sketch(modality, channel, protocol, metric).add(rows[metric].to_numpy())
+
+    def merge(self, other: PopulationStats) -> None:
+        for key, sketch in other.sketches.items():
+            if key in self.sketches:
+                self.sketches[key].merge(sketch)
+            else:
+                self.sketches[key] = sketch
+        self.surgeries |= other.surgeries
+
+    def to_dict(self) -> dict:
+        return {
+            "alpha": self.alpha,
+            "surgeries": sorted(self.surgeries),
+            "sketches": [
+                {"key": list(key), **sketch.to_dict()}
+                for key, sketch in sorted(self.sketches.items())
+            ],
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> PopulationStats:
+        stats = cls(data.get("alpha", 0.01))
+        stats.surgeries = set(data.get("surgeries", []))
+        for item in data["sketches"]:
+            stats.sketches[tuple(item["key"])] = QuantileSketch.from_dict(item)
+        return stats
+
+    def save(self, path: str) -> None:
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str) -> PopulationStats:
+        with open(path, encoding="utf-8") as f:
+            return cls.from_dict(json.load(f))
+
+
+def default_path() -> str:
+    """Location the viewer reads population statistics from."""
+    return os.path.join(cache_dir("population"), DEFAULT_FILE)
+
+
+def load_default() -> PopulationStats | None:
+    path = default_path()
+    if not os.path.isfile(path):
+        return None
+    try:
+        return PopulationStats.load(path)
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+# -----------------------------------------------------
+# Batch job
+# -----------------------------------------------------
+def surgery_protocols(meta: pd.DataFrame) -> dict[str, str]:
+    """Map surgery ID -> protocol from the surgery metadata."""
+    if meta is None or meta.empty or "protocol" not in meta.columns:
+        return {}
+    ids = meta["surgery_id"] if "surgery_id" in meta.columns else meta.index
+    return {str(k): str(v) for k, v in zip(ids, meta["protocol"])}
+
+
+def _dataset_surgeries(path: str) -> list[str]:
+    """Surgery IDs of a Parquet dataset, read from the surgery_id column only."""
+    ids = set()
+    for key in parquet_store.FRAME_KEYS:
+        file_path = os.path.join(parquet_store.dataset_root(path), f"{key}.parquet")
+        ids.update(parquet_store.read_frame(file_path, ["surgery_id"])["surgery_id"].astype(str))
+    return sorted(ids)
+
+
+def _process_task(task: tuple[str, list[str] | None, float]) -> dict:
+    """Worker: build statistics for one file, or some surgeries of a dataset."""
+    path, surgeries, alpha = task
+    stats = PopulationStats(alpha)
+    frames = data_loader.load_signals(path, columns=COLUMNS, surgeries=surgeries,
+                                      flag_artifacts=True)
+    protocols = surgery_protocols(frames[3])
+    for key, df in zip(parquet_store.FRAME_KEYS, frames[:3]):
+        for sid, rows in df.groupby(df["surgery_id"].astype(str), sort=False):
+            stats.add_frame(rows, MODALITIES[key], protocols.get(sid, "unknown"))
+            stats.surgeries.add(sid)
+    return stats.to_dict()
+
+
+def iter_tasks(paths: Iterable[str], alpha: float = 0.01,
+               surgeries_per_task: int = 1) -> Iterator[tuple]:
+    """Split the archive into tasks that each load a bounded amount of data.
+
+    Pickles cannot be read partially, so each is one task. Parquet datasets
+    are split into groups of ``surgeries_per_task`` surgeries.
+    """
+    for path in paths:
+        if parquet_store.is_parquet_dataset(path):
+            ids = _dataset_surgeries(path)
+            for start in range(0, len(ids), surgeries_per_task):
+                yield path, ids[start:start + surgeries_per_task], alpha
+        elif os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                sub = os.path.join(path, name)
+                if name.endswith(".pkl") or parquet_store.is_parquet_dataset(sub):
+                    yield from iter_tasks([sub], alpha, surgeries_per_task)
+        else:
+            yield path, None, alpha
+
+
+def build_population(paths: Iterable[str], out_path: str | None = None,
+                     workers: int | None = None, alpha: float = 0.01) -> PopulationStats:
+    """Stream the archive and save the merged statistics to ``out_path``.
+
+    ``workers=0`` runs in-process, otherwise a process pool of ``workers``
+    (default: CPU count) is used.
+    """
+    tasks = list(iter_tasks(paths, alpha))
+    stats = PopulationStats(alpha)
+    if workers == 0:
+        results = map(_process_task, tasks)
+        for result in results:
+            stats.merge(PopulationStats.from_dict(result))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for result in pool.map(_process_task, tasks):
+                stats.merge(PopulationStats.from_dict(result))
+    stats.save(out_path or default_path())
+    return stats
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("output", help="JSON file to write (use '-' for the viewer default)")
+    parser.add_argument("paths", nargs="+", help="Pickles, Parquet datasets or directories")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--alpha", type=float, default=0.01)
+    args = parser.parse_args()
+    out = None if args.output == "-" else args.output
+    result = build_population(args.paths, out, args.workers, args.alpha)
+    print(f"{len(result.surgeries)} surgeries, {len(result.sketches)} sketches")
@@ -0,0 +1,191 @@
+"""Low-overhead frame and stage timing.
+
+Code paths are instrumented with :meth:`Profiler.stage` (a context manager)
+or the :func:`profiled` decorator. Timings land in a fixed-size ring buffer
+of preallocated lists (cheaper to assign to than NumPy scalars), so old
+samples are simply overwritten; NumPy is only used when summarising. When
+the profiler is disabled ``stage`` returns a shared no-op context and
+``profiled`` calls straight through after one attribute check.
+
+A *frame* is one redraw triggered by the UI (``MainWindow.update_plots``).
+Stages recorded while or after a frame starts are attributed to it, which
+includes the Qt paint events that follow the update; the frame time is the
+span from the frame start to the end of its last stage.
+
+Set ``CV_PROFILE=1`` to enable the global :data:`PROFILER` at start-up.
+"""
+
+from __future__ import annotations
+
+import functools
+import json
+import os
+import time
+from contextlib import nullcontext
+
+import numpy as np
+
+PROFILE_ENV = "CV_PROFILE"
+DEFAULT_CAPACITY = 8192
+
+_NULL_CONTEXT = nullcontext()
+
+
+class _Stage:
+    __slots__ = ("_code", "_profiler", "_start")
+
+    def __init__(self, profiler: Profiler, code: int):
+        self._profiler = profiler
+        self._code = code
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        end = time.perf_counter()
+        self._profiler._record(self._code, self._start, end - self._start)
+        return False
+
+
+class Profiler:
+    """Ring buffer of (frame, stage, start, duration) records."""
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY, enabled: bool = False):
+        self.enabled = enabled
+        self.capacity = capacity
+        self._codes: dict[str, int] = {}
+        self._names = []
+        self.reset()
+
+    def reset(self) -> None:
+        """Drop all recorded timings."""
+        n = self.capacity
+        self._frame = [0] * n
+        self._stage = [0] * n
+        self._start = [0.0] * n
+        self._duration = [0.0] * n
+        self._count = 0
+        self._frame_id = 0
+        self._frame_starts = {}
+
+    def _code(self, name: str) -> int:
+        code = self._codes.get(name)
+        if code is None:
+            code = self._codes[name] = len(self._names)
+            self._names.append(name)
+        return code
+
+    def _record(self, code: int, start: float, duration: float) -> None:
+        i = self._count % self.capacity
+        self._frame[i] = self._frame_id
+        self._stage[i] = code
+        self._start[i] = start
+        self._duration[i] = duration
+        self._count += 1
+
+    # -----------------------------------------------------
+    # Instrumentation
+    # -----------------------------------------------------
+    def stage(self, name: str):
+        """Context manager timing ``name`` within the current frame."""
+        if not self.enabled:
+            return _NULL_CONTEXT
+        return _Stage(self, self._code(name))
+
+    def frame(self, name: str = "frame"):
+        """Start a new frame and time ``name`` as its first stage."""
+        if not self.enabled:
+            return _NULL_CONTEXT
+        self._frame_id += 1
+        self._frame_starts[self._frame_id] = time.perf_counter()
+        # Keep the start table bounded like the ring buffer
+        self._frame_starts.pop(self._frame_id - self.capacity, None)
+        return _Stage(self, self._code(name))
+
+    # -----------------------------------------------------
+    # Results
+    # -----------------------------------------------------
+    def _records(self):
+        n = min(self._count, self.capacity)
+        order = np.arange(self._count - n, self._count) % self.capacity
+        return (np.array(self._frame, dtype=np.int64)[order],
+                np.array(self._stage, dtype=np.int32)[order],
+                np.array(self._start, dtype=np.float64)[order],
+                np.array(self._duration, dtype=np.float64)[order])
+
+    def frame_times(self) -> np.ndarray:
+        """Return the duration (s) of every frame in the buffer."""
+        frames, _, start, duration = self._records()
+        mask = frames > 0
+        if not mask.any():
+            return np.zeros(0)
+        frames, end = frames[mask], (start + duration)[mask]
+        ids, inverse = np.unique(frames, return_inverse=True)
+        last_end = np.full(ids.size, -np.inf)
+        np.maximum.at(last_end, inverse, end)
+        starts = np.array([self._frame_starts.get(int(f), np.nan) for f in ids])
+        times = last_end - starts
+        if self._count > self.capacity:
+            # The oldest frame may be partly overwritten
+            times = times[1:]
+        return times[np.isfinite(times)]
+
+    def summary(self) -> dict:
+        """Return frame-time percentiles and a per-stage breakdown (ms).
+
+        Stage times are inclusive of nested stages.
+        """
+        frames, stages, _, duration = self._records()
+        times = self.frame_times() * 1000.0
+        result = {
+            "frames": int(times.size),
+            "frame_p50_ms": float(np.percentile(times, 50)) if times.size else None,
+            "frame_p95_ms": float(np.percentile(times, 95)) if times.size else None,
+            "stages": {},
+        }
+        n_frames = max(int(np.unique(frames[frames > 0]).size), 1)
+        for code in np.unique(stages):
+            d = duration[stages == code] * 1000.0
+            result["stages"][self._names[code]] = {
+                "calls": int(d.size),
+                "total_ms": float(d.sum()),
+                "per_frame_ms": float(d.sum() / n_frames),
+                "p50_ms": float(np.percentile(d, 50)),
+                "p95_ms": float(np.percentile(d, 95)),
+            }
+        return result
+
+    def dump_json(self, path: str) -> None:
+        """Write the summary and the raw records to ``path``."""
+        frames, stages, start, duration = self._records()
+        data = {
+            "summary": self.summary(),
+            "records": [
+                {"frame": int(f), "stage": self._names[s], "start": float(t0), "duration": float(d)}
+                for f, s, t0, d in zip(frames, stages, start, duration)
+            ],
+        }
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=1)
+
+
+PROFILER = Profiler(enabled=os.environ.get(PROFILE_ENV, "") not in ("", "0"))
+
+
+def profiled(name: str | None = None):
+    """Decorator timing every call of a function as a stage of :data:`PROFILER`."""
+
+    def decorator(func):
+        stage_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not PROFILER.enabled:
+                return func(*args, **kwargs)
+            with PROFILER.stage(stage_name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
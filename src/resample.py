@@ -0,0 +1,170 @@
+"""Resampling of baselines onto the time base of their traces.
+
+A row's trace and baseline may be sampled at different rates and lengths.
+Every baseline is linearly resampled onto its trace's sample times so the two
+can be overlaid or subtracted sample by sample.
+
+Interpolation kernels depend only on the (source rate, source length,
+target rate, target length) combination and are cached. Many rows share a
+baseline (one per surgery, channel and baseline timestamp), so each
+distinct baseline of a frame is resampled once and reused for every row
+referencing it.
+"""
+
+from __future__ import annotations
+
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from .memory import ACCOUNTANT, PRIORITY_DERIVED, array_buffers, iter_arrays
+from .packed import PackedWaveforms, frame_cache, packed_column
+
+BASELINE_KEY = ["surgery_id", "channel", "baseline_timestamp"]
+
+
+@lru_cache(maxsize=512)
+def resample_kernel(src_rate: float, src_len: int, dst_rate: float, dst_len: int
+                    ) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Return (i0, i1, weight, valid) interpolating a source onto a target grid.
+
+    Target sample ``j`` at ``j / dst_rate`` s is ``src[i0] * (1 - w) +
+    src[i1] * w``; ``valid`` is False past the end of the source. The arrays
+    are cached and read-only.
+    """
+    pos = np.arange(dst_len) * (src_rate / dst_rate)
+    valid = pos <= src_len - 1
+    i0 = np.minimum(pos.astype(np.int64), max(src_len - 1, 0))
+    i1 = np.minimum(i0 + 1, max(src_len - 1, 0))
+    weight = (pos - i0).astype(np.float32)
+    for array in (i0, i1, weight, valid):
+        array.setflags(write=False)
+    return i0, i1, weight, valid
+
+
+def resample_block(block: np.ndarray, kernel) -> np.ndarray:
+    """Resample every row of ``block`` with ``kernel``; NaN where invalid."""
+    i0, i1, weight, valid = kernel
+    out = block[:, i0] * (1 - weight) + block[:, i1] * weight
+    out[:, ~valid] = np.nan
+    return out.astype(np.float32, copy=False)
+
+
+# Aligned baselines of every frame (see frame_cache): row position -> array,
+# plus the distinct resampled baselines keyed by (BASELINE_KEY..., rates, lengths).
+_ALIGNED_CACHE: dict[int, dict] = {}
+
+
+def _frame_cache(df: pd.DataFrame) -> dict:
+    return frame_cache(_ALIGNED_CACHE, df,
+                       lambda: {"rows": {}, "baselines": {}, "differences": {}})
+
+
+def _aligned_buffers() -> dict:
+    out = {}
+    for cache in list(_ALIGNED_CACHE.values()):
+        array_buffers(*iter_arrays(list(cache["baselines"].values())), out=out)
+        array_buffers(*iter_arrays(list(cache["differences"].values())), out=out)
+    return out
+
+
+def release_aligned() -> None:
+    """Empty the aligned baseline and difference caches and the kernel cache."""
+    for cache in list(_ALIGNED_CACHE.values()):
+        for part in cache.values():
+            part.clear()
+    resample_kernel.cache_clear()
+
+
+ACCOUNTANT.register("Aligned baselines", _aligned_buffers, release_aligned,
+                    priority=PRIORITY_DERIVED)
+
+
+def aligned_baselines(df: pd.DataFrame, rows: np.ndarray | None = None) -> list[np.ndarray]:
+    """Return the baseline of each row resampled onto its trace's sample times.
+
+    ``rows`` are positions in ``df`` (default: all). Rows without a usable
+    baseline or rate get an all-NaN array of the trace's length.
+    """
+    rows = np.arange(len(df)) if rows is None else np.asarray(rows, dtype=np.int64)
+    cache = _frame_cache(df)
+    missing = np.array([r for r in rows.tolist() if r not in cache["rows"]], dtype=np.int64)
+    if missing.size:
+        _align(df, missing, cache)
+    return [cache["rows"][r] for r in rows.tolist()]
+
+
+def _align(df: pd.DataFrame, rows: np.ndarray, cache: dict) -> None:
+    lengths = packed_column(df, "values").lengths[rows]
+    subset = df.iloc[rows]
+    keys = pd.DataFrame({
+        **{col: subset[col].astype(str).to_numpy() for col in BASELINE_KEY},
+        "base_rate": pd.to_numeric(subset["baseline_signal_rate"], errors="coerce").to_numpy(float),
+        "base_len": subset["baseline_values"].str.len().fillna(0).to_numpy(dtype=np.int64),
+        "rate": pd.to_numeric(subset["signal_rate"], errors="coerce").to_numpy(float),
+        "len": lengths,
+    })
+    groups = keys.groupby(list(keys.columns), sort=False, dropna=False).indices
+    baselines = cache["baselines"]
+    todo = [key for key in groups if key not in baselines]
+    # Resample the distinct baselines, batched by kernel
+    by_kernel: dict[tuple, list] = {}
+    for key in todo:
+        by_kernel.setdefault(key[-4:], []).append(key)
+    for (base_rate, base_len, rate, n), group in by_kernel.items():
+        usable = base_len > 0 and n > 0 and base_rate > 0 and rate > 0
+        if not usable:
+            for key in group:
+                baselines[key] = np.full(int(n), np.nan, dtype=np.float32)
+            continue
+        first_rows = [rows[groups[key][0]] for key in group]
+        packed = PackedWaveforms.from_sequences(df["baseline_values"].iloc[first_rows].to_numpy())
+        block = packed.padded(length=int(base_len))
+        resampled = resample_block(block, resample_kernel(base_rate, int(base_len), rate, int(n)))
+        for key, array in zip(group, resampled):
+            array.setflags(write=False)
+            baselines[key] = array
+    for key, members in groups.items():
+        for r in rows[members].tolist():
+            cache["rows"][r] = baselines[key]
+
+
+def surgery_differences(df: pd.DataFrame, surgery_id) -> pd.Series:
+    """Return "trace minus aligned baseline" arrays of one surgery's rows.
+
+    The series is indexed by the row labels of ``df`` (so rows of a filtered
+    view of ``df`` can be looked up with ``.loc``) and cached per surgery.
+    """
+    cache = _frame_cache(df)["differences"]
+    sid = str(surgery_id)
+    if sid not in cache:
+        rows = np.flatnonzero(df["surgery_id"].astype(str).to_numpy() == sid)
+        packed = packed_column(df, "values")
+        diffs = np.empty(rows.size, dtype=object)
+        for i, (r, base) in enumerate(zip(rows.tolist(), aligned_baselines(df, rows))):
+            diffs[i] = packed.row(r) - base
+        cache[sid] = pd.Series(diffs, index=df.index[rows], dtype=object)
+    return cache[sid]
+
+
+def difference_energy(df: pd.DataFrame) -> pd.DataFrame:
+    """Return the energy (µV²·s) of trace minus aligned baseline per row.
+
+    Samples where the baseline is shorter than the trace are ignored; rows
+    without a baseline get NaN.
+    """
+    result = df[["timestamp", "channel"]].copy()
+    energy = np.full(len(df), np.nan)
+    if len(df):
+        from .features import iter_batches
+
+        packed = packed_column(df, "values")
+        rates = pd.to_numeric(df["signal_rate"], errors="coerce").to_numpy(dtype=float)
+        for chunk, rate, block in iter_batches(packed, rates):
+            base = np.stack(aligned_baselines(df, chunk))
+            diff = block - base
+            squares = np.nansum(diff * diff, axis=1, dtype=np.float64) / rate
+            energy[chunk] = np.where(np.isnan(diff).all(axis=1), np.nan, squares)
+    result["diff_energy"] = energy
+    return result
@@ -0,0 +1,480 @@
+"""Local HTTP service serving a loaded dataset to lightweight viewers.
+
+The service loads a dataset once (pickle, Parquet dataset or shared store)
+and answers small requests so a reviewer station does not need to hold the
+waveforms itself:
+
+``GET /surgeries``
+    JSON list of the dataset's surgeries with their metadata.
+``GET /catalog?q=...``
+    JSON search results from the surgery catalog (:mod:`src.catalog`).
+``GET /trend?surgery=&modality=&channels=&points=``
+    JSON trend series per channel, min/max decimated to about ``points``.
+``GET /waveforms?surgery=&modality=&timestamp=&channels=&points=``
+    Little-endian float32 samples of every channel back to back. The
+    ``X-Waveform-Layout`` header holds a JSON object with ``channels``,
+    ``offsets`` and per-channel ``signal_rate`` (see
+    :func:`decode_waveforms`).
+``GET /frame.png?surgery=&modality=&timestamp=&channels=&width=&height=``
+    The frame's traces pre-rendered as a PNG.
+``GET /stats``
+    Response cache statistics.
+
+``channels`` is a comma-separated list (default: all). Responses are kept
+in an LRU cache keyed by (endpoint, surgery, modality, timestamp, channels,
+decimation), and requests are handled by a fixed pool of worker threads.
+The server binds to localhost unless told otherwise.
+
+Usage::
+
+    python -m src.service data.pkl [--port 8765] [--workers 8]
+    python -m src.service data.pkl --load-test 2000 --concurrency 16
+"""
+
+from __future__ import annotations
+
+import io
+import json
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import pandas as pd
+
+from . import data_loader
+from .catalog import Catalog, meta_records
+from .packed import packed_column
+from .trends import TrendStore
+
+MODALITIES = ("MEP", "SSEP_UPPER", "SSEP_LOWER")
+DEFAULT_PORT = 8765
+DEFAULT_CACHE_SIZE = 512
+
+
+class ServiceError(Exception):
+    """Request error mapped to an HTTP status code."""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class LRUCache:
+    """Thread-safe least-recently-used mapping with hit/miss counters."""
+
+    def __init__(self, maxsize: int = DEFAULT_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict[tuple, object] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value) -> None:
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def stats(self) -> dict:
+        return {"size": len(self), "maxsize": self.maxsize, "hits": self.hits, "misses": self.misses}
+
+
+def decimate_minmax(x: np.ndarray, y: np.ndarray, points: int) -> tuple[np.ndarray, np.ndarray]:
+    """Reduce (x, y) to at most ``points`` samples keeping each bin's extremes.
+
+    The samples are split into ``points // 2`` equal bins and the minimum and
+    maximum of every bin are kept in their original order, so dips and
+    spikes survive any decimation.
+    """
+    n = len(y)
+    if points <= 0 or n <= points:
+        return x, y
+    n_bins = max(points // 2, 1)
+    step = -(-n // n_bins)
+    padded = np.full(n_bins * step, np.nan)
+    padded[:n] = y
+    blocks = padded.reshape(n_bins, step)
+    valid = ~np.isnan(blocks).all(axis=1)
+    base = np.arange(n_bins)[valid] * step
+    with np.errstate(invalid="ignore"):
+        lo = base + np.nanargmin(blocks[valid], axis=1)
+        hi = base + np.nanargmax(blocks[valid], axis=1)
+    keep = np.unique(np.concatenate([lo, hi]))
+    return x[keep], y[keep]
+
+
+def decode_waveforms(layout: str, body: bytes) -> dict[str, np.ndarray]:
+    """Split a ``/waveforms`` response into per-channel sample arrays."""
+    info = json.loads(layout)
+    data = np.frombuffer(body, dtype="<f4")
+    offsets = info["offsets"]
+    return {ch: data[offsets[i]:offsets[i + 1]] for i, ch in enumerate(info["channels"])}
+
+
+class DataService:
+    """Answers service requests from frames loaded once into memory."""
+
+    def __init__(self, frames, cache_size: int = DEFAULT_CACHE_SIZE,
+                 catalog: Catalog | None = None, trend_store: TrendStore | None = None):
+        self.frames = dict(zip(MODALITIES, frames[:3]))
+        self.meta = frames[3] if len(frames) > 3 else None
+        self.cache = LRUCache(cache_size)
+        self.catalog = catalog
+        self._catalog_lock = threading.Lock()
+        self.trends = trend_store if trend_store is not None else TrendStore()
+        # (modality) -> {(surgery, timestamp): row positions}
+        self._frame_rows: dict[str, dict[tuple, np.ndarray]] = {}
+        for modality, df in self.frames.items():
+            if df is None or df.empty:
+                continue
+            self.trends.update(df, modality, meta=self.meta)
+            keys = [df["surgery_id"].astype(str), pd.to_numeric(df["timestamp"], errors="coerce")]
+            self._frame_rows[modality] = df.groupby(keys, sort=False).indices
+            # Build the packed store before requests arrive on several threads
+            packed_column(df, "values")
+
+    # -----------------------------------------------------
+    # Endpoints
+    # -----------------------------------------------------
+    def surgeries(self) -> list[dict]:
+        records = meta_records(self.meta)
+        ids = set(records)
+        for df in self.frames.values():
+            if df is not None:
+                ids.update(df["surgery_id"].astype(str).unique())
+        return [
+            {"surgery_id": sid, **{k: _jsonable(v) for k, v in records.get(sid, {}).items()}}
+            for sid in sorted(ids)
+        ]
+
+    def search_catalog(self, query: str) -> list[dict]:
+        if self.catalog is None:
+            raise ServiceError(404, "No catalog configured")
+        # sqlite3 connections must not be used from several threads at once
+        with self._catalog_lock:
+            return [dict(row) for row in self.catalog.search(query)]
+
+    def trend(self, surgery: str, modality: str, channels: list[str] | None,
+              points: int) -> dict:
+        series = self.trends.series(surgery, modality)
+        if series is None:
+            raise ServiceError(404, f"No trend for surgery {surgery} ({modality})")
+        ts = series["timestamp"].to_numpy()
+        values = series["l1"].to_numpy(dtype=float)
+        names = series["channel"].to_numpy()
+        result = {}
+        for channel in channels or sorted(np.unique(names)):
+            mask = names == channel
+            x, y = decimate_minmax(ts[mask], values[mask], points)
+            result[channel] = {"timestamp": x.tolist(), "value": _finite_list(y)}
+        return {"surgery": surgery, "modality": modality, "metric": "l1", "channels": result}
+
+    def _frame(self, surgery: str, modality: str, timestamp: float,
+               channels: list[str] | None) -> tuple[list[str], list[np.ndarray], list[float]]:
+        """Return (channels, samples, rates) of one frame, sorted by channel."""
+        rows = self._frame_rows.get(modality, {}).get((surgery, timestamp))
+        if rows is None:
+            raise ServiceError(404, f"No {modality} frame at {timestamp} for surgery {surgery}")
+        df = self.frames[modality]
+        names = df["channel"].to_numpy()[rows].astype(str)
+        order = np.argsort(names, kind="stable")
+        if channels:
+            wanted = set(channels)
+            order = np.array([i for i in order if names[i] in wanted], dtype=np.int64)
+        packed = packed_column(df, "values")
+        rates = pd.to_numeric(df["signal_rate"], errors="coerce").to_numpy(dtype=float)
+        return (
+            [names[i] for i in order],
+            [packed.row(rows[i]) for i in order],
+            [float(rates[rows[i]]) for i in order],
+        )
+
+    def waveforms(self, surgery: str, modality: str, timestamp: float,
+                  channels: list[str] | None, points: int) -> tuple[dict, bytes]:
+        names, samples, rates = self._frame(surgery, modality, timestamp, channels)
+        out_rates = []
+        for i, trace in enumerate(samples):
+            step = -(-len(trace) // points) if points > 0 and len(trace) > points else 1
+            samples[i] = trace[::step]
+            out_rates.append(rates[i] / step)
+        offsets = np.zeros(len(samples) + 1, dtype=np.int64)
+        np.cumsum([len(s) for s in samples], out=offsets[1:])
+        body = (np.concatenate(samples) if samples else np.zeros(0)).astype("<f4").tobytes()
+        layout = {"channels": names, "offsets": offsets.tolist(), "signal_rate": out_rates,
+                  "timestamp": timestamp}
+        return layout, body
+
+    def frame_png(self, surgery: str, modality: str, timestamp: float,
+                  channels: list[str] | None, width: int, height: int) -> bytes:
+        # The object-oriented Agg API keeps rendering thread-safe (no pyplot)
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.figure import Figure
+
+        names, samples, rates = self._frame(surgery, modality, timestamp, channels)
+        dpi = 100
+        fig = Figure(figsize=(width / dpi, height / dpi), dpi=dpi)
+        FigureCanvasAgg(fig)
+        # One axes with the traces stacked top to bottom, each scaled to its
+        # own peak; far cheaper to draw than one subplot per channel
+        ax = fig.add_axes((0.25, 0.1, 0.72, 0.82))
+        for row, (trace, rate) in enumerate(zip(samples, rates)):
+            t = np.arange(len(trace)) / rate * 1000.0 if rate > 0 else np.arange(len(trace))
+            peak = float(np.nanmax(np.abs(trace))) if len(trace) else 0.0
+            scale = 0.45 / peak if peak > 0 else 0.0
+            ax.plot(t, -row + trace * scale, linewidth=0.8, color="#1f77b4")
+        ax.set_yticks(-np.arange(len(names)), names, fontsize=7)
+        ax.set_ylim(-len(names) + 0.5, 0.5)
+        ax.tick_params(axis="x", labelsize=6)
+        ax.set_xlabel("ms", fontsize=7)
+        ax.set_title(f"{surgery} {modality} @ {timestamp:g}", fontsize=8)
+        buffer = io.BytesIO()
+        fig.savefig(buffer, format="png")
+        return buffer.getvalue()
+
+    # -----------------------------------------------------
+    # Routing
+    # -----------------------------------------------------
+    def handle(self, path: str, query: dict[str, list[str]]) -> tuple[int, str, dict, bytes]:
+        """Return (status, content type, extra headers, body) for a GET request."""
+        try:
+            return self._dispatch(path, query)
+        except ServiceError as exc:
+            return exc.status, "application/json", {}, _json_bytes({"error": str(exc)})
+        except (KeyError, ValueError) as exc:
+            return 400, "application/json", {}, _json_bytes({"error": str(exc)})
+
+    def _dispatch(self, path, query):
+        if path == "/stats":
+            return 200, "application/json", {}, _json_bytes(self.cache.stats())
+        if path not in ("/surgeries", "/catalog", "/trend", "/waveforms", "/frame.png"):
+            raise ServiceError(404, f"Unknown endpoint {path}")
+
+        def param(name, default=None):
+            values = query.get(name)
+            if not values or values[0] == "":
+                if default is None:
+                    raise ServiceError(400, f"Missing parameter '{name}'")
+                return default
+            return values[0]
+
+        if path == "/surgeries":
+            key = (path,)
+        elif path == "/catalog":
+            key = (path, param("q", ""))
+        else:
+            surgery, modality = param("surgery"), param("modality", "MEP").upper()
+            if modality not in MODALITIES:
+                raise ServiceError(400, f"Unknown modality {modality}")
+            channels = [c for c in param("channels", "").split(",") if c] or None
+            points = int(param("points", "0"))
+            timestamp = float(param("timestamp")) if path != "/trend" else None
+            key = (path, surgery, modality, timestamp, tuple(channels or ()), points)
+            if path == "/frame.png":
+                key += (int(param("width", "800")), int(param("height", "600")))
+
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+        if path == "/surgeries":
+            response = 200, "application/json", {}, _json_bytes(self.surgeries())
+        elif path == "/catalog":
+            response = 200, "application/json", {}, _json_bytes(self.search_catalog(key[1]))
+        elif path == "/trend":
+            response = (200, "application/json", {},
+                        _json_bytes(self.trend(surgery, modality, channels, points)))
+        elif path == "/waveforms":
+            layout, body = self.waveforms(surgery, modality, timestamp, channels, points)
+            response = (200, "application/octet-stream",
+                        {"X-Waveform-Layout": json.dumps(layout)}, body)
+        else:
+            width, height = key[-2:]
+            if not (16 <= width <= 4096 and 16 <= height <= 4096):
+                raise ServiceError(400, "Image size must be between 16 and 4096 pixels")
+            response = (200, "image/png", {},
+                        self.frame_png(surgery, modality, timestamp, channels, width, height))
+        self.cache.put(key, response)
+        return response
+
+
+def _jsonable(value):
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and not np.isfinite(value):
+        return None
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    return str(value)
+
+
+def _finite_list(values: np.ndarray) -> list:
+    return [float(v) if np.isfinite(v) else None for v in values]
+
+
+def _json_bytes(data) -> bytes:
+    return json.dumps(data).encode("utf-8")
+
+
+# -----------------------------------------------------
+# HTTP server
+# -----------------------------------------------------
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        status, content_type, headers, body = self.server.service.handle(
+            url.path, parse_qs(url.query)
+        )
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Requests are not logged; the cache statistics cover usage
+        pass
+
+
+class ServiceServer(HTTPServer):
+    """HTTP server handing each connection to a fixed pool of threads."""
+
+    daemon_threads = True
+
+    def __init__(self, service: DataService, host: str = "127.0.0.1",
+                 port: int = DEFAULT_PORT, workers: int = 8):
+        self.service = service
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="service")
+        super().__init__((host, port), _Handler)
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def process_request(self, request, client_address):
+        self._pool.submit(self._process, request, client_address)
+
+    def _process(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:  # noqa: BLE001 - reported like socketserver does
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self._pool.shutdown(wait=True)
+
+
+def start_in_thread(server: ServiceServer) -> threading.Thread:
+    """Run ``server.serve_forever`` on a daemon thread and return the thread."""
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return thread
+
+
+def load_test(base_url: str, paths: list[str], requests: int = 1000,
+              concurrency: int = 16) -> dict:
+    """Fire ``requests`` GETs over ``paths`` with ``concurrency`` clients.
+
+    Returns throughput and latency percentiles (ms); any non-200 response
+    is counted as an error.
+    """
+    from urllib.error import HTTPError
+    from urllib.request import urlopen
+
+    def fetch(i):
+        start = time.perf_counter()
+        try:
+            with urlopen(base_url + paths[i % len(paths)], timeout=30) as response:
+                response.read()
+                ok = response.status == 200
+        except HTTPError:
+            ok = False
+        return time.perf_counter() - start, ok
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(fetch, range(requests)))
+    elapsed = time.perf_counter() - start
+    latencies = np.array([r[0] for r in results]) * 1000.0
+    return {
+        "requests": requests,
+        "errors": sum(not r[1] for r in results),
+        "requests_per_s": requests / elapsed if elapsed > 0 else float("inf"),
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+    }
+
+
+def sample_paths(service: DataService, frames_per_surgery: int = 20) -> list[str]:
+    """Return a mix of request paths covering every endpoint of ``service``."""
+    paths = ["/surgeries"]
+    for modality, rows in service._frame_rows.items():
+        keys = list(rows)[:frames_per_surgery]
+        for sid in sorted({k[0] for k in keys}):
+            paths.append(f"/trend?surgery={sid}&modality={modality}&points=200")
+        for sid, ts in keys:
+            base = f"?surgery={sid}&modality={modality}&timestamp={float(ts)!r}"
+            paths.append(f"/waveforms{base}")
+            paths.append(f"/waveforms{base}&points=256")
+            paths.append(f"/frame.png{base}&width=400&height=300")
+    return paths
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("path", help="Pickle, Parquet dataset or shared store")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--cache-size", type=int, default=DEFAULT_CACHE_SIZE)
+    parser.add_argument("--catalog", default=None, help="Catalog file to serve at /catalog")
+    parser.add_argument("--load-test", type=int, metavar="N", help="Run N requests and exit")
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+
+    frames = data_loader.load_signals(args.path, columns=data_loader.DISPLAY_COLUMNS,
+                                      flatten_stimulus=True, flag_artifacts=True)
+    catalog = Catalog(args.catalog) if args.catalog else None
+    service = DataService(frames, args.cache_size, catalog, TrendStore(dataset=args.path))
+    port = 0 if args.load_test else args.port
+    server = ServiceServer(service, args.host, port, args.workers)
+    if args.load_test:
+        start_in_thread(server)
+        print(json.dumps(load_test(server.url, sample_paths(service), args.load_test,
+                                   args.concurrency), indent=2))
+        print(json.dumps(service.cache.stats()))
+        server.shutdown()
+        server.server_close()
+    else:
+        print(f"Serving {args.path} on {server.url}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
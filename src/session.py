@@ -0,0 +1,175 @@
+"""Session snapshots for reopening the viewer where it was left.
+
+A snapshot is a small JSON file with the data source, the view state
+(surgery, tab, modality, channel order and checks, timestamp, filters) and
+the path of a *warm store*: the frames exactly as the viewer held them
+(stimulus flattened, malformed rows quarantined) written as a shared store
+(:mod:`src.shared_store`). Restoring attaches the warm store, whose
+waveforms are memory-mapped and whose packed stores are registered, so the
+pickle is not read, flattened or checked again. Trend series come from the
+persistent :class:`src.trends.TrendStore` cache as usual.
+
+A warm store can take as much disk space as the loaded frames, so the
+viewer only writes one if ``CV_WARM_STORE=1`` is set; otherwise the
+snapshot restores the view state over a fresh load of the source. A warm
+store is written once per source file version; saving a snapshot again
+only rewrites the JSON. Warm stores of other sources are removed, so at
+most one is kept on disk. A snapshot whose source has changed since is
+restored from the source instead.
+
+Usage::
+
+    python -m src.session             # show the last session
+    python -m src.session --clear     # forget it and remove its warm store
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import shutil
+from collections.abc import Iterable
+
+from . import data_loader, shared_store
+from .cache import cache_dir
+from .catalog import file_stat
+
+SESSION_FILE = "session.json"
+VERSION = 1
+WARM_STORE_ENV = "CV_WARM_STORE"
+
+
+def warm_store_enabled() -> bool:
+    """Return whether ``CV_WARM_STORE`` asks the viewer to write warm stores."""
+    return os.environ.get(WARM_STORE_ENV, "").strip().lower() in ("1", "true", "yes", "on")
+
+
+def session_path() -> str:
+    return os.path.join(cache_dir("sessions"), SESSION_FILE)
+
+
+def source_key(path: str, surgeries: Iterable | None = None) -> str:
+    """Return an identity of ``path``'s current contents and the selected surgeries."""
+    path = os.path.abspath(path)
+    mtime, size = file_stat(path)
+    text = json.dumps([path, mtime, size, sorted(map(str, surgeries)) if surgeries else None])
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+
+
+def warm_store_path(key: str) -> str:
+    return os.path.join(cache_dir("sessions"), f"warm-{key}")
+
+
+def _prune_warm_stores(keep: str) -> None:
+    root = cache_dir("sessions")
+    for name in os.listdir(root):
+        path = os.path.join(root, name)
+        if name.startswith("warm-") and path != keep and os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def save_session(source: str, frames, state: dict, surgeries: Iterable | None = None,
+                 path: str | None = None, warm_store: bool = True) -> str:
+    """Write a snapshot of ``state`` for ``frames`` loaded from ``source``.
+
+    ``frames`` are the ``(mep, ssep_upper, ssep_lower, meta)`` frames as
+    shown; with ``warm_store`` they are written as the warm store unless it
+    already exists, otherwise any warm store is removed. Returns the
+    snapshot path.
+    """
+    path = path or session_path()
+    surgeries = sorted(map(str, surgeries)) if surgeries else None
+    key = source_key(source, surgeries)
+    if not warm_store:
+        warm = None
+        _prune_warm_stores(keep="")
+    elif shared_store.is_shared_store(source):
+        # Already memory-mapped: attaching the source is as fast as a copy
+        warm = None
+    else:
+        warm = warm_store_path(key)
+        if not shared_store.is_shared_store(warm):
+            shared_store.export_frames(frames, warm)
+        _prune_warm_stores(keep=warm)
+    snapshot = {
+        "version": VERSION,
+        "source": os.path.abspath(source),
+        "surgeries": surgeries,
+        "key": key,
+        "warm_store": warm,
+        "state": state,
+    }
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(snapshot, f, indent=1)
+    os.replace(tmp, path)
+    return path
+
+
+def load_session(path: str | None = None) -> dict | None:
+    """Return the snapshot at ``path``, or None if there is none to restore.
+
+    ``warm_store`` is set to None if the source changed after the snapshot
+    was taken or the warm store is missing.
+    """
+    path = path or session_path()
+    try:
+        with open(path, encoding="utf-8") as f:
+            snapshot = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if snapshot.get("version") != VERSION or not os.path.exists(snapshot.get("source", "")):
+        return None
+    warm = snapshot.get("warm_store")
+    if warm and (source_key(snapshot["source"], snapshot["surgeries"]) != snapshot["key"]
+                 or not shared_store.is_shared_store(warm)):
+        snapshot["warm_store"] = None
+    return snapshot
+
+
+def open_session(snapshot: dict, reports: dict | None = None):
+    """Return the ``(mep, ssep_upper, ssep_lower, meta)`` frames of a snapshot.
+
+    The warm store is attached if it is valid; otherwise the source is
+    loaded like the launch dialog does (``reports`` then receives the
+    integrity reports).
+    """
+    if snapshot.get("warm_store"):
+        return data_loader.load_signals(snapshot["warm_store"], check_integrity=False)
+    return data_loader.load_signals(
+        snapshot["source"],
+        columns=data_loader.DISPLAY_COLUMNS,
+        surgeries=snapshot.get("surgeries"),
+        flatten_stimulus=True,
+        reports=reports,
+        flag_artifacts=True,
+    )
+
+
+def clear_session(path: str | None = None) -> None:
+    """Remove the snapshot at ``path`` and every warm store."""
+    path = path or session_path()
+    if os.path.isfile(path):
+        os.remove(path)
+    _prune_warm_stores(keep="")
+
+
+if __name__ == "__main__":
+    import sys
+
+    if sys.argv[1:] == ["--clear"]:
+        clear_session()
+        print("Session cleared")
+        sys.exit(0)
+    if sys.argv[1:]:
+        print("Usage: python -m src.session [--clear]")
+        sys.exit(1)
+    snapshot = load_session()
+    if snapshot is None:
+        print("No session to restore")
+        sys.exit(0)
+    print(f"Source:     {snapshot['source']}")
+    print(f"Warm store: {snapshot['warm_store'] or '(none, reloads the source)'}")
+    for name, value in snapshot["state"].items():
+        print(f"{name + ':':<18} {value}")
@@ -0,0 +1,169 @@
+"""Memory-mapped dataset that several processes can attach to without copies.
+
+A shared store is a directory holding the packed waveform columns
+(``values`` and ``baseline_values``) as raw ``.npy`` arrays plus the small
+remaining columns as pickles. Attaching maps the waveform arrays read-only,
+so every process that opens the store — several viewer windows, or the
+workers of a process pool given the store path instead of the frames —
+reads the same pages of the OS page cache and memory use stays flat.
+
+Rows are stored grouped by surgery, so attaching a single surgery is a
+slice of the mapped arrays and stays zero-copy as well.
+
+Usage::
+
+    python -m src.shared_store data.pkl shared_dir
+"""
+
+from __future__ import annotations
+
+import json
+import os
+from collections.abc import Iterable
+
+import numpy as np
+import pandas as pd
+
+from .packed import PackedWaveforms, register_packed
+from .parquet_store import FRAME_KEYS
+
+MANIFEST = "shared.json"
+META_FILE = "surgerydata.pkl"
+PACKED_COLUMNS = ("values", "baseline_values")
+VERSION = 1
+
+
+def store_root(path: str) -> str:
+    """Return the store directory for ``path`` (the directory or its manifest)."""
+    if os.path.basename(path) == MANIFEST:
+        return os.path.dirname(path) or "."
+    return path
+
+
+def is_shared_store(path: str) -> bool:
+    return os.path.isfile(os.path.join(store_root(path), MANIFEST))
+
+
+def _array_path(root: str, name: str, column: str, part: str) -> str:
+    return os.path.join(root, f"{name}.{column}.{part}.npy")
+
+
+def export_frames(frames: tuple[pd.DataFrame, ...], path: str) -> str:
+    """Write ``(mep, ssep_upper, ssep_lower, meta)`` frames as a shared store.
+
+    The manifest is written last, so a store is never attached half written.
+    Returns the store directory.
+    """
+    os.makedirs(path, exist_ok=True)
+    manifest = {"version": VERSION, "frames": {}}
+    for name, df in zip(FRAME_KEYS, frames[:3]):
+        ids = df["surgery_id"].astype(str).to_numpy()
+        order = np.argsort(ids, kind="stable")
+        df, ids = df.iloc[order].reset_index(drop=True), ids[order]
+        starts = np.flatnonzero(np.r_[True, ids[1:] != ids[:-1]]) if len(ids) else []
+        stops = np.r_[starts[1:], len(ids)] if len(ids) else []
+        packed_columns = [c for c in PACKED_COLUMNS if c in df.columns]
+        for column in packed_columns:
+            packed = PackedWaveforms.from_sequences(df[column].to_numpy(dtype=object))
+            np.save(_array_path(path, name, column, "data"), packed.data)
+            np.save(_array_path(path, name, column, "offsets"), packed.offsets)
+        df.drop(columns=packed_columns).to_pickle(os.path.join(path, f"{name}.pkl"))
+        manifest["frames"][name] = {
+            "rows": len(df),
+            "columns": list(df.columns),
+            "packed": packed_columns,
+            "surgeries": {ids[s]: [int(s), int(e)] for s, e in zip(starts, stops)},
+        }
+    frames[3].to_pickle(os.path.join(path, META_FILE))
+    tmp = os.path.join(path, MANIFEST + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    os.replace(tmp, os.path.join(path, MANIFEST))
+    return path
+
+
+def _row_ranges(info: dict, surgeries: Iterable | None) -> list[tuple[int, int]] | None:
+    """Return the sorted (start, stop) row ranges of ``surgeries``, or None for all."""
+    if surgeries is None:
+        return None
+    ranges = info["surgeries"]
+    return sorted(tuple(ranges[s]) for s in {str(s) for s in surgeries} if s in ranges)
+
+
+def _attach_column(root: str, name: str, column: str,
+                   ranges: list[tuple[int, int]] | None) -> PackedWaveforms:
+    data = np.load(_array_path(root, name, column, "data"), mmap_mode="r")
+    offsets = np.load(_array_path(root, name, column, "offsets"))
+    # Plain ndarray views of the mapping; they keep the mapping alive
+    data = data.view(np.ndarray)
+    if ranges is None:
+        return PackedWaveforms(data, offsets)
+    if len(ranges) == 1:
+        (start, stop), = ranges
+        window = offsets[start:stop + 1]
+        return PackedWaveforms(data[window[0]:window[-1]], window - window[0])
+    # Several surgeries are not contiguous; gather them into one copy
+    rows = np.concatenate([np.arange(s, e) for s, e in ranges]) if ranges else []
+    return PackedWaveforms(data, offsets).take(rows)
+
+
+def _row_views(packed: PackedWaveforms) -> np.ndarray:
+    """Return an object array whose elements are views of ``packed.data``."""
+    data, offsets = packed.data, packed.offsets
+    return np.fromiter(
+        (data[a:b] for a, b in zip(offsets[:-1].tolist(), offsets[1:].tolist())),
+        dtype=object,
+        count=len(packed),
+    )
+
+
+def attach(path: str, columns: Iterable[str] | None = None,
+           surgeries: Iterable | None = None) -> tuple[pd.DataFrame, ...]:
+    """Attach to a shared store and return ``(mep, ssep_upper, ssep_lower, meta)``.
+
+    Waveform cells are read-only views of the mapped arrays and the packed
+    stores are registered with :func:`src.packed.register_packed`, so later
+    stages never rebuild them. Selecting more than one surgery copies their
+    waveforms into private memory.
+    """
+    root = store_root(path)
+    with open(os.path.join(root, MANIFEST), encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("version") != VERSION:
+        raise KeyError(f"Unsupported shared store version: {manifest.get('version')}")
+    columns = list(columns) if columns is not None else None
+    frames = []
+    for name in FRAME_KEYS:
+        info = manifest["frames"][name]
+        wanted = columns if columns is not None else info["columns"]
+        unknown = set(wanted) - set(info["columns"])
+        if unknown:
+            raise KeyError(f"DataFrame '{name}' has no columns: {', '.join(sorted(unknown))}")
+        df = pd.read_pickle(os.path.join(root, f"{name}.pkl"))
+        ranges = _row_ranges(info, surgeries)
+        if ranges is not None:
+            rows = np.concatenate([np.arange(s, e) for s, e in ranges]) if ranges else []
+            df = df.iloc[rows].reset_index(drop=True)
+        stores: dict[str, PackedWaveforms] = {}
+        for column in info["packed"]:
+            if column in wanted:
+                stores[column] = _attach_column(root, name, column, ranges)
+                df[column] = _row_views(stores[column])
+        df = df[wanted]
+        for column, packed in stores.items():
+            register_packed(df, column, packed)
+        frames.append(df)
+    meta = pd.read_pickle(os.path.join(root, META_FILE))
+    return tuple(frames) + (meta,)
+
+
+if __name__ == "__main__":
+    import sys
+
+    from .data_loader import DISPLAY_COLUMNS, load_signals
+
+    if len(sys.argv) != 3:
+        print("Usage: python -m src.shared_store <input.pkl|parquet_dir> <output_dir>")
+        sys.exit(1)
+    frames = load_signals(sys.argv[1], columns=DISPLAY_COLUMNS, flatten_stimulus=True)
+    print(f"Shared store written to {export_frames(frames, sys.argv[2])}")
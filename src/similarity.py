@@ -0,0 +1,235 @@
+"""Waveform similarity of every trace to its baseline.
+
+The similarity of a row is the maximum of the normalized cross-correlation
+between its trace and its baseline (resampled onto the trace's time base,
+see :mod:`src.resample`) over lags of up to :data:`MAX_LAG_MS`, and the lag
+at which that maximum occurs. 1 means the trace is a scaled, possibly
+shifted copy of the baseline, whatever its energy.
+
+Correlations are computed with FFTs on batches of rows of equal length and
+signal rate. Many rows share a baseline, so the spectrum of each distinct
+baseline is computed once per frame and reused by every row referencing it.
+
+Usage::
+
+    python -m src.similarity data.pkl [--workers N]   # report throughput
+"""
+
+from __future__ import annotations
+
+import os
+import time
+from collections.abc import Iterable
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from .features import iter_batches
+from .memory import ACCOUNTANT, PRIORITY_DERIVED, array_buffers, iter_arrays
+from .packed import frame_cache, packed_column
+from .profiler import profiled
+from .resample import aligned_baselines
+
+SIMILARITY_COLUMNS = ["similarity", "similarity_lag"]
+
+# Largest shift (ms) between trace and baseline considered a match
+MAX_LAG_MS = 10.0
+
+# Upper bound on samples per FFT block; the complex spectra of a block take
+# about four times its size in float64.
+FFT_SAMPLES = 1_000_000
+
+
+def _fft_size(n: int) -> int:
+    """Return the smallest power of two holding a linear correlation of ``n`` samples."""
+    return 1 << max(2 * n - 2, 1).bit_length()
+
+
+def _baseline_spectrum(base: np.ndarray, nfft: int):
+    """Return (conjugate spectrum, norm) of a mean-removed baseline.
+
+    Samples past the end of the baseline (NaN) are treated as zero.
+    """
+    finite = np.isfinite(base)
+    if not finite.any():
+        return None, 0.0
+    centred = np.where(finite, base - base[finite].mean(), 0.0)
+    return np.conj(np.fft.rfft(centred, nfft)), float(np.sqrt(np.dot(centred, centred)))
+
+
+def _block_similarity(block: np.ndarray, bases: list, rate: float, spectra: dict):
+    """Return (similarity, lag in ms) of every row of an equal-rate block.
+
+    ``spectra`` caches baseline spectra by ``(id(base), nfft)``; entries keep
+    a reference to their baseline so the id stays unique.
+    """
+    n_rows, n = block.shape
+    nfft = _fft_size(n)
+    max_lag = min(n - 1, int(MAX_LAG_MS * rate / 1000.0))
+    # Correlation index of lags -max_lag..max_lag in the circular result
+    lag_index = np.r_[nfft - max_lag:nfft, 0:max_lag + 1]
+
+    keys = [(id(base), nfft) for base in bases]
+    for key, base in zip(keys, bases):
+        if key not in spectra:
+            spectra[key] = (base, *_baseline_spectrum(base, nfft))
+    codes = {}
+    inverse = np.array([codes.setdefault(k, len(codes)) for k in keys], dtype=np.int64)
+    distinct = list(codes)
+    empty = np.zeros(nfft // 2 + 1, dtype=complex)
+    base_spectra = np.stack([empty if spectra[k][1] is None else spectra[k][1] for k in distinct])
+    base_norms = np.array([spectra[k][2] for k in distinct])[inverse]
+
+    x = block.astype(np.float64)
+    x -= x.mean(axis=1, keepdims=True)
+    norms = np.sqrt(np.einsum("ij,ij->i", x, x)) * base_norms
+    spectrum = np.fft.rfft(x, nfft, axis=1)
+    spectrum *= base_spectra[inverse]
+    corr = np.fft.irfft(spectrum, nfft, axis=1)[:, lag_index]
+    best = corr.argmax(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        similarity = np.where(norms > 0, corr[np.arange(n_rows), best] / norms, np.nan)
+    lag = np.where(norms > 0, (best - max_lag) * 1000.0 / rate, np.nan)
+    return similarity, lag
+
+
+def compute_similarity(df: pd.DataFrame, rows: np.ndarray | None = None,
+                       spectra: dict | None = None) -> dict[str, np.ndarray]:
+    """Return :data:`SIMILARITY_COLUMNS` arrays for ``rows`` (default: all rows).
+
+    Rows that are empty, have an invalid rate or no usable baseline get NaN.
+    ``spectra`` is a baseline spectrum cache shared between calls.
+    """
+    rows = np.arange(len(df)) if rows is None else np.asarray(rows, dtype=np.int64)
+    spectra = {} if spectra is None else spectra
+    position = np.full(len(df), -1, dtype=np.int64)
+    position[rows] = np.arange(rows.size)
+    out = {col: np.full(rows.size, np.nan) for col in SIMILARITY_COLUMNS}
+    if not rows.size:
+        return out
+    packed = packed_column(df, "values")
+    rates = pd.to_numeric(df["signal_rate"], errors="coerce").to_numpy(dtype=float)
+    for chunk, rate, block in iter_batches(packed, rates, rows):
+        step = max(1, FFT_SAMPLES // block.shape[1])
+        bases = aligned_baselines(df, chunk)
+        for start in range(0, chunk.size, step):
+            stop = start + step
+            similarity, lag = _block_similarity(block[start:stop], bases[start:stop], rate, spectra)
+            target = position[chunk[start:stop]]
+            out["similarity"][target] = similarity
+            out["similarity_lag"][target] = lag
+    return out
+
+
+# Per frame (see frame_cache): the baseline spectra and the similarity frame
+# once computed
+_SIMILARITY_CACHE: dict[int, dict] = {}
+
+
+def _frame_cache(df: pd.DataFrame) -> dict:
+    return frame_cache(_SIMILARITY_CACHE, df, lambda: {"spectra": {}, "values": None})
+
+
+@profiled()
+def frame_similarity(df: pd.DataFrame) -> pd.DataFrame:
+    """Return the cached :data:`SIMILARITY_COLUMNS` of every row, aligned to ``df.index``."""
+    cache = _frame_cache(df)
+    if cache["values"] is None:
+        cache["values"] = pd.DataFrame(compute_similarity(df, spectra=cache["spectra"]),
+                                       index=df.index)
+    return cache["values"]
+
+
+def _similarity_buffers() -> dict:
+    out = {}
+    for cache in list(_SIMILARITY_CACHE.values()):
+        for _, spectrum, _ in list(cache["spectra"].values()):
+            array_buffers(spectrum, out=out)
+        if cache["values"] is not None:
+            array_buffers(*iter_arrays(cache["values"]), out=out)
+    return out
+
+
+def release_similarity() -> None:
+    """Empty the similarity cache; values are recomputed on the next lookup."""
+    for cache in list(_SIMILARITY_CACHE.values()):
+        cache["spectra"].clear()
+        cache["values"] = None
+
+
+ACCOUNTANT.register("Baseline similarity", _similarity_buffers, release_similarity,
+                    priority=PRIORITY_DERIVED)
+
+
+# -----------------------------------------------------
+# Worker pool
+# -----------------------------------------------------
+COLUMNS = ["surgery_id", "timestamp", "channel", "values", "signal_rate",
+           "baseline_timestamp", "baseline_values", "baseline_signal_rate"]
+
+
+def _process_task(task) -> list:
+    """Worker: return (timestamp, channel, similarity, lag) frames of some surgeries."""
+    from .data_loader import load_signals
+
+    path, surgeries = task
+    frames = load_signals(path, columns=COLUMNS, surgeries=surgeries, check_integrity=False)
+    results = []
+    for df in frames[:3]:
+        result = df[["surgery_id", "timestamp", "channel"]].copy()
+        for col, values in compute_similarity(df).items():
+            result[col] = values
+        results.append(result.reset_index(drop=True))
+    return results
+
+
+def similarity_path(path: str, surgeries: Iterable, workers: int | None = None) -> list:
+    """Return the similarity of every row of ``surgeries`` in ``path``, per modality.
+
+    Surgeries are split into one batch per worker of a pool of ``workers``
+    processes (default: CPU count; 0 runs in-process as a single batch), and
+    each batch loads only its surgeries. A pickle cannot be read partially,
+    so it is read once per batch rather than once per surgery.
+    """
+    ids = [str(sid) for sid in surgeries]
+    batches = 1 if workers == 0 else (workers or os.cpu_count() or 1)
+    size = max(1, -(-len(ids) // batches))
+    tasks = [(path, ids[start:start + size]) for start in range(0, len(ids), size)]
+    if workers == 0:
+        parts = list(map(_process_task, tasks))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parts = list(pool.map(_process_task, tasks))
+    return [pd.concat([p[i] for p in parts], ignore_index=True) if parts else pd.DataFrame()
+            for i in range(3)]
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from .data_loader import load_signals
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("path", help="Pickle, Parquet dataset or shared store")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="Process pool size (default 0: in-process)")
+    args = parser.parse_args()
+
+    if args.workers:
+        ids = load_signals(args.path, columns=["surgery_id"], check_integrity=False)[0]
+        ids = sorted(ids["surgery_id"].astype(str).unique())
+        start = time.perf_counter()
+        n_rows = sum(len(df) for df in similarity_path(args.path, ids, args.workers))
+        elapsed = time.perf_counter() - start
+        print(f"{n_rows:>8} traces  {n_rows / max(elapsed, 1e-9):>12,.0f} traces/s "
+              f"({args.workers} workers, {os.cpu_count()} CPUs)")
+    else:
+        frames = load_signals(args.path, columns=COLUMNS)
+        for name, df in zip(("MEP", "SSEP_UPPER", "SSEP_LOWER"), frames[:3]):
+            packed_column(df, "values")
+            aligned_baselines(df)
+            start = time.perf_counter()
+            compute_similarity(df)
+            elapsed = time.perf_counter() - start
+            print(f"{name:<11} {len(df):>8} traces  {len(df) / max(elapsed, 1e-9):>12,.0f} traces/s")
@@ -0,0 +1,193 @@
+"""Batched power spectra and per-channel spectrograms.
+
+Traces are transformed with one real FFT per batch of equal length and
+signal rate (:func:`src.features.iter_batches`). Each spectrum is mapped
+onto a common frequency grid, so the spectra of one surgery and channel
+form a (trace × frequency) float32 image in dB. :class:`Spectrogram` keeps
+that image and computes only the traces it has not reached yet, so moving
+forward in time transforms just the new traces.
+
+Usage::
+
+    python -m src.spectral data.pkl     # report transform throughput
+"""
+
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+from .features import iter_batches
+from .memory import ACCOUNTANT, PRIORITY_DERIVED, array_buffers
+from .packed import PackedWaveforms, frame_cache, packed_column
+from .profiler import profiled
+
+# Frequency bins of the common grid, from 0 Hz to the highest Nyquist frequency
+N_BINS = 256
+
+# Floor added to the power before taking the log, in µV²/Hz
+POWER_FLOOR = 1e-12
+
+_WINDOWS: dict[int, np.ndarray] = {}
+
+
+def _window(n: int) -> tuple[np.ndarray, float]:
+    """Return a Hann window of ``n`` samples and the sum of its squares."""
+    if n not in _WINDOWS:
+        _WINDOWS[n] = np.hanning(n).astype(np.float32) if n > 1 else np.ones(n, np.float32)
+    window = _WINDOWS[n]
+    return window, float(np.dot(window, window))
+
+
+def power_spectra(packed: PackedWaveforms, rates: np.ndarray, freqs: np.ndarray,
+                  rows: np.ndarray | None = None) -> np.ndarray:
+    """Return the power spectral density (dB) of ``rows`` on the grid ``freqs``.
+
+    Each trace has its mean removed and is Hann windowed before the FFT.
+    Rows sharing a length and rate share their interpolation weights;
+    frequencies above a trace's Nyquist frequency, and rows that are empty
+    or have an invalid rate, are NaN.
+    """
+    rows = np.arange(len(packed)) if rows is None else np.asarray(rows, dtype=np.int64)
+    position = np.full(len(packed), -1, dtype=np.int64)
+    position[rows] = np.arange(rows.size)
+    out = np.full((rows.size, freqs.size), np.nan, dtype=np.float32)
+    for chunk, rate, block in iter_batches(packed, rates, rows):
+        n = block.shape[1]
+        window, power = _window(n)
+        block -= block.mean(axis=1, keepdims=True)
+        block *= window
+        spectrum = np.fft.rfft(block, axis=1)
+        density = spectrum.real ** 2 + spectrum.imag ** 2
+        # One-sided density: every bin but DC (and Nyquist) holds both halves
+        density *= 2.0 / (rate * power)
+        density[:, 0] /= 2.0
+        db = 10.0 * np.log10(density + POWER_FLOOR)
+
+        pos = freqs * n / rate
+        inside = pos <= db.shape[1] - 1
+        pos = pos[inside]
+        i0 = pos.astype(np.int64)
+        i1 = np.minimum(i0 + 1, db.shape[1] - 1)
+        w = pos - i0
+        out[np.ix_(position[chunk], np.flatnonzero(inside))] = db[:, i0] * (1 - w) + db[:, i1] * w
+    return out
+
+
+class Spectrogram:
+    """Power spectra of one surgery and channel, one row per trace.
+
+    ``positions`` are the channel's row positions in the frame, sorted by
+    timestamp. The (trace × frequency) float32 image is allocated once;
+    :meth:`extend` fills the rows up to a given trace.
+    """
+
+    def __init__(self, positions: np.ndarray, timestamps: np.ndarray, max_freq: float,
+                 n_bins: int = N_BINS):
+        self.positions = positions
+        self.timestamps = timestamps
+        self.freqs = np.linspace(0.0, max_freq, n_bins)
+        self.data = np.full((positions.size, n_bins), np.nan, dtype=np.float32)
+        self.computed = 0
+
+    def __len__(self) -> int:
+        return self.positions.size
+
+    def stop(self, timestamp) -> int:
+        """Return the number of traces up to and including ``timestamp``."""
+        if timestamp is None:
+            return len(self)
+        return int(np.searchsorted(self.timestamps, float(timestamp), side="right"))
+
+    def extend(self, packed: PackedWaveforms, rates: np.ndarray, stop: int) -> int:
+        """Compute the spectra of traces ``computed:stop``; return how many."""
+        start = self.computed
+        if stop <= start:
+            return 0
+        self.data[start:stop] = power_spectra(packed, rates, self.freqs,
+                                              self.positions[start:stop])
+        self.computed = stop
+        return stop - start
+
+    def image(self, stop: int | None = None) -> np.ndarray:
+        """Return the computed rows before ``stop`` as a view (no copy)."""
+        stop = self.computed if stop is None else min(stop, self.computed)
+        return self.data[:stop]
+
+
+def _rates(df: pd.DataFrame) -> np.ndarray:
+    return pd.to_numeric(df["signal_rate"], errors="coerce").to_numpy(dtype=float)
+
+
+def build_spectrogram(df: pd.DataFrame, surgery_id, channel, n_bins: int = N_BINS) -> Spectrogram:
+    """Return an empty :class:`Spectrogram` for one surgery and channel of ``df``."""
+    mask = (df["surgery_id"].astype(str) == str(surgery_id)) & (df["channel"].astype(str) == str(channel))
+    positions = np.flatnonzero(mask.to_numpy())
+    ts = pd.to_numeric(df["timestamp"].iloc[positions], errors="coerce").to_numpy(dtype=float)
+    order = np.argsort(ts, kind="stable")
+    rates = _rates(df)[positions]
+    valid = rates[np.isfinite(rates) & (rates > 0)]
+    max_freq = float(valid.max()) / 2.0 if valid.size else 0.0
+    return Spectrogram(positions[order], ts[order], max_freq, n_bins)
+
+
+# Spectrograms of every frame by (surgery ID, channel) as str, see frame_cache
+_SPECTROGRAM_CACHE: dict[int, dict[tuple[str, str], Spectrogram]] = {}
+
+
+def _frame_cache(df: pd.DataFrame) -> dict[tuple[str, str], Spectrogram]:
+    return frame_cache(_SPECTROGRAM_CACHE, df, dict)
+
+
+@profiled()
+def channel_spectrogram(df: pd.DataFrame, surgery_id, channel, timestamp=None) -> Spectrogram:
+    """Return the cached spectrogram of one channel, computed up to ``timestamp``.
+
+    Only traces not computed by an earlier call are transformed.
+    """
+    cache = _frame_cache(df)
+    key = (str(surgery_id), str(channel))
+    if key not in cache:
+        cache[key] = build_spectrogram(df, surgery_id, channel)
+    spectrogram = cache[key]
+    stop = spectrogram.stop(timestamp)
+    if stop > spectrogram.computed:
+        spectrogram.extend(packed_column(df, "values"), _rates(df), stop)
+    return spectrogram
+
+
+def _spectrogram_buffers() -> dict:
+    out = {}
+    for cache in list(_SPECTROGRAM_CACHE.values()):
+        for spectrogram in list(cache.values()):
+            array_buffers(spectrogram.data, spectrogram.positions, spectrogram.timestamps, out=out)
+    return out
+
+
+def release_spectrograms() -> None:
+    """Empty the spectrogram cache; spectra are recomputed on the next lookup."""
+    for cache in list(_SPECTROGRAM_CACHE.values()):
+        cache.clear()
+
+
+ACCOUNTANT.register("Spectrograms", _spectrogram_buffers, release_spectrograms,
+                    priority=PRIORITY_DERIVED)
+
+
+if __name__ == "__main__":
+    import sys
+    import time
+
+    from .data_loader import load_signals
+
+    if len(sys.argv) != 2:
+        print("Usage: python -m src.spectral <input.pkl|parquet_dir>")
+        sys.exit(1)
+    for name, df in zip(("MEP", "SSEP_UPPER", "SSEP_LOWER"), load_signals(sys.argv[1])[:3]):
+        packed = packed_column(df, "values")
+        rates = _rates(df)
+        freqs = np.linspace(0.0, np.nanmax(rates) / 2.0, N_BINS)
+        start = time.perf_counter()
+        power_spectra(packed, rates, freqs)
+        elapsed = time.perf_counter() - start
+        print(f"{name:<11} {len(df):>8} traces  {len(df) / max(elapsed, 1e-9):>12,.0f} traces/s")
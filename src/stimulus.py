@@ -0,0 +1,152 @@
+"""Flatten per-row stimulus dicts into typed columns.
+
+The pipeline stores the stimulus parameters of every row as a Python dict.
+Most rows repeat one of a handful of parameter sets, so the dicts are
+interned into a small table of unique sets and every parameter becomes a
+numeric or categorical column.  Rows can then be grouped or filtered by
+stimulus parameters with ordinary vectorized pandas operations.
+"""
+
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+# Key of the requested stimulus intensity (spelled as in the source data).
+INTENSITY_KEY = "definedStimuluslntensity1"
+
+STIMULUS_PREFIXES = {
+    "stimulus": "stim_",
+    "baseline_stimulus": "baseline_stim_",
+}
+
+
+def _set_keys(objects: list) -> list:
+    # Dicts from one pipeline share a key layout, so (keys, values) tuples are
+    # much cheaper to build and hash than sorted item tuples.
+    return list(zip(
+        map(tuple, objects),
+        map(tuple, map(dict.values, objects)),
+    ))
+
+
+def _factorize_keys(keys: list) -> np.ndarray:
+    try:
+        hashes = np.fromiter(map(hash, keys), dtype=np.int64, count=len(keys))
+    except TypeError:
+        # Unhashable parameter values; fall back to their repr
+        keys = [(k, tuple(map(repr, v))) for k, v in keys]
+        hashes = np.fromiter(map(hash, keys), dtype=np.int64, count=len(keys))
+    codes, _ = pd.factorize(hashes)
+    # Factorizing the int64 hashes is far cheaper than hashing tuples inside
+    # pandas; confirm there was no collision before trusting the codes.
+    rep = np.unique(codes, return_index=True)[1][codes]
+    if all(map(tuple.__eq__, keys, (keys[i] for i in rep))):
+        return codes
+    return pd.factorize(pd.Series(keys, dtype=object), sort=False)[0]
+
+
+def intern_stimulus(series: pd.Series) -> tuple[np.ndarray, pd.DataFrame]:
+    """Intern a column of stimulus dicts.
+
+    Returns
+    -------
+    codes: np.ndarray
+        ``int32`` index of the parameter set used by each row.
+    sets: pd.DataFrame
+        One row per unique parameter set with one typed column per key.
+    """
+    objects = series.to_numpy(dtype=object)
+    # Rows frequently share the same dict object, so dedupe by identity first
+    # and only build comparable keys for the distinct objects.
+    id_codes, _ = pd.factorize(
+        np.fromiter(map(id, objects), dtype=np.int64, count=objects.size)
+    )
+    first = np.unique(id_codes, return_index=True)[1]
+    distinct = [d if isinstance(d, dict) else {} for d in objects[first]]
+    key_codes = _factorize_keys(_set_keys(distinct))
+    codes = key_codes[id_codes].astype(np.int32)
+
+    set_first = np.unique(key_codes, return_index=True)[1]
+    records = [distinct[i] for i in set_first]
+    sets = pd.DataFrame(records, index=pd.RangeIndex(len(records)))
+    for col in sets.columns:
+        sets[col] = _typed(sets[col])
+    return codes, sets
+
+
+def _typed(column: pd.Series) -> pd.Series:
+    numeric = pd.to_numeric(column, errors="coerce")
+    if numeric.notna().sum() == column.notna().sum():
+        if numeric.notna().all() and (numeric == numeric.round()).all():
+            return pd.to_numeric(numeric, downcast="integer")
+        return numeric.astype(np.float32)
+    return column.astype("category")
+
+
+def flatten_stimulus(df: pd.DataFrame, column: str = "stimulus") -> pd.DataFrame:
+    """Replace a dict column with an interned set code and typed columns.
+
+    ``column`` becomes ``<column>_set`` (the interned parameter-set index)
+    plus one ``<prefix><key>`` column per parameter, where ``prefix`` is
+    ``stim_`` for ``stimulus`` and ``baseline_stim_`` for
+    ``baseline_stimulus``.
+    """
+    if column not in df.columns:
+        return df
+    prefix = STIMULUS_PREFIXES.get(column, f"{column}_")
+    codes, sets = intern_stimulus(df[column])
+
+    new_cols: dict[str, object] = {f"{column}_set": codes}
+    for key in sets.columns:
+        values = sets[key]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            new_cols[f"{prefix}{key}"] = pd.Categorical.from_codes(
+                values.cat.codes.to_numpy()[codes], values.cat.categories
+            )
+        else:
+            new_cols[f"{prefix}{key}"] = values.to_numpy()[codes]
+
+    out = df.drop(columns=[column])
+    return pd.concat(
+        [out, pd.DataFrame(new_cols, index=df.index)], axis=1
+    )
+
+
+def flatten_all(df: pd.DataFrame) -> pd.DataFrame:
+    """Flatten both ``stimulus`` and ``baseline_stimulus`` if present."""
+    for column in STIMULUS_PREFIXES:
+        df = flatten_stimulus(df, column)
+    return df
+
+
+def stimulus_values(df: pd.DataFrame, key: str, prefix: str = "stim_") -> list:
+    """Return the sorted distinct values of a flattened stimulus parameter.
+
+    Numbers sort before strings, so categorical parameters mixing both
+    still sort.
+    """
+    col = f"{prefix}{key}"
+    if df is None or col not in df.columns:
+        return []
+    return sorted(pd.unique(df[col].dropna()), key=value_sort_key)
+
+
+def value_sort_key(value):
+    """Sort key placing numbers before strings, for mixed parameter values."""
+    return (1, str(value)) if isinstance(value, str) else (0, value)
+
+
+def stimulus_mask(df: pd.DataFrame, prefix: str = "stim_", **criteria) -> np.ndarray:
+    """Return a boolean row mask matching all ``key=value`` criteria.
+
+    Criteria on parameters ``df`` has no column for are skipped, so a
+    filter chosen for one modality leaves frames without that parameter
+    whole.
+    """
+    mask = np.ones(len(df), dtype=bool)
+    for key, value in criteria.items():
+        col = f"{prefix}{key}"
+        if col in df.columns:
+            mask &= (df[col] == value).to_numpy(dtype=bool, na_value=False)
+    return mask
@@ -0,0 +1,183 @@
+"""Synthetic archives with the structure of real recordings.
+
+The generator produces the same dictionary layout as ``InternData.pkl``
+(see ``data explanation.md``) at any scale, for benchmarks and stress
+tests:
+
+* channels on both sides, alternating between two signal rates per
+  modality;
+* one baseline per surgery and channel, shared by all its rows;
+* stimulus dicts with the usual keys, stepping the intensity over time;
+* waveforms with a latency, amplitude drift and noise.
+
+Usage::
+
+    python -m src.synthetic out.pkl --surgeries 5 --channels 8 --timestamps 200
+"""
+
+from __future__ import annotations
+
+from dataclasses import asdict, dataclass
+
+import numpy as np
+import pandas as pd
+
+from .stimulus import INTENSITY_KEY
+
+MEP_MUSCLES = ["APB", "AH", "TA", "GAS", "VL", "ADM", "FDI", "BIC"]
+SSEP_UPPER_SITES = ["Cz-C3", "Cz-C4", "Erb-Fz", "C5-Fz"]
+SSEP_LOWER_SITES = ["Cz-Fz", "C3'-C4'", "PF-Fz", "T12-IC"]
+PROTOCOLS = ["Spine", "Cranial", "Vascular"]
+
+# Modality -> (signal rates in Hz, latency of the response in ms)
+MODALITY_PARAMS = {
+    "mep_data": ((10000, 5000), 25.0),
+    "ssep_upper_data": ((5000, 2500), 20.0),
+    "ssep_lower_data": ((5000, 2500), 40.0),
+}
+
+
+@dataclass
+class SyntheticScale:
+    """Size of a synthetic archive.
+
+    ``channels`` is per modality; half of them are on each side.
+    """
+
+    surgeries: int = 2
+    channels: int = 8
+    timestamps: int = 50
+    samples: int = 1000
+    seed: int = 0
+
+    @property
+    def rows(self) -> int:
+        return self.surgeries * self.channels * self.timestamps * len(MODALITY_PARAMS)
+
+
+def _channel_names(key: str, n: int) -> list[str]:
+    if key == "mep_data":
+        base = [f"{{s}}{m}1-{{s}}{m}2" for m in MEP_MUSCLES]
+    elif key == "ssep_upper_data":
+        base = SSEP_UPPER_SITES
+    else:
+        base = SSEP_LOWER_SITES
+    names = []
+    for i in range(n):
+        side = "L" if i % 2 == 0 else "R"
+        site = base[(i // 2) % len(base)]
+        repeat = i // (2 * len(base))
+        name = site.format(s=side) if "{s}" in site else f"{side}{site}"
+        names.append(name + (f"#{repeat}" if repeat else ""))
+    return names
+
+
+def _stimulus(intensity: int) -> dict:
+    return {
+        INTENSITY_KEY: intensity,
+        "definedStimuluslntensity2": intensity + 100,
+        "measuredStimuluslntensity1": -intensity * 3,
+        "measuredStimuluslntensity2": -intensity * 3,
+        "stimulusRate": 0,
+        "mode": 0,
+        "type": 0,
+        "polarity": 0,
+        "pulseDuration1": 75,
+        "pulseDuration2": 75,
+        "trainCount1": 2,
+        "trainCount2": 6,
+        "trainRate1": 333,
+        "trainRate2": 333,
+    }
+
+
+def _waveforms(rng, n_samples: int, rate: np.ndarray, latency_ms: np.ndarray,
+               amplitude: np.ndarray) -> np.ndarray:
+    """Return one biphasic response plus noise per row as a float32 block."""
+    step = (1000.0 / rate).astype(np.float32)
+    t = np.arange(n_samples, dtype=np.float32)[None, :] * step[:, None]
+    width = np.float32(3.0)
+    d = (t - latency_ms[:, None].astype(np.float32)) / width
+    block = (-d * np.exp(-0.5 * d * d)).astype(np.float32)
+    block *= amplitude[:, None].astype(np.float32)
+    block += rng.standard_normal(block.shape, dtype=np.float32) * np.float32(5.0)
+    return block
+
+
+def _modality_frame(rng, key: str, scale: SyntheticScale, surgery_ids: list[str],
+                    ) -> pd.DataFrame:
+    rates, latency = MODALITY_PARAMS[key]
+    channels = _channel_names(key, scale.channels)
+    n_ts, n_ch = scale.timestamps, scale.channels
+    # Pairs of left/right channels share a rate
+    channel_rate = np.array([rates[(i // 2) % len(rates)] for i in range(n_ch)], dtype=float)
+    row_rate = np.tile(channel_rate, n_ts)
+    frames = []
+    for sid in surgery_ids:
+        timestamps = 1000 + np.arange(n_ts) * 30 + int(rng.integers(0, 600))
+        # Amplitude per channel decays slowly over the surgery
+        channel_amp = rng.uniform(100, 1000, n_ch)
+        drift = np.linspace(1.0, rng.uniform(0.4, 1.1), n_ts)
+        amp = (drift[:, None] * channel_amp[None, :]).ravel()
+        lat = latency + rng.normal(0, 1.0, n_ts * n_ch)
+        block = _waveforms(rng, scale.samples, row_rate, lat, amp)
+
+        baseline_block = _waveforms(
+            rng, scale.samples, channel_rate, np.full(n_ch, latency), channel_amp
+        )
+        baselines = list(baseline_block)
+        baseline_stim = _stimulus(100)
+        # Intensity steps up every tenth of the surgery
+        stim_levels = [_stimulus(100 + 25 * k) for k in range(10)]
+        stim_index = np.minimum(np.arange(n_ts) * 10 // max(n_ts, 1), 9)
+
+        frames.append(pd.DataFrame({
+            "surgery_id": sid,
+            "timestamp": np.repeat(timestamps, n_ch),
+            "channel": np.tile(channels, n_ts),
+            "values": list(block),
+            "stimulus": [stim_levels[i] for i in np.repeat(stim_index, n_ch)],
+            "signal_rate": row_rate.astype(int),
+            "baseline_timestamp": int(timestamps[0]) - 60,
+            "baseline_values": baselines * n_ts,
+            "baseline_stimulus": [baseline_stim] * (n_ts * n_ch),
+            "baseline_signal_rate": row_rate.astype(int),
+        }))
+    return pd.concat(frames, ignore_index=True)
+
+
+def generate_archive(scale: SyntheticScale | None = None) -> dict[str, object]:
+    """Return an archive dictionary in the ``InternData.pkl`` layout."""
+    scale = scale or SyntheticScale()
+    rng = np.random.default_rng(scale.seed)
+    surgery_ids = [f"{0x612a46aec45f5b2d4b760000 + i:024x}" for i in range(scale.surgeries)]
+    archive = {
+        key: _modality_frame(rng, key, scale, surgery_ids) for key in MODALITY_PARAMS
+    }
+    archive["_surgerydata"] = {
+        sid: {
+            "date": str((pd.Timestamp("2023-01-02") + pd.Timedelta(days=3 * i)).date()),
+            "protocol": PROTOCOLS[i % len(PROTOCOLS)],
+        }
+        for i, sid in enumerate(surgery_ids)
+    }
+    return archive
+
+
+def write_archive(path: str, scale: SyntheticScale | None = None) -> str:
+    """Generate an archive and pickle it to ``path``."""
+    pd.to_pickle(generate_archive(scale), path)
+    return path
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("output", help="Pickle file to write")
+    for name, value in asdict(SyntheticScale()).items():
+        parser.add_argument(f"--{name}", type=int, default=value)
+    args = parser.parse_args()
+    scale = SyntheticScale(**{k: getattr(args, k) for k in asdict(SyntheticScale())})
+    write_archive(args.output, scale)
+    print(f"{scale.rows} rows written to {args.output}")
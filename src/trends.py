@@ -0,0 +1,333 @@
+"""Trend metrics and a per-surgery store of precomputed trend series.
+
+Trend series are small (one value per timestamp and channel) compared to the
+raw waveforms they are computed from, so they are computed once per surgery
+and kept in memory and on disk. Views that overlay many surgeries read the
+stored series instead of loading every surgery's waveforms.
+"""
+
+from __future__ import annotations
+
+import os
+from collections.abc import Callable
+
+import numpy as np
+import pandas as pd
+
+from .artifacts import ARTIFACT_COLUMN, artifact_mask
+from .cache import cache_dir, dataset_key, safe_name
+from .features import frame_features
+from .memory import array_buffers, iter_arrays
+from .packed import packed_column
+from .profiler import profiled
+from .resample import difference_energy
+from .similarity import frame_similarity
+
+ALIGNMENTS = ("Start", "Baseline", "Incision")
+
+# Surgery metadata fields that may hold the incision time.
+INCISION_FIELDS = ("incision_time", "incision", "incision_timestamp")
+
+
+@profiled("calculate_l1_norm")
+def calculate_l1_norm(df: pd.DataFrame) -> pd.DataFrame:
+    """Compute L1 norm of the signal for each timestamp/channel row."""
+    if df is None or df.empty:
+        return pd.DataFrame(columns=["timestamp", "channel", "l1"])
+
+    packed = packed_column(df, "values")
+    l1 = packed.reduce(np.add, np.abs(packed.data), empty=0.0)
+    result = df[["timestamp", "channel"]].copy()
+    result["l1"] = l1
+    return result
+
+
+def _feature_metric(name: str, source: Callable[[pd.DataFrame], pd.DataFrame] = frame_features
+                    ) -> Callable[[pd.DataFrame], pd.DataFrame]:
+    """Return a metric function reading ``name`` from a cached per-row frame.
+
+    ``source`` returns that frame, aligned to the rows of ``df``; the
+    default reads the peak features.
+    """
+    def metric(df: pd.DataFrame) -> pd.DataFrame:
+        result = df[["timestamp", "channel"]].copy()
+        result[name] = source(df)[name].to_numpy() if len(df) else []
+        return result
+    metric.__name__ = f"{name}_metric"
+    return metric
+
+
+# Metric name -> function returning a (timestamp, channel, <name>) frame.
+METRICS: dict[str, Callable[[pd.DataFrame], pd.DataFrame]] = {
+    "l1": calculate_l1_norm,
+    "amplitude": _feature_metric("amplitude"),
+    "latency": _feature_metric("latency"),
+    "diff_energy": difference_energy,
+    "similarity": _feature_metric("similarity", frame_similarity),
+    "similarity_lag": _feature_metric("similarity_lag", frame_similarity),
+}
+
+
+def pivot_series(timestamps, channels, values):
+    """Pivot long-form trend values into a dense (channel × timestamp) matrix.
+
+    Returns (channels, timestamps, matrix) with sorted channel and timestamp
+    labels. Several values for one cell are averaged; missing cells are NaN.
+    """
+    ch_codes, ch_labels = pd.factorize(np.asarray(channels), sort=True)
+    ts_codes, ts_labels = pd.factorize(np.asarray(timestamps, dtype=float), sort=True)
+    n_ch, n_ts = len(ch_labels), len(ts_labels)
+    flat = ch_codes.astype(np.int64) * n_ts + ts_codes
+    values = np.asarray(values, dtype=np.float64)
+    sums = np.bincount(flat, weights=values, minlength=n_ch * n_ts)
+    counts = np.bincount(flat, minlength=n_ch * n_ts)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        matrix = (sums / counts).astype(np.float32).reshape(n_ch, n_ts)
+    return np.asarray(ch_labels), np.asarray(ts_labels), matrix
+
+
+def _row_checksums(df: pd.DataFrame) -> np.ndarray:
+    """Return (XOR, sum) of the sample bit patterns of every row of ``df``.
+
+    One pass over the packed samples; a recording that was reloaded or
+    corrected under the same surgery ID gets different checksums.
+    """
+    out = np.zeros((len(df), 2), dtype=np.uint64)
+    if "values" not in df.columns:
+        return out
+    packed = packed_column(df, "values")
+    bits = packed.data.view(np.uint32)
+    nonempty = packed.lengths > 0
+    if bits.size and nonempty.any():
+        starts = packed.offsets[:-1][nonempty]
+        out[nonempty, 0] = np.bitwise_xor.reduceat(bits, starts)
+        out[nonempty, 1] = np.add.reduceat(bits, starts, dtype=np.uint64)
+    return out
+
+
+def _fingerprint(df: pd.DataFrame, checksums: np.ndarray) -> int:
+    """Cheap identity of a surgery's rows and samples used to detect stale series."""
+    columns = ["timestamp", "channel"] + ([ARTIFACT_COLUMN] if ARTIFACT_COLUMN in df.columns else [])
+    keys = df[columns].assign(_xor=checksums[:, 0], _sum=checksums[:, 1])
+    hashed = pd.util.hash_pandas_object(keys, index=False)
+    return int(hashed.sum()) ^ len(df)
+
+
+def _incision_time(meta: pd.DataFrame | None, surgery_id) -> float:
+    if meta is None or meta.empty:
+        return np.nan
+    row = None
+    if str(surgery_id) in meta.index.astype(str):
+        row = meta.loc[meta.index.astype(str) == str(surgery_id)].iloc[0]
+    if row is None:
+        return np.nan
+    for field in INCISION_FIELDS:
+        value = pd.to_numeric(pd.Series([row.get(field)]), errors="coerce").iloc[0]
+        if pd.notna(value):
+            return float(value)
+    return np.nan
+
+
+class TrendStore:
+    """Per-surgery trend series, cached in memory and as ``.npz`` files.
+
+    Series are keyed by (surgery, modality, metric). ``directory=None`` uses
+    the :func:`src.cache.cache_dir` directory of ``dataset`` (the source
+    path, see :func:`src.cache.dataset_key`), so datasets reusing a surgery
+    ID keep their own series; ``persist=False`` keeps everything in memory.
+    """
+
+    def __init__(self, directory: str | None = None, persist: bool = True,
+                 dataset: str | None = None):
+        self._persist = persist
+        self._fixed_directory = directory
+        self._directory = directory
+        self.dataset = dataset
+        self._memory: dict[tuple, dict] = {}
+        # (surgery, modality, metric) -> pivoted matrix, see matrix()
+        self._matrices: dict[tuple, tuple] = {}
+        # (modality, metric) -> surgery IDs, filled from disk on first use
+        self._index: dict[tuple, set] = {}
+
+    @property
+    def directory(self) -> str:
+        if self._directory is None:
+            self._directory = cache_dir("trends", dataset_key(self.dataset))
+        return self._directory
+
+    def set_dataset(self, dataset: str | None) -> None:
+        """Switch to the series of another dataset, dropping those in memory."""
+        if dataset == self.dataset:
+            return
+        self.dataset = dataset
+        self._directory = self._fixed_directory
+        self._memory.clear()
+        self._matrices.clear()
+        self._index.clear()
+
+    def _path(self, surgery_id, modality: str, metric: str) -> str:
+        return os.path.join(
+            self.directory, safe_name(modality), safe_name(metric), f"{safe_name(surgery_id)}.npz"
+        )
+
+    # -----------------------------------------------------
+    # Building
+    # -----------------------------------------------------
+    def update(self, df: pd.DataFrame, modality: str, metric: str = "l1",
+               meta: pd.DataFrame | None = None) -> list[str]:
+        """Compute missing or stale series for every surgery in ``df``.
+
+        The metric is computed once over the whole frame and then split per
+        surgery. Rows flagged as artifacts (see :mod:`src.artifacts`) are
+        left out of the series. Returns the surgery IDs that were
+        (re)computed.
+        """
+        if df is None or df.empty:
+            return []
+        surgery_ids = df["surgery_id"].astype(str)
+        stale = {}
+        checksums = _row_checksums(df)
+        for sid, rows in df.groupby(surgery_ids, sort=False).indices.items():
+            fingerprint = _fingerprint(df.iloc[rows], checksums[rows])
+            entry = self._load(sid, modality, metric)
+            if entry is None or entry["fingerprint"] != fingerprint:
+                stale[sid] = (rows, fingerprint)
+        if not stale:
+            return []
+
+        values = METRICS[metric](df)[metric].to_numpy()
+        flags = artifact_mask(df)
+        for sid, (rows, fingerprint) in stale.items():
+            rows = rows[~flags[rows]]
+            subset = df.iloc[rows]
+            ts = pd.to_numeric(subset["timestamp"], errors="coerce").to_numpy(dtype=float)
+            order = np.argsort(ts, kind="stable")
+            baseline = np.nan
+            if "baseline_timestamp" in subset.columns:
+                baseline = pd.to_numeric(subset["baseline_timestamp"], errors="coerce").min()
+            entry = {
+                "timestamp": ts[order],
+                "channel": subset["channel"].to_numpy().astype(str)[order],
+                "value": values[rows][order].astype(np.float32),
+                "fingerprint": fingerprint,
+                "origins": np.array(
+                    [np.nanmin(ts) if ts.size else np.nan, baseline, _incision_time(meta, sid)],
+                    dtype=float,
+                ),
+            }
+            self._store(sid, modality, metric, entry)
+        return list(stale)
+
+    def _store(self, surgery_id, modality, metric, entry) -> None:
+        self._memory[(str(surgery_id), modality, metric)] = entry
+        self._matrices.pop((str(surgery_id), modality, metric), None)
+        if (modality, metric) in self._index:
+            self._index[(modality, metric)].add(str(surgery_id))
+        if self._persist:
+            path = self._path(surgery_id, modality, metric)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.tmp.npz"
+            np.savez(tmp, surgery_id=np.array(str(surgery_id)), **{
+                k: (np.array(v) if k == "fingerprint" else v) for k, v in entry.items()
+            })
+            os.replace(tmp, path)
+
+    def _load(self, surgery_id, modality, metric) -> dict | None:
+        key = (str(surgery_id), modality, metric)
+        if key in self._memory:
+            return self._memory[key]
+        if not self._persist:
+            return None
+        path = self._path(surgery_id, modality, metric)
+        if not os.path.isfile(path):
+            return None
+        with np.load(path, allow_pickle=False) as data:
+            entry = {k: data[k] for k in ("timestamp", "channel", "value", "origins")}
+            entry["fingerprint"] = int(data["fingerprint"])
+        self._memory[key] = entry
+        return entry
+
+    # -----------------------------------------------------
+    # Memory
+    # -----------------------------------------------------
+    def buffers(self) -> dict:
+        """Return the arrays held in memory as ``{key: nbytes}``, see :mod:`src.memory`."""
+        return array_buffers(*iter_arrays(list(self._memory.values())),
+                             *iter_arrays(list(self._matrices.values())))
+
+    def release(self) -> None:
+        """Drop the pivoted matrices and, if persisted, the series loaded from disk."""
+        self._matrices.clear()
+        if self._persist:
+            self._memory.clear()
+
+    # -----------------------------------------------------
+    # Queries
+    # -----------------------------------------------------
+    def series(self, surgery_id, modality: str, metric: str = "l1") -> pd.DataFrame | None:
+        """Return the (timestamp, channel, <metric>) frame of one surgery."""
+        entry = self._load(surgery_id, modality, metric)
+        if entry is None:
+            return None
+        return pd.DataFrame({
+            "timestamp": entry["timestamp"],
+            "channel": entry["channel"],
+            metric: entry["value"],
+        })
+
+    def channel_series(self, surgery_id, modality: str, channel, metric: str = "l1",
+                       align: str = "Start"):
+        """Return (x, y) arrays of one channel with x relative to ``align``.
+
+        Returns None if the surgery has no stored series or the requested
+        alignment origin is unknown.
+        """
+        entry = self._load(surgery_id, modality, metric)
+        if entry is None:
+            return None
+        origin = entry["origins"][ALIGNMENTS.index(align)]
+        if np.isnan(origin):
+            return None
+        mask = entry["channel"] == str(channel)
+        return entry["timestamp"][mask] - origin, entry["value"][mask]
+
+    def matrix(self, surgery_id, modality: str, metric: str = "l1"):
+        """Return (channels, timestamps, matrix) of one surgery's series.
+
+        The pivot is computed once per stored series and reused until the
+        series is recomputed; callers must not modify the arrays.
+        """
+        key = (str(surgery_id), modality, metric)
+        if key not in self._matrices:
+            entry = self._load(surgery_id, modality, metric)
+            if entry is None:
+                return None
+            self._matrices[key] = pivot_series(entry["timestamp"], entry["channel"], entry["value"])
+        return self._matrices[key]
+
+    def surgeries(self, modality: str, metric: str = "l1") -> list[str]:
+        """Return the IDs of all surgeries with a stored series."""
+        key = (modality, metric)
+        if key not in self._index:
+            ids = {sid for sid, mod, met in self._memory if (mod, met) == key}
+            if self._persist:
+                folder = os.path.join(self.directory, safe_name(modality), safe_name(metric))
+                if os.path.isdir(folder):
+                    for name in os.listdir(folder):
+                        if name.endswith(".npz") and ".tmp." not in name:
+                            with np.load(os.path.join(folder, name), allow_pickle=False) as data:
+                                ids.add(str(data["surgery_id"]))
+            self._index[key] = ids
+        return sorted(self._index[key])
+
+    def channels(self, modality: str, metric: str = "l1",
+                 surgery_ids: list[str] | None = None) -> list[str]:
+        """Return the union of channels stored for the given surgeries."""
+        if surgery_ids is None:
+            surgery_ids = self.surgeries(modality, metric)
+        channels = set()
+        for sid in surgery_ids:
+            entry = self._load(sid, modality, metric)
+            if entry is not None:
+                channels.update(np.unique(entry["channel"]).tolist())
+        return sorted(channels)
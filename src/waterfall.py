@@ -0,0 +1,105 @@
+"""Resampling of trace histories into a 2-D waterfall image.
+
+Each trace is resampled onto a common time grid so the history of one
+channel becomes a dense (trace × sample) array that can be drawn as a single
+image. :class:`WaterfallBuffer` keeps the most recent rows of that array and
+appends new traces without copying the ones already stored.
+"""
+
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+from .features import iter_batches
+from .memory import array_buffers
+from .packed import packed_column
+
+
+def resample_traces(df: pd.DataFrame, n_columns: int, duration: float) -> np.ndarray:
+    """Resample every row of ``df`` onto ``n_columns`` points over ``duration`` s.
+
+    Rows sharing a length and signal rate share their interpolation weights,
+    so each such batch is two gathers and a blend. Samples beyond a trace's
+    end are NaN.
+    """
+    out = np.full((len(df), n_columns), np.nan, dtype=np.float32)
+    if not len(df):
+        return out
+    grid = np.linspace(0.0, duration, n_columns, endpoint=False)
+    packed = packed_column(df, "values")
+    rates = pd.to_numeric(df["signal_rate"], errors="coerce").to_numpy(dtype=float)
+    for rows, rate, block in iter_batches(packed, rates):
+        n = block.shape[1]
+        pos = grid * rate
+        inside = pos <= n - 1
+        pos = pos[inside]
+        i0 = np.minimum(pos.astype(np.int64), n - 1)
+        i1 = np.minimum(i0 + 1, n - 1)
+        w = (pos - i0).astype(np.float32)
+        out[np.ix_(rows, np.flatnonzero(inside))] = block[:, i0] * (1 - w) + block[:, i1] * w
+    return out
+
+
+def trace_duration(df: pd.DataFrame) -> float:
+    """Return the longest trace duration (s) in ``df``."""
+    if not len(df):
+        return 0.0
+    lengths = packed_column(df, "values").lengths
+    rates = pd.to_numeric(df["signal_rate"], errors="coerce").to_numpy(dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        durations = np.where(rates > 0, lengths / rates, 0.0)
+    return float(np.nanmax(durations)) if durations.size else 0.0
+
+
+class WaterfallBuffer:
+    """Rolling (row × column) float32 buffer holding the last ``capacity`` rows.
+
+    Rows are written twice into an array of ``2 * capacity`` rows, so the
+    current contents are always one contiguous slice and appending never
+    shifts the stored rows.
+    """
+
+    def __init__(self, n_columns: int, capacity: int):
+        self.n_columns = n_columns
+        self.capacity = capacity
+        self._data = np.full((2 * capacity, n_columns), np.nan, dtype=np.float32)
+        self._keys = np.full(2 * capacity, np.nan)
+        self._written = 0
+
+    def __len__(self) -> int:
+        return min(self._written, self.capacity)
+
+    def clear(self) -> None:
+        self._written = 0
+
+    def append(self, rows: np.ndarray, keys: np.ndarray | None = None) -> None:
+        """Append ``rows`` (n × n_columns) with optional per-row ``keys``."""
+        rows = np.asarray(rows, dtype=np.float32)
+        if keys is None:
+            keys = np.full(len(rows), np.nan)
+        if len(rows) > self.capacity:
+            rows, keys = rows[-self.capacity:], keys[-self.capacity:]
+        if not len(rows):
+            return
+        slots = (self._written + np.arange(len(rows))) % self.capacity
+        for offset in (0, self.capacity):
+            self._data[slots + offset] = rows
+            self._keys[slots + offset] = keys
+        self._written += len(rows)
+
+    def _start(self) -> int:
+        return self._written % self.capacity if self._written > self.capacity else 0
+
+    def image(self) -> np.ndarray:
+        """Return the stored rows, oldest first, as a view (no copy)."""
+        start = self._start()
+        return self._data[start:start + len(self)]
+
+    def keys(self) -> np.ndarray:
+        start = self._start()
+        return self._keys[start:start + len(self)]
+
+    def buffers(self) -> dict:
+        """Return the preallocated arrays as ``{key: nbytes}``, see :mod:`src.memory`."""
+        return array_buffers(self._data, self._keys)
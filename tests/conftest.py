@@ -43,3 +43,30 @@ def tiny_pickle(tmp_path: Path) -> str:
     pkl_path = tmp_path / "tiny.pkl"
     pd.to_pickle(data, pkl_path)
     return str(pkl_path)
+
+
+@pytest.fixture
+def synthetic_pickle(tmp_path: Path):
+    """Return a function writing a synthetic archive pickle and returning its path.
+
+    ``name`` is the file's path below ``tmp_path``; keyword arguments
+    override the fields of the default :class:`src.synthetic.SyntheticScale`
+    (3 surgeries, 2 channels, 4 timestamps of 64 samples).
+    """
+    from src.synthetic import SyntheticScale, write_archive
+
+    def write(name: str = "data.pkl", **scale) -> str:
+        path = tmp_path / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fields = {"surgeries": 3, "channels": 2, "timestamps": 4, "samples": 64, **scale}
+        write_archive(str(path), SyntheticScale(**fields))
+        return str(path)
+
+    return write
+
+
+@pytest.fixture(autouse=True)
+def isolated_cache(tmp_path, monkeypatch):
+    """Keep derived caches and user data written during tests out of the user's home."""
+    monkeypatch.setenv("CV_CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setenv("CV_DATA_DIR", str(tmp_path / "data"))
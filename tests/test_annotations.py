@@ -0,0 +1,96 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.annotations import AnnotationStore, annotations, import_csv
+
+
+def test_range_query_matches_brute_force():
+    rng = np.random.default_rng(0)
+    starts = rng.uniform(0, 1000, 5000)
+    ends = starts + np.where(rng.random(5000) < 0.5, 0.0, rng.exponential(5.0, 5000))
+    store = AnnotationStore("S1", persist=False)
+    assert store.add_many(starts, ends, labels=[f"e{i}" for i in range(5000)]) == 5000
+    assert np.all(np.diff(store.start) >= 0)
+    for lo, hi in [(0, 10), (500, 500), (995, 2000), (-5, -1), (250.5, 260)]:
+        expected = np.sort(np.flatnonzero((starts <= hi) & (ends >= lo)))
+        found = np.sort(np.asarray(
+            [int(label[1:]) for label in store.label[store.query(lo, hi)]], dtype=np.int64))
+        np.testing.assert_array_equal(found, expected)
+
+
+def test_long_region_keeps_queries_narrow():
+    store = AnnotationStore("S1", persist=False)
+    store.add(0, 10, label="early")
+    store.add_many(np.arange(1.0, 1001.0))
+    store.add(5, 2000, label="long")
+    assert list(store.label[store.query(1500, 1600)]) == ["long"]
+    # Events starting before the long region are skipped by the binary search
+    assert np.searchsorted(store._reach, 1500) == 6
+    assert list(store.query(3, 4)) == [0, 3, 4]
+
+
+def test_store_persists_and_imports_csv(tmp_path):
+    store = annotations("S1")
+    assert annotations("S1") is store and len(store) == 0
+    store.add(12.0, label="positioning", category="surgical")
+    store.add(30.0, 20.0, label="screws")
+    assert store.frame()[["start", "end"]].values.tolist() == [[12.0, 12.0], [20.0, 30.0]]
+
+    path = tmp_path / "events.csv"
+    pd.DataFrame({"timestamp": [5.0, np.nan, 40.0], "label": ["a", "b", None]}).to_csv(
+        path, index=False)
+    assert import_csv("S1", str(path)) == 2
+
+    reloaded = AnnotationStore("S1", directory=store.path.rsplit("/", 1)[0])
+    assert reloaded.frame().equals(store.frame())
+    assert reloaded.label.tolist() == ["a", "positioning", "screws", ""]
+
+    reloaded.remove([0, 3])
+    assert reloaded.start.tolist() == [12.0, 20.0]
+    with pytest.raises(KeyError):
+        store.import_frame(pd.DataFrame({"label": ["x"]}))
+
+
+def test_stores_are_user_data_keyed_by_dataset(tmp_path):
+    from src.cache import cache_dir
+
+    first = annotations("S1", str(tmp_path / "a.pkl"))
+    second = annotations("S1", str(tmp_path / "b.pkl"))
+    assert first is not second and first is annotations("S1", str(tmp_path / "a.pkl"))
+    first.add(1.0, label="only in a")
+    assert len(second) == 0
+    assert not first.path.startswith(cache_dir())
+    assert AnnotationStore("S1", dataset=str(tmp_path / "a.pkl")).label.tolist() == ["only in a"]
+
+
+def test_annotations_in_trends_and_slider(qtbot, tiny_pickle):
+    from src.data_loader import load_signals
+    from ui.main_window import MainWindow
+    from ui.plot_widgets import AnnotationItem
+
+    mep, upper, lower, meta = load_signals(tiny_pickle)
+    annotations("S1", tiny_pickle).add_many(np.linspace(0, 4, 3000), labels=np.full(3000, "auto"))
+    window = MainWindow()
+    qtbot.addWidget(window)
+    window.set_source(tiny_pickle, None)
+    window.load_data(mep, upper, lower, meta)
+    window.trend_tab.refresh({"mep_df": mep, "ssep_upper_df": upper,
+                              "ssep_lower_df": lower, "surgery_meta_df": meta})
+    window.tabs.setCurrentWidget(window.trend_tab)
+    window.trend_tab.finish_rendering()
+    assert window.timestamp_slider.markers().tolist() == [0, 1, 2, 3, 4]
+
+    items = [item for item in window.trend_tab.global_plot.plotItem.items
+             if isinstance(item, AnnotationItem)]
+    assert len(items) == 1
+    window.resize(1200, 800)
+    window.show()
+    window.grab()
+
+    window.controls.annotation_edit.setText("incision")
+    window.timestamp_slider.setValue(2)
+    window._annotate_current()
+    assert "incision" in annotations("S1", tiny_pickle).label.tolist()
+    assert len(annotations("S1")) == 0
+    assert window.controls.annotation_edit.text() == ""
@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+
+from src.artifacts import (
+    ARTIFACT_COLUMN,
+    channel_scales,
+    classify,
+    clean_rows,
+    flag_artifacts,
+)
+from src.packed import packed_column
+from src.population import PopulationStats
+from src.trends import TrendStore
+
+N = 500
+
+
+def _frame():
+    """Two channels of 100 µV responses; C1 also has one trace of each artifact."""
+    rng = np.random.default_rng(0)
+    t = np.linspace(0, 4 * np.pi, N)
+    traces, channels = [], []
+    for channel, n in (("C1", 10), ("C2", 6)):
+        for _ in range(n):
+            traces.append((rng.uniform(80, 120) * np.sin(t) + rng.normal(0, 2, N)).astype(np.float32))
+            channels.append(channel)
+    traces += [
+        np.clip(50 * traces[0], -300, 300),   # saturated amplifier
+        np.zeros(N, np.float32),              # dead lead
+        40 * traces[1],                       # amplitude far above the channel
+        0.05 * traces[2] + 1.0,               # small response: kept
+    ]
+    channels += ["C1"] * 4
+    return pd.DataFrame({
+        "surgery_id": "S1",
+        "timestamp": np.arange(len(traces)),
+        "channel": channels,
+        "values": traces,
+        "signal_rate": 10_000,
+        "baseline_timestamp": 0,
+        "baseline_values": [np.full(N, 50.0, np.float32)] * len(traces),
+        "baseline_signal_rate": 10_000,
+    })
+
+
+def test_checks_flag_only_artifacts():
+    df = _frame()
+    masks = classify(df)
+    assert np.flatnonzero(masks["clipped"]).tolist() == [16]
+    assert np.flatnonzero(masks["flat"]).tolist() == [17]
+    assert 18 in np.flatnonzero(masks["outlier"]) and not masks["outlier"][19]
+
+    flagged = flag_artifacts(df)
+    assert packed_column(flagged, "values") is packed_column(df, "values")
+    assert np.flatnonzero(flagged[ARTIFACT_COLUMN]).tolist() == [16, 17, 18]
+    assert len(clean_rows(flagged)) == len(df) - 3
+    assert clean_rows(df) is df
+
+
+def test_trends_and_population_skip_flagged_rows():
+    df = flag_artifacts(_frame())
+    store = TrendStore(persist=False)
+    store.update(df, "MEP", "l1")
+    series = store.series("S1", "MEP", "l1")
+    assert sorted(series["timestamp"].tolist()) == [i for i in range(len(df)) if i not in (16, 17, 18)]
+
+    stats = PopulationStats()
+    stats.add_frame(df, "MEP", "test")
+    assert stats.sketch("MEP", "C1", "test", "l1").count == 11
+
+
+def test_scales_are_cached_and_robust(qtbot):
+    from ui.mep_view import MepView
+
+    df = flag_artifacts(_frame())
+    scales = channel_scales(df, "S1")
+    assert channel_scales(df, "S1") is scales
+    # The flagged traces reach 300 and 4800 µV; the clean ones stay near 120
+    assert 100 < scales["C1"] < 130 and 100 < scales["C2"] < 130
+    assert channel_scales(df, "S2").empty
+
+    view = MepView()
+    qtbot.addWidget(view)
+    view.update_view(df, "S1", 18, ["C1"], scales=scales)
+    view.update_view(df, "S1", 18, ["C1"], scales=channel_scales(df, "S2"))
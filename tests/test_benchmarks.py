@@ -0,0 +1,32 @@
+import os
+
+import pytest
+
+from benchmarks import suite
+
+
+def test_compare_flags_regressions_past_threshold():
+    baseline = {"small": {"load": 1.0, "draw": 0.1}}
+    results = {"small": {"load": 1.2, "draw": 0.2, "trend": 5.0}}
+    regressions = suite.compare(results, baseline, threshold=0.25)
+    assert len(regressions) == 1
+    assert regressions[0].startswith("small/draw")
+
+
+def test_suite_runs_and_stores_baseline(tmp_path):
+    results = suite.run(["tiny"], repeats=1, log=lambda _: None)
+    assert set(results["tiny"]) == set(suite.CASES)
+    assert all(seconds > 0 for seconds in results["tiny"].values())
+
+    path = str(tmp_path / "baseline.json")
+    suite.save_baseline(results, path)
+    assert suite.load_baseline(path) == results
+    assert suite.main(["--scales", "tiny", "--cases", "frame_lookup", "--repeats", "1",
+                       "--baseline", path, "--threshold", "1000"]) == 0
+
+
+@pytest.mark.slow
+@pytest.mark.skipif(not os.environ.get("CV_BENCH"), reason="set CV_BENCH=1 to run benchmarks")
+def test_no_regression_against_stored_baseline():
+    results = suite.run(["small"], log=lambda _: None)
+    assert suite.compare(results, suite.load_baseline()) == []
@@ -0,0 +1,127 @@
+import os
+import time
+
+from src.catalog import Catalog
+
+
+def _archive(synthetic_pickle, tmp_path):
+    scale = {"surgeries": 2, "channels": 2, "timestamps": 5, "samples": 50}
+    synthetic_pickle("archive/a.pkl", **scale)
+    synthetic_pickle("archive/sub/b.pkl", **scale)
+    return tmp_path / "archive"
+
+
+def test_catalog_scan_is_incremental(tmp_path, synthetic_pickle):
+    root = _archive(synthetic_pickle, tmp_path)
+    with Catalog(str(tmp_path / "catalog.sqlite")) as catalog:
+        assert catalog.update(str(root), workers=0) == {"scanned": 2, "removed": 0, "failed": 0}
+        assert catalog.count() == 4
+        assert catalog.update(str(root), workers=0)["scanned"] == 0
+        os.utime(str(root / "a.pkl"))
+        assert catalog.update(str(root), workers=0, cancelled=lambda: True)["scanned"] == 0
+
+        path = str(root / "a.pkl")
+        stat = os.stat(path)
+        os.utime(path, (stat.st_atime, stat.st_mtime + 10))
+        assert catalog.update(str(root), workers=0)["scanned"] == 1
+        assert catalog.count() == 4
+
+        os.remove(path)
+        assert catalog.update(str(root), workers=0)["removed"] == 1
+        assert catalog.count() == 2
+
+
+def test_catalog_records_surgery_summary(tmp_path, tiny_pickle):
+    with Catalog(str(tmp_path / "catalog.sqlite")) as catalog:
+        catalog.update(os.path.dirname(tiny_pickle), workers=0)
+        (row,) = catalog.search("S1")
+        assert row["date"] == "2021-01-01"
+        assert row["protocol"] == "test"
+        assert row["n_channels"] == 15
+        assert (row["ts_min"], row["ts_max"]) == (0.0, 4.0)
+        assert (row["mep_rows"], row["ssep_upper_rows"], row["ssep_lower_rows"]) == (5, 5, 5)
+        assert catalog.search("TEST 2021") and not catalog.search("test 2022")
+
+
+def test_catalog_search_many_surgeries_is_fast(tmp_path):
+    with Catalog(str(tmp_path / "catalog.sqlite")) as catalog:
+        rows = [
+            (f"/f{i}", f"S{i:05d}", f"2023-{i % 12 + 1:02d}-01", ("Spine", "Cranial")[i % 2],
+             "M0,M1", 2, 0.0, 1.0, 5, 5, 5)
+            for i in range(10_000)
+        ]
+        with catalog._conn:
+            catalog._conn.executemany(
+                "INSERT INTO files VALUES (?, 0, 0, 0, NULL)", [(r[0],) for r in rows]
+            )
+            catalog._conn.executemany(
+                f"INSERT INTO surgeries VALUES ({', '.join('?' * 11)})", rows
+            )
+        start = time.perf_counter()
+        found = catalog.search("spine 2023-03", limit=None)
+        assert time.perf_counter() - start < 0.5
+        assert len(found) == 834
+        assert all(r["protocol"] == "Spine" for r in found)
+
+
+def test_launch_dialog_loads_catalogued_surgery(qtbot, tmp_path, synthetic_pickle):
+    root = _archive(synthetic_pickle, tmp_path)
+    from ui.launch_dialog import LaunchDialog
+
+    catalog = Catalog(str(tmp_path / "catalog.sqlite"))
+    catalog.update(str(root), workers=0)
+    dialog = LaunchDialog(catalog=catalog)
+    qtbot.addWidget(dialog)
+    assert dialog.results_table.rowCount() == 4
+    dialog.search_edit.setText("b.pkl")
+    assert dialog.results_table.rowCount() == 2
+    wanted = dialog._results[0]["surgery_id"]
+    dialog.load_result(0)
+    assert set(dialog.mep_df["surgery_id"].astype(str)) == {wanted}
+    catalog.close()
+
+
+def test_launch_dialog_scans_in_background(qtbot, tmp_path, synthetic_pickle):
+    root = _archive(synthetic_pickle, tmp_path)
+    from ui.launch_dialog import LaunchDialog
+
+    catalog = Catalog(str(tmp_path / "catalog.sqlite"))
+    dialog = LaunchDialog(catalog=catalog)
+    qtbot.addWidget(dialog)
+    assert dialog.results_table.rowCount() == 0
+    dialog.scan_folder(str(root))
+    assert not dialog.search_edit.isEnabled() and not dialog.scan_btn.isEnabled()
+    qtbot.waitUntil(dialog.scan_btn.isEnabled, timeout=30_000)
+    assert dialog.search_edit.isEnabled()
+    assert dialog.results_table.rowCount() == 4
+    assert dialog.catalog_label.text().startswith("Scanned 2 file(s)")
+    catalog.close()
+
+
+def test_launch_dialog_scan_failures_and_close(qtbot, tmp_path, monkeypatch):
+    from ui.launch_dialog import CatalogScanThread, LaunchDialog
+
+    catalog = Catalog(str(tmp_path / "catalog.sqlite"))
+    dialog = LaunchDialog(catalog=catalog)
+    qtbot.addWidget(dialog)
+
+    def broken(directory, cancelled):
+        raise RuntimeError("worker died")
+
+    monkeypatch.setattr(catalog, "update", broken)
+    dialog.scan_folder(str(tmp_path))
+    qtbot.waitUntil(dialog.scan_btn.isEnabled, timeout=10_000)
+    assert "RuntimeError: worker died" in dialog.catalog_label.text()
+
+    def endless(directory, cancelled):
+        while not cancelled():
+            time.sleep(0.01)
+        return {"scanned": 0, "removed": 0, "failed": 0}
+
+    monkeypatch.setattr(catalog, "update", endless)
+    dialog.scan_folder(str(tmp_path))
+    start = time.perf_counter()
+    dialog.reject()
+    assert time.perf_counter() - start < 0.5
+    CatalogScanThread.wait_all()
+    catalog.close()
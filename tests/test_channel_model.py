@@ -0,0 +1,85 @@
+import re
+import time
+
+import pytest
+from PyQt5.QtCore import QModelIndex, Qt
+
+from ui.channel_model import ChannelListModel
+
+
+def _model(channels=("L1", "R1", "L2", "R2", "Lx")):
+    model = ChannelListModel()
+    model.set_channels(channels)
+    return model
+
+
+def test_bulk_operations_emit_one_notification(qtbot):
+    model = _model()
+    changes = []
+    model.checkedChanged.connect(lambda: changes.append(model.checked_channels()))
+    model.check_side("right")
+    model.check_side("left")
+    model.check_all(False)
+    model.check_all(False)  # unchanged: no notification
+    model.check_matching(r"^l\d$")
+    assert changes == [["R1", "R2"], ["L1", "L2", "Lx"], [], ["L1", "L2"]]
+    with pytest.raises(re.error):
+        model.check_matching("(")
+
+    index = model.index(4)
+    assert model.setData(index, Qt.Checked, Qt.CheckStateRole)
+    assert model.data(index, Qt.CheckStateRole) == Qt.Checked
+    assert model.is_checked("Lx") and len(changes) == 5
+
+
+def test_reorder_and_repopulate(qtbot):
+    model = _model()
+    orders = []
+    model.orderChanged.connect(orders.append)
+    model.check_side("left")
+    assert model.moveRow(QModelIndex(), 0, QModelIndex(), 3)
+    assert model.channels() == ["R1", "L2", "L1", "R2", "Lx"]
+    assert model.checked_channels() == ["L2", "L1", "Lx"]
+    assert orders == [model.channels()]
+    assert not model.moveRow(QModelIndex(), 0, QModelIndex(), 0)
+
+    # The same channels keep their order and check state
+    assert not model.set_channels(["Lx", "L1", "L2", "R1", "R2"])
+    assert model.checked_channels() == ["L2", "L1", "Lx"]
+    assert model.set_channels(["A", "B"], checked=False)
+    assert model.checked_channels() == [] and model.rowCount() == 2
+
+
+def test_many_channels_stay_responsive(qtbot):
+    from ui.controls_dock import ChannelListView
+
+    model = ChannelListModel()
+    view = ChannelListView(model)
+    qtbot.addWidget(view)
+    view.show()
+    channels = [f"{side}{i}" for i in range(400) for side in "LR"]
+    start = time.perf_counter()
+    model.set_channels(channels)
+    for _ in range(20):
+        model.check_side("right")
+        model.check_all(True)
+        assert len(model.checked_channels()) == 800
+    assert time.perf_counter() - start < 1.0
+
+
+def test_main_window_plots_checked_channels(qtbot, tiny_pickle):
+    from src import data_loader
+    from ui.main_window import MainWindow
+
+    window = MainWindow()
+    qtbot.addWidget(window)
+    window.load_data(*data_loader.load_signals(tiny_pickle))
+    plotted = []
+    window.mep_view.update_view = lambda df, sid, ts, channels, **kwargs: plotted.append(channels)
+    window.channel_model.check_matching("^M[01]$")
+    assert plotted == [["M0", "M1"]]
+    reordered = []
+    window.channelsReordered.connect(reordered.append)
+    window.channel_model.moveRow(QModelIndex(), 1, QModelIndex(), 0)
+    assert reordered[-1][:2] == ["M1", "M0"]
+    assert plotted[-1] == ["M1", "M0"]
@@ -0,0 +1,106 @@
+import os
+
+import numpy as np
+import pytest
+
+from src import catalog, chunk_store, data_loader
+from src.packed import cached_columns, packed_column
+
+
+def _archive(synthetic_pickle, tmp_path, **kwargs):
+    pkl = synthetic_pickle()
+    frames = data_loader.load_signals(pkl, check_integrity=False)
+    return frames, chunk_store.export_frames(frames, str(tmp_path / "archive"), **kwargs)
+
+
+def _sorted(df):
+    keys = df.assign(_sid=df["surgery_id"].astype(str), _ch=df["channel"].astype(str))
+    return keys.sort_values(["_sid", "_ch"], kind="stable").reset_index(drop=True)
+
+
+def test_roundtrip_is_lossless(tmp_path, synthetic_pickle):
+    frames, path = _archive(synthetic_pickle, tmp_path)
+    assert chunk_store.is_chunk_store(path)
+    assert os.path.abspath(path) in catalog.iter_data_files(str(tmp_path))
+    loaded = data_loader.load_signals(path, check_integrity=False)
+    for original, df in zip(frames[:3], loaded[:3]):
+        assert df.index.equals(original.index)
+        for column in ("values", "baseline_values"):
+            for a, b in zip(original[column], df[column]):
+                np.testing.assert_array_equal(np.asarray(a, dtype=np.float32), b)
+        assert list(df["timestamp"]) == list(original["timestamp"])
+        assert "values" in cached_columns(df)
+        # Shared baselines are stored and returned once
+        firsts = df.groupby(["surgery_id", "channel"])["baseline_values"].agg(
+            lambda s: all(b is s.iloc[0] for b in s))
+        assert firsts.all()
+    assert loaded[3].equals(frames[3])
+
+
+def test_roundtrip_keeps_row_order_and_missing_baselines(tmp_path, synthetic_pickle):
+    frames, _ = _archive(synthetic_pickle, tmp_path)
+    mep = frames[0].sample(frac=1.0, random_state=0)
+    mep["baseline_values"] = [None if i % 3 == 0 else b
+                              for i, b in enumerate(mep["baseline_values"])]
+    path = chunk_store.export_frames((mep,) + frames[1:], str(tmp_path / "shuffled"))
+
+    loaded = chunk_store.read_archive(path)[0]
+    assert loaded.index.equals(mep.index)
+    assert list(loaded["timestamp"]) == list(mep["timestamp"])
+    for a, b in zip(mep["baseline_values"], loaded["baseline_values"]):
+        assert (a is None) == (b is None)
+        if a is not None:
+            np.testing.assert_array_equal(np.asarray(a, dtype=np.float32), b)
+    for a, b in zip(mep["values"], loaded["values"]):
+        np.testing.assert_array_equal(np.asarray(a, dtype=np.float32), b)
+    np.testing.assert_array_equal(packed_column(loaded, "values").take([0]).data,
+                                  np.asarray(mep["values"].iloc[0], dtype=np.float32))
+
+    sid = str(mep["surgery_id"].iloc[0])
+    part = chunk_store.read_archive(path, surgeries=[sid])[0]
+    assert part.index.equals(mep.index[mep["surgery_id"].astype(str) == sid])
+
+
+def test_partial_read_decodes_only_needed_chunks(tmp_path, synthetic_pickle, monkeypatch):
+    frames, path = _archive(synthetic_pickle, tmp_path)
+    decoded = []
+    original = chunk_store.decode_chunk
+    monkeypatch.setattr(chunk_store, "decode_chunk",
+                        lambda buffer, n, *a, **k: decoded.append(n) or original(buffer, n, *a, **k))
+    sid = str(frames[0]["surgery_id"].iloc[0])
+    channel = str(frames[0]["channel"].iloc[0])
+    mep = chunk_store.read_archive(path, columns=["surgery_id", "channel", "values"],
+                                   surgeries=[sid], channels=[channel], workers=2)[0]
+    assert set(mep["surgery_id"].astype(str)) == {sid}
+    assert set(mep["channel"].astype(str)) == {channel}
+    expected = _sorted(frames[0])
+    expected = expected[(expected["_sid"] == sid) & (expected["_ch"] == channel)]
+    for a, b in zip(expected["values"], mep["values"]):
+        np.testing.assert_array_equal(np.asarray(a, dtype=np.float32), b)
+    # Only the MEP has this channel; its group is a single chunk
+    assert decoded == [len(mep) * 64]
+    with pytest.raises(KeyError):
+        chunk_store.read_archive(path, columns=["missing"])
+
+
+def test_quantized_waveforms_compress_well():
+    rng = np.random.default_rng(0)
+    samples = np.cumsum(rng.integers(-20, 21, 100_000)).astype(np.float32) / 100
+    buffer, scale = chunk_store.encode_chunk(samples, "zlib")
+    assert scale == 100
+    assert len(buffer) * 3 < samples.nbytes
+    np.testing.assert_array_equal(chunk_store.decode_chunk(buffer, samples.size, scale, "zlib"),
+                                  samples)
+    noisy = rng.normal(size=1000).astype(np.float32)
+    buffer, scale = chunk_store.encode_chunk(noisy, "zlib")
+    assert scale == 0
+    np.testing.assert_array_equal(chunk_store.decode_chunk(buffer, noisy.size, 0, "zlib"), noisy)
+
+
+def test_decimals_round_waveforms(tmp_path, synthetic_pickle):
+    frames, path = _archive(synthetic_pickle, tmp_path, decimals=1)
+    mep = data_loader.load_signals(path, check_integrity=False)[0]
+    np.testing.assert_allclose(np.concatenate(list(mep["values"])),
+                               np.concatenate(list(frames[0]["values"])), atol=0.05 + 1e-5)
+    index = np.load(os.path.join(path, "mep_data.values.index.npy"))
+    assert (index[:, 4] > 0).all()
@@ -0,0 +1,117 @@
+import gc
+
+import numpy as np
+import pandas as pd
+import pyqtgraph as pg
+import pytest
+
+from src.features import (
+    FEATURE_COLUMNS,
+    PEAK_COLUMNS,
+    extract_basic_features,
+    extract_features,
+    frame_features,
+    surgery_features,
+)
+from src.packed import frame_cache
+from src.trends import TrendStore
+
+
+def _frame():
+    rate = 10_000.0
+    t = np.arange(500) / rate * 1000.0  # ms
+    rng = np.random.default_rng(0)
+    rows = []
+    for i, sid in enumerate(["S1", "S1", "S2"]):
+        scale = 100.0 * (i + 1)
+        # Positive peak at 20 ms, negative peak at 30 ms on low noise
+        trace = scale * (np.exp(-((t - 20) / 2) ** 2) - 0.5 * np.exp(-((t - 30) / 2) ** 2))
+        trace += rng.normal(0, 0.5, t.size)
+        rows.append({"surgery_id": sid, "timestamp": i, "channel": "C1",
+                     "values": trace.astype(np.float32), "signal_rate": rate})
+    rows.append({"surgery_id": "S2", "timestamp": 9, "channel": "C1",
+                 "values": np.zeros(0, np.float32), "signal_rate": rate})
+    return pd.DataFrame(rows)
+
+
+def test_extract_features_finds_peaks_and_onset():
+    df = _frame()
+    features = extract_features(df)
+    assert list(features.columns) == PEAK_COLUMNS
+    first = features.iloc[0]
+    assert first["pos_latency"] == pytest.approx(20.0, abs=0.5)
+    assert first["neg_latency"] == pytest.approx(30.0, abs=0.5)
+    assert first["latency"] == first["pos_latency"]
+    assert first["amplitude"] == pytest.approx(150.0, rel=0.05)
+    assert 10.0 < first["onset"] < 20.0
+    assert features["amplitude"].iloc[2] == pytest.approx(3 * first["amplitude"], rel=0.05)
+    assert features.iloc[3].isna().all()
+
+
+def test_basic_features_match_full_features():
+    df = _frame()
+    # Equal positive and negative peaks: both paths pick the positive one
+    df.at[1, "values"] = np.r_[np.zeros(10), 5.0, np.zeros(10), -5.0, np.zeros(10)].astype(np.float32)
+    pd.testing.assert_frame_equal(extract_basic_features(df),
+                                  extract_features(df)[FEATURE_COLUMNS])
+
+
+def test_features_are_cached_per_surgery():
+    df = _frame()
+    s1 = surgery_features(df, "S1")
+    assert list(s1.index) == [0, 1]
+    assert surgery_features(df, "S1") is s1
+    everything = frame_features(df)
+    assert list(everything.index) == list(df.index)
+    pd.testing.assert_frame_equal(everything, extract_features(df))
+    # Filtered views of the frame look up the cached rows by label
+    view = df[df["timestamp"] == 1]
+    assert s1.loc[view.index[0], "amplitude"] == everything.loc[1, "amplitude"]
+
+
+def test_trend_store_amplitude_and_latency_metrics():
+    df = _frame()
+    store = TrendStore(persist=False)
+    store.update(df, "MEP", "amplitude")
+    store.update(df, "MEP", "latency")
+    amplitude = store.series("S1", "MEP", "amplitude")
+    assert amplitude["amplitude"].to_numpy() == pytest.approx(
+        extract_features(df)["amplitude"].to_numpy()[:2]
+    )
+    assert store.series("S1", "MEP", "latency")["latency"].to_numpy() == pytest.approx(
+        [20.0, 20.0], abs=0.5
+    )
+
+
+def test_views_draw_markers_from_features(qtbot, tiny_pickle):
+    from src import data_loader
+    from ui.mep_view import MepView
+    from ui.trend_view import TrendView
+
+    mep, ssep_u, ssep_l, meta = data_loader.load_signals(tiny_pickle)
+    view = MepView()
+    qtbot.addWidget(view)
+    channels = list(mep["channel"])
+    view.update_view(mep, "S1", 0, channels, features=surgery_features(mep, "S1"))
+    scatters = [item for plot in (view.left_plot, view.right_plot)
+                for item in plot.plotItem.items if isinstance(item, pg.ScatterPlotItem)]
+    assert len(scatters) == 1 and len(scatters[0].data) >= 2
+
+    trend = TrendView(trend_store=TrendStore(persist=False))
+    qtbot.addWidget(trend)
+    trend.refresh({"mep_df": mep, "ssep_upper_df": ssep_u, "ssep_lower_df": ssep_l,
+                   "surgery_meta_df": meta})
+    trend.set_current_surgery("S1")
+    trend.metric_combo.setCurrentText("Latency")
+    assert trend._store.series("S1", "MEP", "latency") is not None
+    assert trend.global_plot.hover_y_label == "ms"
+
+
+def test_frame_cache_entries_live_with_their_frame():
+    registry = {}
+    df = pd.DataFrame({"a": [1]})
+    entry = frame_cache(registry, df, dict)
+    assert frame_cache(registry, df, list) is entry
+    del df
+    gc.collect()
+    assert registry == {}
@@ -16,3 +16,24 @@ def test_gui_smoke(qtbot, tiny_pickle, monkeypatch):
     window.show()
     qtbot.wait(100)
     assert window.isVisible()
+
+
+def test_trend_compare_mode(qtbot, tiny_pickle):
+    from src import data_loader
+    from ui.trend_view import TrendView
+
+    mep, ssep_u, ssep_l, meta = data_loader.load_signals(tiny_pickle)
+    view = TrendView()
+    qtbot.addWidget(view)
+    view.refresh({"mep_df": mep, "ssep_upper_df": ssep_u, "ssep_lower_df": ssep_l,
+                  "surgery_meta_df": meta})
+    view.set_current_surgery("S1")
+    view.compare_check.setChecked(True)
+
+    assert view.compare_channel_combo.count() == 5
+    assert len(view.compare_plot.plotItem.listDataItems()) == 1
+
+    view.modality_combo.setCurrentText("SSEP_UPPER")
+    channels = [view.compare_channel_combo.itemText(i)
+                for i in range(view.compare_channel_combo.count())]
+    assert channels == [f"U{i}" for i in range(5)]
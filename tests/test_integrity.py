@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+
+from src import data_loader
+from src.integrity import quarantine, scan_frame
+from src.packed import cached_columns
+
+
+def make_df():
+    return pd.DataFrame({
+        "surgery_id": ["S1"] * 6,
+        "timestamp": [0, 1, 2, 1, 3, 3],
+        "channel": ["a"] * 6,
+        "values": [[1, 2, 3], [], [1, np.nan, 3], [1, 2], [1, 2, 3], [4, 5, 6]],
+        "signal_rate": [1000, 1000, 1000, 1000, np.nan, 1000],
+        "baseline_values": [[1], [1], [1], [], [1], [1]],
+        "baseline_signal_rate": [1000] * 6,
+    })
+
+
+def test_scan_frame_counts():
+    report = scan_frame(make_df(), "mep")
+    counts = report.counts
+
+    assert counts["empty_values"] == 1
+    assert counts["non_finite"] == 1
+    assert counts["length_mismatch"] == 1
+    assert counts["bad_rate"] == 1
+    assert counts["empty_baseline"] == 1
+    assert counts["non_monotonic"] == 1
+    assert counts["duplicate_key"] == 2
+    assert "quarantined" in report.summary()
+
+
+def test_quarantine_keeps_packed_store():
+    df = make_df()
+    report = scan_frame(df)
+    clean = quarantine(df, report)
+
+    assert list(clean["timestamp"]) == [0, 3]
+    assert len(report.quarantined) == 4
+    assert "values" in cached_columns(clean)
+
+
+def test_load_signals_reports(tiny_pickle):
+    reports = {}
+    mep, *_ = data_loader.load_signals(tiny_pickle, reports=reports)
+
+    assert set(reports) == {"mep_data", "ssep_upper_data", "ssep_lower_data"}
+    assert reports["mep_data"].quarantined.empty
+    assert len(mep) == 5
@@ -1,5 +1,7 @@
 import pandas as pd
-from src import data_loader
+import pytest
+
+from src import chunk_store, data_loader, parquet_store, shared_store
 
 REQUIRED = {"surgery_id", "channel", "timestamp", "values", "baseline_values", "signal_rate"}
 
@@ -12,3 +14,35 @@ def test_load_signals(tiny_pickle):
 
     for df in (mep, ssep_u, ssep_l):
         assert REQUIRED.issubset(df.columns)
+
+
+def test_load_signals_projection(tiny_pickle):
+    mep, *_ = data_loader.load_signals(
+        tiny_pickle, columns=data_loader.DISPLAY_COLUMNS, surgeries=["S1"]
+    )
+    assert list(mep.columns) == data_loader.DISPLAY_COLUMNS
+    assert len(mep) == 5
+
+
+def _convert(backend, pkl, tmp_path):
+    if backend == "pickle":
+        return pkl
+    if backend == "parquet":
+        pytest.importorskip("pyarrow")
+        return parquet_store.convert_pickle(pkl, str(tmp_path / "parquet"))
+    frames = data_loader.load_signals(pkl, check_integrity=False)
+    store = shared_store if backend == "shared" else chunk_store
+    return store.export_frames(frames, str(tmp_path / backend))
+
+
+@pytest.mark.parametrize("backend", ["pickle", "parquet", "shared", "chunked"])
+def test_surgery_filter_applies_to_metadata(backend, synthetic_pickle, tmp_path):
+    path = _convert(backend, synthetic_pickle(), tmp_path)
+    everything = data_loader.load_signals(path)[3]
+    assert len(everything.index) == 3
+    wanted = str(everything.index[1])
+
+    frames = data_loader.load_signals(path, surgeries=[wanted])
+    assert [str(sid) for sid in frames[3].index] == [wanted]
+    for df in frames[:3]:
+        assert set(df["surgery_id"].astype(str)) == {wanted}
@@ -0,0 +1,123 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src import data_loader, memory
+from src.features import frame_features, surgery_features
+from src.memory import (
+    ACCOUNTANT,
+    MemoryAccountant,
+    frame_buffers,
+    parse_size,
+    total_bytes,
+)
+from src.packed import packed_column
+from src.resample import difference_energy
+
+
+def test_shared_buffers_are_counted_once(tmp_path):
+    baseline = np.zeros(1000, dtype=np.float32)
+    store = np.arange(3000, dtype=np.float32)
+    df = pd.DataFrame({
+        "timestamp": np.arange(3.0),
+        "values": [store[i * 1000:(i + 1) * 1000] for i in range(3)],
+        "baseline_values": [baseline] * 3,
+    })
+    buffers = frame_buffers(df)
+    assert total_bytes(buffers) - store.nbytes - baseline.nbytes < 2000
+    # A selection shares the cells with its frame
+    subset = df[df["timestamp"] > 0]
+    assert total_bytes(buffers, frame_buffers(subset)) - total_bytes(buffers) < 1000
+
+    mapped = np.memmap(tmp_path / "m.bin", dtype=np.float32, mode="w+", shape=(1000,))
+    assert total_bytes(memory.array_buffers(mapped[10:20])) == 0
+    lists = pd.DataFrame({"values": [[0.0] * 1000]})
+    assert total_bytes(frame_buffers(lists)) > 1000 * 24
+
+    assert parse_size("512M") == 512 << 20
+    assert parse_size("1.5GiB") == 3 << 29
+    with pytest.raises(ValueError):
+        parse_size("lots")
+
+
+def test_enforce_evicts_least_valuable_first():
+    accountant = MemoryAccountant()
+    caches = {"pool": np.zeros(100), "small": np.zeros(10), "large": np.zeros(50),
+              "index": np.zeros(200)}
+    data = np.zeros(1000)
+    accountant.register("data", lambda: memory.array_buffers(data), category="data")
+    for name, priority in (("pool", 1), ("small", 2), ("large", 2), ("index", 3)):
+        accountant.register(
+            name, lambda name=name: memory.array_buffers(caches[name]),
+            lambda name=name: caches.__setitem__(name, None), priority=priority,
+        )
+    assert accountant.total() == 8 * 1360
+    assert accountant.enforce(budget=8 * 1300) == ["pool"]
+    assert accountant.enforce(budget=8 * 1200) == ["large", "small"]
+    assert accountant.enforce() == []  # no budget set
+    # Data alone over budget: every cache goes, the data stays
+    accountant.budget = 0
+    assert accountant.enforce() == ["index"]
+    assert accountant.total() == data.nbytes
+
+
+def test_budget_is_respected_under_large_load(synthetic_pickle):
+    path = synthetic_pickle("large.pkl", surgeries=4, channels=16, timestamps=40, samples=1024)
+    frames = data_loader.load_signals(path)
+    for name, df in zip(("MEP", "SSEP upper", "SSEP lower"), frames[:3]):
+        ACCOUNTANT.track_frame(f"test {name}", df)
+    for df in frames[:3]:
+        frame_features(df)
+        difference_energy(df)
+        packed_column(df, "baseline_values")
+
+    entries = {e.name: e for e in ACCOUNTANT.report()}
+    data = sum(entries[f"test {name}"].nbytes for name in ("MEP", "SSEP upper", "SSEP lower"))
+    assert data > 3 * 4 * 16 * 40 * 1024 * 4
+    caches = sum(e.nbytes for e in entries.values() if e.evictable)
+    assert caches > data
+    # A budget that only fits part of the caches
+    budget = ACCOUNTANT.total() - caches // 2
+    evicted = ACCOUNTANT.enforce(budget=budget)
+    assert ACCOUNTANT.total() <= budget
+    assert evicted[:2] == ["Aligned baselines", "Peak features"]
+
+    # Evicted caches are rebuilt on use
+    sid = frames[0]["surgery_id"].iloc[0]
+    assert len(surgery_features(frames[0], sid)) == (frames[0]["surgery_id"] == sid).sum()
+    ACCOUNTANT.enforce(budget=0)
+    remaining = {e.name: e.nbytes for e in ACCOUNTANT.report() if e.evictable}
+    assert not any(remaining.values())
+
+
+def test_main_window_reports_and_trims_plots(qtbot, tiny_pickle, monkeypatch):
+    from ui.main_window import MainWindow
+
+    monkeypatch.setattr(ACCOUNTANT, "budget", ACCOUNTANT.budget)
+
+    mep, upper, lower, meta = data_loader.load_signals(tiny_pickle)
+    window = MainWindow()
+    qtbot.addWidget(window)
+    window.load_data(mep, upper, lower, meta)
+    window.trend_tab.refresh({"mep_df": mep, "ssep_upper_df": upper,
+                              "ssep_lower_df": lower, "surgery_meta_df": meta})
+    window.tabs.setCurrentWidget(window.trend_tab)
+    window.trend_tab.finish_rendering()
+    window.channel_model.check_matching("^M0$")
+    window.trend_tab.finish_rendering()
+    hidden = [ch for ch, plot in window.trend_tab._channel_plots.items() if plot.isHidden()]
+    assert hidden
+
+    window.show_memory_panel()
+    names = [window.memory_panel.table.item(row, 0).text()
+             for row in range(window.memory_panel.table.rowCount())]
+    assert {"MEP data", "Trend plots", "Trend plot pool"} <= set(names)
+    assert "Total" in window.memory_panel.total_label.text()
+
+    window.memory_panel.budget_spin.setValue(1)
+    assert "Trend plot pool" in window.enforce_memory_budget()
+    assert not set(hidden) & set(window.trend_tab._channel_plots)
+    assert "released" in window.statusBar().currentMessage()
+    window.memory_panel.budget_spin.setValue(0)
+    assert ACCOUNTANT.budget is None
+    window.memory_panel.hide()
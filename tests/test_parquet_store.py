@@ -0,0 +1,56 @@
+import pandas as pd
+import pytest
+
+from src import data_loader
+
+pytest.importorskip("pyarrow")
+from src import parquet_store
+
+
+def test_convert_and_load(tiny_pickle, tmp_path):
+    out = parquet_store.convert_pickle(tiny_pickle, str(tmp_path / "ds"))
+    mep, _, _, meta = data_loader.load_signals(out)
+    orig = data_loader.load_signals(tiny_pickle)[0]
+
+    assert len(mep) == len(orig)
+    assert data_loader.REQUIRED_COLUMNS.issubset(mep.columns)
+    assert list(mep["values"].iloc[0]) == pytest.approx(orig["values"].iloc[0], rel=1e-6)
+    assert mep["stimulus"].iloc[0] == {}
+    assert meta.loc["S1", "protocol"] == "test"
+
+
+def test_projection_and_surgery_filter(tiny_pickle, tmp_path):
+    out = parquet_store.convert_pickle(tiny_pickle, str(tmp_path / "ds"))
+    cols = ["surgery_id", "timestamp", "channel", "values"]
+
+    mep, *_ = data_loader.load_signals(out, columns=cols)
+    assert list(mep.columns) == cols
+
+    mep, _, _, meta = data_loader.load_signals(out, columns=cols, surgeries=["missing"])
+    assert mep.empty
+    assert meta.empty
+
+
+def test_schema_validation(tiny_pickle, tmp_path):
+    out = parquet_store.convert_pickle(tiny_pickle, str(tmp_path / "ds"))
+    df = pd.read_parquet(f"{out}/mep_data.parquet").drop(columns=["signal_rate"])
+    df.to_parquet(f"{out}/mep_data.parquet")
+
+    with pytest.raises(KeyError, match="signal_rate"):
+        data_loader.load_signals(out)
+
+
+def test_write_frame_unifies_group_schemas(tmp_path):
+    df = pd.DataFrame({
+        "surgery_id": ["A", "A", "B", "B"],
+        "note": [None, None, "moved", None],
+        "gain": [None, 2, 2.5, None],
+        "values": [[1.0, 2.0], [3.0], None, [4.0]],
+    }).astype({"gain": object})
+    path = str(tmp_path / "frame.parquet")
+    parquet_store.write_frame(df, path)
+
+    back = pd.read_parquet(path)
+    assert back["note"].tolist() == [None, None, "moved", None]
+    assert back["gain"].tolist()[1:3] == [2.0, 2.5]
+    assert parquet_store.pq.ParquetFile(path).num_row_groups == 2
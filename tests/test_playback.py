@@ -0,0 +1,92 @@
+import pytest
+
+from src.playback import PlaybackClock
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_fixed_interval_playback_drops_late_frames():
+    clock = FakeClock()
+    playback = PlaybackClock(range(10), speed=2.0, frame_interval=1.0, clock=clock)
+    playback.start(0)
+    assert playback.advance() is None
+    assert playback.delay() == pytest.approx(0.5)
+    clock.now = 0.5
+    assert playback.advance() == 1
+    # A slow render: by 2.1 s frames 2 and 3 were never shown
+    clock.now = 2.1
+    assert playback.advance() == 4
+    assert playback.dropped == 2 and playback.frames == 2
+    assert playback.delay() == pytest.approx(0.4)
+    clock.now = 10.0
+    assert playback.advance() == 9
+    assert playback.finished and playback.delay() == 0.0
+
+
+def test_realtime_playback_follows_recorded_spacing():
+    clock = FakeClock()
+    times = [100.0, 101.0, 130.0, 131.0]
+    playback = PlaybackClock(times, speed=5.0, realtime=True, clock=clock)
+    playback.start(1)
+    assert playback.delay() == pytest.approx(29.0 / 5.0)
+    clock.now = 5.7
+    assert playback.advance() is None
+    clock.now = 5.8
+    assert playback.advance() == 2
+    assert playback.dropped == 0
+    assert playback.fps() == pytest.approx(1 / 2.0)
+
+
+def test_main_window_playback_uses_clock(qtbot, tiny_pickle):
+    from src import data_loader
+    from ui.main_window import MainWindow
+
+    window = MainWindow()
+    qtbot.addWidget(window)
+    window.load_data(*data_loader.load_signals(tiny_pickle))
+    window._timestamps = list(range(5))
+    window.timestamp_slider.setMaximum(4)
+    window.timestamp_slider.setValue(0)
+    clock = window._clock = FakeClock()
+    window.controls.speed_combo.setCurrentText("x2")
+    window.start_playback()
+    assert window.play_timer.isActive()
+    clock.now = 1.6
+    window._advance_playback()
+    assert window.timestamp_slider.value() == 3
+    assert window.controls.playback_label.text().endswith("2 dropped")
+    clock.now = 10.0
+    window._advance_playback()
+    assert window.timestamp_slider.value() == 4
+    assert not window.play_timer.isActive()
+
+
+def test_manual_seek_restarts_playback_clock(qtbot, tiny_pickle):
+    from src import data_loader
+    from ui.main_window import MainWindow
+
+    window = MainWindow()
+    qtbot.addWidget(window)
+    window.load_data(*data_loader.load_signals(tiny_pickle))
+    window._timestamps = list(range(5))
+    window.timestamp_slider.setMaximum(4)
+    window.timestamp_slider.setValue(3)
+    clock = window._clock = FakeClock()
+    window.start_playback()
+    clock.now = 0.5
+    window.timestamp_slider.setValue(1)
+    assert window._playback.index == 1 and window.play_timer.isActive()
+    # One frame interval after the seek, not after the start, frame 2 is due
+    clock.now = 1.2
+    window._advance_playback()
+    assert window.timestamp_slider.value() == 1
+    clock.now = 1.5
+    window._advance_playback()
+    assert window.timestamp_slider.value() == 2
+    assert window.controls.playback_label.text().endswith("0 dropped")
@@ -0,0 +1,34 @@
+import numpy as np
+
+from ui.plot_widgets import BasePlotWidget, time_base
+
+
+def test_time_base_is_shared():
+    assert time_base(1000, 10) is time_base(1000.0, 10)
+    assert time_base(1000, 10)[1] == 0.001
+
+
+def test_nearest_sample(qtbot):
+    plot = BasePlotWidget()
+    qtbot.addWidget(plot)
+    x = time_base(1000, 100)
+    for i in range(32):
+        plot.add_trace(x, np.full(100, float(i)), f"ch{i}", offset=i * 10.0)
+
+    label, t, value, offset = plot.nearest_sample(0.0504, 52.0)
+    assert label == "ch5"
+    assert t == x[50]
+    assert value == 5.0
+    assert offset == 50.0
+
+    plot.clear()
+    assert plot.nearest_sample(0.05, 0.0) is None
+
+
+def test_clear_override_keeps_forwarding(qtbot):
+    plot = BasePlotWidget()
+    qtbot.addWidget(plot)
+    plot.add_trace(time_base(1000, 10), np.zeros(10), "ch")
+    assert plot.setXRange.__self__ is plot.plotItem
+    plot.clear()
+    assert not plot.plotItem.listDataItems() and not plot._trace_groups
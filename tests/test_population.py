@@ -0,0 +1,54 @@
+import numpy as np
+import pyqtgraph as pg
+import pytest
+
+from src.population import PopulationStats, QuantileSketch, build_population
+
+
+def test_sketch_quantiles_within_relative_accuracy():
+    rng = np.random.default_rng(0)
+    values = rng.lognormal(3, 1, 20_000)
+    sketch = QuantileSketch(alpha=0.01)
+    for chunk in np.array_split(values, 7):
+        sketch.add(chunk)
+    for q in (0.05, 0.25, 0.5, 0.75, 0.95):
+        assert sketch.quantile(q) == pytest.approx(np.quantile(values, q), rel=0.02)
+
+
+def test_sketch_merge_and_roundtrip():
+    a, b = QuantileSketch(), QuantileSketch()
+    a.add([0.0, 1.0, 2.0, 3.0])
+    b.add([100.0, 200.0])
+    a.merge(b)
+    assert a.count == 6
+    restored = QuantileSketch.from_dict(a.to_dict())
+    assert restored.count == 6
+    assert restored.quantile(1.0) == pytest.approx(200.0, rel=0.01)
+    assert restored.quantile(0.0) == 0.0
+
+
+def test_build_population_per_protocol(tiny_pickle, tmp_path):
+    out = tmp_path / "population.json"
+    stats = build_population([tiny_pickle], str(out), workers=0)
+    assert stats.surgeries == {"S1"}
+    band = stats.band("MEP", "M0", "test", "amplitude")
+    assert band["median"] == pytest.approx(1.0, rel=0.01)
+    assert stats.band("MEP", "M0", "other", "amplitude") is None
+
+    loaded = PopulationStats.load(str(out))
+    assert loaded.band("MEP", "M0", "test", "l1") == stats.band("MEP", "M0", "test", "l1")
+
+
+def test_trend_view_shades_population_band(qtbot, tiny_pickle):
+    from src.data_loader import load_signals
+    from ui.trend_view import TrendView
+
+    stats = build_population([tiny_pickle], workers=0)
+    mep, upper, lower, meta = load_signals(tiny_pickle)
+    view = TrendView(population_stats=stats)
+    qtbot.addWidget(view)
+    view.refresh({"mep_df": mep, "ssep_upper_df": upper, "ssep_lower_df": lower,
+                  "surgery_meta_df": meta})
+    view.set_current_surgery("S1")
+    items = view._channel_plots["M0"].plotItem.items
+    assert sum(isinstance(item, pg.LinearRegionItem) for item in items) == 2
@@ -0,0 +1,76 @@
+import json
+import time
+
+from src.profiler import PROFILER, Profiler, profiled
+
+
+def test_disabled_profiler_records_nothing():
+    prof = Profiler(enabled=False)
+    with prof.frame(), prof.stage("work"):
+        pass
+    assert prof.summary()["frames"] == 0
+    assert prof.summary()["stages"] == {}
+
+
+def test_frames_include_later_stages():
+    prof = Profiler(enabled=True)
+    for _ in range(3):
+        with prof.frame("update"), prof.stage("filter"):
+            time.sleep(0.002)
+        with prof.stage("paint"):
+            time.sleep(0.003)
+    summary = prof.summary()
+    assert summary["frames"] == 3
+    assert summary["frame_p50_ms"] >= 5
+    assert summary["stages"]["filter"]["calls"] == 3
+    assert summary["stages"]["paint"]["per_frame_ms"] >= 3
+
+
+def test_ring_buffer_keeps_latest_records(tmp_path):
+    prof = Profiler(capacity=16, enabled=True)
+    for _ in range(50):
+        with prof.frame(), prof.stage("a"):
+            pass
+    summary = prof.summary()
+    assert summary["stages"]["a"]["calls"] == 8
+    assert 0 < summary["frames"] <= 8
+
+    path = tmp_path / "profile.json"
+    prof.dump_json(str(path))
+    data = json.loads(path.read_text())
+    assert len(data["records"]) == 16
+    assert data["records"][-1]["frame"] == 50
+
+
+def test_profiled_decorator(monkeypatch):
+    monkeypatch.setattr(PROFILER, "enabled", True)
+    PROFILER.reset()
+
+    @profiled("double")
+    def double(x):
+        return 2 * x
+
+    assert double(2) == 4
+    assert PROFILER.summary()["stages"]["double"]["calls"] == 1
+    PROFILER.reset()
+
+
+def test_main_window_profiles_frames(qtbot, tiny_pickle, tmp_path):
+    from src.data_loader import load_signals
+    from ui.main_window import MainWindow
+
+    window = MainWindow()
+    qtbot.addWidget(window)
+    window.load_data(*load_signals(tiny_pickle))
+    window.toggle_profiler_hud()
+    try:
+        assert PROFILER.enabled
+        window.update_plots()
+        stages = PROFILER.summary()["stages"]
+        assert {"update_plots", "MepView.update_view", "filter", "plot_items"} <= set(stages)
+        path = window.dump_profile(str(tmp_path / "p.json"))
+        with open(path) as f:
+            assert json.load(f)["summary"]["frames"] >= 1
+    finally:
+        window.toggle_profiler_hud()
+    assert not PROFILER.enabled
@@ -0,0 +1,87 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src import resample
+from src.resample import (
+    aligned_baselines,
+    difference_energy,
+    resample_kernel,
+    surgery_differences,
+)
+from src.trends import TrendStore
+
+
+def _frame():
+    """Traces at 10 kHz whose shared baselines are recorded at 5 kHz."""
+    t_trace = np.arange(400) / 10_000.0
+    t_base = np.arange(150) / 5_000.0
+    baseline = np.sin(2 * np.pi * 50 * t_base).astype(np.float32)
+    rows = []
+    for ts in range(3):
+        trace = np.sin(2 * np.pi * 50 * t_trace) + ts
+        rows.append({"surgery_id": "S1", "timestamp": ts, "channel": "C1",
+                     "values": trace.astype(np.float32), "signal_rate": 10_000.0,
+                     "baseline_values": baseline, "baseline_signal_rate": 5_000.0,
+                     "baseline_timestamp": 0})
+    rows.append({"surgery_id": "S2", "timestamp": 0, "channel": "C1",
+                 "values": np.ones(400, np.float32), "signal_rate": 10_000.0,
+                 "baseline_values": np.zeros(0, np.float32), "baseline_signal_rate": 5_000.0,
+                 "baseline_timestamp": 0})
+    return pd.DataFrame(rows)
+
+
+def test_kernel_interpolates_onto_target_grid():
+    i0, i1, weight, valid = resample_kernel(5_000.0, 4, 10_000.0, 10)
+    source = np.array([[0.0, 2.0, 4.0, 6.0]], dtype=np.float32)
+    out = resample.resample_block(source, (i0, i1, weight, valid))
+    assert out[0, :7] == pytest.approx([0, 1, 2, 3, 4, 5, 6])
+    assert np.isnan(out[0, 7:]).all()
+    assert resample_kernel(5_000.0, 4, 10_000.0, 10)[0] is i0
+    assert not i0.flags.writeable
+
+
+def test_baselines_are_aligned_and_resampled_once():
+    df = _frame()
+    aligned = aligned_baselines(df)
+    assert [len(a) for a in aligned] == [400] * 4
+    # The 30 ms baseline covers the first 299 samples of the 40 ms trace
+    expected = np.sin(2 * np.pi * 50 * np.arange(299) / 10_000.0)
+    assert aligned[0][:299] == pytest.approx(expected, abs=2e-3)
+    assert np.isnan(aligned[0][299:]).all()
+    # Rows sharing a baseline share one resampled array
+    assert aligned[0] is aligned[1] is aligned[2]
+    assert np.isnan(aligned[3]).all()
+    assert aligned_baselines(df, [2])[0] is aligned[0]
+
+
+def test_differences_and_energy_metric():
+    df = _frame()
+    diffs = surgery_differences(df, "S1")
+    assert list(diffs.index) == [0, 1, 2]
+    assert surgery_differences(df, "S1") is diffs
+    assert np.nanmax(np.abs(diffs.loc[1][:299] - 1.0)) < 2e-3
+
+    energy = difference_energy(df)["diff_energy"].to_numpy()
+    # Offsets of 0, 1 and 2 µV over the 299 overlapping samples at 10 kHz
+    assert energy[:3] == pytest.approx([0.0, 0.0299, 4 * 0.0299], abs=1e-4)
+    assert np.isnan(energy[3])
+
+    store = TrendStore(persist=False)
+    store.update(df, "MEP", "diff_energy")
+    series = store.series("S1", "MEP", "diff_energy")
+    assert series["diff_energy"].to_numpy() == pytest.approx(energy[:3], abs=1e-6)
+
+
+def test_mep_view_plots_differences(qtbot, tiny_pickle):
+    from src import data_loader
+    from ui.mep_view import MepView
+
+    mep = data_loader.load_signals(tiny_pickle)[0]
+    view = MepView()
+    qtbot.addWidget(view)
+    channels = list(mep["channel"])
+    view.update_view(mep, "S1", 0, channels, differences=surgery_differences(mep, "S1"))
+    labels = [label for plot in (view.left_plot, view.right_plot)
+              for group in plot._trace_groups.values() for label in group.labels]
+    assert labels and all(label.endswith("(difference)") for label in labels)
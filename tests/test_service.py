@@ -0,0 +1,94 @@
+import json
+from urllib.error import HTTPError
+from urllib.request import urlopen
+
+import numpy as np
+import pytest
+
+from src import data_loader
+from src.service import (
+    DataService,
+    LRUCache,
+    ServiceServer,
+    decimate_minmax,
+    decode_waveforms,
+    load_test,
+    sample_paths,
+    start_in_thread,
+)
+from src.trends import TrendStore
+
+
+@pytest.fixture
+def server(tiny_pickle):
+    frames = data_loader.load_signals(tiny_pickle, columns=data_loader.DISPLAY_COLUMNS,
+                                      flatten_stimulus=True)
+    server = ServiceServer(DataService(frames, trend_store=TrendStore(persist=False)),
+                           port=0, workers=4)
+    start_in_thread(server)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _get(server, path):
+    with urlopen(server.url + path, timeout=10) as response:
+        return response.headers, response.read()
+
+
+def test_lru_cache_evicts_least_recently_used():
+    cache = LRUCache(maxsize=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.stats()["hits"] == 3
+
+
+def test_decimate_minmax_keeps_extremes():
+    x = np.arange(10_000.0)
+    y = np.sin(x / 300.0)
+    y[1234] = -5.0
+    xd, yd = decimate_minmax(x, y, 100)
+    assert len(xd) <= 100
+    assert np.all(np.diff(xd) > 0)
+    assert yd.min() == -5.0 and yd.max() == y.max()
+
+
+def test_endpoints(server):
+    _, body = _get(server, "/surgeries")
+    assert json.loads(body) == [{"surgery_id": "S1", "date": "2021-01-01", "protocol": "test"}]
+
+    _, body = _get(server, "/trend?surgery=S1&modality=MEP&channels=M0,M1")
+    trend = json.loads(body)
+    assert list(trend["channels"]) == ["M0", "M1"]
+    assert trend["channels"]["M0"]["timestamp"] == [0.0]
+
+    headers, body = _get(server, "/waveforms?surgery=S1&modality=MEP&timestamp=2")
+    waves = decode_waveforms(headers["X-Waveform-Layout"], body)
+    assert list(waves) == ["M2"]
+    np.testing.assert_allclose(waves["M2"], np.sin(np.linspace(0, np.pi, 5)), rtol=1e-6)
+
+    headers, body = _get(server, "/frame.png?surgery=S1&modality=SSEP_UPPER&timestamp=0"
+                                 "&width=200&height=150")
+    assert headers["Content-Type"] == "image/png"
+    assert body.startswith(b"\x89PNG")
+
+    for path, status in [("/trend?surgery=S9", 404), ("/waveforms?surgery=S1", 400),
+                         ("/nope", 404), ("/catalog", 404)]:
+        with pytest.raises(HTTPError) as info:
+            _get(server, path)
+        assert info.value.code == status
+
+
+def test_concurrent_requests_are_cached(server):
+    paths = sample_paths(server.service)
+    result = load_test(server.url, paths, requests=10 * len(paths), concurrency=8)
+    assert result["errors"] == 0
+    stats = server.service.cache.stats()
+    assert stats["size"] == len(paths)
+    assert stats["hits"] + stats["misses"] == 10 * len(paths)
+    # Concurrent first requests for one key may each miss; repeats must hit
+    assert stats["hits"] >= 8 * len(paths)
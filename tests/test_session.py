@@ -0,0 +1,82 @@
+import os
+
+import numpy as np
+
+from src import data_loader, session, shared_store
+
+
+def _archive(synthetic_pickle):
+    pkl = synthetic_pickle(surgeries=2, channels=3, timestamps=5)
+    frames = data_loader.load_signals(pkl, columns=data_loader.DISPLAY_COLUMNS,
+                                      flatten_stimulus=True)
+    return pkl, frames
+
+
+def test_snapshot_restores_from_warm_store(synthetic_pickle):
+    pkl, frames = _archive(synthetic_pickle)
+    state = {"tab": 1, "surgery": "x", "timestamp": 12.0}
+    path = session.save_session(pkl, frames, state)
+
+    snapshot = session.load_session()
+    assert path == session.session_path()
+    assert snapshot["state"] == state
+    assert shared_store.is_shared_store(snapshot["warm_store"])
+    restored = session.open_session(snapshot)
+    assert len(restored[0]) == len(frames[0])
+    np.testing.assert_array_equal(
+        np.sort(np.concatenate(restored[0]["values"].to_list())),
+        np.sort(np.concatenate(frames[0]["values"].to_list()).astype(np.float32)),
+    )
+
+
+def test_changed_source_falls_back_to_cold_load(synthetic_pickle):
+    pkl, frames = _archive(synthetic_pickle)
+    session.save_session(pkl, frames, {})
+    stat = os.stat(pkl)
+    os.utime(pkl, (stat.st_atime, stat.st_mtime + 10))
+
+    snapshot = session.load_session()
+    assert snapshot["warm_store"] is None
+    assert len(session.open_session(snapshot)[0]) == len(frames[0])
+
+
+def test_new_source_prunes_old_warm_store(synthetic_pickle):
+    pkl, frames = _archive(synthetic_pickle)
+    session.save_session(pkl, frames, {})
+    old = session.load_session()["warm_store"]
+    session.save_session(pkl, frames, {}, surgeries=[frames[0]["surgery_id"].iloc[0]])
+    assert not os.path.exists(old)
+
+    session.clear_session()
+    assert session.load_session() is None
+
+
+def test_window_restores_view_state(qtbot, monkeypatch, synthetic_pickle):
+    from ui.main_window import MainWindow
+
+    pkl, frames = _archive(synthetic_pickle)
+    window = MainWindow()
+    qtbot.addWidget(window)
+    window.load_data(*frames)
+    window.set_source(pkl)
+    window.surgery_combo.setCurrentIndex(1)
+    window.timestamp_slider.setValue(3)
+    channels = window.channel_model.channels()
+    window.channel_model.set_order(channels[::-1])
+    window.channel_model.check_channels(channels[:1])
+    state = window.session_state()
+    # Warm stores are opt-in
+    assert window.save_session()
+    assert session.load_session()["warm_store"] is None
+    monkeypatch.setenv(session.WARM_STORE_ENV, "1")
+    assert window.save_session()
+
+    snapshot = session.load_session()
+    assert shared_store.is_shared_store(snapshot["warm_store"])
+    restored = MainWindow()
+    qtbot.addWidget(restored)
+    restored.load_data(*session.open_session(snapshot), state=snapshot["state"])
+    assert restored.surgery_combo.currentText() == state["surgery"]
+    assert restored.timestamp_slider.value() == 3
+    assert restored.channel_model.channels() == channels[::-1]
+    assert restored.channel_model.checked_channels() == channels[:1]
@@ -0,0 +1,64 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pytest
+
+from src import data_loader, shared_store
+from src.packed import packed_column
+
+
+def _store(synthetic_pickle, tmp_path):
+    pkl = synthetic_pickle()
+    frames = data_loader.load_signals(pkl, columns=data_loader.DISPLAY_COLUMNS,
+                                      flatten_stimulus=True)
+    return frames, shared_store.export_frames(frames, str(tmp_path / "shared"))
+
+
+def _mapped(array):
+    base = array
+    while base is not None and not isinstance(base, np.memmap):
+        base = base.base
+    return base
+
+
+def _sum_values(path):
+    mep = data_loader.load_signals(path, check_integrity=False)[0]
+    return float(packed_column(mep, "values").data.sum(dtype=np.float64))
+
+
+def test_attach_roundtrip_is_zero_copy(tmp_path, synthetic_pickle):
+    frames, path = _store(synthetic_pickle, tmp_path)
+    assert shared_store.is_shared_store(path)
+    attached = data_loader.load_signals(path, flatten_stimulus=True)
+    for original, df in zip(frames[:3], attached[:3]):
+        assert len(df) == len(original)
+        original = original.sort_values("surgery_id", kind="stable").reset_index(drop=True)
+        for a, b in zip(original["values"], df["values"]):
+            np.testing.assert_array_equal(np.asarray(a, dtype=np.float32), b)
+        packed = packed_column(df, "values")
+        assert _mapped(packed.data) is not None
+        assert np.shares_memory(df["values"].iloc[0], packed.data)
+        assert not df["values"].iloc[0].flags.writeable
+    assert attached[3].equals(frames[3])
+
+
+def test_attach_single_surgery_slices_mapping(tmp_path, synthetic_pickle):
+    frames, path = _store(synthetic_pickle, tmp_path)
+    sid = str(frames[0]["surgery_id"].iloc[-1])
+    mep = shared_store.attach(path, columns=["surgery_id", "values"], surgeries=[sid])[0]
+    assert list(mep.columns) == ["surgery_id", "values"]
+    assert set(mep["surgery_id"].astype(str)) == {sid}
+    assert _mapped(packed_column(mep, "values").data) is not None
+
+    both = shared_store.attach(path, surgeries=[sid, str(frames[0]["surgery_id"].iloc[0])])[0]
+    assert both["surgery_id"].nunique() == 2
+    with pytest.raises(KeyError):
+        shared_store.attach(path, columns=["missing"])
+
+
+def test_pool_workers_attach_by_path(tmp_path, synthetic_pickle):
+    _, path = _store(synthetic_pickle, tmp_path)
+    expected = _sum_values(path)
+    with ProcessPoolExecutor(max_workers=2) as pool:
+        results = list(pool.map(_sum_values, [path] * 4))
+    assert results == pytest.approx([expected] * 4)
@@ -0,0 +1,90 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.similarity import compute_similarity, frame_similarity, similarity_path
+from src.trends import TrendStore
+
+RATE = 10_000.0
+
+
+def _pulse(shift_ms=0.0, n=400):
+    t = np.arange(n) / RATE * 1000.0
+    return np.exp(-((t - 15.0 - shift_ms) / 1.5) ** 2).astype(np.float32)
+
+
+def _frame():
+    """Rows of one channel sharing a baseline pulse at 15 ms."""
+    rng = np.random.default_rng(0)
+    traces = [
+        3.0 * _pulse() + 2.0,                   # scaled and offset copy
+        _pulse(shift_ms=2.0),                   # delayed by 2 ms
+        rng.normal(size=400).astype(np.float32),
+        np.zeros(400, np.float32),              # flat: undefined
+    ]
+    return pd.DataFrame({
+        "surgery_id": "S1",
+        "timestamp": np.arange(len(traces)),
+        "channel": "C1",
+        "values": traces,
+        "signal_rate": RATE,
+        "baseline_values": [_pulse()] * len(traces),
+        "baseline_signal_rate": RATE,
+        "baseline_timestamp": 0,
+    })
+
+
+def test_similarity_and_lag_against_baseline():
+    df = _frame()
+    spectra = {}
+    out = compute_similarity(df, spectra=spectra)
+    assert out["similarity"][0] == pytest.approx(1.0, abs=1e-4)
+    assert out["similarity_lag"][0] == pytest.approx(0.0)
+    assert out["similarity"][1] > 0.99
+    assert out["similarity_lag"][1] == pytest.approx(2.0)
+    assert out["similarity"][2] < 0.5
+    assert np.isnan(out["similarity"][3]) and np.isnan(out["similarity_lag"][3])
+    # One spectrum for the one distinct baseline
+    assert len(spectra) == 1
+
+    subset = compute_similarity(df, rows=np.array([1]))
+    assert subset["similarity_lag"][0] == out["similarity_lag"][1]
+
+
+def test_similarity_metrics_in_trend_store():
+    df = _frame()
+    assert frame_similarity(df) is frame_similarity(df)
+    store = TrendStore(persist=False)
+    store.update(df, "MEP", "similarity")
+    store.update(df, "MEP", "similarity_lag")
+    series = store.series("S1", "MEP", "similarity")
+    assert series["similarity"].to_numpy()[:3] == pytest.approx(
+        frame_similarity(df)["similarity"].to_numpy()[:3], abs=1e-6)
+    assert store.series("S1", "MEP", "similarity_lag")["similarity_lag"].iloc[1] == pytest.approx(2.0)
+
+
+def test_worker_pool_matches_in_process(synthetic_pickle):
+    path = synthetic_pickle(surgeries=2, timestamps=3, samples=128)
+    serial = similarity_path(path, _surgeries(path), workers=0)
+    pooled = similarity_path(path, _surgeries(path), workers=2)
+    for a, b in zip(serial, pooled):
+        assert len(a) == len(b) > 0
+        np.testing.assert_allclose(a["similarity"], b["similarity"])
+        assert a["similarity"].between(-1.0001, 1.0001).all()
+
+
+def test_surgeries_are_batched_per_worker(synthetic_pickle, monkeypatch):
+    from src import data_loader
+
+    path = synthetic_pickle(channels=1, timestamps=2)
+    loads = []
+    original = data_loader.load_signals
+    monkeypatch.setattr(data_loader, "load_signals",
+                        lambda *a, **k: loads.append(k["surgeries"]) or original(*a, **k))
+    frames = similarity_path(path, _surgeries(path), workers=0)
+    assert loads == [_surgeries(path)]
+    assert frames[0]["surgery_id"].nunique() == 3
+
+
+def _surgeries(path):
+    return sorted(pd.read_pickle(path)["mep_data"]["surgery_id"].astype(str).unique())
@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.packed import PackedWaveforms
+from src.spectral import channel_spectrogram, power_spectra
+
+
+def make_channel(n, samples=200, rate=1000, freq=50):
+    t = np.arange(samples) / rate
+    return pd.DataFrame({
+        "surgery_id": "S1",
+        "timestamp": np.arange(n)[::-1],
+        "channel": "A",
+        "values": [np.sin(2 * np.pi * freq * t) * (i + 1) for i in range(n)],
+        "signal_rate": rate,
+    })
+
+
+def test_power_spectra_peak_on_common_grid():
+    t1, t2 = np.arange(200) / 1000, np.arange(100) / 500
+    packed = PackedWaveforms.from_sequences([
+        np.sin(2 * np.pi * 100 * t1), np.sin(2 * np.pi * 50 * t2), [], np.ones(10),
+    ])
+    rates = np.array([1000.0, 500.0, 1000.0, np.nan])
+    freqs = np.linspace(0, 500, 101)
+    out = power_spectra(packed, rates, freqs)
+    assert out.shape == (4, 101) and out.dtype == np.float32
+    assert freqs[np.nanargmax(out[0])] == pytest.approx(100)
+    assert freqs[np.nanargmax(out[1])] == pytest.approx(50)
+    # Above the 250 Hz Nyquist frequency of the 500 Hz trace
+    assert np.isnan(out[1, freqs > 250]).all()
+    assert np.isnan(out[2:]).all()
+
+    subset = power_spectra(packed, rates, freqs, rows=np.array([1]))
+    np.testing.assert_array_equal(subset[0], out[1])
+
+
+def test_spectrogram_extends_incrementally():
+    df = make_channel(10)
+    spec = channel_spectrogram(df, "S1", "A", timestamp=3)
+    assert spec.computed == 4
+    # Rows are in timestamp order: the first is timestamp 0, the last frame row
+    np.testing.assert_array_equal(spec.timestamps[:4], [0, 1, 2, 3])
+    first = spec.image().copy()
+
+    assert channel_spectrogram(df, "S1", "A", timestamp=9) is spec
+    assert spec.computed == 10
+    np.testing.assert_array_equal(spec.image(4), first)
+    # Amplitude grows with the row, so later timestamps have less power
+    peak = spec.image().max(axis=1)
+    assert np.all(np.diff(peak) < 0)
+
+
+def test_spectral_view_in_main_window(qtbot, tiny_pickle):
+    from src.data_loader import load_signals
+    from ui.main_window import MainWindow
+
+    window = MainWindow()
+    qtbot.addWidget(window)
+    window.load_data(*load_signals(tiny_pickle))
+    window.tabs.setCurrentWidget(window.spectral_view)
+    window.timestamp_slider.setValue(window.timestamp_slider.maximum())
+    assert window.spectral_view.channel_combo.count() == 5
+    assert window.spectral_view.image.image is not None
@@ -0,0 +1,56 @@
+import pandas as pd
+
+from src import data_loader
+from src.stimulus import INTENSITY_KEY, flatten_stimulus, stimulus_mask, stimulus_values
+
+
+def test_flatten_stimulus_interns_sets():
+    low = {INTENSITY_KEY: 200, "type": 0, "label": "a"}
+    high = {INTENSITY_KEY: 300, "type": 0, "label": "b"}
+    df = pd.DataFrame({"channel": list("wxyz"), "stimulus": [low, high, dict(low), {}]})
+
+    out = flatten_stimulus(df)
+
+    assert "stimulus" not in out.columns
+    assert list(out["stimulus_set"]) == [0, 1, 0, 2]
+    assert out[f"stim_{INTENSITY_KEY}"].dtype.kind in "if"
+    assert isinstance(out["stim_label"].dtype, pd.CategoricalDtype)
+    assert stimulus_values(out, INTENSITY_KEY) == [200, 300]
+    assert list(out[stimulus_mask(out, **{INTENSITY_KEY: 200})]["channel"]) == ["w", "y"]
+
+
+def test_load_signals_flatten(tiny_pickle):
+    mep, *_ = data_loader.load_signals(tiny_pickle, flatten_stimulus=True)
+    assert "stimulus" not in mep.columns
+    assert "baseline_stimulus_set" in mep.columns
+
+
+def test_mask_skips_missing_parameters_and_keeps_precision():
+    precise, label = 12.345678, "high"
+    df = flatten_stimulus(pd.DataFrame({
+        "channel": list("xyz"),
+        "stimulus": [{INTENSITY_KEY: precise, "mode": label}, {INTENSITY_KEY: 12.3, "mode": "low"}, {}],
+    }))
+    values = stimulus_values(df, INTENSITY_KEY)
+    assert len(values) == 2
+    assert list(df[stimulus_mask(df, **{INTENSITY_KEY: values[1]})]["channel"]) == ["x"]
+    assert list(df[stimulus_mask(df, mode=label)]["channel"]) == ["x"]
+    assert stimulus_values(df, "mode") == ["high", "low"]
+
+    other = pd.DataFrame({"channel": ["u", "v"]})
+    assert stimulus_mask(other, **{INTENSITY_KEY: values[1]}).all()
+
+
+def test_intensity_filter_keeps_frames_without_intensity(qtbot, tiny_pickle):
+    from ui.main_window import MainWindow
+
+    mep, upper, lower, meta = data_loader.load_signals(tiny_pickle, flatten_stimulus=True)
+    intensities = [12.345678, 12.3, 12.345678, 40.0, 40.0]
+    mep = mep.assign(**{f"stim_{INTENSITY_KEY}": pd.array(intensities, dtype="float32")})
+    window = MainWindow()
+    qtbot.addWidget(window)
+    window.load_data(mep, upper, lower, meta)
+    assert window.intensity_combo.count() == 4
+    window.intensity_combo.setCurrentIndex(2)
+    assert window._filter_stimulus(mep)["timestamp"].tolist() == [0, 2]
+    assert window._filter_stimulus(upper) is upper
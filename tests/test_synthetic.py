@@ -0,0 +1,34 @@
+import numpy as np
+
+from src import stimulus
+from src.data_loader import load_signals
+from src.synthetic import SyntheticScale, generate_archive, write_archive
+
+
+def test_archive_shape_and_structure():
+    scale = SyntheticScale(surgeries=2, channels=6, timestamps=12, samples=300)
+    archive = generate_archive(scale)
+    mep = archive["mep_data"]
+    assert len(mep) == 2 * 6 * 12
+    assert sorted(archive["_surgerydata"]) == sorted(mep["surgery_id"].unique())
+    assert mep["signal_rate"].nunique() == 2
+    assert {len(v) for v in mep["values"]} == {300}
+    # One baseline per surgery and channel, shared by all its rows
+    first = mep[(mep["surgery_id"] == mep["surgery_id"][0]) & (mep["channel"] == mep["channel"][0])]
+    assert len({id(b) for b in first["baseline_values"]}) == 1
+    assert mep["stimulus"][0][stimulus.INTENSITY_KEY] == 100
+    assert len(stimulus.stimulus_values(
+        stimulus.flatten_stimulus(mep, "stimulus"), stimulus.INTENSITY_KEY
+    )) > 1
+
+
+def test_archive_is_deterministic_and_loads_cleanly(tmp_path):
+    scale = SyntheticScale(surgeries=1, channels=4, timestamps=5, samples=100, seed=3)
+    a = generate_archive(scale)["ssep_lower_data"]
+    b = generate_archive(scale)["ssep_lower_data"]
+    assert np.array_equal(np.vstack(a["values"]), np.vstack(b["values"]))
+
+    reports = {}
+    frames = load_signals(write_archive(str(tmp_path / "s.pkl"), scale), reports=reports)
+    assert all(report.ok for report in reports.values())
+    assert frames[3]["protocol"].tolist() == ["Spine"]
@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.trends import TrendStore, pivot_series
+from ui import trend_heatmap
+from ui.trend_heatmap import TrendHeatmap, bin_columns
+
+
+def test_pivot_series_averages_duplicates():
+    channels, timestamps, matrix = pivot_series([2, 1, 1], ["B", "A", "A"], [5.0, 1.0, 3.0])
+    assert channels.tolist() == ["A", "B"]
+    assert timestamps.tolist() == [1.0, 2.0]
+    assert matrix[0, 0] == 2.0 and matrix[1, 1] == 5.0
+    assert np.isnan(matrix[0, 1])
+
+
+def test_bin_columns_keeps_minimum_and_fills_gaps():
+    ts = np.array([0.0, 1.0, 2.0, 3.0, 10.0])
+    matrix = np.array([[5, 1, 4, 6, 7]], dtype=np.float32)
+    edges, binned = bin_columns(matrix, ts, 5)
+    assert edges[0] == 0 and edges[-1] == 10
+    # Bins: [0,2) -> min(5, 1); [2,4) -> min(4, 6); empty bins repeat 4; last -> 7
+    assert binned[0].tolist() == [1, 4, 4, 4, 7]
+
+
+def test_store_matrix_is_cached_until_recomputed():
+    df = pd.DataFrame({
+        "surgery_id": "S1", "timestamp": [1, 1, 2, 2], "channel": ["A", "B", "A", "B"],
+        "values": [[1.0], [2.0], [3.0], [4.0]],
+    })
+    store = TrendStore(persist=False)
+    store.update(df, "MEP")
+    first = store.matrix("S1", "MEP")
+    assert store.matrix("S1", "MEP") is first
+    assert first[2].tolist() == [[1, 3], [2, 4]]
+    store.update(df.iloc[:3], "MEP")
+    assert store.matrix("S1", "MEP") is not first
+
+
+def test_reorder_only_permutes_rows(qtbot, monkeypatch):
+    heatmap = TrendHeatmap()
+    qtbot.addWidget(heatmap)
+    calls = []
+    original = trend_heatmap.bin_columns
+    monkeypatch.setattr(trend_heatmap, "bin_columns",
+                        lambda *a: (calls.append(1), original(*a))[1])
+    matrix = pivot_series(np.tile(np.arange(100), 3), np.repeat(["A", "B", "C"], 100),
+                          np.repeat([1.0, 2.0, 3.0], 100))
+    heatmap.set_matrix(matrix, ["A", "B", "C"])
+    first = heatmap.image.image.copy()
+    heatmap.set_matrix(matrix, ["C", "A"])
+    assert len(calls) == 1
+    assert np.array_equal(heatmap.image.image, first[[2, 0]])
+
+
+def test_heatmap_click_moves_slider(qtbot, tiny_pickle):
+    from src.data_loader import load_signals
+    from ui.main_window import MainWindow
+
+    mep, upper, lower, meta = load_signals(tiny_pickle)
+    window = MainWindow()
+    qtbot.addWidget(window)
+    window.load_data(mep, upper, lower, meta)
+    window.trend_tab.refresh({"mep_df": mep, "ssep_upper_df": upper,
+                              "ssep_lower_df": lower, "surgery_meta_df": meta})
+    window.tabs.setCurrentWidget(window.trend_tab)
+    window.trend_tab.heatmap_check.setChecked(True)
+    assert window.trend_tab.heatmap.image.image.shape[0] == 5
+    window.trend_tab.heatmap.timestampClicked.emit(3.2)
+    assert window.timestamp_slider.value() == 3
+    assert window.trend_tab.heatmap.cursor.value() == pytest.approx(3)
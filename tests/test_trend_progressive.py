@@ -0,0 +1,60 @@
+from src import data_loader
+from src.trends import TrendStore
+from ui import trend_view
+from ui.trend_view import TrendView
+
+
+def _view(qtbot, synthetic_pickle):
+    path = synthetic_pickle(surgeries=2, channels=24, timestamps=20, samples=32)
+    mep, upper, lower, meta = data_loader.load_signals(path)
+    view = TrendView(trend_store=TrendStore(persist=False))
+    qtbot.addWidget(view)
+    view.refresh({"mep_df": mep, "ssep_upper_df": upper, "ssep_lower_df": lower,
+                  "surgery_meta_df": meta})
+    return view, sorted(mep["surgery_id"].astype(str).unique())
+
+
+def test_channel_plots_are_drawn_in_slices(qtbot, synthetic_pickle, monkeypatch):
+    monkeypatch.setattr(trend_view, "FRAME_BUDGET", 0.0)
+    view, surgeries = _view(qtbot, synthetic_pickle)
+    view.set_current_surgery(surgeries[0])
+    # The summary and one channel plot per slice; the rest are pending
+    assert len(view.global_plot.plotItem.listDataItems()) == 3
+    assert view.rendering
+    pending = len(view._render_queue)
+    assert pending >= 20
+    qtbot.waitUntil(lambda: not view.rendering)
+    assert sum(not plot.isHidden() for plot in view._channel_plots.values()) == pending + 1
+    # Top rows of both columns come first
+    view.set_current_surgery(surgeries[1])
+    rows = [item[1] for item in view._render_queue]
+    assert rows == sorted(rows) and rows[0] == 0
+
+
+def test_new_update_cancels_pending_pass(qtbot, synthetic_pickle, monkeypatch):
+    monkeypatch.setattr(trend_view, "FRAME_BUDGET", 0.0)
+    view, surgeries = _view(qtbot, synthetic_pickle)
+    view.set_current_surgery(surgeries[0])
+    assert view.rendering
+    wanted = [item[0] for item in view._render_queue[:3]]
+    view.set_visible_channels(wanted)
+    view.update_view()
+    # The old pass is dropped; one of the new channels is drawn per slice
+    assert len(view._render_queue) == 2
+    assert {item[0] for item in view._render_queue} < set(wanted)
+    view.finish_rendering()
+    assert not view.rendering
+    shown = {ch for ch, plot in view._channel_plots.items() if not plot.isHidden()}
+    assert shown == set(wanted)
+    view.cancel_rendering()
+    assert not view._render_timer.isActive()
+
+
+def test_modality_change_redraws(qtbot, synthetic_pickle):
+    view, surgeries = _view(qtbot, synthetic_pickle)
+    view.set_current_surgery(surgeries[0])
+    view.finish_rendering()
+    view.modality_combo.setCurrentText("SSEP_UPPER")
+    view.finish_rendering()
+    shown = {ch for ch, plot in view._channel_plots.items() if not plot.isHidden()}
+    assert shown and set(view.ssep_upper_df["channel"].astype(str)) >= shown
@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.trends import TrendStore
+
+
+def make_df(surgery, n=4, baseline=2):
+    return pd.DataFrame({
+        "surgery_id": [surgery] * n * 2,
+        "timestamp": list(range(10, 10 + n)) * 2,
+        "channel": ["A"] * n + ["B"] * n,
+        "values": [[float(i), -float(i)] for i in range(n * 2)],
+        "baseline_timestamp": [baseline] * n * 2,
+    })
+
+
+def test_update_persists_and_reuses(tmp_path):
+    df = pd.concat([make_df("S1"), make_df("S2", baseline=5)], ignore_index=True)
+    store = TrendStore(str(tmp_path))
+    assert sorted(store.update(df, "MEP")) == ["S1", "S2"]
+    assert store.update(df, "MEP") == []
+
+    reopened = TrendStore(str(tmp_path))
+    assert reopened.surgeries("MEP") == ["S1", "S2"]
+    assert reopened.channels("MEP") == ["A", "B"]
+    series = reopened.series("S1", "MEP")
+    assert list(series["l1"][series["channel"] == "B"]) == pytest.approx([8, 10, 12, 14])
+
+
+def test_channel_series_alignment(tmp_path):
+    store = TrendStore(str(tmp_path))
+    store.update(make_df("S1", baseline=4), "MEP")
+
+    x, _ = store.channel_series("S1", "MEP", "A", align="Start")
+    assert list(x) == [0, 1, 2, 3]
+    x, _ = store.channel_series("S1", "MEP", "A", align="Baseline")
+    assert list(x) == [6, 7, 8, 9]
+    assert store.channel_series("S1", "MEP", "A", align="Incision") is None
+
+
+def test_stale_series_recomputed(tmp_path):
+    store = TrendStore(str(tmp_path))
+    store.update(make_df("S1"), "MEP")
+    assert store.update(make_df("S1", n=5), "MEP") == ["S1"]
+    assert np.isclose(store.series("S1", "MEP")["timestamp"].max(), 14)
+
+
+def test_changed_samples_recomputed(tmp_path):
+    store = TrendStore(str(tmp_path))
+    store.update(make_df("S1"), "MEP")
+    rescaled = make_df("S1")
+    rescaled["values"] = [[100 * v for v in row] for row in rescaled["values"]]
+    assert TrendStore(str(tmp_path)).update(rescaled, "MEP") == ["S1"]
+    series = TrendStore(str(tmp_path)).series("S1", "MEP")
+    assert series["l1"].max() == pytest.approx(1400)
+
+
+def test_series_kept_per_dataset(tmp_path):
+    first = TrendStore(dataset=str(tmp_path / "a.pkl"))
+    first.update(make_df("S1"), "MEP")
+    second = TrendStore(dataset=str(tmp_path / "b.pkl"))
+    assert second.directory != first.directory
+    assert second.update(make_df("S1", n=5), "MEP") == ["S1"]
+
+    second.set_dataset(str(tmp_path / "a.pkl"))
+    assert second.directory == first.directory
+    assert second.series("S1", "MEP")["timestamp"].max() == 13
@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.waterfall import WaterfallBuffer, resample_traces, trace_duration
+
+
+def make_channel(n, samples=100, rate=1000):
+    t = np.arange(samples) / rate
+    return pd.DataFrame({
+        "surgery_id": "S1",
+        "timestamp": np.arange(n),
+        "channel": "A",
+        "values": [np.sin(2 * np.pi * 5 * t) * (i + 1) for i in range(n)],
+        "signal_rate": rate,
+    })
+
+
+def test_buffer_rolls_without_losing_order():
+    buf = WaterfallBuffer(n_columns=2, capacity=4)
+    for i in range(7):
+        buf.append(np.full((1, 2), i), np.array([i]))
+    assert buf.image()[:, 0].tolist() == [3, 4, 5, 6]
+    assert buf.keys().tolist() == [3, 4, 5, 6]
+    buf.append(np.arange(10)[:, None] * np.ones((1, 2)))
+    assert buf.image()[:, 0].tolist() == [6, 7, 8, 9]
+    assert buf.image().base is not None  # a view into the buffer
+
+
+def test_resample_interpolates_on_common_grid():
+    df = make_channel(2, samples=100, rate=1000)
+    df["values"] = [df["values"][0], np.arange(50, dtype=float)]
+    df["signal_rate"] = [1000, 500]
+    duration = trace_duration(df)
+    assert duration == pytest.approx(0.1)
+    out = resample_traces(df, 200, duration)
+    assert out.shape == (2, 200)
+    grid = np.linspace(0, 0.1, 200, endpoint=False)
+    expected = np.sin(2 * np.pi * 5 * grid)
+    assert out[0, :-2] == pytest.approx(expected[:-2], abs=1e-2)
+    # The 500 Hz trace ramps one unit per 2 ms and ends at 98 ms
+    assert out[1, 10] == pytest.approx(grid[10] * 500, rel=1e-5)
+    assert np.isnan(out[1, -1])
+
+
+def test_waterfall_view_appends_incrementally(qtbot, monkeypatch):
+    from ui.waterfall_view import WaterfallView
+
+    df = make_channel(50)
+    view = WaterfallView()
+    qtbot.addWidget(view)
+    view.set_data({"MEP": df})
+    calls = []
+    original = view._append
+    monkeypatch.setattr(view, "_append", lambda a, b: (calls.append((a, b)), original(a, b)))
+
+    view.update_view("S1", 9)
+    view.update_view("S1", 19)
+    assert calls == [(0, 10), (10, 20)]
+    assert view.image.image.shape == (20, view.N_COLUMNS)
+
+    view.update_view("S1", 4)
+    assert calls[-1] == (0, 5)
+    assert view.image.image.shape[0] == 5
+
+
+def test_main_window_waterfall_tab(qtbot, tiny_pickle):
+    from src.data_loader import load_signals
+    from ui.main_window import MainWindow
+
+    window = MainWindow()
+    qtbot.addWidget(window)
+    window.load_data(*load_signals(tiny_pickle))
+    window.tabs.setCurrentWidget(window.waterfall_view)
+    window.timestamp_slider.setValue(window.timestamp_slider.maximum())
+    assert window.waterfall_view.channel_combo.count() == 5
+    assert window.waterfall_view.image.image is not None
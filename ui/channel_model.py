@@ -0,0 +1,169 @@
+import re
+
+import numpy as np
+from PyQt5.QtCore import QAbstractListModel, QModelIndex, Qt, pyqtSignal
+
+# Parent index of the top-level rows
+_ROOT = QModelIndex()
+
+
+def is_right(channel) -> bool:
+    """Return True for channels plotted on the right (names starting with "r")."""
+    return str(channel).lower().startswith("r")
+
+
+class ChannelListModel(QAbstractListModel):
+    """Checkable, reorderable channel list backed by NumPy arrays.
+
+    ``_names`` holds the channels in their original order; ``_order`` maps
+    display rows to channels and ``_checked``/``_right`` are per channel.
+    Bulk operations change the arrays at once and emit a single
+    :attr:`checkedChanged`, and reordering emits :attr:`orderChanged`.
+    """
+
+    checkedChanged = pyqtSignal()
+    orderChanged = pyqtSignal(list)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._names = np.empty(0, dtype=object)
+        self._order = np.empty(0, dtype=np.int64)
+        self._checked = np.empty(0, dtype=bool)
+        self._right = np.empty(0, dtype=bool)
+
+    # -----------------------------------------------------
+    # Qt model interface
+    # -----------------------------------------------------
+    def rowCount(self, parent=_ROOT):
+        return 0 if parent.isValid() else self._order.size
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or not 0 <= index.row() < self._order.size:
+            return None
+        channel = self._order[index.row()]
+        if role == Qt.DisplayRole:
+            return self._names[channel]
+        if role == Qt.CheckStateRole:
+            return Qt.Checked if self._checked[channel] else Qt.Unchecked
+        return None
+
+    def setData(self, index, value, role=Qt.EditRole):
+        if role != Qt.CheckStateRole or not index.isValid():
+            return False
+        channel = self._order[index.row()]
+        checked = Qt.CheckState(value) == Qt.Checked
+        if self._checked[channel] != checked:
+            self._checked[channel] = checked
+            self.dataChanged.emit(index, index, [Qt.CheckStateRole])
+            self.checkedChanged.emit()
+        return True
+
+    def flags(self, index):
+        if not index.isValid():
+            # Dropping between rows reorders the list
+            return Qt.ItemIsDropEnabled
+        return (Qt.ItemIsEnabled | Qt.ItemIsSelectable | Qt.ItemIsUserCheckable
+                | Qt.ItemIsDragEnabled)
+
+    def supportedDropActions(self):
+        return Qt.MoveAction
+
+    def moveRows(self, source_parent, source_row, count, dest_parent, dest_row):
+        n = self._order.size
+        if (source_parent.isValid() or dest_parent.isValid() or count <= 0
+                or source_row < 0 or source_row + count > n or not 0 <= dest_row <= n
+                or source_row <= dest_row <= source_row + count):
+            return False
+        if not self.beginMoveRows(QModelIndex(), source_row, source_row + count - 1,
+                                  QModelIndex(), dest_row):
+            return False
+        moved = self._order[source_row:source_row + count]
+        rest = np.delete(self._order, np.s_[source_row:source_row + count])
+        insert_at = dest_row if dest_row < source_row else dest_row - count
+        self._order = np.insert(rest, insert_at, moved)
+        self.endMoveRows()
+        self.orderChanged.emit(self.channels())
+        return True
+
+    # -----------------------------------------------------
+    # Channel state
+    # -----------------------------------------------------
+    def set_channels(self, channels, checked: bool = True) -> bool:
+        """Show ``channels``, all ``checked`` or not; return False if unchanged.
+
+        Setting the channels already shown (in any order) keeps their order
+        and check state, so switching between tabs with the same channels
+        does not reset the list.
+        """
+        names = np.array([str(c) for c in channels], dtype=object)
+        if names.size == self._names.size and set(names) == set(self._names):
+            return False
+        self.beginResetModel()
+        self._names = names
+        self._order = np.arange(names.size)
+        self._checked = np.full(names.size, bool(checked))
+        self._right = np.fromiter((is_right(c) for c in names), dtype=bool, count=names.size)
+        self.endResetModel()
+        self.orderChanged.emit(self.channels())
+        return True
+
+    def set_order(self, channels) -> None:
+        """Show ``channels`` first, in that order, followed by the others.
+
+        Unknown names are ignored. Emits :attr:`orderChanged` if the order
+        changes.
+        """
+        position = {name: i for i, name in enumerate(self._names)}
+        first = [position[c] for c in dict.fromkeys(map(str, channels)) if c in position]
+        rest = self._order[~np.isin(self._order, first)]
+        order = np.concatenate([np.array(first, dtype=np.int64), rest])
+        if np.array_equal(order, self._order):
+            return
+        self.layoutAboutToBeChanged.emit()
+        self._order = order
+        self.layoutChanged.emit()
+        self.orderChanged.emit(self.channels())
+
+    def channels(self) -> list:
+        """Return every channel in display order."""
+        return self._names[self._order].tolist()
+
+    def checked_channels(self) -> list:
+        """Return the checked channels in display order."""
+        return self._names[self._order[self._checked[self._order]]].tolist()
+
+    def is_checked(self, channel) -> bool:
+        match = np.flatnonzero(self._names == str(channel))
+        return bool(match.size and self._checked[match[0]])
+
+    def _set_checked(self, checked: np.ndarray) -> None:
+        """Replace the check state of every channel with one notification."""
+        if np.array_equal(checked, self._checked):
+            return
+        self._checked = checked
+        if self._order.size:
+            self.dataChanged.emit(self.index(0), self.index(self._order.size - 1),
+                                  [Qt.CheckStateRole])
+        self.checkedChanged.emit()
+
+    def check_all(self, checked: bool = True) -> None:
+        self._set_checked(np.full(self._names.size, bool(checked)))
+
+    def check_channels(self, channels) -> None:
+        """Check exactly ``channels``."""
+        self._set_checked(np.isin(self._names, [str(c) for c in channels]))
+
+    def check_side(self, side: str) -> None:
+        """Check only the ``"left"`` or ``"right"`` channels."""
+        self._set_checked(self._right.copy() if side == "right" else ~self._right)
+
+    def check_matching(self, pattern: str) -> None:
+        """Check only the channels matching the regular expression ``pattern``.
+
+        Raises ``re.error`` for an invalid pattern.
+        """
+        regex = re.compile(pattern, re.IGNORECASE)
+        self._set_checked(np.fromiter(
+            (regex.search(name) is not None for name in self._names),
+            dtype=bool, count=self._names.size,
+        ))
@@ -1,4 +1,8 @@
-from PyQt5.QtCore import Qt, pyqtSignal
+import re
+
+import numpy as np
+from PyQt5.QtCore import Qt, QLine
+from PyQt5.QtGui import QColor, QPainter, QPen
 from PyQt5.QtWidgets import (
     QDockWidget,
     QWidget,
@@ -6,23 +10,71 @@ from PyQt5.QtWidgets import (
     QFormLayout,
     QLabel,
     QComboBox,
-    QListWidget,
+    QListView,
     QAbstractItemView,
     QSlider,
     QLineEdit,
     QPushButton,
     QHBoxLayout,
+    QCheckBox,
+    QStyle,
+    QStyleOptionSlider,
 )
 
+from .channel_model import ChannelListModel
+
+
+class ChannelListView(QListView):
+    """List view of a :class:`ChannelListModel` reordered by drag and drop."""
+
+    def __init__(self, model, parent=None):
+        super().__init__(parent)
+        self.setModel(model)
+        self.setUniformItemSizes(True)
+        self.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        self.setDragDropMode(QAbstractItemView.InternalMove)
+        self.setDefaultDropAction(Qt.MoveAction)
+
+
+class MarkedSlider(QSlider):
+    """Slider drawing a tick at each marked value, e.g. annotated timestamps.
 
-class ChannelListWidget(QListWidget):
-    """List widget that emits a signal after internal drag-drop."""
+    Ticks are merged to one per pixel column, so painting does not slow down
+    with thousands of markers.
+    """
 
-    dropped = pyqtSignal()
+    MARKER_COLOR = "#C678DD"
 
-    def dropEvent(self, event):
-        super().dropEvent(event)
-        self.dropped.emit()
+    def __init__(self, orientation, parent=None):
+        super().__init__(orientation, parent)
+        self._markers = np.zeros(0, dtype=np.int64)
+
+    def set_markers(self, values) -> None:
+        """Mark the slider ``values``."""
+        self._markers = np.unique(np.asarray(values, dtype=np.int64))
+        self.update()
+
+    def markers(self) -> np.ndarray:
+        return self._markers
+
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        lo, hi = self.minimum(), self.maximum()
+        if not self._markers.size or hi <= lo:
+            return
+        option = QStyleOptionSlider()
+        self.initStyleOption(option)
+        style = self.style()
+        groove = style.subControlRect(QStyle.CC_Slider, option, QStyle.SC_SliderGroove, self)
+        handle = style.subControlRect(QStyle.CC_Slider, option, QStyle.SC_SliderHandle, self)
+        span = groove.width() - handle.width()
+        xs = groove.x() + handle.width() / 2 + (self._markers - lo) / (hi - lo) * span
+        xs = np.unique(np.round(xs).astype(int))
+        painter = QPainter(self)
+        painter.setPen(QPen(QColor(self.MARKER_COLOR), 2))
+        bottom = self.rect().bottom()
+        painter.drawLines([QLine(x, bottom - 4, x, bottom) for x in xs.tolist()])
+        painter.end()
 
 
 class ControlsDock(QDockWidget):
@@ -48,15 +100,41 @@ class ControlsDock(QDockWidget):
         self.protocol_label = QLabel("N/A")
         form.addRow("Date", self.date_label)
         form.addRow("Protocol", self.protocol_label)
+        self.intensity_combo = QComboBox()
+        self.intensity_combo.addItem("All")
+        form.addRow("Intensity", self.intensity_combo)
+        self.markers_check = QCheckBox("Peak markers")
+        self.markers_check.setChecked(True)
+        form.addRow(self.markers_check)
+        self.difference_check = QCheckBox("Trace − baseline")
+        self.difference_check.setToolTip(
+            "Plot each trace minus its baseline resampled to the trace's time base"
+        )
+        form.addRow(self.difference_check)
         layout.addLayout(form)
 
-        # Channel list
-        self.channel_list = ChannelListWidget()
-        self.channel_list.setDragDropMode(QAbstractItemView.InternalMove)
+        # Channel list and bulk selection
+        self.channel_model = ChannelListModel(self)
+        select_layout = QHBoxLayout()
+        for text, slot in (
+            ("All", lambda: self.channel_model.check_all(True)),
+            ("None", lambda: self.channel_model.check_all(False)),
+            ("Left", lambda: self.channel_model.check_side("left")),
+            ("Right", lambda: self.channel_model.check_side("right")),
+        ):
+            button = QPushButton(text)
+            button.clicked.connect(slot)
+            select_layout.addWidget(button)
+        layout.addLayout(select_layout)
+        self.channel_filter_edit = QLineEdit()
+        self.channel_filter_edit.setPlaceholderText("Check channels matching (regex)")
+        self.channel_filter_edit.returnPressed.connect(self._check_matching)
+        layout.addWidget(self.channel_filter_edit)
+        self.channel_list = ChannelListView(self.channel_model)
         layout.addWidget(self.channel_list)
 
         # Timestamp slider and readout
-        self.timestamp_slider = QSlider(Qt.Horizontal)
+        self.timestamp_slider = MarkedSlider(Qt.Horizontal)
         self.timestamp_slider.setTracking(False)
         layout.addWidget(self.timestamp_slider)
         self.timestamp_label = QLabel("0")
@@ -71,6 +149,15 @@ class ControlsDock(QDockWidget):
         goto_layout.addWidget(self.goto_button)
         layout.addLayout(goto_layout)
 
+        # Annotation of the current timestamp
+        annotate_layout = QHBoxLayout()
+        self.annotation_edit = QLineEdit()
+        self.annotation_edit.setPlaceholderText("Annotate current timestamp")
+        self.annotate_button = QPushButton("Mark")
+        annotate_layout.addWidget(self.annotation_edit)
+        annotate_layout.addWidget(self.annotate_button)
+        layout.addLayout(annotate_layout)
+
         # Playback controls
         play_layout = QHBoxLayout()
         self.play_button = QPushButton("Play")
@@ -90,6 +177,13 @@ class ControlsDock(QDockWidget):
         play_layout.addWidget(self.pause_button)
         play_layout.addWidget(self.speed_combo)
         layout.addLayout(play_layout)
+        playback_info = QHBoxLayout()
+        self.realtime_check = QCheckBox("Real time")
+        self.realtime_check.setToolTip("Follow the recorded spacing of the timestamps")
+        playback_info.addWidget(self.realtime_check)
+        self.playback_label = QLabel("")
+        playback_info.addWidget(self.playback_label)
+        layout.addLayout(playback_info)
 
         # Export buttons
         export_layout = QHBoxLayout()
@@ -100,3 +194,14 @@ class ControlsDock(QDockWidget):
         layout.addLayout(export_layout)
 
         self.setWidget(container)
+
+    def _check_matching(self):
+        """Check the channels matching the filter text; mark invalid patterns."""
+        try:
+            self.channel_model.check_matching(self.channel_filter_edit.text())
+        except re.error as exc:
+            self.channel_filter_edit.setToolTip(f"Invalid pattern: {exc}")
+            self.channel_filter_edit.setStyleSheet("border: 1px solid red")
+            return
+        self.channel_filter_edit.setToolTip("")
+        self.channel_filter_edit.setStyleSheet("")
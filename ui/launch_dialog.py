@@ -1,45 +1,257 @@
+import os
+
+from PyQt5.QtCore import QCoreApplication, QThread, pyqtSignal
 from PyQt5.QtWidgets import (
-    QDialog, QVBoxLayout, QPushButton, QLabel, QFileDialog
+    QDialog, QVBoxLayout, QHBoxLayout, QPushButton, QLabel, QFileDialog,
+    QLineEdit, QTableWidget, QTableWidgetItem, QAbstractItemView, QHeaderView,
 )
 
+from src import catalog as catalog_module
 from src import data_loader
+from src import session as session_module
+
+
+class CatalogScanThread(QThread):
+    """Runs :meth:`src.catalog.Catalog.update` off the GUI thread.
+
+    ``done`` carries the result dict, or the error message if the scan
+    failed. The thread belongs to the application rather than the dialog,
+    so closing the dialog never destroys a running scan; it deletes itself
+    once finished.
+    """
+
+    done = pyqtSignal(object)
+
+    def __init__(self, catalog, directory: str):
+        super().__init__(QCoreApplication.instance())
+        self.catalog = catalog
+        self.directory = directory
+        self.finished.connect(self.deleteLater)
+
+    def run(self):
+        try:
+            result = self.catalog.update(self.directory, cancelled=self.isInterruptionRequested)
+        except Exception as e:  # noqa: BLE001 - the dialog must always hear back
+            result = f"{type(e).__name__}: {e}"
+        self.done.emit(result)
+
+    @staticmethod
+    def wait_all() -> None:
+        """Block until every scan still running has stopped (before exiting)."""
+        app = QCoreApplication.instance()
+        for thread in app.findChildren(CatalogScanThread) if app is not None else []:
+            thread.requestInterruption()
+            thread.wait()
 
 
 class LaunchDialog(QDialog):
-    """Modal dialog prompting the user to select a pickle file."""
+    """Modal dialog prompting the user to select a data file.
 
-    def __init__(self, parent=None):
+    Besides opening a single file, the dialog can search the surgery catalog
+    (:mod:`src.catalog`) and load just one catalogued surgery.
+    """
+
+    RESULT_COLUMNS = ("surgery_id", "date", "protocol", "n_channels", "path")
+    RESULT_LIMIT = 500
+
+    def __init__(self, parent=None, catalog=None):
         super().__init__(parent)
         self.mep_df = None
         self.ssep_upper_df = None
         self.ssep_lower_df = None
         self.surgery_meta_df = None
+        self.integrity_reports = {}
+        # Where the frames came from and, if restored, the session snapshot
+        self.source_path = None
+        self.source_surgeries = None
+        self.session = None
+        self._catalog = catalog
+        self._results = []
+        self._scan = None
         self.setWindowTitle("Select Data File")
         layout = QVBoxLayout(self)
-        layout.addWidget(QLabel("Choose a .pkl file to load"))
+        layout.addWidget(QLabel("Choose a .pkl file, Parquet dataset, shared store or chunked archive to load"))
         open_btn = QPushButton("Open")
         open_btn.clicked.connect(self.select_file)
         layout.addWidget(open_btn)
 
+        self._snapshot = session_module.load_session()
+        if self._snapshot is not None:
+            restore_btn = QPushButton(
+                f"Restore Last Session ({os.path.basename(self._snapshot['source'])})"
+            )
+            restore_btn.setToolTip(self._snapshot["source"])
+            restore_btn.clicked.connect(self.restore_session)
+            layout.addWidget(restore_btn)
+
+        # Catalog search
+        layout.addWidget(QLabel("Or search the surgery catalog"))
+        search_layout = QHBoxLayout()
+        self.search_edit = QLineEdit()
+        self.search_edit.setPlaceholderText("Surgery ID, date, protocol, channel…")
+        self.search_edit.textChanged.connect(self.search_catalog)
+        search_layout.addWidget(self.search_edit)
+        self.scan_btn = QPushButton("Scan Folder…")
+        self.scan_btn.clicked.connect(lambda: self.scan_folder())
+        search_layout.addWidget(self.scan_btn)
+        layout.addLayout(search_layout)
+
+        self.results_table = QTableWidget(0, len(self.RESULT_COLUMNS))
+        self.results_table.setHorizontalHeaderLabels(
+            ["Surgery", "Date", "Protocol", "Channels", "File"]
+        )
+        self.results_table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.results_table.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.results_table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.results_table.verticalHeader().hide()
+        self.results_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
+        self.results_table.horizontalHeader().setStretchLastSection(True)
+        self.results_table.cellDoubleClicked.connect(lambda row, _col: self.load_result(row))
+        layout.addWidget(self.results_table)
+        self.catalog_label = QLabel("")
+        layout.addWidget(self.catalog_label)
+        load_btn = QPushButton("Load Selected Surgery")
+        load_btn.clicked.connect(lambda: self.load_result(self.results_table.currentRow()))
+        layout.addWidget(load_btn)
+
+        if self._catalog is not None or os.path.isfile(catalog_module.default_path()):
+            self.search_catalog()
+
+    @property
+    def catalog(self):
+        if self._catalog is None:
+            self._catalog = catalog_module.Catalog()
+        return self._catalog
+
     def select_file(self):
         path, _ = QFileDialog.getOpenFileName(
             self,
             "Select Data File",
             "",
-            "Pickle Files (*.pkl)"
+            "Data Files (*.pkl *.parquet shared.json chunked.json)"
         )
         if not path:
             return
+        self._load(path)
 
+    def _load(self, path, surgeries=None):
+        self.integrity_reports = {}
         try:
             (
                 self.mep_df,
                 self.ssep_upper_df,
                 self.ssep_lower_df,
                 self.surgery_meta_df,
-            ) = data_loader.load_signals(path)
+            ) = data_loader.load_signals(
+                path,
+                columns=data_loader.DISPLAY_COLUMNS,
+                surgeries=surgeries,
+                flatten_stimulus=True,
+                reports=self.integrity_reports,
+                flag_artifacts=True,
+            )
+            self.source_path, self.source_surgeries = path, surgeries
             self.accept()
-        except (FileNotFoundError, KeyError) as e:
+        except (FileNotFoundError, KeyError, ImportError) as e:
             from PyQt5.QtWidgets import QMessageBox
             QMessageBox.critical(self, "Error Loading File", f"An error occurred:\n{e}")
 
+    def restore_session(self):
+        """Load the last session's data, from its warm store if still valid."""
+        snapshot = self._snapshot
+        self.integrity_reports = {}
+        try:
+            (
+                self.mep_df,
+                self.ssep_upper_df,
+                self.ssep_lower_df,
+                self.surgery_meta_df,
+            ) = session_module.open_session(snapshot, reports=self.integrity_reports)
+        except (FileNotFoundError, KeyError, ImportError) as e:
+            from PyQt5.QtWidgets import QMessageBox
+            QMessageBox.critical(self, "Error Restoring Session", f"An error occurred:\n{e}")
+            return
+        self.source_path = snapshot["source"]
+        self.source_surgeries = snapshot["surgeries"]
+        self.session = snapshot
+        self.accept()
+
+    # -----------------------------------------------------
+    # Catalog
+    # -----------------------------------------------------
+    def scan_folder(self, directory=None):
+        """Add new and changed files below ``directory`` to the catalog.
+
+        The scan runs in a :class:`CatalogScanThread`; searching is disabled
+        until it finishes, since both use the catalog's connection.
+        """
+        if self._scan is not None:
+            return
+        if not directory:
+            directory = QFileDialog.getExistingDirectory(self, "Select Archive Folder")
+        if not directory:
+            return
+        self._scan = CatalogScanThread(self.catalog, directory)
+        self._scan.done.connect(self._scan_finished)
+        self.scan_btn.setEnabled(False)
+        self.search_edit.setEnabled(False)
+        self.catalog_label.setText(f"Scanning {directory}…")
+        self._scan.start()
+
+    def _scan_finished(self, result):
+        self._scan = None
+        self.scan_btn.setEnabled(True)
+        self.search_edit.setEnabled(True)
+        self.search_catalog()
+        if isinstance(result, str):
+            message = f"Scan failed: {result}"
+        else:
+            message = f"Scanned {result['scanned']} file(s)"
+            if result["failed"]:
+                message += f", {result['failed']} could not be read"
+        self.catalog_label.setText(f"{message}. {self.catalog_label.text()}")
+
+    def done(self, result):
+        # Let a running scan stop after its current file without waiting
+        # for it; it no longer reports to this dialog
+        if self._scan is not None:
+            self._scan.requestInterruption()
+            self._scan.done.disconnect(self._scan_finished)
+            self._scan = None
+        super().done(result)
+
+    def search_catalog(self, *_):
+        """Show the catalogued surgeries matching the search text."""
+        if self._scan is not None:
+            return
+        self._results = self.catalog.search(self.search_edit.text(), limit=self.RESULT_LIMIT)
+        table = self.results_table
+        table.setUpdatesEnabled(False)
+        table.setRowCount(len(self._results))
+        for i, row in enumerate(self._results):
+            for j, column in enumerate(self.RESULT_COLUMNS):
+                value = row[column]
+                table.setItem(i, j, QTableWidgetItem("" if value is None else str(value)))
+        table.setUpdatesEnabled(True)
+        total = self.catalog.count()
+        shown = f"{len(self._results)} of {total}" if len(self._results) < total else f"{total}"
+        self.catalog_label.setText(f"{shown} catalogued surgeries")
+
+    def load_result(self, row: int):
+        """Load only the surgery of search result ``row`` from its file."""
+        if not 0 <= row < len(self._results):
+            return
+        result = self._results[row]
+        self._load(result["path"], surgeries=[result["surgery_id"]])
+
+    def integrity_summary(self) -> str:
+        """Return a one-line summary of rows quarantined while loading."""
+        counts = {
+            name: int(report.bad_mask.sum())
+            for name, report in self.integrity_reports.items()
+        }
+        bad = {name: n for name, n in counts.items() if n}
+        if not bad:
+            return ""
+        parts = ", ".join(f"{name}: {n}" for name, n in bad.items())
+        return f"Quarantined malformed rows ({parts})"
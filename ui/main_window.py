@@ -1,4 +1,7 @@
+import os
 import sys
+import time
+import numpy as np
 import pandas as pd
 from PyQt5.QtWidgets import (
     QMainWindow,
@@ -7,13 +10,27 @@ from PyQt5.QtWidgets import (
 )
 
 from .controls_dock import ControlsDock
-from PyQt5.QtWidgets import QListWidgetItem
+from PyQt5.QtWidgets import QShortcut
+from PyQt5.QtGui import QKeySequence
 
 from .trend_view import TrendView
 from .mep_view import MepView
 from .ssep_view import SsepView
+from .waterfall_view import WaterfallView
+from .spectral_view import SpectralView
+from .profiler_hud import ProfilerHud
+from .memory_panel import MemoryPanel
 from PyQt5.QtCore import Qt, pyqtSignal, QTimer
 import style
+from src import session, stimulus
+from src.annotations import annotations
+from src.artifacts import channel_scales
+from src.features import surgery_features
+from src.memory import ACCOUNTANT, format_bytes
+from src.resample import surgery_differences
+from src.cache import cache_dir
+from src.playback import PlaybackClock
+from src.profiler import PROFILER
 
 
 class MainWindow(QMainWindow):
@@ -21,6 +38,8 @@ class MainWindow(QMainWindow):
 
     channelsReordered = pyqtSignal(list)
 
+    MEMORY_CHECK_MS = 5000
+
     def __init__(self, parent=None):
         super().__init__(parent)
         self.setWindowTitle("Competitive Viewer")
@@ -30,9 +49,24 @@ class MainWindow(QMainWindow):
         self.surgery_meta_df = None
         self._timestamps = []
         self.play_timer = QTimer(self)
+        self.play_timer.setSingleShot(True)
+        self.play_timer.setTimerType(Qt.PreciseTimer)
         self.play_timer.timeout.connect(self._advance_playback)
         self._play_interval_ms = 1000
+        self._playback = None
+        self._clock = time.monotonic
+        # (path, surgeries) the data was loaded from, see save_session()
+        self._source = None
+        self._restoring = False
+        # AnnotationStore of the current surgery
+        self._annotations = None
         self._setup_ui()
+        # Caches are trimmed to the memory budget after loading and then
+        # periodically, as redraws fill them
+        self._memory_timer = QTimer(self)
+        self._memory_timer.setInterval(self.MEMORY_CHECK_MS)
+        self._memory_timer.timeout.connect(self.enforce_memory_budget)
+        self._memory_timer.start()
 
     def _setup_ui(self):
         style.apply_dark_theme(QApplication.instance())
@@ -44,6 +78,10 @@ class MainWindow(QMainWindow):
         self.tabs.addTab(self.ssep_view, "SSEP")
         self.trend_tab = TrendView()
         self.tabs.addTab(self.trend_tab, "Trend Analysis")
+        self.waterfall_view = WaterfallView()
+        self.tabs.addTab(self.waterfall_view, "Waterfall")
+        self.spectral_view = SpectralView()
+        self.tabs.addTab(self.spectral_view, "Spectrum")
         self.tabs.currentChanged.connect(self._on_tab_changed)
         self.setCentralWidget(self.tabs)
 
@@ -61,37 +99,55 @@ class MainWindow(QMainWindow):
         self.timestamp_label = self.controls.timestamp_label
         self.controls.goto_button.clicked.connect(self._goto_timestamp)
         self.controls.goto_edit.returnPressed.connect(self._goto_timestamp)
+        self.controls.annotate_button.clicked.connect(self._annotate_current)
+        self.controls.annotation_edit.returnPressed.connect(self._annotate_current)
 
         self.controls.play_button.clicked.connect(self.start_playback)
         self.controls.pause_button.clicked.connect(self.pause_playback)
 
         self.channel_list = self.controls.channel_list
-        self.channel_list.itemChanged.connect(self.on_channels_changed)
-        self.channel_list.dropped.connect(self._emit_channel_order)
+        self.channel_model = self.controls.channel_model
+        self.channel_model.checkedChanged.connect(self.on_channels_changed)
+        self.channel_model.orderChanged.connect(self._emit_channel_order)
 
         self.channelsReordered.connect(self.trend_tab.set_channel_order)
         self.trend_tab.modalityChanged.connect(lambda _:
                                                self._update_channels_for_current_tab())
+        self.trend_tab.modalityChanged.connect(lambda _: self._update_timestamp_slider())
+        self.trend_tab.timestampSelected.connect(self._goto_nearest_timestamp)
 
         self.date_label = self.controls.date_label
         self.protocol_label = self.controls.protocol_label
+        self.intensity_combo = self.controls.intensity_combo
+        self.intensity_combo.currentTextChanged.connect(self._on_intensity_changed)
+        self.controls.markers_check.toggled.connect(lambda _: self.update_plots())
+        self.controls.difference_check.toggled.connect(lambda _: self.update_plots())
+
+        self.waterfall_view.modality_combo.currentTextChanged.connect(
+            lambda _: self._on_tab_changed(self.tabs.currentIndex())
+        )
+        self.waterfall_view.channel_combo.currentTextChanged.connect(lambda _: self.update_plots())
+        self.spectral_view.modality_combo.currentTextChanged.connect(
+            lambda _: self._on_tab_changed(self.tabs.currentIndex())
+        )
+        self.spectral_view.channel_combo.currentTextChanged.connect(lambda _: self.update_plots())
+
+        # Profiler overlay: F12 toggles it, Ctrl+Shift+P dumps the timings
+        self.profiler_hud = ProfilerHud(self.tabs)
+        QShortcut(QKeySequence("F12"), self, activated=self.toggle_profiler_hud)
+        QShortcut(QKeySequence("Ctrl+Shift+P"), self, activated=self.dump_profile)
+
+        # Memory diagnostics: Ctrl+Shift+M
+        self.memory_panel = MemoryPanel(self)
+        QShortcut(QKeySequence("Ctrl+Shift+M"), self, activated=self.show_memory_panel)
 
     def populate_surgeries(self, surgery_ids):
         self.surgery_combo.clear()
         self.surgery_combo.addItems([str(s) for s in surgery_ids])
 
     def populate_channels(self, channels, auto_check=True):
-        self.channel_list.clear()
-        for ch in channels:
-            item = QListWidgetItem(str(ch))
-            item.setFlags(item.flags() | Qt.ItemIsUserCheckable)
-            if auto_check:
-                item.setCheckState(Qt.Checked)
-            else:
-                item.setCheckState(Qt.Unchecked)
-            self.channel_list.addItem(item)
-        # Emit initial order
-        self._emit_channel_order()
+        """Show ``channels``; the list is kept if the channels are unchanged."""
+        self.channel_model.set_channels(channels, checked=auto_check)
 
     # -----------------------------------------------------
     # Data loading
@@ -102,41 +158,69 @@ class MainWindow(QMainWindow):
         ssep_upper_df=None,
         ssep_lower_df=None,
         surgery_meta_df=None,
+        state=None,
     ):
-        """Store dataframes and populate controls."""
-        self.mep_df = mep_df
-        self.ssep_upper_df = ssep_upper_df
-        self.ssep_lower_df = ssep_lower_df
-        self.surgery_meta_df = surgery_meta_df
-
-        surgeries = set()
-        for df in (mep_df, ssep_upper_df, ssep_lower_df):
-            if df is not None:
-                surgeries.update(df["surgery_id"].unique())
-        self.populate_surgeries(sorted(surgeries))
+        """Store dataframes and populate controls.
 
-        self._update_channels_for_current_tab()
-        self._update_timestamp_slider()
-        self._update_surgery_meta_label()
-        if self.surgery_combo.count():
-            self.trend_tab.set_current_surgery(self.surgery_combo.currentText())
+        ``state`` (see :meth:`session_state`) is applied before anything is
+        drawn, so a restored session draws its last frame once.
+        """
+        self._restoring = True
+        try:
+            self.mep_df = mep_df
+            self.ssep_upper_df = ssep_upper_df
+            self.ssep_lower_df = ssep_lower_df
+            self.surgery_meta_df = surgery_meta_df
+            for name, df in (("MEP data", mep_df), ("SSEP upper data", ssep_upper_df),
+                             ("SSEP lower data", ssep_lower_df),
+                             ("Surgery metadata", surgery_meta_df)):
+                ACCOUNTANT.track_frame(name, df)
+
+            surgeries = set()
+            for df in (mep_df, ssep_upper_df, ssep_lower_df):
+                if df is not None:
+                    surgeries.update(df["surgery_id"].unique())
+            self.populate_surgeries(sorted(surgeries))
+            self._update_intensity_combo()
+            self._update_waterfall_data()
+
+            self._update_channels_for_current_tab()
+            self._update_timestamp_slider()
+            self._update_surgery_meta_label()
+            self._update_annotations()
+            if self.surgery_combo.count():
+                self.trend_tab.set_current_surgery(self.surgery_combo.currentText())
+            if state is not None:
+                self._apply_state(state)
+        finally:
+            self._restoring = False
         self.update_plots()
+        # The new frames are measured at the next budget check, off the
+        # path to the first frame
+        self._memory_timer.start()
 
     def on_surgery_changed(self, value):
         self._update_timestamp_slider()
         self._update_surgery_meta_label()
+        self._update_annotations()
         self.trend_tab.set_current_surgery(value)
         self.update_plots()
 
     def on_timestamp_changed(self, value):
+        clock = self._playback
+        if clock is not None and self.play_timer.isActive() and value != clock.index:
+            # Moved by hand while playing: play on from the new frame
+            clock.start(value)
+            self._schedule_playback()
         self.update_plots()
 
 
-    def on_channels_changed(self, item):
+    def on_channels_changed(self):
         self.update_plots()
 
-    def _emit_channel_order(self):
-        order = [self.channel_list.item(i).text() for i in range(self.channel_list.count())]
+    def _emit_channel_order(self, order=None):
+        if order is None:
+            order = self.channel_model.channels()
         self.channelsReordered.emit(order)
         self.update_plots()
 
@@ -151,11 +235,14 @@ class MainWindow(QMainWindow):
     def _current_dataframe(self):
         if self.tabs.currentIndex() == 0:
             return self.mep_df
-        frames = []
-        if self.ssep_upper_df is not None:
-            frames.append(self.ssep_upper_df)
-        if self.ssep_lower_df is not None:
-            frames.append(self.ssep_lower_df)
+        if self.tabs.currentWidget() in (self.waterfall_view, self.spectral_view):
+            return self.tabs.currentWidget().current_dataframe()
+        if self.tabs.currentWidget() == self.trend_tab:
+            return self.trend_tab._current_dataframe()
+        # Only the surgery and timestamp columns are read (timestamp slider),
+        # so the SSEP frames are not copied as a whole
+        frames = [df[["surgery_id", "timestamp"]]
+                  for df in (self.ssep_upper_df, self.ssep_lower_df) if df is not None]
         if frames:
             return pd.concat(frames, ignore_index=True)
         return None
@@ -177,6 +264,9 @@ class MainWindow(QMainWindow):
                 channels = sorted(df["channel"].unique())
             else:
                 channels = []
+        elif tab in (self.waterfall_view, self.spectral_view):
+            df = tab.current_dataframe()
+            channels = sorted(df["channel"].unique()) if df is not None else []
         else:
             channels = set()
             if self.ssep_upper_df is not None:
@@ -186,6 +276,65 @@ class MainWindow(QMainWindow):
             channels = sorted(channels)
         self.populate_channels(channels)
 
+    def _update_intensity_combo(self):
+        """Offer the stimulus intensities present in the loaded data."""
+        values = set()
+        for df in (self.mep_df, self.ssep_upper_df, self.ssep_lower_df):
+            values.update(stimulus.stimulus_values(df, stimulus.INTENSITY_KEY))
+        self.intensity_combo.blockSignals(True)
+        self.intensity_combo.clear()
+        self.intensity_combo.addItem("All")
+        # The item data holds the value itself, so filtering never parses
+        # the displayed text back
+        for value in sorted(values, key=stimulus.value_sort_key):
+            self.intensity_combo.addItem(str(value), value)
+        self.intensity_combo.blockSignals(False)
+
+    def _on_intensity_changed(self, _text):
+        self._update_waterfall_data()
+        self.update_plots()
+
+    def _update_waterfall_data(self):
+        # The waterfall and spectrum cache resampled traces and spectra per
+        # frame, so they get the filtered frames once instead of a fresh
+        # selection on every update.
+        frames = {
+            "MEP": self._filter_stimulus(self.mep_df),
+            "SSEP_UPPER": self._filter_stimulus(self.ssep_upper_df),
+            "SSEP_LOWER": self._filter_stimulus(self.ssep_lower_df),
+        }
+        self.waterfall_view.set_data(frames)
+        self.spectral_view.set_data(frames)
+
+    def _features(self, df, surgery):
+        """Return the cached peak features of ``surgery`` if markers are shown."""
+        if df is None or df.empty or not self.controls.markers_check.isChecked():
+            return None
+        # Computed on the unfiltered frame, whose row labels the filtered
+        # frames keep, so changing the intensity filter reuses the cache
+        return surgery_features(df, surgery)
+
+    def _differences(self, df, surgery):
+        """Return the cached trace-minus-baseline arrays of ``surgery`` if shown."""
+        if df is None or df.empty or not self.controls.difference_check.isChecked():
+            return None
+        return surgery_differences(df, surgery)
+
+    def _scales(self, df, surgery):
+        """Return the cached per-channel display scales of ``surgery``."""
+        if df is None or df.empty:
+            return None
+        # Like the features, computed on the unfiltered frame
+        return channel_scales(df, surgery)
+
+    def _filter_stimulus(self, df):
+        """Restrict ``df`` to the selected stimulus intensity, if any."""
+        value = self.intensity_combo.currentData()
+        if df is None or value is None:
+            return df
+        mask = stimulus.stimulus_mask(df, **{stimulus.INTENSITY_KEY: value})
+        return df if mask.all() else df[mask]
+
     def _update_timestamp_slider(self):
         self.play_timer.stop()
         df = self._current_dataframe()
@@ -204,11 +353,16 @@ class MainWindow(QMainWindow):
             self._update_timestamp_label(0)
         else:
             self.timestamp_slider.setMaximum(0)
+        self._update_annotation_markers()
 
     def update_plots(self):
-        channels = [self.channel_list.item(i).text()
-                    for i in range(self.channel_list.count())
-                    if self.channel_list.item(i).checkState() == Qt.Checked]
+        if self._restoring:
+            return
+        with PROFILER.frame("update_plots"):
+            self._update_plots()
+
+    def _update_plots(self):
+        channels = self.channel_model.checked_channels()
         self.trend_tab.set_visible_channels(channels)
         timestamp = None
         idx = self.timestamp_slider.value()
@@ -218,16 +372,32 @@ class MainWindow(QMainWindow):
         surgery = self.surgery_combo.currentText()
 
         if self.tabs.currentWidget() == self.mep_view:
-            self.mep_view.update_view(self.mep_df, surgery, timestamp, channels)
+            self.mep_view.update_view(
+                self._filter_stimulus(self.mep_df), surgery, timestamp, channels,
+                features=self._features(self.mep_df, surgery),
+                differences=self._differences(self.mep_df, surgery),
+                scales=self._scales(self.mep_df, surgery),
+            )
         elif self.tabs.currentWidget() == self.ssep_view:
             self.ssep_view.update_view(
-                self.ssep_upper_df,
-                self.ssep_lower_df,
+                self._filter_stimulus(self.ssep_upper_df),
+                self._filter_stimulus(self.ssep_lower_df),
                 surgery,
                 timestamp,
                 channels,
+                upper_features=self._features(self.ssep_upper_df, surgery),
+                lower_features=self._features(self.ssep_lower_df, surgery),
+                upper_differences=self._differences(self.ssep_upper_df, surgery),
+                lower_differences=self._differences(self.ssep_lower_df, surgery),
+                upper_scales=self._scales(self.ssep_upper_df, surgery),
+                lower_scales=self._scales(self.ssep_lower_df, surgery),
             )
+        elif self.tabs.currentWidget() == self.waterfall_view:
+            self.waterfall_view.update_view(surgery, timestamp)
+        elif self.tabs.currentWidget() == self.spectral_view:
+            self.spectral_view.update_view(surgery, timestamp)
         else:
+            self.trend_tab.set_current_timestamp(timestamp)
             self.trend_tab.update_view()
 
     def _update_surgery_meta_label(self):
@@ -265,6 +435,13 @@ class MainWindow(QMainWindow):
             value = "N/A"
         self.timestamp_label.setText(str(value))
 
+    def _goto_nearest_timestamp(self, value):
+        """Move the slider to the timestamp closest to ``value``."""
+        if not self._timestamps:
+            return
+        ts = np.asarray(self._timestamps, dtype=float)
+        self.timestamp_slider.setValue(int(np.abs(ts - float(value)).argmin()))
+
     def _goto_timestamp(self):
         """Jump slider to the timestamp entered by the user."""
         text = self.controls.goto_edit.text()
@@ -280,11 +457,191 @@ class MainWindow(QMainWindow):
         except (ValueError, IndexError):
             return
 
+    # -----------------------------------------------------
+    # Profiling
+    # -----------------------------------------------------
+    def toggle_profiler_hud(self):
+        """Show or hide the profiler HUD, recording only while it is shown."""
+        visible = self.profiler_hud.isHidden()
+        PROFILER.enabled = visible
+        if visible:
+            PROFILER.reset()
+        self.profiler_hud.setVisible(visible)
+
+    def dump_profile(self, path=None):
+        """Write the recorded timings to ``path`` (default: cache directory)."""
+        if path is None:
+            name = time.strftime("profile-%Y%m%d-%H%M%S.json")
+            path = os.path.join(cache_dir("profiles"), name)
+        PROFILER.dump_json(path)
+        self.statusBar().showMessage(f"Profile written to {path}", 5000)
+        return path
+
+    # -----------------------------------------------------
+    # Annotations
+    # -----------------------------------------------------
+    def _update_annotations(self):
+        """Load the current surgery's annotations into the trends and slider."""
+        surgery = self.surgery_combo.currentText()
+        dataset = self._source[0] if self._source else None
+        self._annotations = annotations(surgery, dataset) if surgery else None
+        self.trend_tab.set_annotations(self._annotations)
+        self._update_annotation_markers()
+
+    def _update_annotation_markers(self):
+        """Mark the slider positions of the timestamps nearest to annotations."""
+        store = self._annotations
+        if not store or not self._timestamps:
+            self.timestamp_slider.set_markers([])
+            return
+        ts = np.asarray(self._timestamps, dtype=float)
+        starts = store.start[(store.start >= ts[0]) & (store.start <= ts[-1])]
+        idx = np.clip(np.searchsorted(ts, starts), 1, max(len(ts) - 1, 1))
+        if len(ts) > 1:
+            idx -= (starts - ts[idx - 1]) < (ts[idx] - starts)
+        else:
+            idx[:] = 0
+        self.timestamp_slider.set_markers(idx)
+
+    def _annotate_current(self):
+        """Add a point annotation at the current timestamp."""
+        idx = self.timestamp_slider.value()
+        if self._annotations is None or not 0 <= idx < len(self._timestamps):
+            return
+        label = self.controls.annotation_edit.text().strip()
+        self._annotations.add(float(self._timestamps[idx]), label=label)
+        self.controls.annotation_edit.clear()
+        self._update_annotation_markers()
+        self.trend_tab.update_view()
+
+    # -----------------------------------------------------
+    # Session
+    # -----------------------------------------------------
+    def set_source(self, path, surgeries=None):
+        """Record where the loaded data came from, for :meth:`save_session`.
+
+        Trend series and annotations are kept per source, so they are
+        switched over as well.
+        """
+        self._source = (path, surgeries)
+        self.trend_tab.set_dataset(path)
+        if self.mep_df is not None:
+            self._update_annotations()
+
+    def session_state(self) -> dict:
+        """Return the view state saved in a session snapshot."""
+        idx = self.timestamp_slider.value()
+        timestamp = None
+        if 0 <= idx < len(self._timestamps):
+            try:
+                timestamp = float(self._timestamps[idx])
+            except (TypeError, ValueError):
+                pass
+        return {
+            "tab": self.tabs.currentIndex(),
+            "surgery": self.surgery_combo.currentText(),
+            "timestamp": timestamp,
+            "channel_order": self.channel_model.channels(),
+            "checked_channels": self.channel_model.checked_channels(),
+            "intensity": self.intensity_combo.currentText(),
+            "markers": self.controls.markers_check.isChecked(),
+            "difference": self.controls.difference_check.isChecked(),
+            "trend_modality": self.trend_tab.modality_combo.currentText(),
+            "trend_metric": self.trend_tab.metric_combo.currentText(),
+            "trend_align": self.trend_tab.align_combo.currentText(),
+            "waterfall_modality": self.waterfall_view.modality_combo.currentText(),
+            "waterfall_channel": self.waterfall_view.channel_combo.currentText(),
+            "spectral_modality": self.spectral_view.modality_combo.currentText(),
+            "spectral_channel": self.spectral_view.channel_combo.currentText(),
+        }
+
+    def restore_session_state(self, state: dict):
+        """Apply a :meth:`session_state` to the loaded data and redraw once."""
+        self._restoring = True
+        try:
+            self._apply_state(state)
+        finally:
+            self._restoring = False
+        self.update_plots()
+
+    def _apply_state(self, state: dict):
+        """Select the tab, surgery, channels and timestamp of ``state``.
+
+        Entries that no longer apply (a surgery or channel not in the data)
+        are skipped. Plots are not updated.
+        """
+        def select(combo, text):
+            if text is not None and combo.findText(str(text)) >= 0:
+                combo.setCurrentText(str(text))
+
+        if 0 <= state.get("tab", -1) < self.tabs.count():
+            self.tabs.setCurrentIndex(state["tab"])
+        select(self.trend_tab.modality_combo, state.get("trend_modality"))
+        select(self.trend_tab.metric_combo, state.get("trend_metric"))
+        select(self.trend_tab.align_combo, state.get("trend_align"))
+        select(self.waterfall_view.modality_combo, state.get("waterfall_modality"))
+        select(self.waterfall_view.channel_combo, state.get("waterfall_channel"))
+        select(self.spectral_view.modality_combo, state.get("spectral_modality"))
+        select(self.spectral_view.channel_combo, state.get("spectral_channel"))
+        select(self.intensity_combo, state.get("intensity"))
+        self.controls.markers_check.setChecked(bool(state.get("markers")))
+        self.controls.difference_check.setChecked(bool(state.get("difference")))
+        select(self.surgery_combo, state.get("surgery"))
+        self._update_channels_for_current_tab()
+        self.channel_model.set_order(state.get("channel_order", []))
+        if state.get("checked_channels") is not None:
+            self.channel_model.check_channels(state["checked_channels"])
+        self._update_timestamp_slider()
+        if state.get("timestamp") is not None:
+            self._goto_nearest_timestamp(state["timestamp"])
+
+    def save_session(self, path=None):
+        """Snapshot the view state and the loaded frames (see :mod:`src.session`).
+
+        The warm store is only written if ``CV_WARM_STORE`` is set. Returns
+        the snapshot path, or None without a data source or if it could not
+        be written.
+        """
+        if self._source is None or self.mep_df is None:
+            return None
+        source, surgeries = self._source
+        frames = (self.mep_df, self.ssep_upper_df, self.ssep_lower_df, self.surgery_meta_df)
+        try:
+            return session.save_session(source, frames, self.session_state(), surgeries, path,
+                                        warm_store=session.warm_store_enabled())
+        except OSError as e:
+            self.statusBar().showMessage(f"Session not saved: {e}", 5000)
+            return None
+
+    def closeEvent(self, event):
+        self.save_session()
+        super().closeEvent(event)
+
+    # -----------------------------------------------------
+    # Memory
+    # -----------------------------------------------------
+    def show_memory_panel(self):
+        self.memory_panel.show()
+        self.memory_panel.raise_()
+
+    def enforce_memory_budget(self):
+        """Release caches over the memory budget; return the evicted entries."""
+        evicted = ACCOUNTANT.enforce()
+        if evicted:
+            self.statusBar().showMessage(
+                f"Memory budget {format_bytes(ACCOUNTANT.budget)} reached; "
+                f"released {', '.join(evicted)}", 5000)
+        return evicted
+
     # -----------------------------------------------------
     # Playback helpers
     # -----------------------------------------------------
     def start_playback(self):
-        """Begin automatic stepping through timestamps."""
+        """Play from the current timestamp, following the wall clock.
+
+        Frames that fall due while the previous one is still rendering are
+        skipped, so playback keeps pace with the chosen speed.
+        """
         if not self._timestamps:
             return
         speed_text = self.controls.speed_combo.currentText().lstrip("x")
@@ -292,22 +649,40 @@ class MainWindow(QMainWindow):
             speed = float(speed_text)
         except ValueError:
             speed = 1.0
-        interval = int(self._play_interval_ms / speed)
-        if interval <= 0:
-            interval = 1
-        self.play_timer.start(interval)
+        realtime = self.controls.realtime_check.isChecked()
+        try:
+            times = [float(ts) for ts in self._timestamps]
+        except (TypeError, ValueError):
+            realtime, times = False, self._timestamps
+        self._playback = PlaybackClock(
+            times, speed=speed, realtime=realtime,
+            frame_interval=self._play_interval_ms / 1000.0, clock=self._clock,
+        )
+        self._playback.start(self.timestamp_slider.value())
+        self._schedule_playback()
 
     def pause_playback(self):
         """Pause the playback timer."""
         self.play_timer.stop()
 
-    def _advance_playback(self):
-        idx = self.timestamp_slider.value() + 1
-        if idx > self.timestamp_slider.maximum():
+    def _schedule_playback(self):
+        clock = self._playback
+        if clock is None or clock.finished:
             self.play_timer.stop()
             return
-        self.timestamp_slider.setValue(idx)
+        self.play_timer.start(max(1, int(np.ceil(clock.delay() * 1000))))
 
+    def _advance_playback(self):
+        clock = self._playback
+        if clock is None:
+            return
+        index = clock.advance()
+        if index is not None:
+            self.timestamp_slider.setValue(index)
+            self.controls.playback_label.setText(
+                f"{clock.fps():.1f} fps, {clock.dropped} dropped"
+            )
+        self._schedule_playback()
 
 if __name__ == "__main__":
     from PyQt5.QtWidgets import QApplication
@@ -0,0 +1,110 @@
+from PyQt5.QtCore import Qt, QTimer
+from PyQt5.QtWidgets import (
+    QAbstractItemView,
+    QDialog,
+    QHBoxLayout,
+    QHeaderView,
+    QLabel,
+    QPushButton,
+    QSpinBox,
+    QTableWidget,
+    QTableWidgetItem,
+    QVBoxLayout,
+)
+
+from src.memory import ACCOUNTANT, format_bytes
+
+
+class MemoryPanel(QDialog):
+    """Diagnostics window listing the memory of data, caches and plots.
+
+    The table re-reads :data:`src.memory.ACCOUNTANT` once per second while
+    the window is shown. The budget can be changed for the session and
+    enforced right away.
+    """
+
+    REFRESH_MS = 1000
+    COLUMNS = ("Entry", "Category", "Size", "Evictable")
+
+    def __init__(self, parent=None, accountant=ACCOUNTANT):
+        super().__init__(parent)
+        self._accountant = accountant
+        self.setWindowTitle("Memory")
+        self.resize(480, 360)
+
+        layout = QVBoxLayout(self)
+        self.table = QTableWidget(0, len(self.COLUMNS))
+        self.table.setHorizontalHeaderLabels(self.COLUMNS)
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table.verticalHeader().hide()
+        self.table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        layout.addWidget(self.table)
+
+        self.total_label = QLabel()
+        layout.addWidget(self.total_label)
+
+        budget_layout = QHBoxLayout()
+        budget_layout.addWidget(QLabel("Budget:"))
+        self.budget_spin = QSpinBox()
+        self.budget_spin.setRange(0, 1 << 20)
+        self.budget_spin.setSuffix(" MiB")
+        self.budget_spin.setSpecialValueText("No limit")
+        self.budget_spin.setValue((accountant.budget or 0) >> 20)
+        self.budget_spin.valueChanged.connect(self._on_budget_changed)
+        budget_layout.addWidget(self.budget_spin)
+        self.enforce_button = QPushButton("Release caches over budget")
+        self.enforce_button.clicked.connect(self.enforce)
+        budget_layout.addWidget(self.enforce_button)
+        budget_layout.addStretch(1)
+        layout.addLayout(budget_layout)
+
+        self._timer = QTimer(self)
+        self._timer.setInterval(self.REFRESH_MS)
+        self._timer.timeout.connect(self.refresh)
+
+    def showEvent(self, event):
+        self._timer.start()
+        self.refresh()
+        super().showEvent(event)
+
+    def hideEvent(self, event):
+        self._timer.stop()
+        super().hideEvent(event)
+
+    def _on_budget_changed(self, value: int) -> None:
+        self._accountant.budget = value << 20 if value else None
+        self.refresh()
+
+    def enforce(self) -> list:
+        """Evict caches until the budget is met; return the evicted entries."""
+        evicted = self._accountant.enforce()
+        self.refresh()
+        return evicted
+
+    def refresh(self) -> None:
+        entries = self._accountant.report()
+        self.table.setRowCount(len(entries))
+        for row, entry in enumerate(entries):
+            size = QTableWidgetItem(format_bytes(entry.nbytes))
+            size.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+            cells = (
+                QTableWidgetItem(entry.name),
+                QTableWidgetItem(entry.category),
+                size,
+                QTableWidgetItem("yes" if entry.evictable else ""),
+            )
+            for col, item in enumerate(cells):
+                self.table.setItem(row, col, item)
+        self.total_label.setText(self.format_totals(entries, self._accountant.budget))
+
+    @staticmethod
+    def format_totals(entries, budget) -> str:
+        by_category = {}
+        for entry in entries:
+            by_category[entry.category] = by_category.get(entry.category, 0) + entry.nbytes
+        parts = [f"{category} {format_bytes(n)}" for category, n in by_category.items()]
+        total = sum(by_category.values())
+        limit = format_bytes(budget) if budget else "no limit"
+        return f"Total {format_bytes(total)} of {limit}" + (
+            f"  ({', '.join(parts)})" if parts else ""
+        )
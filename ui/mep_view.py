@@ -1,7 +1,9 @@
+import numpy as np
 import pyqtgraph as pg
 from PyQt5.QtWidgets import QWidget, QHBoxLayout
 
-from .plot_widgets import BasePlotWidget, MEP_PEN, BASELINE_PEN
+from src.profiler import PROFILER, profiled
+from .plot_widgets import BasePlotWidget, MEP_PEN, BASELINE_PEN, marker_points, time_base
 
 
 class MepView(QWidget):
@@ -15,34 +17,60 @@ class MepView(QWidget):
         layout.addWidget(self.left_plot)
         layout.addWidget(self.right_plot)
 
-    def update_view(self, mep_df, surgery_id, timestamp, channels_ordered):
-        """Update the plots with MEP and baseline signals."""
+    @profiled()
+    def update_view(self, mep_df, surgery_id, timestamp, channels_ordered, features=None,
+                    differences=None, scales=None):
+        """Update the plots with MEP and baseline signals.
+
+        ``features`` holds peak features indexed like ``mep_df`` (see
+        :func:`src.features.surgery_features`); if given, the peaks and onset
+        of every trace are marked. ``differences`` holds "trace minus
+        baseline" arrays indexed like ``mep_df`` (see
+        :func:`src.resample.surgery_differences`); if given, those are plotted
+        instead of the trace and its baseline. ``scales`` holds the display
+        scale of every channel (see :func:`src.artifacts.channel_scales`); if
+        given, traces are spaced by those instead of their largest samples.
+        """
         self.left_plot.clear()
         self.right_plot.clear()
 
         if mep_df is None or mep_df.empty:
             return
 
-        subset = mep_df[
-            (mep_df["surgery_id"] == surgery_id)
-            & (mep_df["timestamp"] == timestamp)
-            & (mep_df["channel"].isin(channels_ordered))
-        ]
+        with PROFILER.stage("filter"):
+            subset = mep_df[
+                (mep_df["surgery_id"] == surgery_id)
+                & (mep_df["timestamp"] == timestamp)
+                & (mep_df["channel"].isin(channels_ordered))
+            ]
         if subset.empty:
             return
 
+        def row_features(row):
+            if features is None or row.name not in features.index:
+                return None
+            return features.loc[row.name]
+
         def max_abs(seq):
             return max((abs(x) for x in seq), default=0)
 
         # Determine offset so traces don't overlap
-        all_max = max(
-            max((max_abs(v) for v in subset["values"]), default=1),
-            max((max_abs(b) for b in subset["baseline_values"]), default=1),
-        )
-        offset_step = all_max * 1.2
+        if differences is not None:
+            plotted = differences.reindex(subset.index).dropna()
+            all_max = max((float(np.nanmax(np.abs(d), initial=0)) for d in plotted), default=1)
+        elif scales is not None:
+            all_max = scales.reindex(subset["channel"].astype(str).unique()).max()
+        else:
+            all_max = max(
+                max((max_abs(v) for v in subset["values"]), default=1),
+                max((max_abs(b) for b in subset["baseline_values"]), default=1),
+            )
+        offset_step = (all_max if all_max > 0 else 1) * 1.2
 
         left_channels = []
         right_channels = []
+        left_markers = []
+        right_markers = []
         for ch in channels_ordered:
             if str(ch).lower().startswith("r"):
                 right_channels.append(ch)
@@ -57,14 +85,24 @@ class MepView(QWidget):
             values = row["values"]
             baseline = row["baseline_values"]
 
-            x_values = [i / row["signal_rate"] for i in range(len(values))]
-            x_baseline = [i / row["baseline_signal_rate"] for i in range(len(baseline))]
+            x_values = time_base(row["signal_rate"], len(values))
             y_offset = idx * offset_step
 
-            self.left_plot.plot(x_values, [v + y_offset for v in values], pen=MEP_PEN)
-            self.left_plot.plot(x_baseline, [v + y_offset for v in baseline], pen=BASELINE_PEN)
+            if differences is not None:
+                if row.name in differences.index:
+                    self.left_plot.add_trace(
+                        x_values, differences.loc[row.name], f"{channel} (difference)",
+                        y_offset, pen=MEP_PEN,
+                    )
+            else:
+                x_baseline = time_base(row["baseline_signal_rate"], len(baseline))
+                self.left_plot.add_trace(x_values, values, str(channel), y_offset, pen=MEP_PEN)
+                left_markers.extend(marker_points(row_features(row), y_offset))
+                self.left_plot.add_trace(
+                    x_baseline, baseline, f"{channel} (baseline)", y_offset, pen=BASELINE_PEN
+                )
             text = pg.TextItem(f"{channel} ({row['signal_rate']}Hz)")
-            text.setPos(x_values[-1] if x_values else 0, y_offset)
+            text.setPos(x_values[-1] if len(x_values) else 0, y_offset)
             self.left_plot.addItem(text)
 
         for idx, channel in enumerate(right_channels):
@@ -75,12 +113,25 @@ class MepView(QWidget):
             values = row["values"]
             baseline = row["baseline_values"]
 
-            x_values = [i / row["signal_rate"] for i in range(len(values))]
-            x_baseline = [i / row["baseline_signal_rate"] for i in range(len(baseline))]
+            x_values = time_base(row["signal_rate"], len(values))
             y_offset = idx * offset_step
 
-            self.right_plot.plot(x_values, [v + y_offset for v in values], pen=MEP_PEN)
-            self.right_plot.plot(x_baseline, [v + y_offset for v in baseline], pen=BASELINE_PEN)
+            if differences is not None:
+                if row.name in differences.index:
+                    self.right_plot.add_trace(
+                        x_values, differences.loc[row.name], f"{channel} (difference)",
+                        y_offset, pen=MEP_PEN,
+                    )
+            else:
+                x_baseline = time_base(row["baseline_signal_rate"], len(baseline))
+                self.right_plot.add_trace(x_values, values, str(channel), y_offset, pen=MEP_PEN)
+                right_markers.extend(marker_points(row_features(row), y_offset))
+                self.right_plot.add_trace(
+                    x_baseline, baseline, f"{channel} (baseline)", y_offset, pen=BASELINE_PEN
+                )
             text = pg.TextItem(f"{channel} ({row['signal_rate']}Hz)")
-            text.setPos(x_values[-1] if x_values else 0, y_offset)
+            text.setPos(x_values[-1] if len(x_values) else 0, y_offset)
             self.right_plot.addItem(text)
+
+        self.left_plot.add_markers(left_markers)
+        self.right_plot.add_markers(right_markers)
@@ -1,11 +1,21 @@
+from functools import lru_cache
+
+import numpy as np
 import pyqtgraph as pg
 from PyQt5 import QtCore, QtGui, QtWidgets
 
+from src.profiler import PROFILER
+
 # Predefined pens matching the dark theme
 MEP_PEN = pg.mkPen("#E06C75", width=1.2)
 SSEP_U_PEN = pg.mkPen("#61AFEF", width=1.2)
 SSEP_L_PEN = pg.mkPen("#98C379", width=1.2)
 BASELINE_PEN = pg.mkPen("#ABB2BF", width=1, style=QtCore.Qt.DashLine)
+MARKER_BRUSH = pg.mkBrush("#E5C07B")
+ANNOTATION_COLOR = "#C678DD"
+
+# Marker symbols of the positive peak, negative peak and onset
+MARKER_SYMBOLS = {"pos": "t1", "neg": "t", "onset": "d"}
 
 
 class CustomPlotMenu(QtWidgets.QMenu):
@@ -30,22 +40,279 @@ class CustomPlotMenu(QtWidgets.QMenu):
         pass
 
 
+def time_base(rate, n: int) -> np.ndarray:
+    """Return the sample times (s) of an ``n``-sample trace at ``rate`` Hz.
+
+    Bases are cached per (rate, length) so traces sharing them also share
+    the array, which lets the hover lookup batch them together.
+    """
+    return _time_base(float(rate), int(n))
+
+
+@lru_cache(maxsize=256)
+def _time_base(rate: float, n: int) -> np.ndarray:
+    base = np.arange(n, dtype=np.float64) / rate
+    base.setflags(write=False)
+    return base
+
+
+def marker_points(features, offset: float = 0.0) -> list:
+    """Return (x in s, y, symbol) markers of one row of peak features.
+
+    ``features`` is a row of :func:`src.features.extract_features` (or None);
+    the onset is drawn at the trace's offset since only its time is known.
+    """
+    if features is None:
+        return []
+    points = []
+    for key in ("pos", "neg"):
+        latency, peak = features[f"{key}_latency"], features[f"{key}_peak"]
+        if np.isfinite(latency) and np.isfinite(peak):
+            points.append((latency / 1000.0, peak + offset, MARKER_SYMBOLS[key]))
+    if np.isfinite(features["onset"]):
+        points.append((features["onset"] / 1000.0, offset, MARKER_SYMBOLS["onset"]))
+    return points
+
+
+class AnnotationItem(pg.GraphicsObject):
+    """Annotations of an :class:`~src.annotations.AnnotationStore` across a plot.
+
+    Each paint queries only the annotations overlapping the visible x range.
+    Regions are filled, events are drawn as vertical lines merged to one per
+    pixel column, and labels are written while at most :attr:`MAX_LABELS`
+    annotations are visible. Add with ``ignoreBounds=True`` so annotations
+    do not affect auto-ranging.
+    """
+
+    MAX_LABELS = 30
+
+    def __init__(self, store=None):
+        super().__init__()
+        self._store = store
+        self._pen = pg.mkPen(ANNOTATION_COLOR, width=1)
+        self._pen.setCosmetic(True)
+        self._brush = pg.mkBrush(198, 120, 221, 45)
+        self.setZValue(-30)
+
+    def set_store(self, store) -> None:
+        self._store = store
+        self.update()
+
+    def boundingRect(self):
+        vb = self.getViewBox()
+        if vb is None or not self._store:
+            return QtCore.QRectF()
+        return vb.viewRect()
+
+    def viewRangeChanged(self):
+        self.prepareGeometryChange()
+        self.update()
+
+    def paint(self, p, *args):
+        vb = self.getViewBox()
+        if vb is None or not self._store:
+            return
+        with PROFILER.stage("annotations"):
+            rect = vb.viewRect()
+            store = self._store
+            idx = store.query(rect.left(), rect.right())
+            if not idx.size:
+                return
+            starts, ends = store.start[idx], store.end[idx]
+            top, height = rect.top(), rect.height()
+            regions = ends > starts
+            p.setPen(QtCore.Qt.NoPen)
+            p.setBrush(self._brush)
+            p.drawRects([QtCore.QRectF(s, top, e - s, height)
+                         for s, e in zip(starts[regions], ends[regions])])
+            # One line per pixel column, however many events share it
+            pixel = rect.width() / max(vb.width(), 1.0)
+            columns = np.unique(np.round((starts - rect.left()) / pixel))
+            xs = rect.left() + columns * pixel
+            p.setPen(self._pen)
+            p.drawLines([QtCore.QLineF(x, top, x, top + height) for x in xs])
+            if idx.size <= self.MAX_LABELS:
+                transform = p.transform()
+                p.resetTransform()
+                p.setPen(pg.mkPen(ANNOTATION_COLOR))
+                for i, start in zip(idx, starts):
+                    text = store.label[i] or store.category[i]
+                    if text:
+                        pos = transform.map(QtCore.QPointF(start, rect.bottom()))
+                        p.drawText(pos + QtCore.QPointF(3, 12), str(text))
+                p.setTransform(transform)
+
+
+class _TraceGroup:
+    """Traces sharing one x array, stacked for vectorized lookup."""
+
+    def __init__(self, x: np.ndarray):
+        self.x = x
+        self.labels = []
+        self.offsets = []
+        self.rows = []
+        self._stacked = None
+
+    def add(self, y: np.ndarray, label: str, offset: float) -> None:
+        self.labels.append(label)
+        self.offsets.append(offset)
+        self.rows.append(y)
+        self._stacked = None
+
+    def nearest(self, x: float, y: float):
+        """Return (distance, label, x, value, offset) of the closest sample."""
+        n = self.x.size
+        if n == 0:
+            return None
+        i = int(np.searchsorted(self.x, x))
+        if i >= n or (i > 0 and x - self.x[i - 1] < self.x[i] - x):
+            i -= 1
+        if self._stacked is None:
+            self._stacked = (np.vstack(self.rows), np.asarray(self.offsets, dtype=float))
+        values, offsets = self._stacked
+        column = values[:, i]
+        dist = np.abs(column + offsets - y)
+        k = int(np.nanargmin(dist)) if not np.isnan(dist).all() else 0
+        return (
+            float(dist[k]), self.labels[k], float(self.x[i]), float(column[k]), offsets[k]
+        )
+
+
+class HoverReadout:
+    """Single reusable overlay showing the sample nearest to the cursor."""
+
+    def __init__(self, plot_item: pg.PlotItem):
+        self._plot_item = plot_item
+        self.marker = pg.ScatterPlotItem(size=7, brush=pg.mkBrush("#E5C07B"), pen=None)
+        self.text = pg.TextItem(anchor=(0, 1), color="#E5C07B", fill=pg.mkBrush(40, 44, 52, 200))
+        for item in (self.marker, self.text):
+            item.setZValue(1000)
+        self.hide()
+
+    def attach(self) -> None:
+        """Add the overlay items to the view box.
+
+        They bypass ``PlotItem.addItem`` so they survive ``clear()`` and never
+        show up as data items (legend, exports, auto-range).
+        """
+        for item in (self.marker, self.text):
+            if item.scene() is None:
+                self._plot_item.vb.addItem(item, ignoreBounds=True)
+
+    def show(self, x: float, y: float, text: str) -> None:
+        self.marker.setData([x], [y])
+        self.text.setText(text)
+        self.text.setPos(x, y)
+        self.marker.show()
+        self.text.show()
+
+    def hide(self) -> None:
+        self.marker.hide()
+        self.text.hide()
+
+
 class BasePlotWidget(pg.PlotWidget):
-    """PlotWidget with legend, context menu and hover tooltip."""
+    """PlotWidget with legend, context menu and hover readout.
+
+    Traces added with :meth:`add_trace` can be inspected by hovering: the
+    nearest trace sample is looked up by binary search on its (cached) x
+    array and shown in a single overlay, at most once per display refresh.
+    """
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.showGrid(x=True, y=True, alpha=0.3)
         self.addLegend(offset=(30, 10))
         self.scene().contextMenu = CustomPlotMenu(self)
-        self.scene().sigMouseMoved.connect(self._show_tooltip)
+        # PlotWidget forwards clear() to its PlotItem through an instance
+        # attribute; bind it to our override, which also resets the hover state
+        self.clear = type(self).clear.__get__(self)
 
-    def _show_tooltip(self, pos):
-        if not self.plotItem.sceneBoundingRect().contains(pos):
+        self._trace_groups = {}
+        # (scale, unit) of the hovered x value and the label of the y value
+        self.hover_x_units = (1000.0, "ms")
+        self.hover_y_label = "µV"
+        self._hover = HoverReadout(self.plotItem)
+        self._hover.attach()
+        self._hover_pos = None
+        self._hover_timer = QtCore.QTimer(self)
+        self._hover_timer.setSingleShot(True)
+        self._hover_timer.setInterval(self._refresh_interval_ms())
+        self._hover_timer.timeout.connect(self._update_hover)
+        self.scene().sigMouseMoved.connect(self._queue_hover)
+
+    @staticmethod
+    def _refresh_interval_ms() -> int:
+        screen = QtGui.QGuiApplication.primaryScreen()
+        rate = screen.refreshRate() if screen is not None else 0
+        return int(1000 / rate) if rate > 0 else 16
+
+    def clear(self):
+        """Remove all plot items and forget the hoverable traces."""
+        self.plotItem.clear()
+        self._trace_groups = {}
+        self._hover.hide()
+
+    def add_trace(self, x, y, label: str, offset: float = 0.0, **kwargs):
+        """Plot ``y + offset`` against ``x`` and register it for hovering.
+
+        ``x`` must be sorted. Pass the same array object (e.g. from
+        :func:`time_base`) for traces sharing a time base.
+        """
+        with PROFILER.stage("to_array"):
+            x = np.asarray(x, dtype=np.float64)
+            y = np.asarray(y, dtype=np.float64)
+        group = self._trace_groups.get(id(x))
+        if group is None or group.x is not x:
+            group = self._trace_groups[id(x)] = _TraceGroup(x)
+        group.add(y, label, offset)
+        with PROFILER.stage("plot_items"):
+            return self.plot(x, y + offset if offset else y, **kwargs)
+
+    def add_markers(self, points):
+        """Draw (x, y, symbol) markers as a single scatter item."""
+        if not points:
+            return None
+        x, y, symbols = zip(*points)
+        with PROFILER.stage("plot_items"):
+            item = pg.ScatterPlotItem(
+                x=np.asarray(x), y=np.asarray(y), symbol=list(symbols), size=9,
+                brush=MARKER_BRUSH, pen=pg.mkPen(None),
+            )
+            self.addItem(item)
+        return item
+
+    def paintEvent(self, event):
+        with PROFILER.stage("paint"):
+            super().paintEvent(event)
+
+    def nearest_sample(self, x: float, y: float):
+        """Return (label, x, value, offset) of the registered sample closest
+        to the view point (x, y), or None if no traces are registered."""
+        best = None
+        for group in self._trace_groups.values():
+            hit = group.nearest(x, y)
+            if hit is not None and (best is None or hit[0] < best[0]):
+                best = hit
+        return None if best is None else best[1:]
+
+    def _queue_hover(self, pos):
+        self._hover_pos = pos
+        if not self._hover_timer.isActive():
+            self._hover_timer.start()
+
+    def _update_hover(self):
+        pos = self._hover_pos
+        if pos is None or not self.plotItem.sceneBoundingRect().contains(pos):
+            self._hover.hide()
             return
-        mouse_point = self.plotItem.vb.mapSceneToView(pos)
-        QtWidgets.QToolTip.showText(
-            QtGui.QCursor.pos(),
-            f"t={mouse_point.x():.2f}s\nµV={mouse_point.y():.2f}",
+        point = self.plotItem.vb.mapSceneToView(pos)
+        hit = self.nearest_sample(point.x(), point.y())
+        if hit is None:
+            self._hover.show(point.x(), point.y(), f"x={point.x():.2f}\ny={point.y():.2f}")
+            return
+        label, t, value, offset = hit
+        scale, unit = self.hover_x_units
+        self._hover.show(
+            t, value + offset, f"{label}\nt={t * scale:.2f} {unit}\n{self.hover_y_label}={value:.2f}"
         )
-
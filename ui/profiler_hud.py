@@ -0,0 +1,72 @@
+from PyQt5.QtCore import QEvent, Qt, QTimer
+from PyQt5.QtWidgets import QLabel
+
+from src.profiler import PROFILER
+
+
+class ProfilerHud(QLabel):
+    """Translucent overlay with frame-time percentiles and stage breakdown.
+
+    The label floats in the top-right corner of its parent and re-reads
+    :data:`src.profiler.PROFILER` twice per second while visible.
+    """
+
+    REFRESH_MS = 500
+    MAX_STAGES = 8
+
+    def __init__(self, parent, profiler=PROFILER):
+        super().__init__(parent)
+        self._profiler = profiler
+        self.setAttribute(Qt.WA_TransparentForMouseEvents)
+        self.setStyleSheet(
+            "background-color: rgba(20, 22, 26, 200); color: #E5C07B;"
+            "font-family: monospace; padding: 6px;"
+        )
+        self.setTextFormat(Qt.PlainText)
+        self._timer = QTimer(self)
+        self._timer.setInterval(self.REFRESH_MS)
+        self._timer.timeout.connect(self.refresh)
+        parent.installEventFilter(self)
+        self.hide()
+
+    def eventFilter(self, obj, event):
+        if obj is self.parent() and event.type() == QEvent.Resize:
+            self._reposition()
+        return False
+
+    def _reposition(self) -> None:
+        self.adjustSize()
+        parent = self.parentWidget()
+        self.move(max(parent.width() - self.width() - 10, 0), 10)
+        self.raise_()
+
+    def showEvent(self, event):
+        self._timer.start()
+        self.refresh()
+        super().showEvent(event)
+
+    def hideEvent(self, event):
+        self._timer.stop()
+        super().hideEvent(event)
+
+    def refresh(self) -> None:
+        self.setText(self.format_summary(self._profiler.summary()))
+        self._reposition()
+
+    @classmethod
+    def format_summary(cls, summary: dict) -> str:
+        if not summary["frames"]:
+            return "profiler: no frames recorded"
+        lines = [(
+            f"frames {summary['frames']}  "
+            f"p50 {summary['frame_p50_ms']:.1f} ms  p95 {summary['frame_p95_ms']:.1f} ms"
+        )]
+        stages = sorted(
+            summary["stages"].items(), key=lambda kv: kv[1]["per_frame_ms"], reverse=True
+        )
+        for name, stats in stages[:cls.MAX_STAGES]:
+            lines.append(
+                f"{name[:28]:<28} {stats['per_frame_ms']:7.2f} ms/frame  "
+                f"p95 {stats['p95_ms']:6.2f}"
+            )
+        return "\n".join(lines)
@@ -0,0 +1,95 @@
+import numpy as np
+import pandas as pd
+import pyqtgraph as pg
+from PyQt5.QtCore import QRectF
+from PyQt5.QtWidgets import QComboBox, QHBoxLayout, QLabel, QVBoxLayout, QWidget
+
+from src.profiler import PROFILER, profiled
+from src.spectral import channel_spectrogram
+
+from .plot_widgets import BasePlotWidget
+
+MODALITIES = ("MEP", "SSEP_UPPER", "SSEP_LOWER")
+
+
+class SpectralView(QWidget):
+    """Power spectra of one channel's traces stacked as rows of an image.
+
+    Spectra come from the cache of :mod:`src.spectral`, which transforms
+    only the traces that were not reached before, so playback adds the new
+    rows as the timestamp advances.
+    """
+
+    # Rows used to pick the colour levels
+    LEVEL_ROWS = 256
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._frames = {}
+        self._setup_ui()
+
+    def _setup_ui(self) -> None:
+        layout = QVBoxLayout(self)
+        selector_layout = QHBoxLayout()
+        selector_layout.addWidget(QLabel("Modality:"))
+        self.modality_combo = QComboBox()
+        self.modality_combo.addItems(MODALITIES)
+        selector_layout.addWidget(self.modality_combo)
+        selector_layout.addWidget(QLabel("Channel:"))
+        self.channel_combo = QComboBox()
+        selector_layout.addWidget(self.channel_combo)
+        selector_layout.addStretch(1)
+        layout.addLayout(selector_layout)
+
+        self.plot = BasePlotWidget(self)
+        self.plot.setLabel("bottom", "Frequency", units="Hz")
+        self.plot.setLabel("left", "Trace")
+        self.image = pg.ImageItem(axisOrder="row-major")
+        self.image.setColorMap(pg.colormap.get("viridis"))
+        self.plot.addItem(self.image)
+        layout.addWidget(self.plot)
+
+        self.modality_combo.currentTextChanged.connect(self._populate_channels)
+
+    def set_data(self, frames: dict) -> None:
+        """Set the modality frames, keyed by ``MODALITIES``."""
+        self._frames = dict(frames)
+        self._populate_channels()
+
+    def current_dataframe(self) -> pd.DataFrame:
+        return self._frames.get(self.modality_combo.currentText())
+
+    def _populate_channels(self, *_) -> None:
+        df = self.current_dataframe()
+        current = self.channel_combo.currentText()
+        channels = sorted(df["channel"].astype(str).unique()) if df is not None else []
+        self.channel_combo.blockSignals(True)
+        self.channel_combo.clear()
+        self.channel_combo.addItems(channels)
+        if current in channels:
+            self.channel_combo.setCurrentText(current)
+        self.channel_combo.blockSignals(False)
+
+    @profiled()
+    def update_view(self, surgery_id, timestamp) -> None:
+        """Show the channel's spectra up to and including ``timestamp``."""
+        df = self.current_dataframe()
+        channel = self.channel_combo.currentText()
+        if df is None or df.empty or not channel:
+            self.image.clear()
+            return
+        spectrogram = channel_spectrogram(df, surgery_id, channel, timestamp)
+        data = spectrogram.image(spectrogram.stop(timestamp))
+        if not len(data) or not spectrogram.freqs[-1] > 0:
+            self.image.clear()
+            return
+        with PROFILER.stage("plot_items"):
+            recent = data[-self.LEVEL_ROWS:]
+            finite = recent[np.isfinite(recent)]
+            if finite.size:
+                low, high = np.percentile(finite, (5, 99.5))
+            else:
+                low, high = 0.0, 1.0
+            high = max(float(high), float(low) + 1e-6)
+            self.image.setImage(data, autoLevels=False, levels=(float(low), high))
+            self.image.setRect(QRectF(0.0, 0.0, float(spectrogram.freqs[-1]), len(data)))
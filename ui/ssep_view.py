@@ -1,8 +1,12 @@
+import numpy as np
 import pandas as pd
 import pyqtgraph as pg
 from PyQt5.QtWidgets import QWidget, QHBoxLayout
 
-from .plot_widgets import BasePlotWidget, SSEP_U_PEN, SSEP_L_PEN, BASELINE_PEN
+from src.profiler import PROFILER, profiled
+from .plot_widgets import (
+    BasePlotWidget, SSEP_U_PEN, SSEP_L_PEN, BASELINE_PEN, marker_points, time_base,
+)
 
 
 class SsepView(QWidget):
@@ -16,37 +20,80 @@ class SsepView(QWidget):
         layout.addWidget(self.left_plot)
         layout.addWidget(self.right_plot)
 
-    def update_view(self, ssep_upper_df, ssep_lower_df, surgery_id, timestamp, channels_ordered):
-        """Update the plots with SSEP and baseline signals."""
+    @profiled()
+    def update_view(self, ssep_upper_df, ssep_lower_df, surgery_id, timestamp, channels_ordered,
+                    upper_features=None, lower_features=None,
+                    upper_differences=None, lower_differences=None,
+                    upper_scales=None, lower_scales=None):
+        """Update the plots with SSEP and baseline signals.
+
+        ``upper_features``/``lower_features`` hold peak features indexed like
+        their frames (see :func:`src.features.surgery_features`); if given,
+        the peaks and onset of every trace are marked.
+        ``upper_differences``/``lower_differences`` hold "trace minus
+        baseline" arrays indexed like their frames (see
+        :func:`src.resample.surgery_differences`); if either is given, those
+        are plotted instead of the traces and their baselines.
+        ``upper_scales``/``lower_scales`` hold the display scale of every
+        channel (see :func:`src.artifacts.channel_scales`); if given, traces
+        are spaced by those instead of their largest samples.
+        """
         self.left_plot.clear()
         self.right_plot.clear()
 
-        frames = []
-        if ssep_upper_df is not None and not ssep_upper_df.empty:
-            frames.append(ssep_upper_df.assign(region="Upper"))
-        if ssep_lower_df is not None and not ssep_lower_df.empty:
-            frames.append(ssep_lower_df.assign(region="Lower"))
-        if not frames:
+        with PROFILER.stage("filter"):
+            # Select the rows before combining the frames: tagging and
+            # concatenating whole frames copied them on every redraw
+            frames = []
+            for region, df in (("Upper", ssep_upper_df), ("Lower", ssep_lower_df)):
+                if df is None or df.empty:
+                    continue
+                part = df[
+                    (df["surgery_id"] == surgery_id)
+                    & (df["timestamp"] == timestamp)
+                    & (df["channel"].isin(channels_ordered))
+                ]
+                frames.append(part.assign(region=region, row_label=part.index))
+            if not frames:
+                return
+            subset = pd.concat(frames, ignore_index=True)
+        if subset.empty:
             return
 
-        ssep_df = pd.concat(frames, ignore_index=True)
+        differences = {"Upper": upper_differences, "Lower": lower_differences}
+        difference_mode = upper_differences is not None or lower_differences is not None
 
-        subset = ssep_df[
-            (ssep_df["surgery_id"] == surgery_id)
-            & (ssep_df["timestamp"] == timestamp)
-            & (ssep_df["channel"].isin(channels_ordered))
-        ]
-        if subset.empty:
-            return
+        def row_difference(region, label):
+            table = differences.get(region)
+            if table is None or label not in table.index:
+                return None
+            return table.loc[label]
 
         def max_abs(seq):
             return max((abs(x) for x in seq), default=0)
 
-        all_max = max(
-            max((max_abs(v) for v in subset["values"]), default=1),
-            max((max_abs(b) for b in subset["baseline_values"]), default=1),
-        )
-        offset_step = all_max * 1.2
+        if difference_mode:
+            plotted = (
+                row_difference(region, label)
+                for region, label in zip(subset["region"], subset["row_label"])
+            )
+            all_max = max(
+                (float(np.nanmax(np.abs(d), initial=0)) for d in plotted if d is not None),
+                default=1,
+            )
+        elif upper_scales is not None or lower_scales is not None:
+            channels = subset["channel"].astype(str)
+            all_max = pd.concat([
+                table.reindex(channels[subset["region"] == region].unique())
+                for region, table in (("Upper", upper_scales), ("Lower", lower_scales))
+                if table is not None
+            ]).max()
+        else:
+            all_max = max(
+                max((max_abs(v) for v in subset["values"]), default=1),
+                max((max_abs(b) for b in subset["baseline_values"]), default=1),
+            )
+        offset_step = (all_max if all_max > 0 else 1) * 1.2
 
         # Split rows into left and right groups while preserving channel order
         left_rows = []
@@ -61,30 +108,51 @@ class SsepView(QWidget):
         legend_added_left = set()
         legend_added_right = set()
 
+        features = {"Upper": upper_features, "Lower": lower_features}
+
+        def row_features(region, label):
+            table = features.get(region)
+            if table is None or label not in table.index:
+                return None
+            return table.loc[label]
+
         def plot_group(rows, plot, legend_added):
+            markers = []
             for idx, row in enumerate(rows):
                 region = row.get("region", "")
                 channel = row["channel"]
                 values = row["values"]
                 baseline = row["baseline_values"]
 
-                x_values = [i / row["signal_rate"] for i in range(len(values))]
-                x_baseline = [i / row["baseline_signal_rate"] for i in range(len(baseline))]
+                x_values = time_base(row["signal_rate"], len(values))
                 y_offset = idx * offset_step
 
                 pen = SSEP_U_PEN if region == "Upper" else SSEP_L_PEN
                 name = region if region not in legend_added else None
+                label = f"{region}: {channel}"
 
-                plot.plot(x_values, [v + y_offset for v in values], pen=pen, name=name)
-                plot.plot(x_baseline, [v + y_offset for v in baseline], pen=BASELINE_PEN)
+                if difference_mode:
+                    difference = row_difference(region, row["row_label"])
+                    if difference is not None:
+                        plot.add_trace(
+                            x_values, difference, f"{label} (difference)", y_offset,
+                            pen=pen, name=name,
+                        )
+                else:
+                    x_baseline = time_base(row["baseline_signal_rate"], len(baseline))
+                    plot.add_trace(x_values, values, label, y_offset, pen=pen, name=name)
+                    markers.extend(marker_points(row_features(region, row["row_label"]), y_offset))
+                    plot.add_trace(
+                        x_baseline, baseline, f"{label} (baseline)", y_offset, pen=BASELINE_PEN
+                    )
 
-                label = f"{region}: {channel}"
                 text = pg.TextItem(f"{label} ({row['signal_rate']}Hz)")
-                text.setPos(x_values[-1] if x_values else 0, y_offset)
+                text.setPos(x_values[-1] if len(x_values) else 0, y_offset)
                 plot.addItem(text)
 
                 if name:
                     legend_added.add(region)
+            plot.add_markers(markers)
 
         plot_group(left_rows, self.left_plot, legend_added_left)
         plot_group(right_rows, self.right_plot, legend_added_right)
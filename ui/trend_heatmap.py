@@ -0,0 +1,151 @@
+import numpy as np
+import pyqtgraph as pg
+from PyQt5.QtCore import QRectF, Qt, pyqtSignal
+
+from src.profiler import PROFILER
+
+from .plot_widgets import BasePlotWidget
+
+
+def bin_columns(matrix: np.ndarray, timestamps: np.ndarray, n_bins: int):
+    """Decimate the columns of ``matrix`` into ``n_bins`` equal time bins.
+
+    Each bin keeps the minimum of its columns, so a short loss of signal
+    stays visible at any zoom. Bins without a timestamp repeat the previous
+    bin, i.e. show the last known value. Returns (bin edges, binned matrix).
+    """
+    t0, t1 = float(timestamps[0]), float(timestamps[-1])
+    n_bins = max(1, min(n_bins, len(timestamps)))
+    edges = np.linspace(t0, t1, n_bins + 1)
+    if t1 <= t0:
+        return edges, np.fmin.reduce(matrix, axis=1, keepdims=True)
+    bins = np.minimum(((timestamps - t0) / (t1 - t0) * n_bins).astype(np.int64), n_bins - 1)
+    starts = np.flatnonzero(np.r_[True, bins[1:] != bins[:-1]])
+    reduced = np.fmin.reduceat(matrix, starts, axis=1)
+    # Forward-fill bins that contain no timestamp
+    present = np.zeros(n_bins, dtype=np.int64)
+    present[bins[starts]] = np.arange(1, len(starts) + 1)
+    source = np.maximum.accumulate(present) - 1
+    return edges, reduced[:, source]
+
+
+class TrendHeatmap(BasePlotWidget):
+    """Channel × time overview of a trend metric drawn as one image.
+
+    Each row is scaled by its channel's median so channels with different
+    amplitudes share one colour scale (1 = typical). Clicking the image
+    emits :attr:`timestampClicked` with the time under the cursor.
+    """
+
+    timestampClicked = pyqtSignal(float)
+
+    LEVELS = (0.0, 2.0)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.hover_x_units = (1.0, "s")
+        self.hover_y_label = "rel. L1"
+        self.setLabel("bottom", "Timestamp", units="s")
+        self.image = pg.ImageItem(axisOrder="row-major")
+        # Diverging map with low values (signal loss) in red
+        pos, colors = pg.colormap.get("CET-D1A").getStops()
+        self.image.setColorMap(pg.ColorMap(1.0 - pos[::-1], colors[::-1]))
+        self.addItem(self.image)
+        self.cursor = pg.InfiniteLine(angle=90, movable=False, pen=pg.mkPen("#E5C07B", width=1))
+        self.addItem(self.cursor, ignoreBounds=True)
+        self.cursor.hide()
+        self.getViewBox().setMouseEnabled(y=False)
+        self.getViewBox().invertY(True)
+        self.scene().sigMouseClicked.connect(self._on_clicked)
+
+        self._source = None
+        self._channels = np.zeros(0, dtype=str)
+        self._timestamps = np.zeros(0)
+        self._relative = np.zeros((0, 0), dtype=np.float32)
+        self._binned = None
+        self._order = []
+
+    def clear(self):
+        # The image and cursor are reused across updates
+        self._trace_groups = {}
+        self._hover.hide()
+
+    def set_matrix(self, matrix, channels=None) -> None:
+        """Show a (channels, timestamps, values) tuple from ``TrendStore.matrix``.
+
+        ``channels`` selects and orders the rows as in
+        :meth:`set_channel_order`. Passing the same tuple again only permutes
+        the rows of the cached image.
+        """
+        if channels is not None:
+            self._order = [str(ch) for ch in channels]
+        if matrix is self._source:
+            self._render()
+            return
+        self._source = matrix
+        self._binned = None
+        if matrix is None:
+            self._channels, self._timestamps = np.zeros(0, dtype=str), np.zeros(0)
+            self._relative = np.zeros((0, 0), dtype=np.float32)
+        else:
+            channels, timestamps, values = matrix
+            with np.errstate(invalid="ignore", divide="ignore"), PROFILER.stage("heatmap_scale"):
+                median = np.nanmedian(np.where(np.isfinite(values), values, np.nan), axis=1)
+                median[~(median > 0)] = np.nan
+                self._relative = (values / median[:, None]).astype(np.float32)
+            self._channels, self._timestamps = channels.astype(str), timestamps
+        self._render()
+
+    def set_channel_order(self, channels) -> None:
+        """Show the given channels, top to bottom; only the rows are permuted."""
+        self._order = [str(ch) for ch in channels]
+        self._render()
+
+    def set_cursor(self, timestamp) -> None:
+        if timestamp is None:
+            self.cursor.hide()
+            return
+        self.cursor.setValue(float(timestamp))
+        self.cursor.show()
+
+    def _rows(self) -> np.ndarray:
+        index = {ch: i for i, ch in enumerate(self._channels)}
+        if not self._order:
+            return np.arange(len(self._channels))
+        return np.array([index[ch] for ch in self._order if ch in index], dtype=np.int64)
+
+    def _pixel_width(self) -> int:
+        return max(int(self.getViewBox().width()), 64)
+
+    def _render(self) -> None:
+        if not len(self._channels) or not len(self._timestamps):
+            self.image.clear()
+            return
+        width = self._pixel_width()
+        if self._binned is None or self._binned[0] != width:
+            with PROFILER.stage("heatmap_bin"):
+                self._binned = (width,) + bin_columns(self._relative, self._timestamps, width)
+        _, edges, binned = self._binned
+        rows = self._rows()
+        with PROFILER.stage("plot_items"):
+            self.image.setImage(binned[rows], autoLevels=False, levels=self.LEVELS)
+            self.image.setRect(QRectF(edges[0], 0.0, max(edges[-1] - edges[0], 1e-9), len(rows)))
+            # Row i spans [i, i + 1) with y pointing down; label its centre
+            self.getAxis("left").setTicks([
+                [(i + 0.5, self._channels[r]) for i, r in enumerate(rows)]
+            ])
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        # Resize events already arrive while PlotWidget is being constructed
+        binned = self.__dict__.get("_binned")
+        if binned is not None and binned[0] != self._pixel_width():
+            self._render()
+
+    def _on_clicked(self, event):
+        if event.button() != Qt.LeftButton or not len(self._timestamps):
+            return
+        pos = event.scenePos()
+        if not self.plotItem.vb.sceneBoundingRect().contains(pos):
+            return
+        self.timestampClicked.emit(float(self.plotItem.vb.mapSceneToView(pos).x()))
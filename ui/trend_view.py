@@ -1,54 +1,88 @@
 import pandas as pd
 import numpy as np
-from PyQt5.QtCore import pyqtSignal
+import time
+
+from PyQt5.QtCore import Qt, QTimer, pyqtSignal
 from PyQt5.QtWidgets import (
     QWidget,
     QVBoxLayout,
     QHBoxLayout,
     QGridLayout,
     QComboBox,
+    QCheckBox,
     QLabel,
 )
 import pyqtgraph as pg
-from .plot_widgets import BasePlotWidget
-
-
-def calculate_l1_norm(df: pd.DataFrame) -> pd.DataFrame:
-    """Compute L1 norm of the signal for each timestamp/channel row."""
-    if df is None or df.empty:
-        return pd.DataFrame(columns=["timestamp", "channel", "l1"])
-
-    result = df[["timestamp", "channel", "values"]].copy()
-
-    def _l1(arr):
-        np_arr = np.asarray(arr, dtype=float)
-        return float(np.sum(np.abs(np_arr))) if np_arr.size > 0 else 0.0
-
-    result["l1"] = result["values"].apply(_l1)
-    return result[["timestamp", "channel", "l1"]]
-
-
-
+from .plot_widgets import AnnotationItem, BasePlotWidget
+from .trend_heatmap import TrendHeatmap
+from src.trends import ALIGNMENTS, METRICS, TrendStore, calculate_l1_norm, pivot_series
+from src import population
+from src.artifacts import artifact_mask
+from src.memory import ACCOUNTANT, PRIORITY_DERIVED, PRIORITY_POOL, array_buffers
+from src.profiler import profiled
+
+__all__ = ["TrendView", "calculate_l1_norm"]
+
+# Metric selector entry -> (TrendStore metric, hover label)
+TREND_METRICS = {
+    "L1": ("l1", "L1"),
+    "Amplitude": ("amplitude", "µV p-p"),
+    "Latency": ("latency", "ms"),
+    "Baseline difference": ("diff_energy", "µV²·s"),
+    "Baseline similarity": ("similarity", "NCC"),
+    "Similarity lag": ("similarity_lag", "ms"),
+}
+
+# Time (s) one slice of progressive channel plot rendering may take before
+# yielding to the event loop.
+FRAME_BUDGET = 0.012
+
+# Estimated bytes held by one channel plot besides its curve data (widget,
+# graphics scene, axes and the viewport's backing store).
+PLOT_OVERHEAD = 256 * 1024
 
 
 class TrendView(QWidget):
-    """Widget for displaying L1-norm trends across time."""
+    """Widget for displaying L1, amplitude or latency trends across time."""
 
     modalityChanged = pyqtSignal(str)
+    # Emitted with the timestamp clicked in the heatmap overview
+    timestampSelected = pyqtSignal(float)
 
-    def __init__(self, parent=None):
+    def __init__(self, parent=None, trend_store=None, population_stats=None):
         super().__init__(parent)
 
+        self._store = trend_store if trend_store is not None else TrendStore()
+        # Normative bands shaded behind the channel curves, if available
+        self._population = (
+            population_stats if population_stats is not None else population.load_default()
+        )
+        self._protocols = {}
+        self._meta = None
         self.mep_df = None
         self.ssep_upper_df = None
         self.ssep_lower_df = None
         self._surgery_id = None
         self._channel_order = []
+        # AnnotationStore of the current surgery, drawn behind the trends
+        self._annotations = None
 
         self._visible_channels = []
         self._channel_plots = {}
+        # Channel plots still to be drawn by the current pass, in order
+        self._render_queue = []
+        self._render_timer = QTimer(self)
+        self._render_timer.setSingleShot(True)
+        self._render_timer.timeout.connect(self._render_slice)
+        self._update_start = 0.0
         self._setup_ui()
 
+        ACCOUNTANT.register("Trend series", self._store.buffers, self._store.release,
+                            priority=PRIORITY_DERIVED)
+        ACCOUNTANT.register("Trend plots", self._shown_plot_buffers, category="plots")
+        ACCOUNTANT.register("Trend plot pool", self._pooled_plot_buffers, self.trim_plot_pool,
+                            priority=PRIORITY_POOL, category="plots")
+
     def _setup_ui(self) -> None:
         layout = QVBoxLayout(self)
 
@@ -57,12 +91,40 @@ class TrendView(QWidget):
         selector_layout.addWidget(QLabel("Modality:"))
         self.modality_combo = QComboBox()
         self.modality_combo.addItems(["MEP", "SSEP_UPPER", "SSEP_LOWER"])
-        self.modality_combo.currentTextChanged.connect(self.update_view)
+        self.modality_combo.currentTextChanged.connect(self._on_modality_changed)
         self.modality_combo.currentTextChanged.connect(self.modalityChanged.emit)
         selector_layout.addWidget(self.modality_combo)
+        selector_layout.addWidget(QLabel("Metric:"))
+        self.metric_combo = QComboBox()
+        self.metric_combo.addItems(list(TREND_METRICS))
+        self.metric_combo.currentTextChanged.connect(self._on_metric_changed)
+        selector_layout.addWidget(self.metric_combo)
+
+        self.heatmap_check = QCheckBox("Heatmap overview")
+        self.heatmap_check.toggled.connect(lambda _: self.update_view())
+        selector_layout.addWidget(self.heatmap_check)
+
+        # Multi-surgery comparison controls
+        self.compare_check = QCheckBox("Compare surgeries")
+        self.compare_check.toggled.connect(self._on_compare_toggled)
+        selector_layout.addWidget(self.compare_check)
+        self.compare_channel_combo = QComboBox()
+        self.compare_channel_combo.currentTextChanged.connect(lambda _: self.update_view())
+        selector_layout.addWidget(self.compare_channel_combo)
+        self.align_combo = QComboBox()
+        self.align_combo.addItems(ALIGNMENTS)
+        self.align_combo.currentTextChanged.connect(lambda _: self.update_view())
+        selector_layout.addWidget(QLabel("Align:"))
+        selector_layout.addWidget(self.align_combo)
         selector_layout.addStretch(1)
         layout.addLayout(selector_layout)
 
+        # Channel × time overview, replacing the channel plots when enabled
+        self.heatmap = TrendHeatmap(self)
+        self.heatmap.timestampClicked.connect(self.timestampSelected.emit)
+        self.heatmap.hide()
+        layout.addWidget(self.heatmap, 2)
+
         # Layout for channel plots
         self.channel_grid = QGridLayout()
         self.channel_grid.setColumnStretch(0, 1)
@@ -71,9 +133,19 @@ class TrendView(QWidget):
 
         # Global summary plot
         self.global_plot = BasePlotWidget(self)
+        self.global_plot.hover_x_units = (1.0, "s")
+        self.global_plot.hover_y_label = "L1"
         self.global_legend = self.global_plot.plotItem.legend
         layout.addWidget(self.global_plot)
 
+        # Overlay of one channel across surgeries
+        self.compare_plot = BasePlotWidget(self)
+        self.compare_plot.hover_x_units = (1.0, "s")
+        self.compare_plot.hover_y_label = "L1"
+        self.compare_plot.hide()
+        layout.addWidget(self.compare_plot)
+        self._set_compare_controls_enabled(False)
+
     def refresh(self, data_dict: dict) -> None:
         """Update internal data and refresh the display."""
         for widget in self._channel_plots.values():
@@ -84,6 +156,10 @@ class TrendView(QWidget):
         self.mep_df = data_dict.get("mep_df")
         self.ssep_upper_df = data_dict.get("ssep_upper_df")
         self.ssep_lower_df = data_dict.get("ssep_lower_df")
+        self._meta = data_dict.get("surgery_meta_df")
+        self._protocols = population.surgery_protocols(self._meta)
+        self._update_store(self._metric())
+        self._populate_compare_channels()
         self.update_view()
 
     def set_current_surgery(self, surgery_id: str) -> None:
@@ -100,11 +176,58 @@ class TrendView(QWidget):
         """Set which channels should be displayed."""
         self._visible_channels = list(channels)
 
+    def set_current_timestamp(self, timestamp) -> None:
+        """Mark ``timestamp`` in the heatmap overview."""
+        self.heatmap.set_cursor(timestamp)
+
+    def set_annotations(self, store) -> None:
+        """Draw the annotations of ``store`` (an :class:`~src.annotations.AnnotationStore`).
+
+        They are drawn from the next :meth:`update_view`.
+        """
+        self._annotations = store
+
+    def set_dataset(self, path) -> None:
+        """Keep the trend series of the dataset at ``path`` apart from other datasets."""
+        self._store.set_dataset(path)
+
+    def set_population(self, stats) -> None:
+        """Set the :class:`~src.population.PopulationStats` used for bands."""
+        self._population = stats
+        self.update_view()
+
     # -----------------------------------------------------
     # Internal helpers
     # -----------------------------------------------------
+    def _metric(self) -> str:
+        return TREND_METRICS[self.metric_combo.currentText()][0]
+
+    def _metric_label(self) -> str:
+        return TREND_METRICS[self.metric_combo.currentText()][1]
+
+    def _update_store(self, metric: str) -> None:
+        """Bring the stored ``metric`` series up to date with the loaded frames."""
+        for mode in ("MEP", "SSEP_UPPER", "SSEP_LOWER"):
+            self._store.update(self._dataframe_for(mode), mode, metric, meta=self._meta)
+
+    def _on_modality_changed(self, _text: str) -> None:
+        self._populate_compare_channels()
+        self.update_view()
+
+    def _on_metric_changed(self, _text: str) -> None:
+        # Amplitude and latency series are computed on first use
+        self._update_store(self._metric())
+        self._populate_compare_channels()
+        label = self._metric_label()
+        for plot in (self.global_plot, self.compare_plot, *self._channel_plots.values()):
+            plot.hover_y_label = label
+        self.heatmap.hover_y_label = f"rel. {label}"
+        self.update_view()
+
     def _current_dataframe(self) -> pd.DataFrame:
-        mode = self.modality_combo.currentText()
+        return self._dataframe_for(self.modality_combo.currentText())
+
+    def _dataframe_for(self, mode: str) -> pd.DataFrame:
         if mode == "MEP":
             return self.mep_df
         if mode == "SSEP_UPPER":
@@ -113,22 +236,207 @@ class TrendView(QWidget):
             return self.ssep_lower_df
         return None
 
+    def _add_population_band(self, plot, mode: str, channel, metric: str = "l1") -> None:
+        """Shade the population 5–95th percentile and IQR and draw the median."""
+        if self._population is None or self._surgery_id is None:
+            return
+        protocol = self._protocols.get(str(self._surgery_id), "unknown")
+        band = self._population.band(mode, channel, protocol, metric)
+        if band is None:
+            return
+        for lo, hi, alpha in (("p5", "p95", 30), ("p25", "p75", 50)):
+            region = pg.LinearRegionItem(
+                values=(band[lo], band[hi]),
+                orientation="horizontal",
+                movable=False,
+                brush=pg.mkBrush(100, 150, 255, alpha),
+                pen=pg.mkPen(None),
+            )
+            region.setZValue(-20)
+            plot.plotItem.addItem(region)
+        median = pg.InfiniteLine(
+            pos=band["median"], angle=0, movable=False,
+            pen=pg.mkPen((100, 150, 255), style=Qt.DashLine),
+        )
+        median.setZValue(-10)
+        plot.plotItem.addItem(median)
+
+    def _add_annotations(self, plot) -> None:
+        if self._annotations is not None:
+            plot.plotItem.addItem(AnnotationItem(self._annotations), ignoreBounds=True)
+
+    def _set_compare_controls_enabled(self, enabled: bool) -> None:
+        self.compare_channel_combo.setEnabled(enabled)
+        self.align_combo.setEnabled(enabled)
+
+    def _on_compare_toggled(self, checked: bool) -> None:
+        self._set_compare_controls_enabled(checked)
+        if checked:
+            self._populate_compare_channels()
+        self.update_view()
+
+    def _populate_compare_channels(self) -> None:
+        mode = self.modality_combo.currentText()
+        current = self.compare_channel_combo.currentText()
+        channels = self._store.channels(mode, self._metric())
+        self.compare_channel_combo.blockSignals(True)
+        self.compare_channel_combo.clear()
+        self.compare_channel_combo.addItems(channels)
+        if current in channels:
+            self.compare_channel_combo.setCurrentText(current)
+        self.compare_channel_combo.blockSignals(False)
+
+    def _update_compare_view(self) -> None:
+        """Overlay the stored trend of one channel for every surgery."""
+        # Auto-ranging after every removed/added curve is quadratic in their
+        # number, so range once at the end.
+        self.compare_plot.disableAutoRange()
+        self.compare_plot.clear()
+        mode = self.modality_combo.currentText()
+        channel = self.compare_channel_combo.currentText()
+        align = self.align_combo.currentText()
+        if not channel:
+            self.compare_plot.enableAutoRange()
+            return
+        metric = self._metric()
+        self.compare_plot.plotItem.setTitle(
+            f"{channel}: {self.metric_combo.currentText()} aligned to {align.lower()}"
+        )
+        surgeries = self._store.surgeries(mode, metric)
+        for i, sid in enumerate(surgeries):
+            xy = self._store.channel_series(sid, mode, channel, metric, align=align)
+            if xy is None or not len(xy[0]):
+                continue
+            if sid == str(self._surgery_id):
+                pen = pg.mkPen("w", width=2)
+            else:
+                pen = pg.mkPen(pg.intColor(i, hues=max(len(surgeries), 1), alpha=140), width=1)
+            item = self.compare_plot.add_trace(xy[0], xy[1], sid, pen=pen)
+            # Peak-preserving decimation to the pixel width keeps large
+            # overlays interactive.
+            item.setDownsampling(auto=True, method="peak")
+            item.setClipToView(True)
+        self.compare_plot.enableAutoRange()
+
+    # -----------------------------------------------------
+    # Plot pool
+    # -----------------------------------------------------
+    def _pooled_channels(self) -> list:
+        """Return the channels whose plots are hidden and not about to be drawn."""
+        pending = {item[0] for item in self._render_queue}
+        return [ch for ch, plot in self._channel_plots.items()
+                if plot.isHidden() and ch not in pending]
+
+    def _plot_buffers(self, channels) -> dict:
+        """Estimate the memory of the given channel plots, see :mod:`src.memory`."""
+        out = {}
+        for channel in channels:
+            plot = self._channel_plots[channel]
+            out[("plot", id(plot))] = PLOT_OVERHEAD
+            for item in plot.plotItem.listDataItems():
+                array_buffers(item.xData, item.yData, out=out)
+        return out
+
+    def _shown_plot_buffers(self) -> dict:
+        pooled = set(self._pooled_channels())
+        return self._plot_buffers([ch for ch in self._channel_plots if ch not in pooled])
+
+    def _pooled_plot_buffers(self) -> dict:
+        return self._plot_buffers(self._pooled_channels())
+
+    def trim_plot_pool(self) -> None:
+        """Delete the hidden channel plots; they are recreated when shown again."""
+        for channel in self._pooled_channels():
+            plot = self._channel_plots.pop(channel)
+            plot.setParent(None)
+            plot.deleteLater()
+
+    # -----------------------------------------------------
+    # Progressive rendering
+    # -----------------------------------------------------
+    @property
+    def rendering(self) -> bool:
+        """True while channel plots of the last update are still pending."""
+        return bool(self._render_queue)
+
+    def cancel_rendering(self) -> None:
+        """Drop the channel plots still pending from the last update."""
+        self._render_timer.stop()
+        self._render_queue = []
+
+    def finish_rendering(self) -> None:
+        """Draw every pending channel plot now."""
+        self._render_timer.stop()
+        while self._render_queue:
+            self._render_channel(*self._render_queue.pop(0))
+
+    @profiled()
+    def _render_slice(self, start=None) -> None:
+        """Draw pending channel plots until one frame budget after ``start``.
+
+        At least one plot is drawn per slice.
+        """
+        if start is None:
+            start = time.perf_counter()
+        while self._render_queue:
+            self._render_channel(*self._render_queue.pop(0))
+            if time.perf_counter() - start > FRAME_BUDGET:
+                break
+        if self._render_queue:
+            self._render_timer.start(0)
+
+    @profiled()
     def update_view(self) -> None:
-        df = self._current_dataframe()
-        if df is not None and self._surgery_id is not None:
-            df = df[df["surgery_id"] == self._surgery_id]
+        """Redraw the trends of the current surgery, modality and channels.
+
+        The global summary and the first channel plots are drawn right away;
+        the remaining channel plots follow in slices of at most
+        :data:`FRAME_BUDGET` between events. Calling again cancels the
+        slices still pending.
+        """
+        self.cancel_rendering()
+        self._update_start = time.perf_counter()
         # clear layout positions without deleting widgets
         while self.channel_grid.count():
             self.channel_grid.takeAt(0)
 
+        # Auto-ranging after every removed or added curve is slow, so range
+        # once after clearing and once after drawing the summary
+        self.global_plot.disableAutoRange()
         self.global_plot.clear()
+        self.global_plot.enableAutoRange()
         if self.global_legend is not None:
             self.global_legend.clear()
 
-        if df is None or df.empty:
+        comparing = self.compare_check.isChecked()
+        self.compare_plot.setVisible(comparing)
+        self.global_plot.setVisible(not comparing)
+        if comparing:
+            self.heatmap.hide()
+            for widget in self._channel_plots.values():
+                widget.hide()
+            self._update_compare_view()
             return
 
-        norm_df = calculate_l1_norm(df)
+        df = self._current_dataframe()
+        if df is None or df.empty:
+            return
+        # The store is brought up to date with the loaded frames in refresh()
+        # and when the metric changes
+        metric = self._metric()
+        norm_df = None
+        if self._surgery_id is not None:
+            norm_df = self._store.series(
+                self._surgery_id, self.modality_combo.currentText(), metric
+            )
+        if norm_df is None:
+            if self._surgery_id is not None:
+                df = df[df["surgery_id"] == self._surgery_id]
+            if df.empty:
+                return
+            norm_df = METRICS[metric](df)[~artifact_mask(df)]
+        if norm_df.empty:
+            return
 
         unique_channels = list(norm_df["channel"].unique())
         if self._channel_order:
@@ -142,30 +450,49 @@ class TrendView(QWidget):
         if self._visible_channels:
             channels = [ch for ch in channels if ch in self._visible_channels]
 
+        # Global statistics
+        summary = norm_df.groupby("timestamp")[metric].agg(["min", "max", "mean"])
+        x_vals = summary.index.to_list()
+        x_vals = np.asarray(x_vals, dtype=float)
+        self.global_plot.disableAutoRange()
+        self.global_plot.add_trace(x_vals, summary["min"].to_numpy(), "Min", pen=pg.mkPen("y", width=2), name="Min")
+        self.global_plot.add_trace(x_vals, summary["max"].to_numpy(), "Max", pen=pg.mkPen("r", width=2), name="Max")
+        self.global_plot.add_trace(x_vals, summary["mean"].to_numpy(), "Avg", pen=pg.mkPen("c", width=2), name="Avg")
+        self._add_annotations(self.global_plot)
+        self.global_plot.enableAutoRange()
+
+        self.heatmap.setVisible(self.heatmap_check.isChecked())
+        if self.heatmap_check.isChecked():
+            for widget in self._channel_plots.values():
+                widget.hide()
+            self._update_heatmap(norm_df, channels)
+        else:
+            self._update_channel_plots(norm_df, channels)
+
+    def _update_heatmap(self, norm_df: pd.DataFrame, channels: list) -> None:
+        matrix = None
+        if self._surgery_id is not None:
+            matrix = self._store.matrix(
+                self._surgery_id, self.modality_combo.currentText(), self._metric()
+            )
+        if matrix is None:
+            matrix = pivot_series(norm_df["timestamp"], norm_df["channel"], norm_df[self._metric()])
+        self.heatmap.set_matrix(matrix, channels)
+
+    def _update_channel_plots(self, norm_df: pd.DataFrame, channels: list) -> None:
+        """Lay out the channel plots and queue their curves, top rows first."""
+        metric = self._metric()
+        x_all = norm_df["timestamp"].to_numpy(dtype=float)
+        y_all = norm_df[metric].to_numpy(dtype=float)
+        groups = norm_df.groupby("channel", sort=False).indices
         left_row = right_row = 0
-        used = set()
         used_cols = {0: False, 1: False}
+        queue = []
         for channel in channels:
-            subset = norm_df[norm_df["channel"] == channel]
-            if subset.empty:
+            rows = groups.get(channel)
+            if rows is None or not len(rows):
                 continue
-            x = subset["timestamp"].to_list()
-            y = subset["l1"].to_list()
-
-            if channel not in self._channel_plots:
-                self._channel_plots[channel] = BasePlotWidget(self)
-            plot = self._channel_plots[channel]
-            plot.clear()
-            plot.plot(x, y, pen=pg.mkPen(width=2))
-
-            title = str(channel)
-            mode = self.modality_combo.currentText()
-            if mode == "SSEP_UPPER":
-                title = f"Upper: {channel}"
-            elif mode == "SSEP_LOWER":
-                title = f"Lower: {channel}"
-            plot.plotItem.setTitle(title)
-
+            rows = rows[np.argsort(x_all[rows], kind="stable")]
             if str(channel).lower().startswith("r"):
                 col = 1
                 row = right_row
@@ -175,12 +502,13 @@ class TrendView(QWidget):
                 row = left_row
                 left_row += 1
             used_cols[col] = True
-
-            self.channel_grid.addWidget(plot, row, col)
-            plot.show()
-            used.add(channel)
+            queue.append((channel, row, col, x_all[rows], y_all[rows]))
+            # Keep existing plots in place until their curves are redrawn
+            if channel in self._channel_plots:
+                self.channel_grid.addWidget(self._channel_plots[channel], row, col)
 
         # hide unused plots
+        used = {item[0] for item in queue}
         for ch, widget in self._channel_plots.items():
             if ch not in used:
                 widget.hide()
@@ -199,10 +527,34 @@ class TrendView(QWidget):
             self.channel_grid.setColumnStretch(0, 1)
             self.channel_grid.setColumnStretch(1, 0)
 
-        # Global statistics
-        summary = norm_df.groupby("timestamp")["l1"].agg(["min", "max", "mean"])
-        x_vals = summary.index.to_list()
-        self.global_plot.plot(x_vals, summary["min"].to_list(), pen=pg.mkPen("y", width=2), name="Min")
-        self.global_plot.plot(x_vals, summary["max"].to_list(), pen=pg.mkPen("r", width=2), name="Max")
-        self.global_plot.plot(x_vals, summary["mean"].to_list(), pen=pg.mkPen("c", width=2), name="Avg")
+        # Rows at the top of both columns are on screen first
+        queue.sort(key=lambda item: item[1])
+        self._render_queue = queue
+        # The first slice shares the frame budget with the summary and layout
+        self._render_slice(self._update_start)
+
+    def _render_channel(self, channel, row: int, col: int, x: np.ndarray, y: np.ndarray) -> None:
+        """Draw the curve and population band of one channel plot."""
+        metric = self._metric()
+        if channel not in self._channel_plots:
+            plot = BasePlotWidget(self)
+            plot.hover_x_units = (1.0, "s")
+            plot.hover_y_label = self._metric_label()
+            self._channel_plots[channel] = plot
+            self.channel_grid.addWidget(plot, row, col)
+        plot = self._channel_plots[channel]
+        plot.disableAutoRange()
+        plot.clear()
+        mode = self.modality_combo.currentText()
+        self._add_population_band(plot, mode, channel, metric)
+        self._add_annotations(plot)
+        plot.add_trace(x, y, str(channel), pen=pg.mkPen(width=2))
+        plot.enableAutoRange()
 
+        title = str(channel)
+        if mode == "SSEP_UPPER":
+            title = f"Upper: {channel}"
+        elif mode == "SSEP_LOWER":
+            title = f"Lower: {channel}"
+        plot.plotItem.setTitle(title)
+        plot.show()
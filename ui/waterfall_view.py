@@ -0,0 +1,150 @@
+import numpy as np
+import pandas as pd
+import pyqtgraph as pg
+from PyQt5.QtCore import QRectF
+from PyQt5.QtWidgets import QComboBox, QHBoxLayout, QLabel, QVBoxLayout, QWidget
+
+from src.memory import ACCOUNTANT, array_buffers, frame_buffers
+from src.profiler import PROFILER, profiled
+from src.waterfall import WaterfallBuffer, resample_traces, trace_duration
+
+from .plot_widgets import BasePlotWidget
+
+MODALITIES = ("MEP", "SSEP_UPPER", "SSEP_LOWER")
+
+
+class WaterfallView(QWidget):
+    """Successive traces of one channel stacked as rows of a single image.
+
+    The channel's traces up to the current timestamp are resampled onto a
+    common time grid and kept in a :class:`~src.waterfall.WaterfallBuffer`.
+    Moving forward in time only resamples and appends the new traces.
+    """
+
+    N_COLUMNS = 512
+    CAPACITY = 4096
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._frames = {}
+        # State of the channel currently shown
+        self._key = None
+        self._rows = None
+        self._timestamps = np.zeros(0)
+        self._duration = 0.0
+        self._shown = 0
+        self._buffer = WaterfallBuffer(self.N_COLUMNS, self.CAPACITY)
+        self._setup_ui()
+        ACCOUNTANT.register("Waterfall", self._memory_buffers, category="plots")
+
+    def _setup_ui(self) -> None:
+        layout = QVBoxLayout(self)
+        selector_layout = QHBoxLayout()
+        selector_layout.addWidget(QLabel("Modality:"))
+        self.modality_combo = QComboBox()
+        self.modality_combo.addItems(MODALITIES)
+        selector_layout.addWidget(self.modality_combo)
+        selector_layout.addWidget(QLabel("Channel:"))
+        self.channel_combo = QComboBox()
+        selector_layout.addWidget(self.channel_combo)
+        selector_layout.addStretch(1)
+        layout.addLayout(selector_layout)
+
+        self.plot = BasePlotWidget(self)
+        self.plot.setLabel("bottom", "Time", units="s")
+        self.plot.setLabel("left", "Trace")
+        self.plot.hover_y_label = "trace"
+        self.image = pg.ImageItem(axisOrder="row-major")
+        self.image.setColorMap(pg.colormap.get("CET-D1"))
+        self.plot.addItem(self.image)
+        layout.addWidget(self.plot)
+
+        self.modality_combo.currentTextChanged.connect(self._populate_channels)
+
+    def set_data(self, frames: dict) -> None:
+        """Set the modality frames, keyed by ``MODALITIES``."""
+        self._frames = dict(frames)
+        self._key = None
+        self._populate_channels()
+
+    def current_dataframe(self) -> pd.DataFrame:
+        return self._frames.get(self.modality_combo.currentText())
+
+    def _populate_channels(self, *_) -> None:
+        df = self.current_dataframe()
+        current = self.channel_combo.currentText()
+        channels = sorted(df["channel"].astype(str).unique()) if df is not None else []
+        self.channel_combo.blockSignals(True)
+        self.channel_combo.clear()
+        self.channel_combo.addItems(channels)
+        if current in channels:
+            self.channel_combo.setCurrentText(current)
+        self.channel_combo.blockSignals(False)
+
+    def _memory_buffers(self) -> dict:
+        """Return the image buffer and selected frames, see :mod:`src.memory`."""
+        out = self._buffer.buffers()
+        array_buffers(self._timestamps, out=out)
+        for df in (*self._frames.values(), self._rows):
+            out.update(frame_buffers(df))
+        return out
+
+    # -----------------------------------------------------
+    # Rendering
+    # -----------------------------------------------------
+    def _select(self, df: pd.DataFrame, surgery_id, channel: str) -> None:
+        """Cache the time-sorted rows of one surgery and channel."""
+        with PROFILER.stage("filter"):
+            mask = (df["surgery_id"] == surgery_id) & (df["channel"].astype(str) == channel)
+            rows = df[mask]
+            ts = pd.to_numeric(rows["timestamp"], errors="coerce").to_numpy(dtype=float)
+            order = np.argsort(ts, kind="stable")
+            self._rows = rows.iloc[order]
+            self._timestamps = ts[order]
+        self._duration = trace_duration(self._rows)
+        self._buffer.clear()
+        self._shown = 0
+
+    def _append(self, start: int, stop: int) -> None:
+        with PROFILER.stage("resample"):
+            block = resample_traces(self._rows.iloc[start:stop], self.N_COLUMNS, self._duration)
+        self._buffer.append(block, self._timestamps[start:stop])
+        self._shown = stop
+
+    @profiled()
+    def update_view(self, surgery_id, timestamp) -> None:
+        """Show the channel's traces up to and including ``timestamp``."""
+        df = self.current_dataframe()
+        channel = self.channel_combo.currentText()
+        if df is None or df.empty or not channel:
+            self.image.clear()
+            return
+        key = (id(df), str(surgery_id), channel)
+        if key != self._key:
+            self._select(df, surgery_id, channel)
+            self._key = key
+        stop = len(self._timestamps)
+        if timestamp is not None:
+            stop = int(np.searchsorted(self._timestamps, float(timestamp), side="right"))
+        if stop < self._shown or stop - self.CAPACITY > self._shown:
+            # Moved back in time, or too far ahead to append: rebuild from
+            # the last CAPACITY traces
+            self._buffer.clear()
+            self._shown = max(0, stop - self.CAPACITY)
+        if stop > self._shown:
+            self._append(max(self._shown, stop - self.CAPACITY), stop)
+        self._render()
+
+    def _render(self) -> None:
+        data = self._buffer.image()
+        if not len(data):
+            self.image.clear()
+            return
+        with PROFILER.stage("plot_items"):
+            # Symmetric levels from the most recent traces only
+            recent = np.abs(data[-256:])
+            limit = float(np.nanpercentile(recent, 99)) if np.isfinite(recent).any() else 0.0
+            limit = limit if limit > 0 else 1.0
+            self.image.setImage(data, autoLevels=False, levels=(-limit, limit))
+            first = self._shown - len(data)
+            self.image.setRect(QRectF(0.0, first, self._duration, len(data)))